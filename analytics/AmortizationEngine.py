@@ -0,0 +1,180 @@
+import numpy as np
+
+from entity.projectionModel import ProjectionModel
+
+
+class AmortizationEngine:
+    """
+    Векторный расчет графиков погашения аннуитетных кредитов для целого портфеля.
+    Все кредиты обрабатываются одновременно через broadcasting матриц "кредит x месяц",
+    без циклов Python по отдельным кредитам. Портфель делится на порции так, чтобы
+    промежуточные матрицы укладывались в заданный бюджет памяти.
+    """
+
+    # Количество одновременно живущих матриц float64/int64 размера "порция x горизонт"
+    # (четыре матрицы графика, номера ячеек агрегирования и временная матрица)
+    MATRICES_PER_CHUNK = 6
+
+    def __init__(self, memory_budget=256 * 2 ** 20):
+        """
+        :param memory_budget: Бюджет памяти на промежуточные матрицы одной порции в байтах
+        """
+        self.memory_budget = memory_budget
+
+    def chunk_size(self, horizon):
+        """
+        Возвращает количество кредитов в порции, при котором расчет укладывается в бюджет памяти.
+
+        :param horizon: Количество месяцев в графике
+        """
+        return max(1, self.memory_budget // (horizon * 8 * self.MATRICES_PER_CHUNK))
+
+    @staticmethod
+    def annuity_payment(principal, annual_rate, months):
+        """
+        Рассчитывает ежемесячный аннуитетный платеж.
+
+        :param principal: Массив сумм кредитов
+        :param annual_rate: Массив годовых процентных ставок в процентах
+        :param months: Массив сроков кредитов в месяцах
+        :return: Массив ежемесячных платежей
+        """
+        principal = np.asarray(principal, dtype=np.float64)
+        months = np.maximum(np.asarray(months, dtype=np.float64), 1)
+        rate = np.asarray(annual_rate, dtype=np.float64) / 1200
+        with np.errstate(divide="ignore", invalid="ignore"):
+            payment = principal * rate / -np.expm1(-months * np.log1p(rate))
+        return np.where(rate == 0, principal / months, payment)
+
+    def schedules(self, principal, annual_rate, months, payment=None, horizon=None):
+        """
+        Порционно рассчитывает полные графики погашения.
+
+        :param principal: Массив сумм кредитов
+        :param annual_rate: Массив годовых процентных ставок в процентах
+        :param months: Массив сроков кредитов в месяцах
+        :param payment: Массив ежемесячных платежей (по умолчанию аннуитетный платеж);
+                        недоплата гасится последним платежом
+        :param horizon: Количество месяцев в графике (по умолчанию максимальный срок)
+        :return: Генератор кортежей (start, stop, график), где график - словарь матриц
+                 'payment', 'interest', 'principal', 'balance' размера (stop - start) x horizon
+        """
+        principal, rate, months, payment = self._portfolio(principal, annual_rate, months, payment)
+        horizon = self._horizon(months, horizon)
+        step = self.chunk_size(horizon)
+        for start in range(0, len(principal), step):
+            stop = min(start + step, len(principal))
+            yield start, stop, self._schedule(principal[start:stop], rate[start:stop], months[start:stop],
+                                              payment[start:stop], horizon)
+
+    def schedule(self, principal, annual_rate, months, payment=None, horizon=None):
+        """
+        Рассчитывает полные графики погашения и собирает их в матрицы "кредит x месяц".
+        Для больших портфелей следует использовать schedules или project.
+
+        :return: Словарь матриц 'payment', 'interest', 'principal', 'balance'
+        """
+        parts = [chunk for _, _, chunk in self.schedules(principal, annual_rate, months, payment, horizon)]
+        if not parts:
+            return {field: np.empty((0, 0)) for field in ("payment", "interest", "principal", "balance")}
+        return {field: np.concatenate([part[field] for part in parts]) for field in parts[0]}
+
+    def project(self, principal, annual_rate, months, payment=None, groups=None, start_month=None, horizon=None):
+        """
+        Прогнозирует погашение портфеля с агрегированием по группам и календарным месяцам.
+        Полные графики не сохраняются: каждая порция сразу суммируется в матрицы агрегатов.
+
+        :param principal: Массив сумм кредитов
+        :param annual_rate: Массив годовых процентных ставок в процентах
+        :param months: Массив сроков кредитов в месяцах
+        :param payment: Массив ежемесячных платежей (по умолчанию аннуитетный платеж)
+        :param groups: Массив ключей групп (например, названий банков); None - одна общая группа
+        :param start_month: Массив номеров месяцев выдачи кредитов относительно начала прогноза
+                            (по умолчанию все кредиты выданы в месяце 0)
+        :param horizon: Количество месяцев графика каждого кредита (по умолчанию максимальный срок)
+        :return: Экземпляр ProjectionModel; месяцы - номера от 0
+        """
+        principal, rate, months, payment = self._portfolio(principal, annual_rate, months, payment)
+        horizon = self._horizon(months, horizon)
+        count = len(principal)
+
+        if groups is None:
+            keys, group_index = np.array([None], dtype=object), np.zeros(count, dtype=np.int64)
+        else:
+            keys, group_index = np.unique(np.asarray(groups), return_inverse=True)
+        start_month = (np.zeros(count, dtype=np.int64) if start_month is None
+                       else np.asarray(start_month, dtype=np.int64))
+
+        total_months = (int(start_month.max()) if count else 0) + horizon
+        size = len(keys) * total_months
+        totals = {field: np.zeros(size) for field in ("payment", "interest", "principal", "balance")}
+
+        offsets = np.arange(horizon)
+        for start, stop, chunk in self.schedules(principal, rate * 1200, months, payment, horizon):
+            # Номер ячейки "группа x календарный месяц" для каждого элемента графика
+            cells = (group_index[start:stop, None] * total_months + start_month[start:stop, None] + offsets).ravel()
+            for field, values in chunk.items():
+                totals[field] += np.bincount(cells, weights=values.ravel(), minlength=size)
+            del chunk, cells  # Освобождаем порцию до расчета следующей
+
+        shape = (len(keys), total_months)
+        return ProjectionModel(keys, np.arange(total_months), totals["payment"].reshape(shape),
+                               totals["interest"].reshape(shape), totals["principal"].reshape(shape),
+                               totals["balance"].reshape(shape))
+
+    @staticmethod
+    def _portfolio(principal, annual_rate, months, payment):
+        principal = np.asarray(principal, dtype=np.float64)
+        rate = np.nan_to_num(np.asarray(annual_rate, dtype=np.float64)) / 1200
+        months = np.asarray(months, dtype=np.int64)
+        if payment is None:
+            payment = AmortizationEngine.annuity_payment(principal, rate * 1200, months)
+        payment = np.asarray(payment, dtype=np.float64)
+        return principal, rate, months, payment
+
+    @staticmethod
+    def _horizon(months, horizon):
+        if horizon is None:
+            horizon = int(months.max()) if len(months) else 0
+        return max(int(horizon), 1)
+
+    @staticmethod
+    def _schedule(principal, rate, months, payment, horizon):
+        """
+        Рассчитывает графики одной порции по замкнутой формуле остатка аннуитета:
+        B(k) = P * (1 + r)^k - A * ((1 + r)^k - 1) / r.
+        Операции выполняются на месте, чтобы одновременно жило не больше MATRICES_PER_CHUNK матриц.
+        """
+        rate = rate[:, None]
+        elapsed = np.arange(horizon, dtype=np.float64)  # Количество уже внесенных платежей
+
+        # (1 + r)^k
+        growth = np.log1p(rate) * elapsed
+        np.exp(growth, out=growth)
+        balance = principal[:, None] * growth
+
+        # Множитель накопленных платежей: ((1 + r)^k - 1) / r, при нулевой ставке - k
+        growth -= 1
+        np.divide(growth, np.where(rate == 0, 1, rate), out=growth)
+        zero_rate = rate[:, 0] == 0
+        growth[zero_rate] = elapsed
+        growth *= payment[:, None]
+        balance -= growth
+        del growth
+
+        # Остаток до платежа; после погашения и за пределами срока - ноль
+        np.maximum(balance, 0, out=balance)
+        balance *= elapsed < months[:, None]
+
+        interest = balance * rate
+        due = balance
+        due += interest
+
+        # Платеж не превышает долга, а последний платеж гасит остаток полностью
+        paid = np.minimum(payment[:, None], due)
+        rows = np.flatnonzero((months >= 1) & (months <= horizon))
+        paid[rows, months[rows] - 1] = due[rows, months[rows] - 1]
+
+        repaid = paid - interest
+        due -= paid
+        return {"payment": paid, "interest": interest, "principal": repaid, "balance": due}
@@ -0,0 +1,85 @@
+"""
+Бенчмарк памяти моделей entity: сравнивает экземпляры со __slots__ и эквивалентные классы
+с __dict__ (прежнее представление), а также скорость создания через __init__ и from_row.
+
+Запуск из корня репозитория:
+    python -m benchmarks.model_memory --count 200000
+"""
+import argparse
+import datetime
+import json
+import time
+import tracemalloc
+from decimal import Decimal
+
+from entity.bankAtmModel import BankAtmModel
+from entity.bankModel import BankModel
+from entity.bankOfficeModel import BankOfficeModel
+from entity.creditAccountModel import CreditAccountModel
+from entity.employeeModel import EmployeeModel
+from entity.paymentAccountModel import PaymentAccountModel
+from entity.userModel import UserModel
+
+# Типичные строки курсора для каждой модели
+SAMPLE_ROWS = {
+    BankModel: (1, "Sberbank", 3, 3, 15, 15, 50, 845302, 11.26),
+    BankOfficeModel: (1, "office0", "ул. Кирова, д. 19", "working", True, 1, True, False, True, 845302, 30.6, 1),
+    BankAtmModel: (1, "BankATM0", "ул. Кирова, д. 19", "working", 1, 1, 4, False, True, 845302, 6.38),
+    EmployeeModel: (1, "Алексей Иванович Смирнов", datetime.date(1990, 12, 25), "Кассир", 1, True, 1, False,
+                    Decimal("90449.00")),
+    UserModel: (1, "User1", datetime.date(1987, 3, 22), "job1", Decimal("9920.00"), ["Sberbank"], 1000),
+    PaymentAccountModel: (1, 1, "Sberbank", Decimal("5798.00")),
+    CreditAccountModel: (1, 1, "Sberbank", datetime.date(2023, 3, 22), datetime.date(2024, 3, 24), 11,
+                         5326540.0, 16544.0, 5.43, 5, 1),
+}
+
+
+def dict_based(model):
+    """
+    Класс с тем же __init__, но с __dict__ у каждого экземпляра (представление до __slots__).
+    """
+    return type(f"Dict{model.__name__}", (), {"__init__": model.__init__})
+
+
+def measure_memory(factory, rows):
+    """
+    Возвращает средний объем памяти на один объект в байтах (без учета самих значений строки).
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(row) for row in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    list_overhead = 8 * len(objects)  # Указатели в самом списке
+    return (after - before - list_overhead) / len(objects)
+
+
+def measure_time(factory, rows):
+    start = time.perf_counter()
+    for row in rows:
+        factory(row)
+    return (time.perf_counter() - start) / len(rows) * 1e9
+
+
+def run(count):
+    results = {}
+    for model, row in SAMPLE_ROWS.items():
+        rows = [row] * count
+        legacy = dict_based(model)
+        results[model.__name__] = {
+            "dict_bytes_per_object": round(measure_memory(lambda r, legacy=legacy: legacy(*r), rows), 1),
+            "slots_bytes_per_object": round(measure_memory(model.from_row, rows), 1),
+            "init_ns_per_object": round(measure_time(lambda r, model=model: model(*r), rows), 1),
+            "from_row_ns_per_object": round(measure_time(model.from_row, rows), 1),
+        }
+        item = results[model.__name__]
+        item["saved_percent"] = round(
+            100 * (1 - item["slots_bytes_per_object"] / item["dict_bytes_per_object"]), 1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory footprint of entity models")
+    parser.add_argument("--count", type=int, default=200000, help="Количество объектов каждой модели")
+    args = parser.parse_args()
+    print(json.dumps(run(args.count), indent=2, ensure_ascii=False))
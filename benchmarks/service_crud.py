@@ -0,0 +1,403 @@
+"""
+Бенчмарк пропускной способности и задержек операций сервисов: для create, read, update, delete, list
+и get_all_info_* каждого сервиса измеряются операции в секунду и перцентили задержки p50/p95/p99
+при заданных размерах таблиц (scale BulkDataFiller) и уровнях конкурентности (количество потоков).
+
+По умолчанию бенчмарк запускает временный экземпляр PostgreSQL (initdb во временный каталог,
+подключение только через unix-сокет) и удаляет его после замеров; initdb не запускается от root.
+С параметром --host используется существующий сервер - таблицы в нем будут пересозданы.
+
+Запуск из корня репозитория:
+    python -m benchmarks.service_crud --scales 1 20 --concurrency 1 4 --ops 500 --output bench.json
+    python -m benchmarks.service_crud --baseline bench.json   # сравнение с прошлым запуском
+"""
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from db.QueryStats import QueryStats
+from main import BankDataFiller
+from seed.BulkDataFiller import BulkDataFiller
+from seed.DataGenerator import DataGenerator
+from seed.ParallelDataFiller import ParallelDataFiller
+
+# Операции, которые читают таблицу целиком: выполняются scan_ops раз вместо ops
+SCAN_OPERATIONS = {"list", "get_all_info_about_banks"}
+
+
+class TemporaryPostgres:
+    """
+    Временный экземпляр PostgreSQL: кластер создается initdb во временном каталоге, сервер слушает
+    только unix-сокет в том же каталоге и работает без fsync. При выходе сервер останавливается,
+    а каталог удаляется.
+    """
+
+    def __init__(self, bin_dir=None, max_connections=100):
+        """
+        :param bin_dir: Каталог с initdb и pg_ctl (по умолчанию - из PATH или pg_config --bindir)
+        :param max_connections: Значение max_connections сервера
+        """
+        self.bin_dir = bin_dir or self.find_bin_dir()
+        self.max_connections = max_connections
+        self.directory = None
+
+    @staticmethod
+    def find_bin_dir():
+        initdb = shutil.which("initdb")
+        if initdb:
+            return os.path.dirname(initdb)
+        try:
+            return subprocess.run(["pg_config", "--bindir"], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            raise RuntimeError("PostgreSQL binaries not found: pass --pg-bin or --host") from None
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix="bench-pg-")
+        data = os.path.join(self.directory, "data")
+        try:
+            self._run("initdb", "-D", data, "-U", "postgres", "-A", "trust", "--no-sync")
+            options = (f"-h '' -k {self.directory} -c fsync=off -c synchronous_commit=off "
+                       f"-c full_page_writes=off -c max_connections={self.max_connections}")
+            self._run("pg_ctl", "-D", data, "-l", os.path.join(self.directory, "server.log"), "-o", options,
+                      "-w", "start")
+        except BaseException:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            raise
+        return {"dbname": "postgres", "user": "postgres", "host": self.directory}
+
+    def __exit__(self, *exc_info):
+        try:
+            self._run("pg_ctl", "-D", os.path.join(self.directory, "data"), "-m", "immediate", "-w", "stop")
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _run(self, program, *args):
+        subprocess.run([os.path.join(self.bin_dir, program), *args], check=True, stdout=subprocess.DEVNULL)
+
+
+def measure(operation, count, concurrency):
+    """
+    Выполняет operation(i) для i из range(count) в concurrency потоках (потоки разбирают номера
+    из общего счетчика) и сводит задержки отдельных вызовов.
+
+    :return: Словарь с количеством операций, операциями в секунду и задержками в миллисекундах
+    """
+    latencies = np.empty(count)
+    numbers = itertools.count()
+    errors = []
+    start = threading.Barrier(concurrency + 1)
+
+    def worker():
+        start.wait()
+        # После ошибки в любом потоке остальные не берут новые номера
+        while not errors:
+            i = next(numbers)
+            if i >= count:
+                return
+            try:
+                began = time.perf_counter()
+                operation(i)
+                latencies[i] = time.perf_counter() - began
+            except Exception as error:  # noqa: BLE001 - ошибка поднимается снова в основном потоке
+                errors.append(error)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    if errors:
+        raise errors[0]
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "ops": count,
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(count / elapsed, 1),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(latencies.mean()) * 1000, 3),
+        "max_ms": round(float(latencies.max()) * 1000, 3),
+    }
+
+
+class ServiceWorkloads:
+    """
+    Операции сервисов для замеров над заполненной базой. Чтения выбирают случайные существующие строки,
+    а update и delete работают со строками, созданными замером create той же серии, поэтому после серии
+    объем данных не меняется и следующие серии (другие уровни конкурентности) идут на той же базе.
+    """
+
+    def __init__(self, filler, seed):
+        """
+        :param filler: Экземпляр BankDataFiller с заполненной базой (его пул и сервисы)
+        :param seed: Зерно выбора строк и генерации данных
+        """
+        self.filler = filler
+        self.rng = np.random.default_rng(seed)
+        self.data = DataGenerator(seed)
+        self.series = 0
+
+        with filler.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT bank_id, name FROM banks ORDER BY bank_id")
+            self.banks = cursor.fetchall()
+            self.ids = {}
+            for table, columns in (("bank_offices", "bank_office_id, bank_id"),
+                                   ("employees", "employee_id, bank_id, bank_office_id"),
+                                   ("atms", "atm_id"), ("users", "user_id"),
+                                   ("payment_accounts", "payment_account_id, user_id, bank_name"),
+                                   ("credit_accounts", "credit_account_id")):
+                cursor.execute(f"SELECT {columns} FROM {table} ORDER BY 1")
+                self.ids[table] = cursor.fetchall()
+
+    def targets(self, rows, count):
+        """
+        Возвращает count случайных строк из rows (с повторениями).
+        """
+        return [rows[i] for i in self.rng.integers(len(rows), size=count)]
+
+    def operations(self, ops, scan_ops):
+        """
+        Возвращает замеры серии в порядке выполнения: для каждого сервиса create идет первым,
+        delete - последним.
+
+        :param ops: Количество выполнений точечных операций
+        :param scan_ops: Количество выполнений операций из SCAN_OPERATIONS
+        :return: Список кортежей (сервис, операция, количество, функция от номера выполнения)
+        """
+        self.series += 1
+        result = []
+        for service, operations in (("Bank", self._bank(ops)), ("BankOffice", self._bank_office(ops)),
+                                    ("Employee", self._employee(ops)), ("BankAtm", self._bank_atm(ops)),
+                                    ("User", self._user(ops)), ("PaymentAccount", self._payment_account(ops)),
+                                    ("CreditAccount", self._credit_account(ops))):
+            for name, operation in operations:
+                result.append((service, name, scan_ops if name in SCAN_OPERATIONS else ops, operation))
+        return result
+
+    def _crud(self, service, table, ops, create, update):
+        """
+        Общие операции сервиса: create(i) создает строку и возвращает ее идентификатор,
+        update - словарь полей для update.
+        """
+        created = [None] * ops
+        reads = [row[0] for row in self.targets(self.ids[table], ops)]
+
+        def create_one(i):
+            created[i] = create(i)
+
+        return [
+            ("create", create_one),
+            ("read", lambda i: service.read(reads[i])),
+            ("update", lambda i: service.update(created[i], **update)),
+            ("list", lambda i: service.list()),
+            ("delete", lambda i: service.delete(created[i])),
+        ]
+
+    def _bank(self, ops):
+        bank = self.filler.bank
+        created = [None] * ops
+        reads = [row[0] for row in self.targets(self.banks, ops)]
+        bank_ids = [row[0] for row in self.banks]
+
+        def create_one(i):
+            created[i] = bank.create(f"bench-{self.series}-{i}").bank_id
+
+        return [
+            ("create", create_one),
+            ("read", lambda i: bank.read(reads[i])),
+            ("update", lambda i: bank.update(created[i], rating=50)),
+            ("list", lambda i: bank.list()),
+            ("get_all_info_about_bank", lambda i: bank.get_all_info_about_bank(reads[i])),
+            ("get_all_info_about_banks", lambda i: list(bank.get_all_info_about_banks(bank_ids))),
+            ("delete", lambda i: bank.delete(created[i])),
+        ]
+
+    def _bank_office(self, ops):
+        banks = self.targets(self.banks, ops)
+        addresses = self.data.addresses(ops, self.series * ops, stream="bench").tolist()
+        return self._crud(self.filler.bank_office, "bank_offices", ops, lambda i: self.filler.bank_office.create(
+            f"bench-office{i}", addresses[i], "working", True, True, True, True, 50.0, banks[i][0]
+        ).bank_office_id, {"rent_cost": 75.0})
+
+    def _employee(self, ops):
+        offices = self.targets(self.ids["bank_offices"], ops)
+        names = self.data.full_names(ops, self.series * ops, stream="bench").tolist()
+        return self._crud(self.filler.employee, "employees", ops, lambda i: self.filler.employee.create(
+            names[i], "1990-01-01", DataGenerator.POSITIONS[0], offices[i][1], False, offices[i][0], True, 50000
+        ).employee_id, {"salary": 60000})
+
+    def _bank_atm(self, ops):
+        employees = self.targets(self.ids["employees"], ops)
+        return self._crud(self.filler.bank_atm, "atms", ops, lambda i: self.filler.bank_atm.create(
+            f"bench-atm{i}", "working", employees[i][1], employees[i][2], employees[i][0], True, True, 5.0
+        ).atm_id, {"status": "no money"})
+
+    def _user(self, ops):
+        user = self.filler.user
+        banks = self.targets(self.banks, ops)
+        names = self.data.full_names(ops, self.series * ops, stream="bench-users").tolist()
+        reads = [row[0] for row in self.targets(self.ids["users"], ops)]
+        operations = self._crud(user, "users", ops, lambda i: user.create(
+            names[i], "1990-01-01", "bench", 5000, [banks[i][1]]
+        ).user_id, {"monthly_income": 7000})
+        operations.insert(-1, ("get_all_info_about_user", lambda i: user.get_all_info_about_user(reads[i])))
+        return operations
+
+    def _payment_account(self, ops):
+        users = self.targets(self.ids["payment_accounts"], ops)
+        payment_account = self.filler.payment_account
+        return self._crud(payment_account, "payment_accounts", ops, lambda i: payment_account.create(
+            users[i][1], users[i][2], 1000
+        ).payment_account_id, {"balance": 2000})
+
+    def _credit_account(self, ops):
+        accounts = self.targets(self.ids["payment_accounts"], ops)
+        employees = self.targets(self.ids["employees"], ops)
+        credit_account = self.filler.credit_account
+        return self._crud(credit_account, "credit_accounts", ops, lambda i: credit_account.create(
+            accounts[i][1], accounts[i][2], "2023-03-22", "2024-03-24", 12, 100000, 9000, employees[i][0],
+            accounts[i][0]
+        ).credit_account_id, {"monthly_payment": 9500})
+
+
+def run(connection_params, scales, concurrency, ops, scan_ops, banks, seed, services=None, query_stats=False):
+    """
+    Для каждого размера базы пересоздает таблицы, заполняет их BulkDataFiller и выполняет серии
+    замеров на каждом уровне конкурентности.
+
+    :param services: Названия сервисов для замеров (по умолчанию - все)
+    :param query_stats: Добавлять в результаты серий статистику запросов по методам (QueryStats)
+    :return: Словарь с описанием окружения и результатами серий
+    """
+    results = {"meta": {
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "ops": ops, "scan_ops": scan_ops, "banks": banks, "seed": seed,
+    }, "runs": []}
+
+    for scale in scales:
+        stats = QueryStats() if query_stats else None
+        filler = BankDataFiller(connection_params, seed=seed, maxconn=max(concurrency), stats=stats)
+        try:
+            rows = BulkDataFiller(filler.pool, scale=scale, seed=seed,
+                                  bank_names=ParallelDataFiller.bank_names(banks)).fill_models()
+            with filler.pool.connection() as connection, connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+                cursor.execute("SHOW server_version")
+                results["meta"]["postgres"] = cursor.fetchone()[0]
+
+            workloads = ServiceWorkloads(filler, seed)
+            for threads in concurrency:
+                series = {}
+                if stats is not None:
+                    stats.reset()
+                for service, name, count, operation in workloads.operations(ops, scan_ops):
+                    if services and service not in services:
+                        continue
+                    series.setdefault(service, {})[name] = measure(operation, count, threads)
+                    print(f"scale={scale} concurrency={threads} {service}.{name}: "
+                          f"{series[service][name]['ops_per_sec']} ops/s", file=sys.stderr)
+                results["runs"].append({"scale": scale, "rows": rows, "concurrency": threads, "results": series})
+                if stats is not None:
+                    results["runs"][-1]["queries"] = stats.snapshot()
+        finally:
+            filler.close_connection()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Сравнивает результаты с прошлым запуском по совпадающим (scale, concurrency, сервис, операция).
+
+    :param tolerance: Допустимая доля ухудшения p95 и ops/sec (0.2 - на 20 %)
+    :return: Список описаний регрессий
+    """
+    previous = {(run["scale"], run["concurrency"], service, name): stats
+                for run in baseline["runs"] for service, operations in run["results"].items()
+                for name, stats in operations.items()}
+    regressions = []
+    for run in results["runs"]:
+        for service, operations in run["results"].items():
+            for name, stats in operations.items():
+                old = previous.get((run["scale"], run["concurrency"], service, name))
+                if old is None:
+                    continue
+                if (stats["p95_ms"] > old["p95_ms"] * (1 + tolerance)
+                        or stats["ops_per_sec"] < old["ops_per_sec"] * (1 - tolerance)):
+                    regressions.append(
+                        f"scale={run['scale']} concurrency={run['concurrency']} {service}.{name}: "
+                        f"p95 {old['p95_ms']} -> {stats['p95_ms']} ms, "
+                        f"{old['ops_per_sec']} -> {stats['ops_per_sec']} ops/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and latency of service operations")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 20],
+                        help="Размеры базы: множители клиентов BulkDataFiller")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Количество потоков")
+    parser.add_argument("--ops", type=int, default=200, help="Количество выполнений точечной операции")
+    parser.add_argument("--scan-ops", type=int, default=5, help="Количество выполнений list и пакетных чтений")
+    parser.add_argument("--banks", type=int, default=5, help="Количество банков в базе")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно данных и выбора строк")
+    parser.add_argument("--services", nargs="+", help="Сервисы для замеров (по умолчанию - все)")
+    parser.add_argument("--query-stats", action="store_true", help="Добавить статистику запросов по методам")
+    parser.add_argument("--output", help="Файл для результатов JSON (по умолчанию - stdout)")
+    parser.add_argument("--baseline", help="Результаты прошлого запуска для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение относительно baseline")
+    parser.add_argument("--pg-bin", help="Каталог с initdb и pg_ctl для временного сервера")
+    parser.add_argument("--host", help="Использовать существующий сервер вместо временного (таблицы пересоздаются)")
+    parser.add_argument("--port", default="5432")
+    parser.add_argument("--dbname", default="postgres")
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+
+    if args.host:
+        server = contextlib.nullcontext({key: value for key, value in (
+            ("host", args.host), ("port", args.port), ("dbname", args.dbname), ("user", args.user),
+            ("password", args.password)) if value is not None})
+    else:
+        server = TemporaryPostgres(args.pg_bin, max_connections=max(args.concurrency) + 10)
+
+    # get_all_info_about_user печатает счета пользователя: вывод замеров не должен его содержать
+    with server as connection_params, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = run(connection_params, args.scales, args.concurrency, args.ops, args.scan_ops, args.banks,
+                      args.seed, args.services, args.query_stats)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import contextvars
+import time
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from db.BankCache import BankCache
+from db.CounterManager import CounterManager
+from db.IdentityMap import NO_IDENTITY_MAP, IdentityMap
+from db.QueryStats import caller
+from db.sql import rowcount
+
+
+class AsyncConnectionPool:
+    """
+    Асинхронный пул подключений к PostgreSQL на основе asyncpg для асинхронных сервисов (AsyncBank и т.д.).
+    Как и ConnectionPool, выдает подключение на время одной операции в своей транзакции, поэтому
+    независимые запросы одного обработчика можно выполнять параллельно через asyncio.gather.
+    Внутри transaction() операции текущей задачи выполняются в одной общей транзакции
+    и должны ожидаться последовательно (одно подключение не выполняет запросы параллельно).
+    """
+
+    def __init__(self, connection_params, min_size=1, max_size=10, timeout=30.0, deferred_counters=False, stats=None):
+        """
+        :param connection_params: Параметры подключения в формате psycopg2.connect (dbname, user, host, ...)
+        :param min_size: Минимальное количество открытых подключений
+        :param max_size: Максимальное количество подключений
+        :param timeout: Сколько секунд ждать свободное подключение
+        :param deferred_counters: Накапливать изменения счетчиков банков и переносить их пакетно (CounterManager);
+                                  по умолчанию счетчики обновляются сразу
+        :param stats: Экземпляр QueryStats для учета запросов; без него подключения не оборачиваются
+        """
+        params = dict(connection_params)
+        if "dbname" in params:
+            params["database"] = params.pop("dbname")
+        if stats is not None:
+            params["connection_class"] = stats.async_connection_class
+        self.stats = stats
+        self._params = params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._pool = None
+        self._unit = contextvars.ContextVar(f"unit_{id(self)}", default=None)  # Подключение единицы работы
+        self._identity = contextvars.ContextVar(f"identity_{id(self)}", default=NO_IDENTITY_MAP)
+
+        # Кэш метаданных банков и счетчики банков, общие для всех сервисов этого пула
+        self.bank_cache = BankCache()
+        self.counters = CounterManager(deferred_counters, on_change=self._counters_changed)
+
+    async def open(self):
+        """
+        Открывает подключения пула.
+
+        :return: Сам пул
+        """
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(min_size=self.min_size, max_size=self.max_size, **self._params)
+        return self
+
+    async def close(self):
+        """
+        Закрывает все подключения пула.
+        """
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Выдает подключение на время одной операции. При успешном выходе транзакция фиксируется,
+        при исключении откатывается. Внутри transaction() выдается подключение единицы работы без фиксации.
+        """
+        unit = self._unit.get()
+        if unit is not None:
+            yield unit
+            return
+
+        async with self._pool.acquire(timeout=self.timeout) as connection, connection.transaction():
+            yield connection
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Открывает единицу работы: все операции сервисов этого пула в текущей задаче выполняются
+        в одной транзакции, которая фиксируется один раз при выходе из блока и откатывается
+        при исключении. Вложенный вызов открывает точку сохранения.
+
+        :return: Подключение asyncpg единицы работы
+        """
+        unit = self._unit.get()
+        try:
+            if unit is not None:
+                try:
+                    async with unit.transaction():
+                        yield unit
+                except BaseException:
+                    # Модели в карте могли получить откаченные значения
+                    self._identity.get().expire_all()
+                    raise
+                return
+
+            async with self._pool.acquire(timeout=self.timeout) as connection:
+                token = self._unit.set(connection)
+                identity_token = self._identity.set(IdentityMap(self.stats))
+                try:
+                    async with connection.transaction():
+                        yield connection
+                finally:
+                    self._identity.reset(identity_token)
+                    self._unit.reset(token)
+        except BaseException:
+            # Откаченная работа могла попасть в кэш банков
+            self.bank_cache.invalidate()
+            raise
+
+    def in_transaction(self):
+        """
+        Возвращает True, если текущая задача выполняется внутри transaction().
+        """
+        return self._unit.get() is not None
+
+    def identity_map(self):
+        """
+        Возвращает карту идентичности единицы работы текущей задачи;
+        вне transaction() - выключенную карту, которая ничего не хранит.
+        """
+        return self._identity.get()
+
+    def _counters_changed(self, *tables):
+        self._identity.get().expire_all(*tables)
+
+
+class InstrumentedConnection(asyncpg.Connection):
+    """
+    Подключение asyncpg, записывающее запросы execute/executemany/fetch* в QueryStats
+    (класс с заполненным атрибутом stats создает сама статистика: QueryStats.async_connection_class).
+    """
+
+    stats = None
+
+    async def _recorded(self, method, query, call, rows):
+        # method определяется до первого await, пока цепочка вызовов сопрограмм еще активна
+        began, error, result = time.perf_counter(), True, None
+        try:
+            result = await call
+            error = False
+            return result
+        finally:
+            self.stats.record(method, query, time.perf_counter() - began, rows(result) if not error else 0, error)
+
+    async def execute(self, query, *args, timeout=None):
+        if not self.stats.enabled:
+            return await super().execute(query, *args, timeout=timeout)
+        return await self._recorded(caller(), query, super().execute(query, *args, timeout=timeout),
+                                    lambda status: rowcount(status) if status.split()[-1].isdigit() else 0)
+
+    async def executemany(self, command, args, *, timeout=None):
+        if not self.stats.enabled:
+            return await super().executemany(command, args, timeout=timeout)
+        return await self._recorded(caller(), command, super().executemany(command, args, timeout=timeout),
+                                    lambda result: 0)
+
+    async def fetch(self, query, *args, timeout=None, record_class=None):
+        if not self.stats.enabled:
+            return await super().fetch(query, *args, timeout=timeout, record_class=record_class)
+        return await self._recorded(caller(), query,
+                                    super().fetch(query, *args, timeout=timeout, record_class=record_class), len)
+
+    async def fetchrow(self, query, *args, timeout=None, record_class=None):
+        if not self.stats.enabled:
+            return await super().fetchrow(query, *args, timeout=timeout, record_class=record_class)
+        return await self._recorded(caller(), query,
+                                    super().fetchrow(query, *args, timeout=timeout, record_class=record_class),
+                                    lambda row: int(row is not None))
+
+    async def fetchval(self, query, *args, column=0, timeout=None):
+        if not self.stats.enabled:
+            return await super().fetchval(query, *args, column=column, timeout=timeout)
+        return await self._recorded(caller(), query,
+                                    super().fetchval(query, *args, column=column, timeout=timeout), lambda value: 1)
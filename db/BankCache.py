@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+from entity.bankModel import BankModel
+
+
+class BankCache:
+    """
+    Кэш сквозного чтения метаданных банков (процентная ставка, общая сумма денег, идентификатор
+    по названию). Таблица 'banks' почти не меняется, поэтому сервисы читают эти значения из кэша
+    вместо запроса при каждой вставке. Записи живут не дольше ttl секунд, при переполнении
+    вытесняются давно не использованные. Счетчики банка (num_*) в кэше могут устареть
+    и из него не читаются.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        """
+        :param maxsize: Максимальное количество ключей в кэше
+        :param ttl: Время жизни записи в секундах
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # ("id", bank_id) или ("name", name) -> (BankModel, срок годности)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_by_id(self, cursor, bank_id):
+        """
+        Возвращает BankModel по идентификатору, при промахе читая его через cursor.
+
+        :return: BankModel или None, если банка нет
+        """
+        return self._get_many(cursor, "bank_id", [bank_id]).get(bank_id)
+
+    def get_by_name(self, cursor, name):
+        """
+        Возвращает BankModel по названию, при промахе читая его через cursor.
+
+        :return: BankModel или None, если банка нет
+        """
+        return self._get_many(cursor, "name", [name]).get(name)
+
+    def get_many_by_id(self, cursor, bank_ids):
+        """
+        Возвращает словарь {bank_id: BankModel}; все промахи читаются одним запросом.
+        """
+        return self._get_many(cursor, "bank_id", bank_ids)
+
+    def get_many_by_name(self, cursor, names):
+        """
+        Возвращает словарь {name: BankModel}; все промахи читаются одним запросом.
+        """
+        return self._get_many(cursor, "name", names)
+
+    async def aget_by_id(self, connection, bank_id):
+        """
+        Асинхронный вариант get_by_id: промах читается через подключение asyncpg.
+        """
+        return (await self._aget_many(connection, "bank_id", [bank_id])).get(bank_id)
+
+    async def aget_by_name(self, connection, name):
+        """
+        Асинхронный вариант get_by_name: промах читается через подключение asyncpg.
+        """
+        return (await self._aget_many(connection, "name", [name])).get(name)
+
+    async def aget_many_by_id(self, connection, bank_ids):
+        """
+        Асинхронный вариант get_many_by_id.
+        """
+        return await self._aget_many(connection, "bank_id", bank_ids)
+
+    async def aget_many_by_name(self, connection, names):
+        """
+        Асинхронный вариант get_many_by_name.
+        """
+        return await self._aget_many(connection, "name", names)
+
+    def _get_many(self, cursor, field, keys):
+        found, missing = self._lookup(field, keys)
+        if missing:
+            cursor.execute(f"SELECT * FROM banks WHERE {field} = ANY(%s)", (missing,))
+            self._store(field, cursor.fetchall(), found)
+        return found
+
+    async def _aget_many(self, connection, field, keys):
+        found, missing = self._lookup(field, keys)
+        if missing:
+            self._store(field, await connection.fetch(f"SELECT * FROM banks WHERE {field} = ANY($1)", missing), found)
+        return found
+
+    def _lookup(self, field, keys):
+        kind = "id" if field == "bank_id" else "name"
+        found, missing = {}, []
+        now = time.monotonic()
+
+        with self._lock:
+            for key in set(keys):
+                entry = self._entries.get((kind, key))
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end((kind, key))
+                    found[key] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(key)
+                    self.misses += 1
+        return found, missing
+
+    def _store(self, field, rows, found):
+        banks = [BankModel.from_row(data) for data in rows]
+        self.put(*banks)
+        for bank in banks:
+            found[getattr(bank, field)] = bank
+
+    def put(self, *banks):
+        """
+        Помещает банки в кэш под ключами идентификатора и названия.
+        """
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for bank in banks:
+                for key in (("id", bank.bank_id), ("name", bank.name)):
+                    self._entries[key] = (bank, expires)
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, bank_id=None):
+        """
+        Удаляет банк из кэша (обоими ключами). Без аргумента очищает кэш полностью.
+        """
+        with self._lock:
+            if bank_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key, (bank, _) in self._entries.items() if bank.bank_id == bank_id]:
+                del self._entries[key]
+
+    def stats(self):
+        """
+        Возвращает счетчики попаданий, промахов и вытеснений.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._entries)}
@@ -0,0 +1,82 @@
+import io
+
+
+class BulkLoader:
+    """
+    Загрузка больших пачек строк в PostgreSQL через COPY FROM STDIN вместо построчных INSERT.
+    """
+
+    def __init__(self, batch_size=100000):
+        """
+        :param batch_size: Количество строк, которые отправляются одним COPY
+        """
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _format_value(value):
+        """
+        Преобразует значение Python в поле текстового формата COPY.
+        """
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, (list, tuple)):
+            # Литерал массива PostgreSQL: {"a","b"}
+            items = ",".join(
+                "NULL" if item is None else '"' + str(item).replace("\\", "\\\\").replace('"', '\\"') + '"'
+                for item in value
+            )
+            value = "{" + items + "}"
+        return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+
+    def copy(self, cursor, table, columns, rows):
+        """
+        Загружает строки в таблицу пачками по batch_size через COPY.
+
+        :param cursor: Курсор psycopg2
+        :param table: Имя таблицы
+        :param columns: Список колонок в порядке значений в строках
+        :param rows: Итерируемый объект кортежей (может быть генератором)
+        :return: Количество загруженных строк
+        """
+        query = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        buffer = io.StringIO()
+        in_buffer = 0
+        total = 0
+
+        for row in rows:
+            buffer.write("\t".join(map(self._format_value, row)))
+            buffer.write("\n")
+            in_buffer += 1
+            if in_buffer >= self.batch_size:
+                buffer.seek(0)
+                cursor.copy_expert(query, buffer)
+                total += in_buffer
+                buffer = io.StringIO()
+                in_buffer = 0
+
+        if in_buffer:
+            buffer.seek(0)
+            cursor.copy_expert(query, buffer)
+            total += in_buffer
+        return total
+
+    @staticmethod
+    def next_id(cursor, table, id_column):
+        """
+        Возвращает первый свободный идентификатор таблицы, чтобы назначать ключи на стороне клиента.
+        """
+        cursor.execute(f"SELECT COALESCE(MAX({id_column}), 0) + 1 FROM {table}")
+        return cursor.fetchone()[0]
+
+    @staticmethod
+    def reset_sequence(cursor, table, id_column):
+        """
+        Сдвигает SERIAL-последовательность за максимальный идентификатор после загрузки с явными ключами.
+        """
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{id_column}'), "
+            f"COALESCE((SELECT MAX({id_column}) FROM {table}), 0) + 1, false)"
+        )
@@ -0,0 +1,262 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+from db.BankCache import BankCache
+from db.CounterManager import CounterManager
+from db.IdentityMap import NO_IDENTITY_MAP, IdentityMap
+from db.PreparedStatements import PreparedStatements
+from db.UnitOfWork import UnitOfWork
+
+
+class ConnectionPool:
+    """
+    Пул подключений к PostgreSQL на основе ThreadedConnectionPool.
+    Сервисы берут подключение на время одной операции через connection(), поэтому
+    несколько потоков могут работать с сервисами параллельно, а ошибка в одной
+    транзакции не блокирует остальные. Внутри transaction() операции потока
+    выполняются в одной общей транзакции.
+    """
+
+    def __init__(self, connection_params, minconn=1, maxconn=10, timeout=30.0, health_check_after=30.0,
+                 max_idle=300.0, deferred_counters=False, stats=None, prepared_statements=True):
+        """
+        :param connection_params: Параметры psycopg2.connect
+        :param minconn: Минимальное количество открытых подключений
+        :param maxconn: Максимальное количество подключений
+        :param timeout: Сколько секунд ждать свободное подключение, прежде чем выбросить PoolError
+        :param health_check_after: Через сколько секунд простоя подключение проверяется запросом SELECT 1
+        :param max_idle: Через сколько секунд простоя подключение закрывается и открывается заново
+        :param deferred_counters: Накапливать изменения счетчиков банков и переносить их пакетно (CounterManager);
+                                  по умолчанию счетчики обновляются сразу
+        :param stats: Экземпляр QueryStats для учета запросов; без него курсоры не оборачиваются
+        :param prepared_statements: Выполнять частые однострочные запросы как подготовленные (PreparedStatements)
+        """
+        if stats is not None:
+            connection_params = {**connection_params, "cursor_factory": stats.cursor_factory}
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **connection_params)
+        self.stats = stats
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._returned_at = {}  # id подключения -> время возврата в пул
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.max_idle = max_idle
+        self._local = threading.local()  # Единица работы, открытая в текущем потоке
+
+        # Кэш метаданных банков, подготовленные запросы и счетчики банков, общие для всех сервисов этого пула
+        self.bank_cache = BankCache()
+        self.statements = PreparedStatements(prepared_statements)
+        self.counters = CounterManager(deferred_counters, self.statements, self._counters_changed)
+
+    def identity_map(self):
+        """
+        Возвращает карту идентичности единицы работы текущего потока;
+        вне transaction() - выключенную карту, которая ничего не хранит.
+        """
+        unit = getattr(self._local, "unit", None)
+        return unit.identity_map if unit is not None else NO_IDENTITY_MAP
+
+    def _counters_changed(self, *tables):
+        self.identity_map().expire_all(*tables)
+
+    def getconn(self):
+        """
+        Выдает проверенное подключение из пула, дожидаясь свободного не дольше timeout.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError(f"No free connection in pool after {self.timeout} seconds")
+        try:
+            # Каждая попытка либо возвращает живое подключение, либо закрывает негодное
+            for _ in range(self.maxconn + 1):
+                connection = self._pool.getconn()
+                if self._is_usable(connection):
+                    return connection
+                self._pool.putconn(connection, close=True)
+                self._returned_at.pop(id(connection), None)
+            raise pg_pool.PoolError("Could not obtain a healthy connection")
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        """
+        Возвращает подключение в пул. Незавершенная транзакция откатывается самим пулом.
+        """
+        try:
+            if close or connection.closed:
+                self._returned_at.pop(id(connection), None)
+            else:
+                self._returned_at[id(connection)] = time.monotonic()
+            self._pool.putconn(connection, close=close or bool(connection.closed))
+        finally:
+            self._slots.release()
+
+    def _is_usable(self, connection):
+        if connection.closed:
+            return False
+        returned_at = self._returned_at.get(id(connection))
+        if returned_at is None:
+            return True  # Новое подключение
+        idle = time.monotonic() - returned_at
+        if idle > self.max_idle:
+            return False  # Долго простаивавшее подключение пересоздается
+        if idle > self.health_check_after:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                return False
+        return True
+
+    @contextmanager
+    def connection(self):
+        """
+        Выдает подключение на время одной операции. При успешном выходе транзакция фиксируется,
+        при исключении откатывается; в обоих случаях подключение возвращается в пул.
+        Внутри transaction() выдается подключение единицы работы без фиксации.
+        """
+        unit = getattr(self._local, "unit", None)
+        if unit is not None:
+            yield unit.connection
+            return
+
+        connection = self.getconn()
+        broken = False
+        try:
+            yield connection
+            connection.commit()
+        except GeneratorExit:
+            # Потребитель потокового чтения прекратил перебор досрочно - это не ошибка
+            connection.commit()
+            raise
+        except BaseException as error:
+            broken = isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not connection.closed:
+                connection.rollback()
+            raise
+        finally:
+            self.putconn(connection, close=broken)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Открывает единицу работы: все операции сервисов этого пула в текущем потоке выполняются
+        в одной транзакции, которая фиксируется один раз при выходе из блока и откатывается
+        при исключении. Вложенный вызов открывает точку сохранения.
+
+        :return: Экземпляр UnitOfWork
+        """
+        unit = getattr(self._local, "unit", None)
+        try:
+            if unit is not None:
+                with unit.savepoint():
+                    yield unit
+                return
+
+            with self.connection() as connection:
+                self._local.unit = UnitOfWork(connection, IdentityMap(self.stats))
+                try:
+                    yield self._local.unit
+                finally:
+                    self._local.unit = None
+        except BaseException:
+            # Откаченная работа могла попасть в кэш банков
+            self.bank_cache.invalidate()
+            raise
+
+    def closeall(self):
+        """
+        Закрывает все подключения пула.
+        """
+        self._pool.closeall()
+
+
+class SingleConnection:
+    """
+    Обертка над одним уже открытым подключением с тем же интерфейсом, что и ConnectionPool.
+    Операции разных потоков выполняются по очереди. Вложенная операция того же потока
+    (например, запись во время потокового чтения) выполняется в транзакции внешней
+    и не фиксирует ее раньше времени.
+    """
+
+    def __init__(self, connection, stats=None):
+        self._connection = connection
+        self.stats = stats
+        if stats is not None:
+            connection.cursor_factory = stats.cursor_factory
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._unit = None
+        self.bank_cache = BankCache()
+        self.statements = PreparedStatements()
+        self.counters = CounterManager(statements=self.statements, on_change=self._counters_changed)
+
+    def identity_map(self):
+        unit = self._unit
+        return unit.identity_map if unit is not None else NO_IDENTITY_MAP
+
+    def _counters_changed(self, *tables):
+        self.identity_map().expire_all(*tables)
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            if self._depth:
+                yield self._connection
+                return
+            self._depth += 1
+            try:
+                yield self._connection
+                self._connection.commit()
+            except GeneratorExit:
+                self._connection.commit()
+                raise
+            except BaseException:
+                if not self._connection.closed:
+                    self._connection.rollback()
+                raise
+            finally:
+                self._depth -= 1
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            try:
+                if self._unit is not None:
+                    with self._unit.savepoint():
+                        yield self._unit
+                    return
+
+                with self.connection() as connection:
+                    self._unit = UnitOfWork(connection, IdentityMap(self.stats))
+                    try:
+                        yield self._unit
+                    finally:
+                        self._unit = None
+            except BaseException:
+                self.bank_cache.invalidate()
+                raise
+
+    def closeall(self):
+        self._connection.close()
+
+
+_single_connections = weakref.WeakKeyDictionary()
+
+
+def as_pool(connection):
+    """
+    Возвращает поставщика подключений для сервиса: пул передается как есть,
+    обычное подключение psycopg2 оборачивается в SingleConnection (одна обертка на подключение).
+    """
+    if hasattr(connection, "getconn") or isinstance(connection, SingleConnection):
+        return connection
+    if connection not in _single_connections:
+        _single_connections[connection] = SingleConnection(connection)
+    return _single_connections[connection]
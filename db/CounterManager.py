@@ -0,0 +1,322 @@
+import threading
+from collections import Counter
+
+from psycopg2.extras import execute_values
+
+from db.batch import aadd_counters, add_counters, add_counters_from
+
+
+class CounterManager:
+    """
+    Обслуживание денормализованных счетчиков банка (num_offices, num_atms, num_employees, num_clients).
+    В немедленном режиме (по умолчанию) счетчики в 'banks' обновляются сгруппированными UPDATE
+    в транзакции писателя.
+
+    В отложенном режиме сервисы не обновляют строки 'banks' при каждой вставке, а дописывают
+    изменения в таблицу 'bank_counter_deltas'. Вставка не блокирует строки банков, поэтому
+    параллельные писатели не выстраиваются в очередь за одними и теми же блокировками.
+    Чтения банков берут строки из banks_source, где к счетчикам прибавлены еще не перенесенные
+    изменения, поэтому видят все зафиксированные изменения любых процессов независимо от переноса.
+    Накопленные изменения переносятся в 'banks' одним сгруппированным UPDATE методом flush.
+    """
+
+    COUNTERS = ("num_offices", "num_atms", "num_employees", "num_clients")
+
+    # Таблица накопленных изменений счетчиков (только вставки, без индексов и внешних ключей)
+    DDL = """
+        CREATE TABLE IF NOT EXISTS bank_counter_deltas (
+            bank_id INT NOT NULL,  -- Идентификатор банка
+            num_offices INT NOT NULL DEFAULT 0,  -- Изменение количества офисов
+            num_atms INT NOT NULL DEFAULT 0,  -- Изменение количества банкоматов
+            num_employees INT NOT NULL DEFAULT 0,  -- Изменение количества сотрудников
+            num_clients INT NOT NULL DEFAULT 0  -- Изменение количества клиентов
+        );
+    """
+
+    # Ключ рекомендательной блокировки, под которой выполняется перенос изменений
+    FLUSH_LOCK = 7420016
+
+    # Накопленные изменения, сгруппированные по банкам
+    DELTAS_QUERY = (f"SELECT bank_id, {', '.join(f'sum({column})::int AS {column}' for column in COUNTERS)} "
+                    f"FROM bank_counter_deltas GROUP BY bank_id")
+
+    # Перенос накопленных изменений в 'banks' одним сгруппированным UPDATE;
+    # возвращает количество перенесенных строк изменений и обновленных банков
+    FLUSH_QUERY = f"""
+        WITH drained AS (DELETE FROM bank_counter_deltas RETURNING *),
+        updated AS (
+            UPDATE banks b SET {", ".join(f"{column} = b.{column} + d.{column}" for column in COUNTERS)}
+            FROM (SELECT bank_id, {", ".join(f"sum({column}) AS {column}" for column in COUNTERS)}
+                  FROM drained GROUP BY bank_id) d
+            WHERE b.bank_id = d.bank_id
+            RETURNING b.bank_id
+        )
+        SELECT (SELECT count(*) FROM drained), (SELECT count(*) FROM updated)
+    """
+
+    # Пересчет счетчиков банков по исходным таблицам; накопленные изменения отбрасываются в том же операторе.
+    # Возвращает количество отброшенных строк изменений и исправленных банков
+    RECOMPUTE_BANKS_QUERY = """
+        WITH drained AS (DELETE FROM bank_counter_deltas RETURNING bank_id),
+        fixed AS (
+            UPDATE banks b SET num_offices = c.num_offices, num_atms = c.num_atms,
+                               num_employees = c.num_employees, num_clients = c.num_clients
+            FROM (
+                SELECT s.bank_id,
+                       (SELECT count(*) FROM bank_offices o WHERE o.bank_id = s.bank_id) AS num_offices,
+                       (SELECT count(*) FROM atms a WHERE a.bank_id = s.bank_id) AS num_atms,
+                       (SELECT count(*) FROM employees e WHERE e.bank_id = s.bank_id) AS num_employees,
+                       (SELECT count(*) FROM user_banks m WHERE m.bank_id = s.bank_id) AS num_clients
+                FROM banks s
+            ) c
+            WHERE b.bank_id = c.bank_id
+              AND (b.num_offices, b.num_atms, b.num_employees, b.num_clients)
+                  IS DISTINCT FROM (c.num_offices, c.num_atms, c.num_employees, c.num_clients)
+            RETURNING b.bank_id
+        )
+        SELECT (SELECT count(*) FROM drained), (SELECT count(*) FROM fixed)
+    """
+
+    # Пересчет количества банкоматов офисов
+    RECOMPUTE_OFFICES_QUERY = """
+        UPDATE bank_offices o SET num_atms = c.num_atms
+        FROM (
+            SELECT s.bank_office_id, (SELECT count(*) FROM atms a WHERE a.bank_office_id = s.bank_office_id) AS num_atms
+            FROM bank_offices s
+        ) c
+        WHERE o.bank_office_id = c.bank_office_id AND o.num_atms IS DISTINCT FROM c.num_atms
+    """
+
+    def __init__(self, deferred=False, statements=None, on_change=None, flush_threshold=1000):
+        """
+        :param deferred: Если True, изменения накапливаются в 'bank_counter_deltas' до flush,
+                         иначе счетчики в 'banks' обновляются сразу
+        :param statements: Реестр PreparedStatements для изменения счетчика одного банка
+        :param on_change: Функция, вызываемая с именами таблиц, строки которых изменены
+                          (пул помечает их устаревшими в карте идентичности единицы работы)
+        :param flush_threshold: Сколько строк изменений, записанных этим процессом, накапливается
+                                до того, как чтения банков попробуют перенести их (flush_due)
+        """
+        self.deferred = deferred
+        self.statements = statements
+        self.on_change = on_change
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        # Строки изменений, записанные этим процессом и еще не перенесенные. Используется только
+        # для решения, когда переносить: чтения учитывают таблицу изменений целиком
+        self.pending = 0
+
+    def banks_source(self, columns, alias="banks"):
+        """
+        Возвращает источник строк банков для FROM: в немедленном режиме - таблицу 'banks',
+        в отложенном - подзапрос, в котором к счетчикам прибавлены накопленные изменения.
+
+        :param columns: Колонки таблицы 'banks' в порядке выдачи
+        :param alias: Псевдоним источника в запросе
+        """
+        if not self.deferred:
+            return "banks" if alias == "banks" else f"banks {alias}"
+        selected = ", ".join(f"b.{column} + COALESCE(d.{column}, 0) AS {column}" if column in self.COUNTERS
+                             else f"b.{column}" for column in columns)
+        return (f"(SELECT {selected} FROM banks b LEFT JOIN ({self.DELTAS_QUERY}) d "
+                f"ON d.bank_id = b.bank_id) AS {alias}")
+
+    def flush_due(self):
+        """
+        Возвращает True, если этот процесс записал не меньше flush_threshold строк изменений.
+        """
+        return self.deferred and self.pending >= self.flush_threshold
+
+    def add(self, cursor, column, bank_ids, sign=1):
+        """
+        Изменяет счетчик банков: каждый идентификатор в bank_ids дает изменение на sign.
+
+        :param cursor: Курсор транзакции, в которой выполняется изменение
+        :param column: Колонка счетчика из COUNTERS
+        :param bank_ids: Идентификаторы банков (с повторами)
+        :param sign: Знак изменения (+1 или -1)
+        """
+        if column not in self.COUNTERS:
+            raise ValueError(f"Unknown counter: {column}")
+        bank_ids = [bank_id for bank_id in bank_ids if bank_id is not None]
+        if not bank_ids:
+            return
+        deltas = [(bank_id, sign * count) for bank_id, count in Counter(bank_ids).items()]
+
+        # Изменение одного банка (обычный случай для create и delete) - подготовленным запросом
+        if len(deltas) == 1 and self.statements is not None:
+            if self.deferred:
+                self.statements.execute(cursor, f"counter_delta_{column}",
+                                        f"INSERT INTO bank_counter_deltas (bank_id, {column}) VALUES (%s, %s)",
+                                        deltas[0])
+                self._added(1)
+            else:
+                self.statements.execute(cursor, f"counter_add_{column}",
+                                        f"UPDATE banks SET {column} = {column} + %s WHERE bank_id = %s",
+                                        deltas[0][::-1])
+                self._changed("banks")
+            return
+
+        if not self.deferred:
+            add_counters(cursor, "banks", "bank_id", column, bank_ids, sign)
+            self._changed("banks")
+            return
+
+        execute_values(cursor, f"INSERT INTO bank_counter_deltas (bank_id, {column}) VALUES %s", deltas,
+                       page_size=len(deltas))
+        self._added(len(deltas))
+
+    def add_from(self, column, source, sign=1):
+        """
+        Возвращает SQL-оператор, изменяющий счетчик на sign для каждой строки CTE source
+        (строки группируются по bank_id). Используется как завершающий оператор или CTE запросов
+        вида WITH source AS (... RETURNING bank_id). Построение оператора ничего не меняет:
+        после выполнения запроса с ним вызывающий код сообщает об этом методом applied.
+
+        :param column: Колонка счетчика из COUNTERS
+        :param source: Имя CTE с колонкой bank_id
+        :param sign: Знак изменения (+1 или -1)
+        """
+        if column not in self.COUNTERS:
+            raise ValueError(f"Unknown counter: {column}")
+        if not self.deferred:
+            return add_counters_from("banks", "bank_id", column, source, sign)
+        return (f"INSERT INTO bank_counter_deltas (bank_id, {column}) "
+                f"SELECT bank_id, ({sign}) * count(*) FROM {source} GROUP BY bank_id")
+
+    def add_from_many(self, sources, sign=1):
+        """
+        Вариант add_from для нескольких счетчиков сразу: строки всех CTE объединяются и группируются
+        по bank_id, поэтому каждая строка 'banks' изменяется одним UPDATE (одна строка не может
+        изменяться дважды в одном операторе, например при удалении офисов вместе с их банкоматами).
+
+        :param sources: Словарь {колонка счетчика: имя CTE с колонкой bank_id}
+        :param sign: Знак изменения (+1 или -1)
+        """
+        unknown = [column for column in sources if column not in self.COUNTERS]
+        if unknown:
+            raise ValueError(f"Unknown counter: {', '.join(unknown)}")
+        columns = list(sources)
+        rows = " UNION ALL ".join(
+            f"SELECT bank_id, {', '.join(f'{int(column == source_column)} AS {column}' for column in columns)} "
+            f"FROM {source}"
+            for source_column, source in sources.items())
+        deltas = (f"SELECT bank_id, {', '.join(f'({sign}) * sum({column}) AS {column}' for column in columns)} "
+                  f"FROM ({rows}) AS s GROUP BY bank_id")
+        if not self.deferred:
+            return (f"UPDATE banks SET {', '.join(f'{column} = banks.{column} + d.{column}' for column in columns)} "
+                    f"FROM ({deltas}) AS d WHERE banks.bank_id = d.bank_id")
+        return f"INSERT INTO bank_counter_deltas (bank_id, {', '.join(columns)}) {deltas}"
+
+    def applied(self):
+        """
+        Учитывает успешно выполненный оператор add_from или add_from_many: в отложенном режиме
+        он записал строку изменений, в немедленном - изменил строки 'banks'.
+        """
+        if self.deferred:
+            self._added(1)
+        else:
+            self._changed("banks")
+
+    def flush(self, cursor, wait=True):
+        """
+        Переносит все зафиксированные накопленные изменения в 'banks' одним сгруппированным UPDATE.
+        Параллельные переносы выполняются по очереди под рекомендательной блокировкой.
+        Изменения незафиксированных транзакций остаются в таблице до следующего переноса.
+
+        :param cursor: Курсор транзакции
+        :param wait: Если False и блокировку держит другой перенос, ничего не делать
+        :return: Количество обновленных банков
+        """
+        if wait:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (self.FLUSH_LOCK,))
+        else:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (self.FLUSH_LOCK,))
+            if not cursor.fetchone()[0]:
+                return 0
+        cursor.execute(self.FLUSH_QUERY)
+        drained, updated = cursor.fetchone()
+        self._drained(drained)
+        if updated:
+            self._changed("banks")
+        return updated
+
+    def recompute(self, cursor):
+        """
+        Пересчитывает все счетчики банков (и количество банкоматов офисов) по исходным таблицам
+        одним запросом на таблицу. Накопленные изменения при этом отбрасываются в том же операторе,
+        поэтому ничего не учитывается дважды.
+
+        :param cursor: Курсор транзакции
+        :return: Количество банков, счетчики которых были исправлены
+        """
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (self.FLUSH_LOCK,))
+        cursor.execute(self.RECOMPUTE_BANKS_QUERY)
+        drained, fixed = cursor.fetchone()
+        self._drained(drained)
+        cursor.execute(self.RECOMPUTE_OFFICES_QUERY)
+        self._changed("banks", "bank_offices")
+        return fixed
+
+    async def aadd(self, connection, column, bank_ids, sign=1):
+        """
+        Асинхронный вариант add для подключения asyncpg.
+        """
+        if column not in self.COUNTERS:
+            raise ValueError(f"Unknown counter: {column}")
+        counts = Counter(bank_id for bank_id in bank_ids if bank_id is not None)
+        if not counts:
+            return
+        if not self.deferred:
+            await aadd_counters(connection, "banks", "bank_id", column, counts.elements(), sign)
+            self._changed("banks")
+            return
+
+        keys, deltas = list(counts), [sign * count for count in counts.values()]
+        await connection.execute(
+            f"INSERT INTO bank_counter_deltas (bank_id, {column}) SELECT * FROM unnest($1::int[], $2::int[])",
+            keys, deltas)
+        self._added(len(keys))
+
+    async def aflush(self, connection, wait=True):
+        """
+        Асинхронный вариант flush для подключения asyncpg.
+        """
+        if wait:
+            await connection.execute("SELECT pg_advisory_xact_lock($1)", self.FLUSH_LOCK)
+        elif not await connection.fetchval("SELECT pg_try_advisory_xact_lock($1)", self.FLUSH_LOCK):
+            return 0
+        drained, updated = await connection.fetchrow(self.FLUSH_QUERY)
+        self._drained(drained)
+        if updated:
+            self._changed("banks")
+        return updated
+
+    async def arecompute(self, connection):
+        """
+        Асинхронный вариант recompute для подключения asyncpg.
+        """
+        await connection.execute("SELECT pg_advisory_xact_lock($1)", self.FLUSH_LOCK)
+        drained, fixed = await connection.fetchrow(self.RECOMPUTE_BANKS_QUERY)
+        self._drained(drained)
+        await connection.execute(self.RECOMPUTE_OFFICES_QUERY)
+        self._changed("banks", "bank_offices")
+        return fixed
+
+    def _added(self, count):
+        # Накопленные изменения сразу видны чтениям банков (banks_source)
+        with self._lock:
+            self.pending += count
+        self._changed("banks")
+
+    def _drained(self, count):
+        # Перенесены строки, которые видел оператор переноса (в том числе записанные другими процессами).
+        # Пустая таблица значит, что изменения этого процесса уже перенесены другим процессом
+        # или еще не зафиксированы; чтения учитывают их и без переноса
+        with self._lock:
+            self.pending = max(self.pending - count, 0) if count else 0
+
+    def _changed(self, *tables):
+        if self.on_change is not None:
+            self.on_change(*tables)
+
@@ -0,0 +1,117 @@
+from db.QueryStats import caller
+
+
+class IdentityMap:
+    """
+    Карта идентичности единицы работы: модели, прочитанные или записанные сервисами внутри одного
+    pool.transaction(), хранятся по (таблица, первичный ключ). Повторный read того же ключа
+    возвращает тот же экземпляр модели без SELECT, а list, create и update обновляют уже
+    выданные экземпляры на месте, поэтому все ссылки на строку внутри единицы работы видят
+    одни и те же данные. update помечает строку устаревшей (expire): следующий read выполняет
+    SELECT и обновляет тот же экземпляр. delete удаляет ключ. Изменения строк других таблиц
+    (счетчики банков) и откат точки сохранения помечают устаревшими затронутые таблицы
+    целиком (expire_all), а каскадные удаления очищают их (clear).
+
+    Вне единицы работы пулы возвращают выключенную карту (enabled = False): она ничего не хранит,
+    и сервисы читают базу как обычно.
+    """
+
+    def __init__(self, stats=None, enabled=True):
+        """
+        :param stats: Экземпляр QueryStats, в который записываются попадания и промахи карты
+        :param enabled: Если False, карта ничего не хранит и get всегда возвращает None
+        """
+        self.stats = stats
+        self.enabled = enabled
+        self._entries = {}  # (таблица, ключ) -> модель
+        self._expired = set()  # Ключи устаревших строк: экземпляр сохраняется, но read выполняет SELECT
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, table, key):
+        """
+        Возвращает модель строки, уже загруженной в этой единице работы.
+
+        :return: Экземпляр модели или None, если строки нет в карте
+        """
+        if not self.enabled:
+            return None
+        model = self._entries.get((table, key)) if (table, key) not in self._expired else None
+        if model is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if self.stats is not None and self.stats.enabled:
+            self.stats.record_identity(caller(), model is not None)
+        return model
+
+    def add(self, table, key, model):
+        """
+        Помещает модель строки в карту. Если для ключа уже выдан экземпляр, он обновляется
+        значениями model и возвращается вместо нее.
+
+        :return: Экземпляр модели из карты
+        """
+        if not self.enabled or model is None:
+            return model
+        self._expired.discard((table, key))
+        current = self._entries.setdefault((table, key), model)
+        if current is not model:
+            for field in type(model).__slots__:
+                setattr(current, field, getattr(model, field))
+        return current
+
+    def add_all(self, table, key_field, models):
+        """
+        Помещает в карту список моделей (например, результат list).
+
+        :param key_field: Атрибут модели с первичным ключом
+        :return: Список экземпляров из карты в порядке models
+        """
+        if not self.enabled:
+            return models
+        return [self.add(table, getattr(model, key_field), model) for model in models]
+
+    def expire(self, table, key):
+        """
+        Помечает строку устаревшей после изменения: get возвращает None, пока add не обновит
+        уже выданный экземпляр свежими значениями.
+        """
+        if self.enabled and (table, key) in self._entries:
+            self._expired.add((table, key))
+
+    def expire_all(self, *tables):
+        """
+        Помечает устаревшими все строки указанных таблиц (без аргументов - все строки).
+        """
+        if self.enabled:
+            self._expired.update(key for key in self._entries if not tables or key[0] in tables)
+
+    def discard(self, table, key):
+        """
+        Удаляет строку из карты.
+        """
+        if self.enabled:
+            self._entries.pop((table, key), None)
+            self._expired.discard((table, key))
+
+    def clear(self, *tables):
+        """
+        Удаляет из карты все строки указанных таблиц (без аргументов - все строки).
+        """
+        if not self.enabled:
+            return
+        if not tables:
+            self._entries.clear()
+            self._expired.clear()
+            return
+        for key in [key for key in self._entries if key[0] in tables]:
+            del self._entries[key]
+            self._expired.discard(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Карта вне единицы работы
+NO_IDENTITY_MAP = IdentityMap(enabled=False)
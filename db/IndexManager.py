@@ -0,0 +1,182 @@
+import re
+from collections import namedtuple
+
+from db.ConnectionPool import as_pool
+
+# Объявление вторичного индекса: имя, таблица, колонки, уникальность и условие частичного индекса
+Index = namedtuple("Index", ["name", "table", "columns", "unique", "where"], defaults=(None,))
+
+# Поиск, который выполняют сервисы: кто выполняет запрос, по какой таблице, каким колонкам
+# и с каким дополнительным условием (его должно повторять условие частичного индекса)
+Lookup = namedtuple("Lookup", ["source", "table", "columns", "where"], defaults=(None,))
+
+# Таблица и колонки внешних ключей в DDL сервисов (FOREIGN KEY (...) и REFERENCES в описании колонки)
+TABLE_PATTERN = re.compile(r"CREATE TABLE (?:IF NOT EXISTS )?(\w+)")
+FOREIGN_KEY_PATTERN = re.compile(
+    r"^\s*(?:FOREIGN KEY \((\w+)\)|(?!FOREIGN\b)(\w+)\s[^\n]*?)\s*REFERENCES\b", re.MULTILINE)
+
+
+class IndexManager:
+    """
+    Объявляет и создает вторичные индексы схемы и проверяет, что поиск,
+    который выполняют сервисы, поддержан индексами, а не последовательным сканированием.
+    """
+
+    INDEXES = (
+        Index("banks_name_key", "banks", ("name",), True),
+        Index("bank_offices_bank_id_idx", "bank_offices", ("bank_id",), False),
+        Index("atms_bank_id_idx", "atms", ("bank_id",), False),
+        Index("atms_bank_office_id_idx", "atms", ("bank_office_id",), False),
+        Index("atms_employee_id_idx", "atms", ("employee_id",), False),
+        Index("employees_bank_id_idx", "employees", ("bank_id",), False),
+        Index("employees_bank_office_id_idx", "employees", ("bank_office_id",), False),
+        Index("payment_accounts_user_id_idx", "payment_accounts", ("user_id",), False),
+        Index("credit_accounts_user_id_idx", "credit_accounts", ("user_id",), False),
+        Index("credit_accounts_employee_id_idx", "credit_accounts", ("employee_id",), False),
+        Index("credit_accounts_payment_account_id_idx", "credit_accounts", ("payment_account_id",), False),
+        Index("users_rating_stale_idx", "users", ("user_id",), False, "monthly_income IS DISTINCT FROM rated_income"),
+    )
+
+    def __init__(self, connection, services=None):
+        """
+        :param connection: Подключение psycopg2 или пул ConnectionPool
+        :param services: Классы сервисов, поиск которых проверяет missing_indexes (по умолчанию все синхронные)
+        """
+        self.pool = as_pool(connection)
+        self.services = services
+
+    def create_indexes(self, names=None):
+        """
+        Создает объявленные индексы, которых еще нет.
+
+        :param names: Имена индексов, которые нужно создать (по умолчанию все объявленные)
+        :return: Список имен созданных индексов
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
+            existing = {row[0] for row in cursor.fetchall()}
+
+            created = []
+            for index in self.INDEXES:
+                if index.name in existing or (names is not None and index.name not in names):
+                    continue
+                unique = "UNIQUE " if index.unique else ""
+                where = f" WHERE {index.where}" if index.where else ""
+                cursor.execute(
+                    f"CREATE {unique}INDEX IF NOT EXISTS {index.name} ON {index.table} ({', '.join(index.columns)})"
+                    f"{where}"
+                )
+                created.append(index.name)
+        return created
+
+    def drop_indexes(self):
+        """
+        Удаляет все объявленные индексы (например, перед массовой загрузкой).
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            for index in self.INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+    def lookups(self):
+        """
+        Возвращает поиск, который выполняют сервисы этого менеджера (см. service_lookups).
+
+        :return: Список Lookup
+        """
+        return service_lookups(self.services or default_services())
+
+    def existing_indexes(self):
+        """
+        Возвращает индексированные колонки таблиц текущей схемы.
+
+        :return: Словарь {таблица: [(кортеж колонок индекса в порядке ключа, условие частичного индекса или None), ...]}
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = """
+                SELECT t.relname, array_agg(a.attname ORDER BY k.ord), pg_get_expr(i.indpred, i.indrelid)
+                FROM pg_index i
+                JOIN pg_class t ON t.oid = i.indrelid
+                JOIN pg_namespace n ON n.oid = t.relnamespace
+                CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                WHERE n.nspname = current_schema()
+                GROUP BY i.indexrelid, i.indpred, i.indrelid, t.relname
+            """
+            cursor.execute(query)
+            indexes = {}
+            for table, columns, where in cursor.fetchall():
+                indexes.setdefault(table, []).append((tuple(columns), where))
+        return indexes
+
+    def missing_indexes(self):
+        """
+        Проверяет поиск, выполняемый сервисами, по фактическим индексам базы. Поиск считается
+        поддержанным, если его колонки составляют начало ключа какого-либо индекса таблицы
+        и условие индекса совпадает с условием поиска: поиск без условия поддерживает только полный индекс
+        (частичный индекс содержит не все строки), а поиск с условием - только частичный индекс с тем же условием.
+
+        :return: Список Lookup без подходящего индекса
+        """
+        indexes = self.existing_indexes()
+        missing = []
+        for lookup in self.lookups():
+            width = len(lookup.columns)
+            if not any(set(columns[:width]) == set(lookup.columns)
+                       and same_condition(where, lookup.where)
+                       for columns, where in indexes.get(lookup.table, [])):
+                missing.append(lookup)
+        return missing
+
+
+def service_lookups(services):
+    """
+    Собирает поиск, который выполняют сервисы, из их определений:
+    - по колонкам внешних ключей из DDL (атрибуты *_DDL): по ним фильтруют страницы page,
+      собирают связанные сущности и проверяют ссылки при удалении родительских строк;
+    - из атрибута LOOKUPS сервиса, объявленного рядом с запросами (поиск по другим колонкам
+      и условия частичных индексов, например User.STALE_RATING_CONDITION).
+
+    :param services: Классы сервисов
+    :return: Список Lookup
+    """
+    lookups = []
+    for service in services:
+        for name in dir(service):
+            if not name.endswith("_DDL"):
+                continue
+            ddl = getattr(service, name)
+            table = TABLE_PATTERN.search(ddl).group(1)
+            for match in FOREIGN_KEY_PATTERN.finditer(ddl):
+                column = match.group(1) or match.group(2)
+                lookups.append(Lookup(f"{service.__name__}: FOREIGN KEY {table}({column})", table, (column,)))
+        lookups.extend(getattr(service, "LOOKUPS", ()))
+    return lookups
+
+
+def same_condition(first, second):
+    """
+    Сравнивает условия без учета псевдонимов таблиц, скобок, пробелов и регистра
+    (pg_get_expr возвращает условие индекса в скобках и без псевдонимов).
+    """
+    if first is None or second is None:
+        return first is second
+
+    def normalize(condition):
+        condition = re.sub(r"\b\w+\.", "", condition)
+        return " ".join(condition.replace("(", " ").replace(")", " ").lower().split())
+
+    return normalize(first) == normalize(second)
+
+
+def default_services():
+    """
+    Синхронные сервисы схемы; импортируются при вызове, так как сами сервисы используют модули db.
+    """
+    from service.Bank import Bank
+    from service.BankAtm import BankAtm
+    from service.BankOffice import BankOffice
+    from service.CreditAccount import CreditAccount
+    from service.Employee import Employee
+    from service.PaymentAccount import PaymentAccount
+    from service.User import User
+    return Bank, BankOffice, User, Employee, BankAtm, PaymentAccount, CreditAccount
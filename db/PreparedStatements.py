@@ -0,0 +1,125 @@
+import threading
+import weakref
+
+from psycopg2 import errors, extensions
+
+from db.sql import positional
+
+RETRY_SAVEPOINT = "prepared_execute"
+
+
+class PreparedStatements:
+    """
+    Реестр подготовленных запросов для частых однострочных операций (чтение по идентификатору,
+    INSERT ... RETURNING, изменение счетчиков). Запрос регистрируется под именем при первом
+    выполнении и подготавливается (PREPARE) один раз на каждом подключении, после чего
+    выполняется через EXECUTE без повторного разбора и планирования.
+
+    Подготовленные запросы живут в сеансе сервера, поэтому реестр помнит их для каждого
+    подключения: пул выдает те же подключения снова, и повторная подготовка не нужна.
+    Новое подключение (в том числе пересозданное пулом после обрыва) и подключение с другим
+    серверным процессом подготавливают запросы заново. Если запросы удалены из сеанса в обход
+    реестра (DEALLOCATE, DISCARD ALL), EXECUTE прозрачно повторяется после новой подготовки.
+    После изменения структуры таблиц, меняющего результат запросов (например, набор колонок
+    SELECT *), нужно вызвать invalidate.
+    """
+
+    def __init__(self, enabled=True):
+        """
+        :param enabled: Если False, запросы выполняются обычным execute без подготовки
+        """
+        self.enabled = enabled
+        self._queries = {}  # имя -> (исходный запрос, PREPARE, EXECUTE)
+        self._connections = weakref.WeakKeyDictionary()  # подключение -> (pid сервера, поколение, имена)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.prepares = 0  # Сколько раз выполнялся PREPARE
+
+    def execute(self, cursor, name, query, params=()):
+        """
+        Выполняет запрос как подготовленный; результат читается из cursor как обычно.
+
+        :param cursor: Курсор psycopg2
+        :param name: Имя подготовленного запроса (идентификатор SQL)
+        :param query: Запрос с параметрами %s; под одним именем всегда должен быть один и тот же запрос
+        :param params: Значения параметров
+        """
+        if not self.enabled:
+            cursor.execute(query, params)
+            return
+
+        statement = self._queries.get(name) or self._register(name, query, len(params))
+        if statement[0] != query:
+            raise ValueError(f"Prepared statement {name} is already registered with a different query")
+
+        prepared = self._prepared(cursor)
+        if name in prepared:
+            try:
+                self._execute_prepared(cursor, statement[2], params)
+                return
+            except errors.InvalidSqlStatementName:
+                # Запросы сеанса удалены в обход реестра (DEALLOCATE, DISCARD ALL): подготовить заново
+                with self._lock:
+                    self._connections.pop(cursor.connection, None)
+                prepared = self._prepared(cursor)
+
+        cursor.execute(statement[1])
+        prepared.add(name)
+        self.prepares += 1
+        cursor.execute(statement[2], params)
+
+    def invalidate(self):
+        """
+        Помечает подготовленные запросы всех подключений устаревшими: при следующем использовании
+        подключение удаляет их (DEALLOCATE ALL) и подготавливает заново.
+        """
+        with self._lock:
+            self._generation += 1
+
+    def _register(self, name, query, count):
+        execute = f"EXECUTE {name} ({', '.join(['%s'] * count)})" if count else f"EXECUTE {name}"
+        statement = (query, f"PREPARE {name} AS {positional(query)}", execute)
+        with self._lock:
+            return self._queries.setdefault(name, statement)
+
+    @staticmethod
+    def _execute_prepared(cursor, execute, params):
+        """
+        Выполняет EXECUTE запроса, который считается подготовленным на подключении. Если запрос
+        пропал из сеанса, ошибка не должна прерывать транзакцию: первый запрос транзакции
+        откатывается целиком, а внутри начатой транзакции EXECUTE выполняется в точке сохранения.
+        """
+        connection = cursor.connection
+        if connection.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                cursor.execute(execute, params)
+            except errors.InvalidSqlStatementName:
+                connection.rollback()
+                raise
+            return
+
+        # Точка сохранения отправляется вместе с EXECUTE, чтобы не тратить отдельный обмен с сервером
+        with connection.cursor() as savepoint:
+            try:
+                cursor.execute(f"SAVEPOINT {RETRY_SAVEPOINT}; {execute}", params)
+            except errors.InvalidSqlStatementName:
+                savepoint.execute(f"ROLLBACK TO SAVEPOINT {RETRY_SAVEPOINT}; RELEASE SAVEPOINT {RETRY_SAVEPOINT}")
+                raise
+            # Отдельный курсор не затирает результат EXECUTE, который читает вызывающий код
+            savepoint.execute(f"RELEASE SAVEPOINT {RETRY_SAVEPOINT}")
+
+    def _prepared(self, cursor):
+        """
+        Возвращает множество имен, подготовленных на подключении курсора.
+        """
+        connection = cursor.connection
+        pid = connection.info.backend_pid
+        with self._lock:
+            state = self._connections.get(connection)
+            if state is not None and state[0] == pid and state[1] == self._generation:
+                return state[2]
+            stale = state is not None and state[0] == pid and bool(state[2])
+            state = self._connections[connection] = (pid, self._generation, set())
+        if stale:
+            cursor.execute("DEALLOCATE ALL")
+        return state[2]
@@ -0,0 +1,245 @@
+import bisect
+import logging
+import sys
+import threading
+import time
+
+from psycopg2.extensions import cursor as base_cursor
+
+logger = logging.getLogger("db.queries")
+
+# Верхние границы корзин гистограммы длительности запросов в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Ключ статистики запросов сверх max_statements
+OTHER_STATEMENTS = "<other>"
+
+# Модули, которые не считаются источником запроса: пулы, курсоры и вспомогательные функции db
+INFRASTRUCTURE_MODULES = ("db.", "psycopg2", "asyncpg", "asyncio", "contextlib")
+
+
+def caller():
+    """
+    Возвращает метод, от имени которого выполняется запрос: самый внешний метод сервиса (service.*)
+    в цепочке вызовов. Инфраструктура (INFRASTRUCTURE_MODULES) пропускается; если запрос выполняется
+    не из сервиса, возвращается первая функция вне нее (например, "BulkDataFiller.fill_banks").
+    Цепочка сопрограмм обрывается на границе задачи asyncio, поэтому для запросов из задач
+    asyncio.gather возвращается внешний метод сервиса внутри задачи.
+    """
+    label = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("service."):
+            label = frame.f_code.co_qualname
+        elif not module.startswith(INFRASTRUCTURE_MODULES):
+            return label or frame.f_code.co_qualname
+        frame = frame.f_back
+    return label or "unknown"
+
+
+def statement_text(query):
+    """
+    Приводит текст запроса (str, bytes или psycopg2.sql.Composable) к одной строке без лишних пробелов.
+    """
+    if isinstance(query, bytes):
+        query = query.decode(errors="replace")
+    elif not isinstance(query, str):
+        query = repr(query)
+    return " ".join(query.split())
+
+
+class QueryStats:
+    """
+    Статистика SQL-запросов по методам сервисов: количество, суммарная длительность, количество строк,
+    ошибки и гистограмма длительности для каждого метода, а также счетчики отдельных запросов
+    и попадания/промахи карты идентичности (IdentityMap) единиц работы.
+    Запросы дольше slow_threshold записываются в журнал "db.queries" с уровнем WARNING.
+
+    Запросы записывают обертки подключений: пул с параметром stats создает курсоры cursor_factory
+    (psycopg2) или подключения async_connection_class (asyncpg). Пул без stats не оборачивает
+    подключения и не несет никаких накладных расходов; выключенная статистика (enabled = False)
+    стоит одной проверки атрибута на запрос.
+    """
+
+    def __init__(self, slow_threshold=0.5, buckets=DEFAULT_BUCKETS, max_statements=1000, enabled=True):
+        """
+        :param slow_threshold: Длительность в секундах, начиная с которой запрос попадает в журнал медленных
+        :param buckets: Возрастающие верхние границы корзин гистограммы в секундах
+        :param max_statements: Сколько различных текстов запросов учитывать отдельно;
+                               остальные считаются вместе под ключом OTHER_STATEMENTS
+        :param enabled: Записывать ли запросы
+        """
+        self.slow_threshold = slow_threshold
+        self.buckets = tuple(buckets)
+        self.max_statements = max_statements
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # метод -> [количество, длительность, строки, ошибки, медленные, максимум, корзины,
+        #          попадания карты идентичности, промахи карты идентичности]
+        self._methods = {}
+        self._statements = {}  # (метод, текст) -> [количество, длительность, строки]
+
+        # Классы оберток, записывающие запросы в эту статистику
+        self.cursor_factory = type("InstrumentedCursor", (InstrumentedCursor,), {"stats": self})
+        self._async_connection_class = None
+
+    @property
+    def async_connection_class(self):
+        """
+        Класс подключения asyncpg, записывающий запросы в эту статистику. Создается при первом
+        обращении, поэтому синхронные сервисы не зависят от asyncpg.
+        """
+        if self._async_connection_class is None:
+            from db.AsyncConnectionPool import InstrumentedConnection
+            self._async_connection_class = type("InstrumentedConnection", (InstrumentedConnection,), {"stats": self})
+        return self._async_connection_class
+
+    def record(self, method, query, duration, rows=0, error=False):
+        """
+        Учитывает один выполненный запрос.
+
+        :param method: Метод, выполнивший запрос (см. caller)
+        :param query: Текст запроса
+        :param duration: Длительность в секундах
+        :param rows: Количество возвращенных или затронутых строк
+        :param error: Завершился ли запрос ошибкой
+        """
+        text = statement_text(query)
+        slow = duration >= self.slow_threshold
+        rows = max(rows or 0, 0)
+        with self._lock:
+            item = self._method(method)
+            item[0] += 1
+            item[1] += duration
+            item[2] += rows
+            item[3] += error
+            item[4] += slow
+            item[5] = max(item[5], duration)
+            item[6][bisect.bisect_left(self.buckets, duration)] += 1
+
+            key = (method, text)
+            if key not in self._statements and len(self._statements) >= self.max_statements:
+                key = (method, OTHER_STATEMENTS)
+            statement = self._statements.setdefault(key, [0, 0.0, 0])
+            statement[0] += 1
+            statement[1] += duration
+            statement[2] += rows
+
+        if slow:
+            logger.warning("Slow query (%.3f s) in %s: %s", duration, method, text)
+
+    def record_identity(self, method, hit):
+        """
+        Учитывает обращение метода к карте идентичности единицы работы.
+
+        :param hit: True, если модель найдена в карте и SELECT не понадобился
+        """
+        with self._lock:
+            self._method(method)[7 if hit else 8] += 1
+
+    def _method(self, method):
+        item = self._methods.get(method)
+        if item is None:
+            item = self._methods[method] = [0, 0.0, 0, 0, 0, 0.0, [0] * (len(self.buckets) + 1), 0, 0]
+        return item
+
+    def snapshot(self):
+        """
+        Возвращает копию накопленной статистики.
+
+        :return: Словарь {метод: {"count", "seconds", "rows", "errors", "slow", "max_seconds",
+                 "identity_hits", "identity_misses",
+                 "buckets": {верхняя граница ("0.001", ..., "+Inf"): количество не дольше ее (нарастающим итогом)},
+                 "statements": {текст: {"count", "seconds", "rows"}}}}
+        """
+        with self._lock:
+            methods = {method: item[:6] + [list(item[6])] + item[7:] for method, item in self._methods.items()}
+            statements = {key: list(value) for key, value in self._statements.items()}
+
+        result = {}
+        for method, (count, seconds, rows, errors, slow, longest, buckets, hits, misses) in sorted(methods.items()):
+            cumulative, total = {}, 0
+            for bound, bucket in zip([repr(bound) for bound in self.buckets] + ["+Inf"], buckets):
+                total += bucket
+                cumulative[bound] = total
+            result[method] = {"count": count, "seconds": seconds, "rows": rows, "errors": errors, "slow": slow,
+                              "max_seconds": longest, "identity_hits": hits, "identity_misses": misses,
+                              "buckets": cumulative, "statements": {}}
+        for (method, text), (count, seconds, rows) in statements.items():
+            result[method]["statements"][text] = {"count": count, "seconds": seconds, "rows": rows}
+        return result
+
+    def prometheus(self, prefix="bank_db"):
+        """
+        Возвращает статистику методов в текстовом формате Prometheus.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_query_duration_seconds Duration of SQL statements by calling service method.",
+            f"# TYPE {prefix}_query_duration_seconds histogram",
+        ]
+        for method, item in snapshot.items():
+            label = _label(method)
+            for bound, count in item["buckets"].items():
+                lines.append(f'{prefix}_query_duration_seconds_bucket{{method="{label}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_query_duration_seconds_sum{{method="{label}"}} {item["seconds"]!r}')
+            lines.append(f'{prefix}_query_duration_seconds_count{{method="{label}"}} {item["count"]}')
+
+        for name, field, description in (
+                ("query_rows", "rows", "Rows returned or affected by SQL statements."),
+                ("query_errors", "errors", "SQL statements that raised an error."),
+                ("query_slow", "slow", "SQL statements slower than the slow query threshold."),
+                ("identity_map_hits", "identity_hits", "Reads served from the unit of work identity map."),
+                ("identity_map_misses", "identity_misses", "Identity map lookups that required a SELECT.")):
+            lines.append(f"# HELP {prefix}_{name}_total {description}")
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for method, item in snapshot.items():
+                lines.append(f'{prefix}_{name}_total{{method="{_label(method)}"}} {item[field]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """
+        Очищает накопленную статистику.
+        """
+        with self._lock:
+            self._methods.clear()
+            self._statements.clear()
+
+
+def _label(value):
+    # Экранирование значения метки в текстовом формате Prometheus
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class InstrumentedCursor(base_cursor):
+    """
+    Курсор psycopg2, записывающий каждый execute, executemany и copy_expert в QueryStats
+    (класс с заполненным атрибутом stats создает сама статистика: QueryStats.cursor_factory).
+    """
+
+    stats = None
+
+    def execute(self, query, vars=None):
+        if not self.stats.enabled:
+            return super().execute(query, vars)
+        return self._recorded(query, super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        if not self.stats.enabled:
+            return super().executemany(query, vars_list)
+        return self._recorded(query, super().executemany, query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        if not self.stats.enabled:
+            return super().copy_expert(sql, file, size)
+        return self._recorded(sql, super().copy_expert, sql, file, size)
+
+    def _recorded(self, query, call, *args):
+        began, error = time.perf_counter(), True
+        try:
+            result = call(*args)
+            error = False
+            return result
+        finally:
+            self.stats.record(caller(), query, time.perf_counter() - began, self.rowcount, error)
@@ -0,0 +1,52 @@
+import itertools
+from contextlib import contextmanager
+
+from db.IdentityMap import IdentityMap
+
+
+class UnitOfWork:
+    """
+    Единица работы: одна транзакция на подключении, к которой присоединяются все операции сервисов,
+    выполняемые внутри with pool.transaction(). Операции сервисов не фиксируют ее по отдельности -
+    фиксация (или откат) происходит один раз при выходе из самого внешнего блока.
+    Вложенный pool.transaction() и savepoint() открывают точку сохранения: ошибка внутри них
+    откатывает только их часть работы.
+    Модели, прочитанные и записанные сервисами внутри единицы работы, хранятся в ее карте
+    идентичности (identity_map).
+    """
+
+    def __init__(self, connection, identity_map=None):
+        """
+        :param connection: Подключение psycopg2, на котором выполняется транзакция
+        :param identity_map: Карта идентичности единицы работы (по умолчанию - новая пустая IdentityMap)
+        """
+        self.connection = connection
+        self.identity_map = identity_map if identity_map is not None else IdentityMap()
+        self._savepoint_names = itertools.count()
+        self.depth = 0  # Количество открытых точек сохранения
+
+    @contextmanager
+    def savepoint(self):
+        """
+        Открывает точку сохранения. При исключении изменения после нее откатываются,
+        а исключение передается дальше; внешняя транзакция остается работоспособной.
+        """
+        name = f"uow_{next(self._savepoint_names)}"
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SAVEPOINT {name}")
+        self.depth += 1
+        try:
+            yield self
+        except BaseException:
+            # Модели в карте могли получить откаченные значения
+            self.identity_map.expire_all()
+            if not self.connection.closed:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                    cursor.execute(f"RELEASE SAVEPOINT {name}")
+            raise
+        else:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"RELEASE SAVEPOINT {name}")
+        finally:
+            self.depth -= 1
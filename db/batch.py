@@ -0,0 +1,197 @@
+from collections import Counter, defaultdict
+
+from psycopg2.extras import execute_values
+
+from db.sql import update_columns
+
+# Наибольшее количество параметров одного запроса в протоколе PostgreSQL
+MAX_PARAMETERS = 32767
+
+
+def normalize_rows(items, fields, defaults=None):
+    """
+    Приводит элементы пакетной операции к кортежам в порядке fields.
+    Элемент может быть кортежем/списком позиционных аргументов create() или словарем именованных.
+
+    :param items: Итерируемый объект элементов
+    :param fields: Имена параметров create() по порядку
+    :param defaults: Значения по умолчанию для необязательных параметров
+    :return: Список кортежей
+    """
+    defaults = defaults or {}
+    rows = []
+    for item in items:
+        if isinstance(item, dict):
+            values = {**defaults, **item}
+        else:
+            values = dict(defaults)
+            values.update(zip(fields, item))
+        missing = [field for field in fields if field not in values]
+        if missing:
+            raise ValueError(f"Missing values for {', '.join(missing)} in {item!r}")
+        rows.append(tuple(values[field] for field in fields))
+    return rows
+
+
+def insert_returning_ids(cursor, query, rows):
+    """
+    Вставляет все строки одним многострочным INSERT ... VALUES ... RETURNING.
+    Идентификаторы SERIAL выдаются в порядке строк VALUES, поэтому после сортировки
+    они соответствуют порядку входных данных.
+
+    :param cursor: Курсор psycopg2
+    :param query: Запрос с одним плейсхолдером %s для VALUES и RETURNING идентификатора
+    :param rows: Список кортежей значений
+    :return: Список идентификаторов в порядке rows
+    """
+    result = execute_values(cursor, query, rows, page_size=len(rows), fetch=True)
+    return sorted(row[0] for row in result)
+
+
+async def ainsert_returning_ids(connection, query, rows):
+    """
+    Асинхронный вариант insert_returning_ids для asyncpg: запрос вставляет строки
+    из unnest($1::тип[], $2::тип[], ...) - по одному массиву на колонку - и возвращает идентификаторы.
+
+    :param connection: Подключение asyncpg
+    :param query: Запрос INSERT ... SELECT * FROM unnest(...) RETURNING идентификатора
+    :param rows: Список кортежей значений
+    :return: Список идентификаторов в порядке rows
+    """
+    columns = [list(values) for values in zip(*rows)]
+    result = await connection.fetch(query, *columns)
+    return sorted(row[0] for row in result)
+
+
+def group_updates(table, fields, updates):
+    """
+    Группирует изменения пакетного update по набору колонок: строки с одинаковым набором
+    обновляются одним запросом.
+
+    :param table: Таблица (для сообщения об ошибке)
+    :param fields: Допустимые колонки (см. sql.update_columns)
+    :param updates: Словарь {ключ: {колонка: значение}} или итерируемый объект пар (ключ, словарь)
+    :return: Кортеж (ключи в порядке updates, {кортеж колонок: [(ключ, значения...)]})
+    """
+    updates = dict(updates)
+    groups = defaultdict(list)
+    for key, values in updates.items():
+        columns = update_columns(table, fields, values)
+        if columns:
+            groups[columns].append((key, *values.values()))
+    return list(updates), groups
+
+
+def update_many_query(table, key_column, columns, returning=None, alias="t"):
+    """
+    Возвращает запрос UPDATE ... FROM (VALUES ...), изменяющий строки значениями из списка VALUES.
+    Первая строка VALUES состоит из NULL с типами колонок таблицы ((NULL::таблица).колонка):
+    по ней PostgreSQL выводит типы остальных строк, поэтому значения и NULL не нужно приводить явно.
+    Сама она ни с чем не соединяется, так как ее ключ - NULL.
+
+    :param columns: Изменяемые колонки (проверенные update_columns)
+    :return: Запрос с плейсхолдером %s для остальных строк VALUES вида (ключ, значения columns...)
+    """
+    names = (key_column, *columns)
+    typed = ", ".join(f"(NULL::{table}).{name}" for name in names)
+    fields = ", ".join(f"{column} = v.{column}" for column in columns)
+    return (f"UPDATE {table} {alias} SET {fields} FROM (VALUES ({typed}), %s) AS v({', '.join(names)}) "
+            f"WHERE {alias}.{key_column} = v.{key_column} RETURNING {returning or f'{alias}.*'}")
+
+
+def update_rows(cursor, table, key_column, fields, updates, returning=None, alias="t"):
+    """
+    Обновляет несколько строк значениями, своими для каждой строки: по одному запросу
+    UPDATE ... FROM (VALUES ...) ... RETURNING на каждый набор изменяемых колонок.
+
+    :param cursor: Курсор psycopg2
+    :param table: Таблица
+    :param key_column: Ключевая колонка
+    :param fields: Допустимые колонки
+    :param updates: Словарь {ключ: {колонка: значение}} или итерируемый объект пар (ключ, словарь)
+    :param returning: Список возвращаемых выражений; первым должен быть ключ (по умолчанию все колонки)
+    :param alias: Псевдоним таблицы, на который ссылается returning
+    :return: Словарь {ключ: возвращенная строка} и ключи в порядке updates
+    """
+    keys, groups = group_updates(table, fields, updates)
+    rows = {}
+    for columns, values in groups.items():
+        query = update_many_query(table, key_column, columns, returning, alias)
+        for row in execute_values(cursor, query, values, page_size=len(values), fetch=True):
+            rows[row[0]] = row
+    return rows, keys
+
+
+async def aupdate_rows(connection, table, key_column, fields, updates, returning=None, alias="t"):
+    """
+    Асинхронный вариант update_rows для подключения asyncpg. Строки VALUES передаются параметрами
+    ($1, $2, ...) порциями, укладывающимися в ограничение количества параметров запроса.
+    """
+    keys, groups = group_updates(table, fields, updates)
+    rows = {}
+    for columns, values in groups.items():
+        query = update_many_query(table, key_column, columns, returning, alias)
+        width = len(columns) + 1
+        size = MAX_PARAMETERS // width
+        for start in range(0, len(values), size):
+            chunk = values[start:start + size]
+            placeholders = ", ".join(
+                "(" + ", ".join(f"${number}" for number in range(index * width + 1, (index + 1) * width + 1)) + ")"
+                for index in range(len(chunk)))
+            params = [value for row in chunk for value in row]
+            for row in await connection.fetch(query.replace("%s", placeholders, 1), *params):
+                rows[row[0]] = row
+    return rows, keys
+
+
+def add_counters(cursor, table, key_column, column, keys, sign=1):
+    """
+    Изменяет денормализованный счетчик одним сгруппированным UPDATE вместо запроса на каждую строку.
+
+    :param cursor: Курсор psycopg2
+    :param table: Таблица со счетчиком (например, banks)
+    :param key_column: Ключевая колонка таблицы (например, bank_id)
+    :param column: Колонка счетчика (например, num_offices)
+    :param keys: Ключи, по одному на каждое изменение
+    :param sign: 1 для увеличения, -1 для уменьшения
+    """
+    deltas = [(key, sign * count) for key, count in Counter(keys).items()]
+    if not deltas:
+        return
+    execute_values(
+        cursor,
+        f"UPDATE {table} SET {column} = {column} + d.delta FROM (VALUES %s) AS d(key, delta) "
+        f"WHERE {table}.{key_column} = d.key",
+        deltas
+    )
+
+
+def add_counters_from(table, key_column, column, source, sign=1):
+    """
+    Возвращает SQL-оператор, изменяющий счетчик один раз на каждую строку CTE source: строки
+    группируются по ключу, и каждая строка таблицы обновляется одним UPDATE на количество своих строк.
+    Используется как завершающий оператор (или CTE) запросов вида WITH source AS (... RETURNING ключ).
+
+    :param table: Таблица со счетчиком (например, bank_offices)
+    :param key_column: Ключевая колонка таблицы; так же называется колонка в source
+    :param column: Колонка счетчика (например, num_atms)
+    :param source: Имя CTE с колонкой key_column
+    :param sign: 1 для увеличения, -1 для уменьшения
+    """
+    return (f"UPDATE {table} SET {column} = {table}.{column} + ({sign}) * d.count "
+            f"FROM (SELECT {key_column}, count(*) AS count FROM {source} GROUP BY {key_column}) AS d "
+            f"WHERE {table}.{key_column} = d.{key_column}")
+
+
+async def aadd_counters(connection, table, key_column, column, keys, sign=1):
+    """
+    Асинхронный вариант add_counters для подключения asyncpg.
+    """
+    counts = Counter(keys)
+    if not counts:
+        return
+    await connection.execute(
+        f"UPDATE {table} SET {column} = {column} + d.delta FROM unnest($1::int[], $2::int[]) AS d(key, delta) "
+        f"WHERE {table}.{key_column} = d.key",
+        list(counts), [sign * count for count in counts.values()]
+    )
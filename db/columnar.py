@@ -0,0 +1,135 @@
+import itertools
+
+import numpy as np
+
+from db.pagination import filter_conditions
+from db.sql import positional
+
+# Счетчик для уникальных имен серверных курсоров
+_cursor_names = itertools.count()
+
+
+def fetch_columns(pool, query, dtypes, params=None, batch_size=50000):
+    """
+    Читает результат запроса в колоночном виде: по одному массиву NumPy на колонку.
+    Строки приходят пачками через серверный курсор; каждая пачка сразу раскладывается
+    по типизированным массивам, промежуточные объекты моделей не создаются.
+    NULL превращается в NaN для вещественных колонок и в NaT для дат.
+
+    :param pool: Поставщик подключений
+    :param query: SQL-запрос, колонки которого идут в порядке dtypes
+    :param dtypes: Словарь {колонка: dtype NumPy} в порядке колонок запроса
+    :param params: Параметры запроса
+    :param batch_size: Количество строк, получаемых с сервера за одно обращение
+    :return: Словарь {колонка: numpy.ndarray}
+    """
+    chunks = {name: [] for name in dtypes}
+    with pool.connection() as connection:
+        with connection.cursor(name=f"columns_{next(_cursor_names)}") as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                _append_batch(chunks, dtypes, rows)
+    return _concatenate(chunks, dtypes)
+
+
+async def afetch_columns(pool, query, dtypes, params=None, batch_size=50000):
+    """
+    Асинхронный вариант fetch_columns для AsyncConnectionPool: пачки читаются курсором asyncpg.
+    """
+    chunks = {name: [] for name in dtypes}
+    async with pool.connection() as connection:
+        cursor = await connection.cursor(positional(query), *(params or ()))
+        while True:
+            rows = await cursor.fetch(batch_size)
+            if not rows:
+                break
+            _append_batch(chunks, dtypes, rows)
+    return _concatenate(chunks, dtypes)
+
+
+def _append_batch(chunks, dtypes, rows):
+    # Пачка строк раскладывается по типизированным массивам колонок
+    for name, values in zip(dtypes, zip(*rows)):
+        chunks[name].append(np.array(values, dtype=dtypes[name]))
+
+
+def _concatenate(chunks, dtypes):
+    return {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=dtypes[name])
+        for name, parts in chunks.items()
+    }
+
+
+def fetch_table_columns(pool, table, dtypes, fields=None, filters=None, batch_size=50000):
+    """
+    Читает колонки таблицы в массивы NumPy с отбором по фильтрам.
+    Вещественные колонки приводятся к float8 на сервере, чтобы не создавать объекты Decimal.
+
+    :param pool: Поставщик подключений
+    :param table: Имя таблицы
+    :param dtypes: Словарь {колонка: dtype NumPy} всех допустимых колонок таблицы
+    :param fields: Список читаемых колонок (по умолчанию все колонки dtypes)
+    :param filters: Словарь {колонка: значение}; список значений означает = ANY, None - IS NULL
+    :param batch_size: Количество строк, получаемых с сервера за одно обращение
+    :return: Словарь {колонка: numpy.ndarray}
+    """
+    query, selected, params = table_columns_query(table, dtypes, fields, filters)
+    return fetch_columns(pool, query, selected, params, batch_size)
+
+
+async def afetch_table_columns(pool, table, dtypes, fields=None, filters=None, batch_size=50000):
+    """
+    Асинхронный вариант fetch_table_columns для AsyncConnectionPool; параметры те же.
+    """
+    query, selected, params = table_columns_query(table, dtypes, fields, filters)
+    return await afetch_columns(pool, query, selected, params, batch_size)
+
+
+def table_columns_query(table, dtypes, fields=None, filters=None):
+    """
+    Строит запрос колоночного чтения таблицы.
+
+    :return: Кортеж (запрос с параметрами %s, словарь dtypes выбранных колонок, список параметров)
+    """
+    fields = list(fields) if fields is not None else list(dtypes)
+    for field in fields:
+        if field not in dtypes:
+            raise ValueError(f"Unknown column: {field}")
+
+    selected = {field: dtypes[field] for field in fields}
+    columns = ", ".join(
+        f"{field}::float8" if np.dtype(dtype).kind == "f" else field for field, dtype in selected.items())
+    conditions, params = filter_conditions(dtypes, filters)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {columns} FROM {table}{where}", selected, params
+
+
+def group_sum(keys, values):
+    """
+    Векторно суммирует values по группам keys.
+
+    :param keys: Массив ключей групп
+    :param values: Массив значений той же длины (NaN пропускаются)
+    :return: Словарь {ключ: сумма}
+    """
+    groups, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=np.nan_to_num(values), minlength=len(groups))
+    return dict(zip(groups.tolist(), sums.tolist()))
+
+
+def group_mean(keys, values):
+    """
+    Векторно вычисляет среднее values по группам keys (NaN не учитываются).
+
+    :param keys: Массив ключей групп
+    :param values: Массив значений той же длины
+    :return: Словарь {ключ: среднее}
+    """
+    present = ~np.isnan(values)
+    groups, inverse = np.unique(keys[present], return_inverse=True)
+    sums = np.bincount(inverse, weights=values[present], minlength=len(groups))
+    counts = np.bincount(inverse, minlength=len(groups))
+    return dict(zip(groups.tolist(), (sums / counts).tolist()))
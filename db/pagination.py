@@ -0,0 +1,88 @@
+from db.sql import positional
+from entity.pageModel import PageModel
+
+
+def filter_conditions(fields, filters, prefix=""):
+    """
+    Строит условия WHERE по словарю фильтров, проверяя колонки по списку допустимых.
+
+    :param fields: Допустимые колонки фильтров
+    :param filters: Словарь {колонка: значение}; список значений означает = ANY, None - IS NULL
+    :param prefix: Псевдоним таблицы (например, "u.")
+    :return: Кортеж (список условий, список параметров)
+    """
+    conditions, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in fields:
+            raise ValueError(f"Unknown filter column: {column}")
+        if value is None:
+            conditions.append(f"{prefix}{column} IS NULL")
+        elif isinstance(value, (list, tuple, set)):
+            conditions.append(f"{prefix}{column} = ANY(%s)")
+            params.append(list(value))
+        else:
+            conditions.append(f"{prefix}{column} = %s")
+            params.append(value)
+    return conditions, params
+
+
+def keyset_page(pool, select, id_column, model, fields, after_id=None, limit=100, filters=None, prefix=""):
+    """
+    Читает одну страницу методом keyset (seek): вместо OFFSET используется условие id > after_id
+    по первичному ключу, поэтому время ответа не зависит от глубины страницы.
+
+    :param pool: Поставщик подключений
+    :param select: Начало запроса SELECT ... FROM ... без WHERE
+    :param id_column: Колонка первичного ключа (SERIAL), по которой идет постраничный обход
+    :param model: Класс модели, строящийся из строки результата
+    :param fields: Допустимые колонки фильтров
+    :param after_id: Токен продолжения предыдущей страницы (None - первая страница)
+    :param limit: Максимальное количество моделей на странице
+    :param filters: Словарь {колонка: значение}; список значений означает = ANY, None - IS NULL
+    :param prefix: Псевдоним таблицы в select (например, "u.")
+    :return: Экземпляр PageModel
+    """
+    query, params = keyset_query(select, id_column, fields, after_id, limit, filters, prefix)
+    with pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    return page_from_rows(rows, model, id_column, limit)
+
+
+async def akeyset_page(pool, select, id_column, model, fields, after_id=None, limit=100, filters=None, prefix=""):
+    """
+    Асинхронный вариант keyset_page для AsyncConnectionPool; параметры те же.
+    """
+    query, params = keyset_query(select, id_column, fields, after_id, limit, filters, prefix)
+    async with pool.connection() as connection:
+        rows = await connection.fetch(positional(query), *params)
+    return page_from_rows(rows, model, id_column, limit)
+
+
+def keyset_query(select, id_column, fields, after_id=None, limit=100, filters=None, prefix=""):
+    """
+    Строит запрос одной keyset-страницы.
+
+    :return: Кортеж (запрос с параметрами %s, список параметров)
+    """
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+
+    conditions, params = filter_conditions(fields, filters, prefix)
+    if after_id is not None:
+        conditions.append(f"{prefix}{id_column} > %s")
+        params.append(int(after_id))
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"{select}{where} ORDER BY {prefix}{id_column} LIMIT %s"
+    params.append(limit + 1)  # Лишняя строка показывает, есть ли следующая страница
+    return query, params
+
+
+def page_from_rows(rows, model, id_column, limit):
+    """
+    Собирает PageModel из строк запроса keyset_query.
+    """
+    items = [model.from_row(data) for data in rows[:limit]]
+    next_token = getattr(items[-1], id_column) if len(rows) > limit else None
+    return PageModel(items, next_token)
@@ -0,0 +1,60 @@
+import re
+from datetime import date
+
+# Параметр psycopg2 (%s), не экранированный вторым знаком процента
+_PLACEHOLDER = re.compile(r"(?<!%)%s")
+
+
+def positional(query):
+    """
+    Переводит запрос с параметрами psycopg2 (%s) в нумерованные параметры asyncpg ($1, $2, ...),
+    чтобы синхронные и асинхронные сервисы использовали одни и те же SQL-запросы.
+    """
+    numbers = iter(range(1, query.count("%s") + 1))
+    return _PLACEHOLDER.sub(lambda match: f"${next(numbers)}", query).replace("%%", "%")
+
+
+def as_date(value):
+    """
+    Приводит дату в формате ISO (строку) к datetime.date; asyncpg не принимает строки для колонок DATE.
+    """
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def rowcount(status):
+    """
+    Возвращает количество затронутых строк по статусу команды asyncpg (например, "UPDATE 5").
+    """
+    return int(status.split()[-1])
+
+
+def update_columns(table, fields, values):
+    """
+    Проверяет имена колонок, переданные в update, по списку допустимых: имена подставляются в SQL
+    как идентификаторы, поэтому произвольные ключи kwargs не должны попадать в запрос.
+
+    :param table: Таблица (для сообщения об ошибке)
+    :param fields: Допустимые колонки
+    :param values: Словарь {колонка: значение}
+    :return: Кортеж колонок в порядке values
+    """
+    unknown = [key for key in values if key not in fields]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(map(str, unknown))}")
+    return tuple(values)
+
+
+def update_query(table, key_column, columns, returning=None, alias="t"):
+    """
+    Возвращает запрос UPDATE одной строки, который сразу возвращает ее новые значения (RETURNING).
+    Параметры запроса: значения columns по порядку, затем значение ключа.
+
+    :param table: Таблица
+    :param key_column: Ключевая колонка
+    :param columns: Изменяемые колонки (проверенные update_columns)
+    :param returning: Список возвращаемых выражений (по умолчанию все колонки таблицы)
+    :param alias: Псевдоним таблицы, на который ссылается returning
+    """
+    fields = ", ".join(f"{column} = %s" for column in columns)
+    return (f"UPDATE {table} {alias} SET {fields} WHERE {alias}.{key_column} = %s "
+            f"RETURNING {returning or f'{alias}.*'}")
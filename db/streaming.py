@@ -0,0 +1,37 @@
+import itertools
+
+from db.sql import positional
+
+# Счетчик для уникальных имен серверных курсоров
+_cursor_names = itertools.count()
+
+
+def stream_rows(pool, query, params=None, batch_size=2000):
+    """
+    Потоково читает результат запроса через именованный (серверный) курсор:
+    строки приходят пачками по batch_size, поэтому память клиента не зависит от размера таблицы.
+    Подключение удерживается, пока генератор не будет исчерпан или закрыт.
+
+    :param pool: Поставщик подключений (ConnectionPool или SingleConnection)
+    :param query: SQL-запрос
+    :param params: Параметры запроса
+    :param batch_size: Количество строк, получаемых с сервера за одно обращение
+    :return: Генератор кортежей строк
+    """
+    with pool.connection() as connection:
+        with connection.cursor(name=f"stream_{next(_cursor_names)}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+            yield from cursor
+
+
+async def astream_rows(pool, query, params=None, batch_size=2000):
+    """
+    Асинхронный вариант stream_rows для AsyncConnectionPool: строки читаются курсором asyncpg
+    пачками по batch_size.
+
+    :return: Асинхронный генератор записей
+    """
+    async with pool.connection() as connection:
+        async for record in connection.cursor(positional(query), *(params or ()), prefetch=batch_size):
+            yield record
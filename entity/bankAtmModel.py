@@ -1,4 +1,9 @@
 class BankAtmModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    # Порядок колонок таблицы, как в from_row, а не по алфавиту
+    __slots__ = ("atm_id", "name", "address", "status", "bank_id", "bank_office_id", "employee_id",  # noqa: RUF023
+                 "dispense_money", "accept_money", "money_in_atm", "maintenance_cost")
+
     def __init__(self, atm_id, name, address, status, bank_id, bank_office_id, employee_id, dispense_money,
                  accept_money, money_in_atm, maintenance_cost):
         """
@@ -28,6 +33,19 @@ class BankAtmModel:
         self.money_in_atm = money_in_atm
         self.maintenance_cost = maintenance_cost
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Создает модель прямо из строки курсора (порядок колонок таблицы) без вызова __init__.
+        :param row: Кортеж значений строки
+        :return: Экземпляр BankAtmModel
+        """
+        model = cls.__new__(cls)
+        (model.atm_id, model.name, model.address, model.status, model.bank_id, model.bank_office_id,
+         model.employee_id, model.dispense_money, model.accept_money, model.money_in_atm,
+         model.maintenance_cost) = row
+        return model
+
     def __repr__(self):
         return (f'<BankAtmModel: {self.atm_id}, {self.name}, {self.address}, {self.status}, {self.bank_id}, '
                 f'{self.bank_office_id}, {self.employee_id}, {self.dispense_money}, {self.accept_money}, '
@@ -0,0 +1,39 @@
+class BankInfoModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    __slots__ = ("bank", "bank_atms", "bank_offices", "employees", "users")
+
+    def __init__(self, bank=None, bank_atms=None, bank_offices=None, employees=None, users=None):
+        """
+        Конструктор класса BankInfoModel.
+        Полная информация о банке со всеми связанными сущностями:
+        :param bank: Экземпляр BankModel (по умолчанию None)
+        :param bank_atms: Список BankAtmModel банкоматов банка (по умолчанию пустой список)
+        :param bank_offices: Список BankOfficeModel офисов банка (по умолчанию пустой список)
+        :param employees: Список EmployeeModel сотрудников банка (по умолчанию пустой список)
+        :param users: Список UserModel клиентов банка (по умолчанию пустой список)
+        """
+        # Данные самого банка
+        self.bank = bank
+
+        # Банкоматы банка
+        self.bank_atms = bank_atms if bank_atms is not None else []
+
+        # Офисы банка
+        self.bank_offices = bank_offices if bank_offices is not None else []
+
+        # Сотрудники банка
+        self.employees = employees if employees is not None else []
+
+        # Клиенты банка
+        self.users = users if users is not None else []
+
+    def __repr__(self):
+        """
+        Метод для представления объекта класса в виде строки.
+        Используется для удобного вывода и отладки.
+        :return: Строковое представление объекта BankInfoModel
+        """
+        return (
+            f"BankInfoModel({self.bank}, bank_atms={self.bank_atms}, bank_offices={self.bank_offices}, "
+            f"employees={self.employees}, users={self.users})"
+        )
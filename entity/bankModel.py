@@ -1,4 +1,9 @@
 class BankModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    # Порядок колонок таблицы, как в from_row, а не по алфавиту
+    __slots__ = ("bank_id", "name", "num_offices", "num_atms", "num_employees", "num_clients", "rating",  # noqa: RUF023
+                 "total_money", "interest_rate")
+
     def __init__(self, bank_id=None, name=None, num_offices=0, num_atms=0, num_employees=0, num_clients=0, rating=0,
                  total_money=0, interest_rate=0.0):
         """
@@ -41,6 +46,18 @@ class BankModel:
         # Процентная ставка банка
         self.interest_rate = interest_rate
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Создает модель прямо из строки курсора (порядок колонок таблицы) без вызова __init__.
+        :param row: Кортеж значений строки
+        :return: Экземпляр BankModel
+        """
+        model = cls.__new__(cls)
+        (model.bank_id, model.name, model.num_offices, model.num_atms, model.num_employees,
+         model.num_clients, model.rating, model.total_money, model.interest_rate) = row
+        return model
+
     def __repr__(self):
         """
         Метод для представления объекта класса в виде строки.
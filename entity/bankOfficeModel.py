@@ -1,4 +1,9 @@
 class BankOfficeModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    # Порядок колонок таблицы, как в from_row, а не по алфавиту
+    __slots__ = ("bank_office_id", "name", "address", "status", "can_place_atm", "num_atms",  # noqa: RUF023
+                 "can_provide_credit", "dispense_money", "accept_money", "money_in_office", "rent_cost",
+                 "bank_id")
 
     def __init__(self, bank_office_id=None, name=None, address=None, status=None, can_place_atm=None,
                  num_atms=0, can_provide_credit=None, dispense_money=None, accept_money=None,
@@ -55,6 +60,19 @@ class BankOfficeModel:
         # Идентификатор банка, к которому относится офис
         self.bank_id = bank_id
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Создает модель прямо из строки курсора (порядок колонок таблицы) без вызова __init__.
+        :param row: Кортеж значений строки
+        :return: Экземпляр BankOfficeModel
+        """
+        model = cls.__new__(cls)
+        (model.bank_office_id, model.name, model.address, model.status, model.can_place_atm, model.num_atms,
+         model.can_provide_credit, model.dispense_money, model.accept_money, model.money_in_office,
+         model.rent_cost, model.bank_id) = row
+        return model
+
     def __repr__(self):
         """
         Метод для представления объекта класса в виде строки.
@@ -1,4 +1,10 @@
 class CreditAccountModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    # Порядок колонок таблицы, как в from_row, а не по алфавиту
+    __slots__ = ("credit_account_id", "user_id", "bank_name", "start_date", "end_date",  # noqa: RUF023
+                 "loan_duration_months", "loan_amount", "monthly_payment", "interest_rate", "employee_id",
+                 "payment_account_id")
+
     def __init__(self, credit_account_id=None, user_id=None, bank_name=None, start_date=None, end_date=None,
                  loan_duration_months=None, loan_amount=None, monthly_payment=None, interest_rate=None,
                  employee_id=None, payment_account_id=None):
@@ -50,6 +56,19 @@ class CreditAccountModel:
         # Идентификатор расчетного счета, связанного с кредитом
         self.payment_account_id = payment_account_id
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Создает модель прямо из строки курсора (порядок колонок таблицы) без вызова __init__.
+        :param row: Кортеж значений строки
+        :return: Экземпляр CreditAccountModel
+        """
+        model = cls.__new__(cls)
+        (model.credit_account_id, model.user_id, model.bank_name, model.start_date, model.end_date,
+         model.loan_duration_months, model.loan_amount, model.monthly_payment, model.interest_rate,
+         model.employee_id, model.payment_account_id) = row
+        return model
+
     def __repr__(self):
         """
         Метод для представления объекта класса в виде строки.
@@ -1,4 +1,9 @@
 class EmployeeModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    # Порядок колонок таблицы, как в from_row, а не по алфавиту
+    __slots__ = ("employee_id", "full_name", "birth_date", "position", "bank_id", "works_remotely",  # noqa: RUF023
+                 "bank_office_id", "can_provide_credit", "salary")
+
     def __init__(self, employee_id=None, full_name=None, birth_date=None, position=None, bank_id=None,
                  works_remotely=None, bank_office_id=None, can_provide_credit=None, salary=None):
         """
@@ -41,6 +46,18 @@ class EmployeeModel:
         # Зарплата работника
         self.salary = salary
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Создает модель прямо из строки курсора (порядок колонок таблицы) без вызова __init__.
+        :param row: Кортеж значений строки
+        :return: Экземпляр EmployeeModel
+        """
+        model = cls.__new__(cls)
+        (model.employee_id, model.full_name, model.birth_date, model.position, model.bank_id,
+         model.works_remotely, model.bank_office_id, model.can_provide_credit, model.salary) = row
+        return model
+
     def __repr__(self):
         """
         Метод для представления объекта класса в виде строки.
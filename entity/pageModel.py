@@ -0,0 +1,25 @@
+class PageModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    __slots__ = ("items", "next_token")
+
+    def __init__(self, items=None, next_token=None):
+        """
+        Конструктор класса PageModel.
+        Страница результатов постраничного чтения:
+        :param items: Список моделей на странице (по умолчанию пустой список)
+        :param next_token: Токен продолжения - идентификатор, который передается как after_id
+                           для получения следующей страницы; None, если страниц больше нет
+        """
+        # Модели на странице
+        self.items = items if items is not None else []
+
+        # Токен следующей страницы
+        self.next_token = next_token
+
+    def __repr__(self):
+        """
+        Метод для представления объекта класса в виде строки.
+        Используется для удобного вывода и отладки.
+        :return: Строковое представление объекта PageModel
+        """
+        return f"PageModel({self.items}, next_token={self.next_token})"
@@ -1,4 +1,8 @@
 class PaymentAccountModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    # Порядок колонок таблицы, как в from_row, а не по алфавиту
+    __slots__ = ("payment_account_id", "user_id", "bank_name", "balance")  # noqa: RUF023
+
     def __init__(self, payment_account_id=None, user_id=None, bank_name=None, balance=None):
         """
         Конструктор класса PaymentAccountModel.
@@ -20,6 +24,17 @@ class PaymentAccountModel:
         # Баланс платежного аккаунта
         self.balance = balance
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Создает модель прямо из строки курсора (порядок колонок таблицы) без вызова __init__.
+        :param row: Кортеж значений строки
+        :return: Экземпляр PaymentAccountModel
+        """
+        model = cls.__new__(cls)
+        (model.payment_account_id, model.user_id, model.bank_name, model.balance) = row
+        return model
+
     def __repr__(self):
         """
         Метод для представления объекта класса в виде строки.
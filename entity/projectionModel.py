@@ -0,0 +1,51 @@
+class ProjectionModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    # Порядок аргументов конструктора, а не по алфавиту
+    __slots__ = ("groups", "months", "payment", "interest", "principal", "balance")  # noqa: RUF023
+
+    def __init__(self, groups, months, payment, interest, principal, balance):
+        """
+        Конструктор класса ProjectionModel.
+        Прогноз погашения кредитного портфеля по группам (например, банкам) и месяцам:
+        :param groups: Массив ключей групп длины G
+        :param months: Массив месяцев прогноза длины T (datetime64[M] или номера месяцев)
+        :param payment: Матрица G x T суммарных платежей
+        :param interest: Матрица G x T процентного дохода
+        :param principal: Матрица G x T погашенного основного долга
+        :param balance: Матрица G x T остатка основного долга на конец месяца
+        """
+        # Ключи групп и месяцы прогноза
+        self.groups = groups
+        self.months = months
+
+        # Агрегаты по группам и месяцам
+        self.payment = payment
+        self.interest = interest
+        self.principal = principal
+        self.balance = balance
+
+    def total(self, field):
+        """
+        Возвращает помесячный итог по всем группам.
+
+        :param field: Название агрегата ('payment', 'interest', 'principal' или 'balance')
+        :return: Массив длины T
+        """
+        return getattr(self, field).sum(axis=0)
+
+    def by_group(self, field):
+        """
+        Возвращает итог за весь горизонт прогноза по каждой группе.
+
+        :param field: Название агрегата ('payment', 'interest' или 'principal')
+        :return: Словарь {ключ группы: сумма}
+        """
+        return dict(zip(self.groups.tolist(), getattr(self, field).sum(axis=1).tolist()))
+
+    def __repr__(self):
+        """
+        Метод для представления объекта класса в виде строки.
+        Используется для удобного вывода и отладки.
+        :return: Строковое представление объекта ProjectionModel
+        """
+        return f"ProjectionModel(groups={len(self.groups)}, months={len(self.months)})"
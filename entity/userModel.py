@@ -1,4 +1,8 @@
 class UserModel:
+    # Фиксированный набор атрибутов без __dict__ у каждого экземпляра
+    # Порядок колонок таблицы, как в from_row, а не по алфавиту
+    __slots__ = ("user_id", "full_name", "birth_date", "job", "monthly_income", "banks", "credit_rating")  # noqa: RUF023
+
     def __init__(self, user_id=None, full_name=None, birth_date=None, job=None, monthly_income=None,
                  banks=None, credit_rating=None):
         """
@@ -33,6 +37,18 @@ class UserModel:
         # Кредитный рейтинг пользователя
         self.credit_rating = credit_rating
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Создает модель прямо из строки курсора (порядок колонок таблицы) без вызова __init__.
+        :param row: Кортеж значений строки
+        :return: Экземпляр UserModel
+        """
+        model = cls.__new__(cls)
+        (model.user_id, model.full_name, model.birth_date, model.job, model.monthly_income, model.banks,
+         model.credit_rating) = row
+        return model
+
     def __repr__(self):
         """
         Метод для представления объекта класса в виде строки.
@@ -1,7 +1,11 @@
 import random
-import psycopg2
 from data import *
+from db.ConnectionPool import ConnectionPool
+from db.IndexManager import IndexManager
 from entity.employeeModel import EmployeeModel
+from seed.BulkDataFiller import BulkDataFiller
+from seed.DataGenerator import DataGenerator
+from seed.ParallelDataFiller import ParallelDataFiller
 from service.Bank import Bank
 from service.BankAtm import BankAtm
 from service.BankOffice import BankOffice
@@ -12,8 +16,14 @@ from service.User import User
 
 
 class BankDataFiller:
-    def __init__(self, connection_params):
-        self.connection = psycopg2.connect(**connection_params)
+    def __init__(self, connection_params, seed=None, **pool_options):
+        # Пул подключений, общий для всех сервисов (pool_options: minconn, maxconn, timeout и т.д.)
+        self.pool = ConnectionPool(connection_params, **pool_options)
+        self.connection_params = connection_params
+
+        # Генератор ФИО, адресов и дат рождения и генератор остальных случайных значений (seed - для воспроизводимости)
+        self.data = DataGenerator(seed)
+        self.random = random.Random(self.data.seed)
         self.banks = []
         self.bank_offices = []
         self.bank_atms = []
@@ -23,13 +33,13 @@ class BankDataFiller:
         self.credit_accounts = []
 
         # Сервисы
-        self.bank = Bank(self.connection)
-        self.bank_office = BankOffice(self.connection)
-        self.bank_atm = BankAtm(self.connection)
-        self.credit_account = CreditAccount(self.connection)
-        self.employee = Employee(self.connection)
-        self.payment_account = PaymentAccount(self.connection)
-        self.user = User(self.connection)
+        self.bank = Bank(self.pool)
+        self.bank_office = BankOffice(self.pool)
+        self.bank_atm = BankAtm(self.pool)
+        self.credit_account = CreditAccount(self.pool)
+        self.employee = Employee(self.pool)
+        self.payment_account = PaymentAccount(self.pool)
+        self.user = User(self.pool)
 
         # Параметры
         self.count_bank_offices = 3
@@ -52,104 +62,132 @@ class BankDataFiller:
         self.bank_office.drop_table()
         self.bank_office.create_table()
 
-        self.bank_atm.drop_table()
-        self.bank_atm.create_table()
-
         self.user.drop_table()
         self.user.create_table()
 
         self.employee.drop_table()
         self.employee.create_table()
 
+        # Таблица банкоматов ссылается на сотрудников, поэтому создается после них
+        self.bank_atm.drop_table()
+        self.bank_atm.create_table()
+
         self.payment_account.drop_table()
         self.payment_account.create_table()
 
         self.credit_account.drop_table()
         self.credit_account.create_table()
 
+        # Вторичные индексы по внешним ключам и колонкам поиска
+        IndexManager(self.pool).create_indexes()
+
     def fill_bank_offices(self, bank_id, bank_office_id):
-        address = random.choice(addresses)
+        # Каждый офис получает свой адрес из генератора, общие списки не изменяются
+        position = self.count_bank_offices * bank_id + bank_office_id
         self.bank_offices.append(
             self.bank_office.create(
-                f"office{self.count_bank_offices * bank_id + bank_office_id}",
-                address,
-                random.choice(["working", "not working"]),
-                random.choice([True, False]), random.choice([True, False]),
-                random.choice([True, False]), random.choice([True, False]),
-                random.uniform(10.0, 100.0), self.banks[bank_id].bank_id
+                f"office{position}",
+                self.data.addresses(1, position).item(),
+                self.random.choice(["working", "not working"]),
+                self.random.choice([True, False]), self.random.choice([True, False]),
+                self.random.choice([True, False]), self.random.choice([True, False]),
+                self.random.uniform(10.0, 100.0), self.banks[bank_id].bank_id
             )
         )
-        addresses.remove(address)
 
     def fill_employees(self, bank_id, bank_office_id):
-        positions_copy = positions.copy()
-        full_names_copy = full_names.copy()
-        birth_dates_copy = birth_dates.copy()
-
-        for k in range(self.count_employees):
-            full_name = random.choice(full_names_copy)
-            birth_date = random.choice(birth_dates_copy)
-            position = random.choice(positions_copy)
+        # Различные ФИО, даты рождения и должности сотрудников офиса выбираются векторно
+        start = (self.count_bank_offices * bank_id + bank_office_id) * self.count_employees
+        full_names = self.data.full_names(self.count_employees, start, stream="employees").tolist()
+        birth_dates = self.data.birth_dates(self.count_employees, start, stream="employees").tolist()
+        positions = self.data.sample(DataGenerator.POSITIONS, self.count_employees).tolist()
 
+        for full_name, birth_date, position in zip(full_names, birth_dates, positions):
             self.employees.append(
                 self.employee.create(
                     full_name, birth_date, position, self.banks[bank_id].bank_id,
-                    random.choice([True, False]), self.bank_offices[bank_office_id].bank_office_id,
-                    random.choice([True, False]), random.randint(10000, 100000)
+                    self.random.choice([True, False]), self.bank_offices[bank_office_id].bank_office_id,
+                    self.random.choice([True, False]), self.random.randint(10000, 100000)
                 )
             )
 
-            full_names_copy.remove(full_name)
-            birth_dates_copy.remove(birth_date)
-            positions_copy.remove(position)
-
     def fill_bank_atms(self, bank_id, bank_office_id, empl):
         self.bank_atms.append(
             self.bank_atm.create(
                 f"BankATM{bank_office_id}",
-                random.choice(["working", "not working", "no money"]),
+                self.random.choice(["working", "not working", "no money"]),
                 self.banks[bank_id].bank_id, self.bank_offices[bank_office_id].bank_office_id,
-                empl.employee_id, random.choice([True, False]), random.choice([True, False]),
-                random.uniform(1.0, 10.0)
+                empl.employee_id, self.random.choice([True, False]), self.random.choice([True, False]),
+                self.random.uniform(1.0, 10.0)
             )
         )
 
     def fill_users(self, bank_id, empl):
         for k in range(self.count_fill_users):
-            self.users.append(self.user.create(
-                f"User{self.count_users}", '1987-03-22', f"job{self.count_users}",
-                random.randint(0, 10000), [banks_str[bank_id]]
-            ))
-            self.count_users += 1
-
-            for m in range(self.count_credit_payments_accounts):
-                self.payment_accounts.append(
-                    self.payment_account.create(self.count_users, banks_str[bank_id], random.randint(0, 100000))
-                )
-                self.credit_accounts.append(
-                    self.credit_account.create(
-                        self.count_users, banks_str[bank_id], "2023-03-22", "2024-03-24",
-                        random.randint(2, 20), random.randint(100000, 10000000),
-                        random.randint(1000, 100000), empl.employee_id,
-                        self.payment_accounts[m].payment_account_id
+            # Пользователь со всеми счетами и кредитами фиксируется одной транзакцией
+            with self.pool.transaction():
+                self.users.append(self.user.create(
+                    self.data.full_names(1, self.count_users, stream="users").item(),
+                    self.data.birth_dates(1, self.count_users, stream="users").item(), f"job{self.count_users}",
+                    self.random.randint(0, 10000), [banks_str[bank_id]]
+                ))
+                self.count_users += 1
+
+                for m in range(self.count_credit_payments_accounts):
+                    self.payment_accounts.append(
+                        self.payment_account.create(self.count_users, banks_str[bank_id], self.random.randint(0, 100000))
+                    )
+                    self.credit_accounts.append(
+                        self.credit_account.create(
+                            self.count_users, banks_str[bank_id], "2023-03-22", "2024-03-24",
+                            self.random.randint(2, 20), self.random.randint(100000, 10000000),
+                            self.random.randint(1000, 100000), empl.employee_id,
+                            self.payment_accounts[m].payment_account_id
+                        )
                     )
-                )
         self.employees.remove(empl)
 
     def fill_models(self):
         for i in range(len(banks_str)):
-            self.banks.append(self.bank.create(banks_str[i]))
+            self.banks.append(self.bank.create(banks_str[i], self.random))
             for j in range(self.count_bank_offices):
                 self.fill_bank_offices(i, j)
                 self.fill_employees(i, j)
 
-                empl: EmployeeModel = random.choice(self.employees)  # Используем явно, чтобы взять ID сотрудника
+                empl: EmployeeModel = self.random.choice(self.employees)  # Используем явно, чтобы взять ID сотрудника
 
                 self.fill_bank_atms(i, j, empl)
                 self.fill_users(i, empl)
 
+    def fill_models_bulk(self, scale=1, seed=None):
+        """
+        Массовое заполнение базы через COPY вместо построчных create.
+
+        :param scale: Множитель количества офисов каждого банка (и их сотрудников, банкоматов,
+                      клиентов, счетов и кредитов)
+        :param seed: Зерно генератора случайных чисел для воспроизводимых данных
+        :return: Словарь с количеством загруженных строк по таблицам
+        """
+        return BulkDataFiller(self.pool, scale=scale, seed=seed).fill_models()
+
+    def fill_models_parallel(self, workers=None, scale=1, seed=None, bank_count=None):
+        """
+        Массовое заполнение базы пулом процессов: каждый банк со всеми зависимыми строками
+        загружается отдельным процессом через COPY. При одном seed данные совпадают с fill_models_bulk.
+
+        :param workers: Количество процессов (по умолчанию - количество ядер)
+        :param scale: Множитель количества офисов каждого банка (и их сотрудников, банкоматов,
+                      клиентов, счетов и кредитов)
+        :param seed: Зерно генераторов случайных чисел для воспроизводимых данных
+        :param bank_count: Количество банков (частей работы); по умолчанию - банки из banks_str
+        :return: Словарь с количеством загруженных строк по таблицам
+        """
+        counts = ParallelDataFiller(self.connection_params, workers, scale, seed, bank_count=bank_count).fill_models()
+        self.pool.bank_cache.invalidate()  # Банки загружены в обход сервисов
+        return counts
+
     def close_connection(self):
-        self.connection.close()
+        self.pool.closeall()
 
 
 if __name__ == "__main__":
@@ -163,6 +201,6 @@ if __name__ == "__main__":
 
     filler = BankDataFiller(connection_params)
     filler.fill_models()
-    filler.bank.get_all_info_about_bank(1)
+    print(filler.bank.get_all_info_about_bank(1))
     filler.user.get_all_info_about_user(1)
     filler.close_connection()
@@ -0,0 +1,267 @@
+import math
+import random
+
+from data import banks_str
+from db.BulkLoader import BulkLoader
+from db.ConnectionPool import as_pool
+from seed.DataGenerator import DataGenerator
+from service.Bank import Bank
+
+
+class BulkDataFiller:
+    """
+    Массовое заполнение базы: строки генерируются пачками в памяти и загружаются через COPY.
+    Идентификаторы назначаются на стороне клиента, поэтому внешние ключи и счетчики
+    (num_offices, num_atms, num_employees, num_clients) известны без запросов RETURNING.
+    """
+
+    def __init__(self, connection, scale=1, seed=None, batch_size=100000, bank_names=None):
+        """
+        :param connection: Подключение psycopg2 или пул ConnectionPool
+        :param scale: Множитель количества строк каждого банка: офисов (и, соответственно, их сотрудников,
+                      банкоматов, клиентов, счетов и кредитов)
+        :param seed: Зерно генератора случайных чисел для воспроизводимых данных
+                     (если не задано, выбирается случайно и сохраняется в self.seed)
+        :param batch_size: Размер пачки строк для одного COPY
+        :param bank_names: Названия создаваемых банков (по умолчанию banks_str); при загрузке
+                           в непустую таблицу к ним добавляются идентификаторы банков (см. bank_name)
+        """
+        self.pool = as_pool(connection)
+        self.loader = BulkLoader(batch_size)
+        self.data = DataGenerator(seed)  # ФИО, адреса и даты рождения по позициям потоков
+        self.seed = self.data.seed
+        self.bank_names = list(bank_names) if bank_names is not None else list(banks_str)
+
+        # Параметры (совпадают с BankDataFiller, количество офисов банка умножается на scale)
+        self.count_bank_offices = 3 * scale
+        self.count_bank_atms = 1
+        self.count_employees = 5
+        self.count_fill_users = 5
+        self.count_credit_payments_accounts = 2
+
+    def fill_models(self):
+        """
+        Генерирует и загружает все сущности в одной транзакции.
+
+        :return: Словарь с количеством загруженных строк по таблицам
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            counts = self.fill_banks(cursor, range(len(self.bank_names)), self.first_ids(cursor))
+            self.reset_sequences(cursor)
+        return counts
+
+    def rows_per_bank(self):
+        """
+        Возвращает количество строк каждой таблицы, которое генерируется на один банк.
+        """
+        offices = self.count_bank_offices
+        users = offices * self.count_fill_users
+        accounts = users * self.count_credit_payments_accounts
+        return {
+            "banks": 1,
+            "bank_offices": offices,
+            "employees": offices * self.count_employees,
+            "atms": offices * self.count_bank_atms,
+            "users": users,
+            "payment_accounts": accounts,
+            "credit_accounts": accounts,
+        }
+
+    def first_ids(self, cursor):
+        """
+        Возвращает первые свободные идентификаторы всех таблиц.
+        """
+        return {table: self.loader.next_id(cursor, table, column) for table, column in self._id_columns().items()}
+
+    def reset_sequences(self, cursor):
+        """
+        Сдвигает SERIAL-последовательности всех таблиц за загруженные идентификаторы.
+        """
+        for table, column in self._id_columns().items():
+            self.loader.reset_sequence(cursor, table, column)
+
+    def bank_random(self, bank_index):
+        """
+        Возвращает генератор случайных чисел банка с номером bank_index. Зерно зависит только
+        от self.seed и номера банка, поэтому данные банка одинаковы при любом разбиении на части.
+        """
+        return random.Random(f"{self.seed}/{bank_index}")
+
+    def bank_name(self, bank_index, bank_id, first_ids):
+        """
+        Возвращает название банка с номером bank_index. Названия банков уникальны (banks_name_key),
+        поэтому при дозагрузке в непустую таблицу к названию добавляется идентификатор банка
+        (например, "Sberbank-6"): он уникален и одинаков при любом разбиении загрузки на части.
+        """
+        name = self.bank_names[bank_index]
+        return name if first_ids["banks"] == 1 else f"{name}-{bank_id}"
+
+    def fill_banks(self, cursor, bank_indexes, first_ids):
+        """
+        Генерирует и загружает банки с номерами bank_indexes (позиции в bank_names) со всеми
+        офисами, сотрудниками, банкоматами, клиентами и счетами. Строкам банка с номером i
+        выделяется свой диапазон идентификаторов first_ids[таблица] + i * rows_per_bank()[таблица],
+        поэтому непересекающиеся наборы банков можно загружать независимо, в том числе параллельно.
+
+        :param cursor: Курсор транзакции
+        :param bank_indexes: Номера загружаемых банков
+        :param first_ids: Словарь {таблица: первый идентификатор всей загрузки}
+        :return: Словарь с количеством загруженных строк по таблицам
+        """
+        per_bank = self.rows_per_bank()
+        bank_indexes = list(bank_indexes)
+        rngs = {i: self.bank_random(i) for i in bank_indexes}
+
+        def block(table, i):
+            # Первый идентификатор таблицы в диапазоне банка с номером i
+            return first_ids[table] + i * per_bank[table]
+
+        # Банки: счетчики известны заранее из параметров генерации
+        banks = []
+        for i in bank_indexes:
+            rating, total_money, interest_rate = Bank.random_parameters(rngs[i])
+            num_offices = self.count_bank_offices
+            banks.append((block("banks", i), self.bank_name(i, block("banks", i), first_ids), num_offices, num_offices * self.count_bank_atms,
+                          num_offices * self.count_employees, num_offices * self.count_fill_users,
+                          rating, total_money, round(interest_rate, 2)))
+
+        counts = {"banks": self.loader.copy(cursor, "banks", self._columns("banks"), banks)}
+
+        offices, employees, atms = [], [], []
+        users_plan = []  # (номер банка, банк, офис, сотрудники офиса)
+        for i, bank in zip(bank_indexes, banks):
+            rng = rngs[i]
+            bank_id, total_money = bank[0], bank[7]
+
+            # Адреса и сотрудники банка берут свои диапазоны позиций потоков генератора
+            office_position = i * per_bank["bank_offices"]
+            employee_position = i * per_bank["employees"]
+            bank_addresses = self.data.addresses(self.count_bank_offices, office_position).tolist()
+            names = self.data.full_names(per_bank["employees"], employee_position, stream="employees").tolist()
+            birth_dates = self.data.birth_dates(per_bank["employees"], employee_position,
+                                                stream="employees").tolist()
+            for j in range(self.count_bank_offices):
+                office_id = block("bank_offices", i) + j
+                address = bank_addresses[j]
+                offices.append((
+                    office_id, f"office{office_position + j}", address,
+                    rng.choice(["working", "not working"]),
+                    rng.choice([True, False]), self.count_bank_atms, rng.choice([True, False]),
+                    rng.choice([True, False]), rng.choice([True, False]), total_money,
+                    rng.uniform(10.0, 100.0), bank_id
+                ))
+
+                office_employees = []
+                for k in range(self.count_employees):
+                    n = j * self.count_employees + k
+                    employee_id = block("employees", i) + n
+                    employees.append((
+                        employee_id, names[n], birth_dates[n], rng.choice(DataGenerator.POSITIONS),
+                        bank_id, rng.choice([True, False]), office_id, rng.choice([True, False]),
+                        rng.randint(10000, 99999)
+                    ))
+                    office_employees.append(employee_id)
+
+                for k in range(self.count_bank_atms):
+                    atms.append((
+                        block("atms", i) + j * self.count_bank_atms + k, f"BankATM{j}", address,
+                        rng.choice(["working", "not working", "no money"]), bank_id, office_id,
+                        rng.choice(office_employees), rng.choice([True, False]), rng.choice([True, False]),
+                        total_money, rng.uniform(1.0, 10.0)
+                    ))
+                users_plan.append((i, bank, j, office_employees))
+
+        counts["bank_offices"] = self.loader.copy(cursor, "bank_offices", self._columns("bank_offices"), offices)
+        counts["employees"] = self.loader.copy(cursor, "employees", self._columns("employees"), employees)
+        counts["atms"] = self.loader.copy(cursor, "atms", self._columns("atms"), atms)
+
+        # Клиенты и их счета генерируются потоково, не удерживая все строки в памяти
+        plan = [
+            (i, bank, employees_of_office, rngs[i],
+             i * per_bank["users"] + j * self.count_fill_users,
+             block("users", i) + j * self.count_fill_users,
+             block("payment_accounts", i) + j * self.count_fill_users * self.count_credit_payments_accounts,
+             block("credit_accounts", i) + j * self.count_fill_users * self.count_credit_payments_accounts)
+            for i, bank, j, employees_of_office in users_plan
+        ]
+        counts["users"] = self.loader.copy(
+            cursor, "users", self._columns("users"), self._user_rows(plan))
+        counts["user_banks"] = self.loader.copy(
+            cursor, "user_banks", self._columns("user_banks"), self._user_bank_rows(plan))
+        counts["payment_accounts"] = self.loader.copy(
+            cursor, "payment_accounts", self._columns("payment_accounts"),
+            self._payment_account_rows(plan))
+        counts["credit_accounts"] = self.loader.copy(
+            cursor, "credit_accounts", self._columns("credit_accounts"),
+            self._credit_account_rows(plan))
+        return counts
+
+    def _user_rows(self, plan):
+        for _, _, _, rng, position, user_id, _, _ in plan:
+            # ФИО и даты рождения клиентов офиса генерируются потоково, пачками
+            names = self.data.stream("full_names", self.count_fill_users, position, stream="users")
+            birth_dates = self.data.stream("birth_dates", self.count_fill_users, position, stream="users")
+            for name, birth_date in zip(names, birth_dates):
+                monthly_income = rng.randint(1, 10000)
+                credit_rating = math.ceil(monthly_income / 1000) * 100
+                yield (user_id, name, birth_date, f"job{user_id}", monthly_income, credit_rating, monthly_income)
+                user_id += 1
+
+    def _user_bank_rows(self, plan):
+        for _, bank, _, _, _, user_id, _, _ in plan:
+            for _ in range(self.count_fill_users):
+                yield user_id, bank[0]
+                user_id += 1
+
+    def _payment_account_rows(self, plan):
+        for _, bank, _, rng, _, user_id, account_id, _ in plan:
+            for _ in range(self.count_fill_users):
+                for _ in range(self.count_credit_payments_accounts):
+                    yield account_id, user_id, bank[1], rng.randint(0, 100000)
+                    account_id += 1
+                user_id += 1
+
+    def _credit_account_rows(self, plan):
+        for _, bank, office_employees, rng, _, user_id, payment_id, credit_id in plan:
+            for _ in range(self.count_fill_users):
+                employee_id = rng.choice(office_employees)
+                for _ in range(self.count_credit_payments_accounts):
+                    # Кредит привязывается к соответствующему платежному счету этого же клиента
+                    yield (credit_id, user_id, bank[1], "2023-03-22", "2024-03-24", rng.randint(2, 20),
+                           rng.randint(100000, 10000000), rng.randint(1000, 100000), bank[8],
+                           employee_id, payment_id)
+                    credit_id += 1
+                    payment_id += 1
+                user_id += 1
+
+    @staticmethod
+    def _id_columns():
+        return {
+            "banks": "bank_id",
+            "bank_offices": "bank_office_id",
+            "employees": "employee_id",
+            "atms": "atm_id",
+            "users": "user_id",
+            "payment_accounts": "payment_account_id",
+            "credit_accounts": "credit_account_id",
+        }
+
+    @staticmethod
+    def _columns(table):
+        return {
+            "banks": ["bank_id", "name", "num_offices", "num_atms", "num_employees", "num_clients", "rating",
+                      "total_money", "interest_rate"],
+            "bank_offices": ["bank_office_id", "name", "address", "status", "can_place_atm", "num_atms",
+                             "can_provide_credit", "dispense_money", "accept_money", "money_in_office",
+                             "rent_cost", "bank_id"],
+            "employees": ["employee_id", "full_name", "birth_date", "position", "bank_id", "works_remotely",
+                          "bank_office_id", "can_provide_credit", "salary"],
+            "atms": ["atm_id", "name", "address", "status", "bank_id", "bank_office_id", "employee_id",
+                     "dispense_money", "accept_money", "money_in_atm", "maintenance_cost"],
+            "users": ["user_id", "full_name", "birth_date", "job", "monthly_income", "credit_rating", "rated_income"],
+            "user_banks": ["user_id", "bank_id"],
+            "payment_accounts": ["payment_account_id", "user_id", "bank_name", "balance"],
+            "credit_accounts": ["credit_account_id", "user_id", "bank_name", "start_date", "end_date",
+                                "loan_duration_months", "loan_amount", "monthly_payment", "interest_rate",
+                                "employee_id", "payment_account_id"],
+        }[table]
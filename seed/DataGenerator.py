@@ -0,0 +1,197 @@
+import math
+import random
+import zlib
+
+import numpy as np
+
+
+class UniqueSequence:
+    """
+    Псевдослучайная перестановка индексов [0, capacity) с произвольным доступом:
+    позиция p переходит в индекс (p * multiplier + offset) mod capacity. Разные позиции одного
+    круга дают разные индексы, поэтому выборка без повторений не требует хранить уже выданные
+    значения, а любой диапазон позиций вычисляется векторно и независимо от остальных.
+    Позиции после capacity образуют следующий круг с другим сдвигом.
+    """
+
+    def __init__(self, capacity, rng):
+        """
+        :param capacity: Размер пространства индексов одного круга
+        :param rng: numpy.random.Generator, из которого выбираются параметры перестановки
+        """
+        self.capacity = capacity
+        self.multiplier = 1
+        if capacity > 2:
+            while True:
+                self.multiplier = int(rng.integers(1, capacity))
+                if math.gcd(self.multiplier, capacity) == 1:
+                    break
+        self.offset = int(rng.integers(capacity))
+        self.step = int(rng.integers(capacity))  # Сдвиг перестановки следующего круга
+
+    def take(self, count, start=0):
+        """
+        Возвращает индексы позиций [start, start + count).
+
+        :return: Кортеж массивов (индексы в [0, capacity), номера кругов)
+        """
+        rounds, positions = np.divmod(np.arange(start, start + count, dtype=np.int64), self.capacity)
+        indexes = (positions * self.multiplier + self.offset + rounds * self.step) % self.capacity
+        return indexes, rounds
+
+
+class DataGenerator:
+    """
+    Детерминированный генератор синтетических данных для заполнения базы: ФИО, адреса и даты рождения
+    собираются из словарей компонентов, поэтому их количество не ограничено фиксированными списками.
+    Значения выдаются по позициям потока: одинаковые seed, поток и позиция всегда дают одно и то же
+    значение, разные позиции одного потока - разные значения (пока не исчерпан круг словаря;
+    следующие круги получают номер: "... 2", "корп. 2"). Части данных (например, банки при
+    параллельном заполнении) берут непересекающиеся диапазоны позиций и генерируются независимо.
+    """
+
+    MALE_FIRST_NAMES = (
+        "Александр", "Алексей", "Андрей", "Антон", "Артём", "Борис", "Вадим", "Валентин", "Василий", "Виктор",
+        "Владимир", "Глеб", "Григорий", "Даниил", "Денис", "Дмитрий", "Евгений", "Егор", "Иван", "Игорь",
+        "Илья", "Кирилл", "Константин", "Леонид", "Максим", "Михаил", "Никита", "Николай", "Олег", "Павел",
+    )
+    FEMALE_FIRST_NAMES = (  # Той же длины, что и мужские
+        "Александра", "Алина", "Анастасия", "Анна", "Валентина", "Валерия", "Вера", "Вероника", "Виктория",
+        "Галина", "Дарья", "Евгения", "Екатерина", "Елена", "Елизавета", "Ирина", "Кристина", "Ксения",
+        "Лариса", "Людмила", "Маргарита", "Марина", "Мария", "Надежда", "Наталья", "Ольга", "Полина",
+        "Светлана", "Софья", "Татьяна",
+    )
+    # Мужские отчества; женские получаются заменой окончания "вич" на "вна"
+    PATRONYMICS = (
+        "Александрович", "Алексеевич", "Андреевич", "Антонович", "Борисович", "Вадимович", "Васильевич",
+        "Викторович", "Владимирович", "Григорьевич", "Денисович", "Дмитриевич", "Евгеньевич", "Егорович",
+        "Иванович", "Игоревич", "Кириллович", "Константинович", "Леонидович", "Максимович", "Михайлович",
+        "Николаевич", "Олегович", "Павлович", "Петрович", "Романович", "Сергеевич", "Степанович",
+        "Фёдорович", "Юрьевич",
+    )
+    # Мужские фамилии; женские получаются добавлением "а"
+    SURNAMES = (
+        "Смирнов", "Иванов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов", "Новиков",
+        "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров", "Павлов", "Козлов",
+        "Степанов", "Николаев", "Орлов", "Андреев", "Макаров", "Никитин", "Захаров", "Зайцев", "Соловьёв",
+        "Борисов", "Яковлев", "Григорьев", "Романов", "Воробьёв", "Сергеев", "Кузьмин", "Фролов",
+        "Александров", "Дмитриев", "Королёв", "Гусев", "Киселёв", "Ильин", "Максимов", "Поляков", "Сорокин",
+        "Виноградов", "Ковалёв", "Белов", "Медведев", "Антонов", "Тарасов",
+    )
+    STREETS = (
+        "Кирова", "Лесная", "Победы", "Школьная", "Мира", "Тихая", "Новая", "Центральная", "Речная", "Гоголя",
+        "Зелёная", "Лермонтова", "Кольцевая", "Пролетарская", "Вокзальная", "Ленина", "Пушкина", "Садовая",
+        "Советская", "Молодёжная", "Набережная", "Парковая", "Заводская", "Строителей", "Чехова", "Горького",
+        "Толстого", "Луговая", "Полевая", "Солнечная", "Северная", "Южная", "Береговая", "Октябрьская",
+        "Комсомольская", "Первомайская", "Гагарина", "Маяковского", "Суворова", "Весенняя",
+    )
+    HOUSES = 200  # Номера домов на каждой улице (1..HOUSES)
+    POSITIONS = (
+        "Менеджер по работе с клиентами", "Финансовый аналитик", "Кредитный специалист", "Операционист",
+        "Управляющий отделением", "Кассир", "Бухгалтер", "Юрист", "Риск-менеджер", "Экономист",
+    )
+    BIRTH_DATES = ("1950-01-01", "2005-12-31")  # Диапазон дат рождения по умолчанию (включительно)
+
+    def __init__(self, seed=None):
+        """
+        :param seed: Зерно генератора; если не задано, выбирается случайно и сохраняется в self.seed
+        """
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(32)
+        self.rng = np.random.default_rng(self.seed)  # Для выборок, не привязанных к позициям потока
+        self._sequences = {}
+
+        # Женские формы словарей
+        self._male_first = np.array(self.MALE_FIRST_NAMES)
+        self._female_first = np.array(self.FEMALE_FIRST_NAMES)
+        self._male_patronymics = np.array(self.PATRONYMICS)
+        self._female_patronymics = np.char.replace(self._male_patronymics, "вич", "вна")
+        self._male_surnames = np.array(self.SURNAMES)
+        self._female_surnames = np.char.add(self._male_surnames, "а")
+        self._streets = np.char.add("ул. ", np.array(self.STREETS))
+
+    def sequence(self, stream, capacity):
+        """
+        Возвращает перестановку потока stream; ее параметры зависят только от seed и имени потока.
+        """
+        key = (stream, capacity)
+        if key not in self._sequences:
+            rng = np.random.default_rng([self.seed, zlib.crc32(stream.encode())])
+            self._sequences[key] = UniqueSequence(capacity, rng)
+        return self._sequences[key]
+
+    def full_names(self, count, start=0, stream="full_names"):
+        """
+        Возвращает различные ФИО позиций [start, start + count) потока stream
+        (мужские и женские с согласованными отчеством и фамилией).
+
+        :return: Массив строк
+        """
+        first, patronymics, surnames = len(self.MALE_FIRST_NAMES), len(self.PATRONYMICS), len(self.SURNAMES)
+        indexes, rounds = self.sequence(stream, 2 * first * patronymics * surnames).take(count, start)
+
+        # Индекс раскладывается по смешанному основанию: пол, имя, отчество, фамилия
+        indexes, female = np.divmod(indexes, 2)
+        indexes, surname = np.divmod(indexes, surnames)
+        name, patronymic = np.divmod(indexes, patronymics)
+        female = female.astype(bool)
+        names = np.char.add(np.where(female, self._female_first[name], self._male_first[name]), " ")
+        names = np.char.add(names, np.where(female, self._female_patronymics[patronymic],
+                                            self._male_patronymics[patronymic]))
+        names = np.char.add(names, " ")
+        names = np.char.add(names, np.where(female, self._female_surnames[surname], self._male_surnames[surname]))
+        return self._numbered(names, rounds, " ")
+
+    def addresses(self, count, start=0, stream="addresses"):
+        """
+        Возвращает различные адреса позиций [start, start + count) потока stream.
+
+        :return: Массив строк вида "ул. Лесная, д. 7" (после исчерпания улиц - с номером корпуса)
+        """
+        indexes, rounds = self.sequence(stream, len(self.STREETS) * self.HOUSES).take(count, start)
+        street, house = np.divmod(indexes, self.HOUSES)
+        addresses = np.char.add(np.char.add(self._streets[street], ", д. "), (house + 1).astype(str))
+        return self._numbered(addresses, rounds, ", корп. ")
+
+    def birth_dates(self, count, start=0, stream="birth_dates", first=None, last=None):
+        """
+        Возвращает даты рождения позиций [start, start + count) потока stream. Даты одного круга
+        различны; круг охватывает все дни диапазона [first, last].
+
+        :return: Массив datetime64[D]
+        """
+        first = np.datetime64(first or self.BIRTH_DATES[0], "D")
+        last = np.datetime64(last or self.BIRTH_DATES[1], "D")
+        days = int((last - first).astype(np.int64)) + 1
+        indexes, _ = self.sequence(f"{stream}:{first}:{last}", days).take(count, start)
+        return first + indexes
+
+    def sample(self, values, count, rng=None):
+        """
+        Векторная выборка count различных элементов values без повторений.
+
+        :param rng: numpy.random.Generator (по умолчанию self.rng)
+        :return: Массив выбранных значений
+        """
+        rng = rng if rng is not None else self.rng
+        values = np.asarray(values)
+        return values[rng.choice(len(values), count, replace=False)]
+
+    def stream(self, field, total, start=0, chunk_size=50000, **options):
+        """
+        Потоково выдает значения поля (метода full_names, addresses или birth_dates) для позиций
+        [start, start + total): значения генерируются пачками по chunk_size, поэтому источник
+        можно передавать в BulkLoader.copy при любом объеме данных.
+
+        :return: Генератор значений Python (str или datetime.date)
+        """
+        generate = getattr(self, field)
+        for offset in range(start, start + total, chunk_size):
+            yield from generate(min(chunk_size, start + total - offset), offset, **options).tolist()
+
+    @staticmethod
+    def _numbered(values, rounds, separator):
+        # Значения кругов после первого получают номер круга, чтобы оставаться различными
+        if not rounds.any():
+            return values
+        suffixes = np.char.add(separator, (rounds + 1).astype(str))
+        return np.where(rounds > 0, np.char.add(values, suffixes), values)
@@ -0,0 +1,93 @@
+import atexit
+import multiprocessing
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+
+import psycopg2
+
+from data import banks_str
+from seed.BulkDataFiller import BulkDataFiller
+
+# Подключение процесса-исполнителя: у каждого процесса пула свое, открывается один раз при запуске
+_worker_connection = None
+
+
+def _init_worker(connection_params):
+    global _worker_connection
+    _worker_connection = psycopg2.connect(**connection_params)
+    atexit.register(_worker_connection.close)
+
+
+def _fill_bank(options, bank_index, first_ids):
+    # Один банк со всеми зависимыми строками загружается в одной транзакции подключения процесса
+    filler = BulkDataFiller(_worker_connection, **options)
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        return filler.fill_banks(cursor, [bank_index], first_ids)
+
+
+class ParallelDataFiller:
+    """
+    Параллельное массовое заполнение базы: работа делится на части по банкам, части загружаются
+    пулом процессов (каждый процесс - со своим подключением) через BulkDataFiller.
+    Каждому банку выделяется свой диапазон идентификаторов и свое зерно генератора,
+    поэтому части не пересекаются, а данные при одном seed одинаковы при любом количестве
+    процессов и совпадают с последовательным BulkDataFiller.fill_models.
+    Каждый банк фиксируется своей транзакцией: при ошибке уже загруженные банки остаются в базе.
+    """
+
+    def __init__(self, connection_params, workers=None, scale=1, seed=None, batch_size=100000, bank_count=None):
+        """
+        :param connection_params: Параметры подключения psycopg2.connect (передаются процессам)
+        :param workers: Количество процессов (по умолчанию - количество ядер)
+        :param scale: Множитель количества строк каждого банка (см. BulkDataFiller)
+        :param seed: Зерно генераторов; если не задано, выбирается случайно и сохраняется в self.seed
+        :param batch_size: Размер пачки строк для одного COPY
+        :param bank_count: Количество банков (частей); по умолчанию - банки из banks_str.
+                           Банки сверх banks_str получают названия вида "Sberbank-1"
+        """
+        self.connection_params = connection_params
+        self.workers = workers or os.cpu_count()
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(32)
+        self.options = {"scale": scale, "seed": self.seed, "batch_size": batch_size,
+                        "bank_names": self.bank_names(bank_count)}
+
+    @staticmethod
+    def bank_names(bank_count=None):
+        """
+        Возвращает названия bank_count банков: сначала banks_str, затем их копии с номером.
+        """
+        if bank_count is None:
+            return list(banks_str)
+        return [banks_str[i] if i < len(banks_str) else f"{banks_str[i % len(banks_str)]}-{i // len(banks_str)}"
+                for i in range(bank_count)]
+
+    def fill_models(self):
+        """
+        Генерирует и загружает все банки параллельно.
+
+        :return: Словарь с количеством загруженных строк по таблицам
+        """
+        with closing(psycopg2.connect(**self.connection_params)) as connection:
+            filler = BulkDataFiller(connection, **self.options)
+            with filler.pool.connection() as conn, conn.cursor() as cursor:
+                first_ids = filler.first_ids(cursor)
+
+            counts = Counter()
+            context = multiprocessing.get_context("spawn")  # Процессы не наследуют подключения родителя
+            with ProcessPoolExecutor(self.workers, context, _init_worker, (self.connection_params,)) as executor:
+                futures = [executor.submit(_fill_bank, self.options, i, first_ids)
+                           for i in range(len(filler.bank_names))]
+                try:
+                    for future in as_completed(futures):
+                        counts.update(future.result())
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+            with filler.pool.connection() as conn, conn.cursor() as cursor:
+                filler.reset_sequences(cursor)
+        return dict(counts)
@@ -0,0 +1,336 @@
+import asyncio
+import random
+
+from db.batch import ainsert_returning_ids, aupdate_rows
+from db.CounterManager import CounterManager
+from db.pagination import akeyset_page
+from db.sql import positional, update_columns, update_query
+from db.streaming import astream_rows
+from entity.bankInfoModel import BankInfoModel
+from entity.bankModel import BankModel
+from service.Bank import Bank
+from service.impl.IBank import IBank
+
+
+class AsyncBank(IBank):
+    """
+    Асинхронный сервис банков для AsyncConnectionPool: те же операции, что и у Bank,
+    выполняются как сопрограммы и возвращают те же модели.
+    """
+
+    FIELDS = Bank.FIELDS
+    UPDATE_FIELDS = Bank.UPDATE_FIELDS
+
+    def __init__(self, pool):
+        """
+        Инициализация класса AsyncBank. Принимает пул AsyncConnectionPool: подключение берется
+        на время каждой операции.
+        """
+        self.pool = pool
+
+    async def create_table(self):
+        """
+        Создает таблицу 'banks' и таблицу изменений счетчиков банков.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute(Bank.TABLE_DDL)
+            await connection.execute(CounterManager.DDL)
+
+    async def drop_table(self):
+        """
+        Удаляет таблицу 'banks' и таблицу изменений счетчиков из базы данных, если они существуют.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute("""
+                DROP TABLE IF EXISTS bank_counter_deltas;
+                DROP TABLE IF EXISTS banks CASCADE;
+            """)
+        self.pool.bank_cache.invalidate()  # Кэшированные банки удаленной таблицы больше не существуют
+
+    async def create(self, name, rng=random):
+        """
+        Создает новый банк с заданным именем и случайными параметрами (см. Bank.random_parameters).
+
+        :param name: Название банка.
+        :param rng: Источник случайных чисел (модуль random или экземпляр random.Random).
+        :return: Экземпляр модели BankModel с данными нового банка.
+        """
+        rating, total_money, interest_rate = Bank.random_parameters(rng)
+        interest_rate = round(interest_rate, 2)
+
+        async with self.pool.connection() as connection:
+            bank_id = await connection.fetchval("""
+                INSERT INTO banks (name, num_offices, num_atms, num_employees, num_clients, rating, total_money, interest_rate)
+                VALUES ($1, 0, 0, 0, 0, $2, $3, $4)
+                RETURNING bank_id
+            """, name, rating, total_money, interest_rate)
+
+        bank = BankModel(bank_id, name, 0, 0, 0, 0, rating, total_money, interest_rate)
+        return self.pool.identity_map().add("banks", bank_id, bank)
+
+    async def create_many(self, names, rng=random):
+        """
+        Создает несколько банков одним INSERT из массивов колонок в одной транзакции.
+
+        :param names: Итерируемый объект названий банков.
+        :param rng: Источник случайных чисел (модуль random или экземпляр random.Random).
+        :return: Список экземпляров BankModel в порядке входных данных.
+        """
+        rows = []
+        for name in names:
+            rating, total_money, interest_rate = Bank.random_parameters(rng)
+            rows.append((name, 0, 0, 0, 0, rating, total_money, round(interest_rate, 2)))
+        if not rows:
+            return []
+
+        async with self.pool.connection() as connection:
+            bank_ids = await ainsert_returning_ids(connection, """
+                INSERT INTO banks (name, num_offices, num_atms, num_employees, num_clients, rating, total_money, interest_rate)
+                SELECT * FROM unnest($1::text[], $2::int[], $3::int[], $4::int[], $5::int[], $6::int[], $7::int[],
+                                     $8::float8[])
+                RETURNING bank_id
+            """, rows)
+
+        banks = [BankModel(bank_id, *row) for bank_id, row in zip(bank_ids, rows)]
+        return self.pool.identity_map().add_all("banks", "bank_id", banks)
+
+    async def read(self, bank_id):
+        """
+        Получает информацию о банке по его ID.
+
+        :param bank_id: Идентификатор банка.
+        :return: Экземпляр модели BankModel или None, если банк не найден.
+        """
+        await self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        identity = self.pool.identity_map()
+        bank = identity.get("banks", bank_id)  # Банк, уже загруженный в текущей единице работы
+        if bank is not None:
+            return bank
+
+        async with self.pool.connection() as connection:
+            data = await connection.fetchrow(f"SELECT * FROM {self._banks} WHERE bank_id = $1", bank_id)
+        return identity.add("banks", bank_id, BankModel.from_row(data)) if data else None
+
+    async def list(self):
+        """
+        Возвращает список всех банков.
+
+        :return: Список объектов BankModel.
+        """
+        await self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        async with self.pool.connection() as connection:
+            banks_data = await connection.fetch(f"SELECT * FROM {self._banks}")
+        banks = [BankModel.from_row(data) for data in banks_data]
+        return self.pool.identity_map().add_all("banks", "bank_id", banks)
+
+    async def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все банки курсором, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Асинхронный генератор экземпляров BankModel
+        """
+        await self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        async for data in astream_rows(self.pool, f"SELECT * FROM {self._banks}", batch_size=batch_size):
+            yield BankModel.from_row(data)
+
+    async def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает keyset-страницу банков (см. Bank.page).
+
+        :return: Экземпляр PageModel с моделями BankModel и токеном следующей страницы
+        """
+        await self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        return await akeyset_page(self.pool, f"SELECT * FROM {self._banks}", "bank_id", BankModel, self.FIELDS,
+                                  after_id, limit, filters)
+
+    async def update(self, bank_id, **kwargs):
+        """
+        Обновляет информацию о банке по его ID.
+
+        :param bank_id: Идентификатор банка.
+        :param kwargs: Поля, которые нужно обновить (в формате ключ-значение).
+        :return: Экземпляр модели BankModel с обновленными данными банка или None, если банк не найден.
+        """
+        columns = update_columns("banks", self.UPDATE_FIELDS, kwargs)
+        if not columns:
+            return await self.read(bank_id)
+
+        async with self.pool.connection() as connection:
+            await self._flush_before_update(connection)
+            # Новые значения строки возвращаются тем же запросом
+            data = await connection.fetchrow(positional(update_query("banks", "bank_id", columns)),
+                                             *kwargs.values(), bank_id)
+        self.pool.bank_cache.invalidate(bank_id)  # Метаданные банка в кэше больше не актуальны
+        if "name" in columns:
+            self.pool.identity_map().expire_all("users")  # Названия банков входят в модели клиентов
+
+        if data is None:
+            return None
+        # Уже выданный экземпляр банка обновляется на месте
+        return self.pool.identity_map().add("banks", bank_id, BankModel.from_row(data))
+
+    async def update_many(self, updates):
+        """
+        Обновляет несколько банков своими значениями для каждого (см. Bank.update_many).
+
+        :return: Список экземпляров BankModel с новыми данными в порядке updates
+        """
+        updates = dict(updates)
+        async with self.pool.connection() as connection:
+            await self._flush_before_update(connection)
+            rows, bank_ids = await aupdate_rows(connection, "banks", "bank_id", self.UPDATE_FIELDS, updates)
+        self.pool.bank_cache.invalidate()  # Метаданные измененных банков в кэше больше не актуальны
+        if any("name" in values for values in updates.values()):
+            self.pool.identity_map().expire_all("users")  # Названия банков входят в модели клиентов
+        banks = [BankModel.from_row(rows[bank_id]) for bank_id in bank_ids if bank_id in rows]
+        return self.pool.identity_map().add_all("banks", "bank_id", banks)
+
+    async def delete(self, bank_id):
+        """
+        Удаляет банк из базы данных по его ID.
+
+        :param bank_id: Идентификатор банка.
+        :return: Сообщение, подтверждающее удаление банка.
+        """
+        await self.delete_many([bank_id])
+
+        return f"Bank with ID {bank_id} deleted."
+
+    async def delete_many(self, bank_ids):
+        """
+        Удаляет несколько банков одним запросом (см. Bank.delete_many).
+
+        :return: Количество удаленных банков
+        """
+        bank_ids = list(bank_ids)
+        if not bank_ids:
+            return 0
+
+        async with self.pool.connection() as connection:
+            deleted = await connection.fetch("DELETE FROM banks WHERE bank_id = ANY($1) RETURNING bank_id", bank_ids)
+        for (bank_id,) in deleted:
+            self.pool.bank_cache.invalidate(bank_id)  # Удаляем банк из кэша метаданных
+        self.pool.identity_map().clear()  # Вместе с банками каскадно удалены их офисы, банкоматы и сотрудники
+        return len(deleted)
+
+    async def flush_counters(self):
+        """
+        Переносит накопленные изменения счетчиков в таблицу 'banks' одним сгруппированным UPDATE.
+
+        :return: Количество обновленных банков
+        """
+        async with self.pool.connection() as connection:
+            return await self.pool.counters.aflush(connection)
+
+    async def recompute_counters(self):
+        """
+        Пересчитывает счетчики всех банков по исходным таблицам (см. Bank.recompute_counters).
+
+        :return: Количество банков, счетчики которых были исправлены
+        """
+        async with self.pool.connection() as connection:
+            return await self.pool.counters.arecompute(connection)
+
+    @property
+    def _banks(self):
+        # Источник строк банков (см. Bank._banks)
+        return self.pool.counters.banks_source(self.FIELDS)
+
+    async def _sync_counters(self):
+        # Перенос накопленных изменений, когда их набралось много (см. Bank._sync_counters)
+        if self.pool.counters.flush_due():
+            async with self.pool.connection() as connection:
+                await self.pool.counters.aflush(connection, wait=False)
+
+    async def _flush_before_update(self, connection):
+        # RETURNING возвращает счетчики из 'banks' (см. Bank._flush_before_update)
+        if self.pool.counters.deferred:
+            await self.pool.counters.aflush(connection)
+
+    async def _fetch(self, query, *params):
+        async with self.pool.connection() as connection:
+            return await connection.fetch(query, *params)
+
+    async def get_all_info_about_bank(self, bank_id):
+        """
+        Возвращает банк вместе с его банкоматами, офисами, сотрудниками и клиентами.
+        Банк и четыре списка связанных сущностей читаются параллельно, каждый запрос -
+        на своем подключении пула, поэтому время ответа определяется самым медленным запросом.
+        Внутри transaction() запросы выполняются по очереди на подключении единицы работы.
+
+        :param bank_id: Идентификатор банка.
+        :return: Экземпляр BankInfoModel или None, если банк не найден.
+        """
+        await self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        queries = [(f"SELECT * FROM {self._banks} WHERE bank_id = $1", bank_id)]
+        queries += [(positional(query), [bank_id]) for _, _, query in Bank.BANKS_INFO_QUERIES]
+
+        if self.pool.in_transaction():
+            results = [await self._fetch(*query) for query in queries]
+        else:
+            results = await asyncio.gather(*(self._fetch(*query) for query in queries))
+
+        banks, related = results[0], results[1:]
+        if not banks:
+            return None
+        return BankInfoModel(BankModel.from_row(banks[0]), **{
+            name: [model.from_row(row[1:]) for row in rows]
+            for (name, model, _), rows in zip(Bank.BANKS_INFO_QUERIES, related)
+        })
+
+    async def get_all_info_about_banks(self, bank_ids, itersize=2000):
+        """
+        Потоково возвращает полную информацию о нескольких банках (см. Bank.get_all_info_about_banks).
+        Строки связанных сущностей читаются курсорами на подключении единицы работы.
+
+        :param bank_ids: Итерируемый объект идентификаторов банков.
+        :param itersize: Сколько строк курсор получает за одно обращение.
+        :return: Асинхронный генератор экземпляров BankInfoModel в порядке возрастания bank_id.
+        """
+        await self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        bank_ids = list(bank_ids)
+        async with self.pool.transaction() as connection:
+            # Курсоры asyncpg читаются по очереди, поэтому связанные строки одного банка
+            # забираются из каждого курсора целиком перед переходом к следующему банку
+            groups = {}
+            for name, model, query in Bank.BANKS_INFO_QUERIES:
+                cursor = connection.cursor(positional(query), bank_ids, prefetch=itersize)
+                groups[name] = (model, _PeekCursor(cursor.__aiter__()))
+
+            banks = connection.cursor(f"SELECT * FROM {self._banks} WHERE bank_id = ANY($1) ORDER BY bank_id",
+                                      bank_ids, prefetch=itersize)
+            async for data in banks:
+                bank = BankModel.from_row(data)
+                related = {}
+                for name, (model, cursor) in groups.items():
+                    related[name] = [model.from_row(row[1:]) for row in await cursor.take(bank.bank_id)]
+                yield BankInfoModel(bank, **related)
+
+
+class _PeekCursor:
+    """
+    Итератор курсора, упорядоченного по первой колонке, с просмотром следующей строки:
+    take возвращает подряд идущие строки с заданным ключом.
+    """
+
+    def __init__(self, iterator):
+        self._iterator = iterator
+        self._next = None
+        self._done = False
+
+    async def take(self, key):
+        rows = []
+        while not self._done:
+            if self._next is None:
+                try:
+                    self._next = await self._iterator.__anext__()
+                except StopAsyncIteration:
+                    self._done = True
+                    break
+            if self._next[0] > key:
+                break
+            if self._next[0] == key:
+                rows.append(self._next)
+            self._next = None  # Строки банков, которых нет в выборке, пропускаются
+        return rows
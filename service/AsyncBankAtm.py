@@ -0,0 +1,229 @@
+from db.batch import (
+    aadd_counters,
+    add_counters_from,
+    ainsert_returning_ids,
+    aupdate_rows,
+    normalize_rows,
+)
+from db.pagination import akeyset_page
+from db.sql import positional, update_columns, update_query
+from db.streaming import astream_rows
+from entity.bankAtmModel import BankAtmModel
+from service.BankAtm import BankAtm
+from service.impl.IBankAtm import IBankAtm
+
+
+class AsyncBankAtm(IBankAtm):
+    """
+    Асинхронный сервис банкоматов для AsyncConnectionPool (операции BankAtm в виде сопрограмм).
+    """
+
+    FIELDS = BankAtm.FIELDS
+    UPDATE_FIELDS = BankAtm.UPDATE_FIELDS
+    CREATE_FIELDS = BankAtm.CREATE_FIELDS
+
+    def __init__(self, pool):
+        """
+        Инициализация класса AsyncBankAtm. Принимает пул AsyncConnectionPool.
+        """
+        self.pool = pool
+
+    async def create_table(self):
+        """
+        Создает таблицу 'atms' в базе данных.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute(BankAtm.TABLE_DDL)
+
+    async def drop_table(self):
+        """
+        Удаляет таблицу 'atms' вместе с её зависимостями.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute("DROP TABLE IF EXISTS atms CASCADE")
+
+    async def create(self, name, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money,
+                     maintenance_cost):
+        """
+        Создает новый банкомат (см. BankAtm.create).
+
+        :return: Экземпляр BankAtmModel или None, если банка или офиса не существует
+        """
+        async with self.pool.connection() as connection:
+            # Получаем количество денег в банке (из кэша метаданных банков)
+            bank = await self.pool.bank_cache.aget_by_id(connection, bank_id)
+            if bank is None:
+                return None
+
+            # Вставляем банкомат с адресом офиса; для несуществующего офиса строка не вставляется
+            data = await connection.fetchrow(f"""
+                WITH created AS (
+                    INSERT INTO atms (name, address, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money, money_in_atm, maintenance_cost)
+                    SELECT $1, o.address, $2, $3, o.bank_office_id, $4, $5, $6, $7, $8
+                    FROM bank_offices o WHERE o.bank_office_id = $9
+                    RETURNING atm_id, address, bank_id, bank_office_id
+                ),
+                offices AS ({add_counters_from("bank_offices", "bank_office_id", "num_atms", "created")}),
+                banks AS ({self.pool.counters.add_from("num_atms", "created")})
+                SELECT atm_id, address FROM created
+            """, name, status, bank_id, employee_id, dispense_money, accept_money, bank.total_money, maintenance_cost,
+                bank_office_id)
+            self.pool.counters.applied()
+
+        if data is None:
+            return None
+        atm_id, address = data
+
+        atm = BankAtmModel(atm_id, name, address, status, bank_id, bank_office_id, employee_id, dispense_money,
+                           accept_money, bank.total_money, maintenance_cost)
+        identity = self.pool.identity_map()
+        identity.expire("bank_offices", bank_office_id)  # Изменилось количество банкоматов офиса
+        return identity.add("atms", atm.atm_id, atm)
+
+    async def create_many(self, atms):
+        """
+        Создает несколько банкоматов одним INSERT из массивов колонок в одной транзакции.
+
+        :param atms: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров BankAtmModel в порядке входных данных
+        """
+        rows = normalize_rows(atms, self.CREATE_FIELDS)
+        if not rows:
+            return []
+
+        async with self.pool.connection() as connection:
+            # Получаем адреса офисов и количество денег в банках
+            addresses = dict(await connection.fetch(
+                "SELECT bank_office_id, address FROM bank_offices WHERE bank_office_id = ANY($1)",
+                list({row[3] for row in rows})))
+            banks = await self.pool.bank_cache.aget_many_by_id(connection, [row[2] for row in rows])
+            total_money = {bank_id: bank.total_money for bank_id, bank in banks.items()}
+
+            values = [
+                (name, addresses[bank_office_id], status, bank_id, bank_office_id, employee_id, dispense_money,
+                 accept_money, total_money[bank_id], maintenance_cost)
+                for (name, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money,
+                     maintenance_cost) in rows
+            ]
+            atm_ids = await ainsert_returning_ids(connection, """
+                INSERT INTO atms (name, address, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money, money_in_atm, maintenance_cost)
+                SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::int[], $5::int[], $6::int[], $7::bool[],
+                                     $8::bool[], $9::int[], $10::float8[])
+                RETURNING atm_id
+            """, values)
+
+            # Обновляем количество банкоматов в банках и офисах
+            await self.pool.counters.aadd(connection, "num_atms", [row[2] for row in rows])
+            await aadd_counters(connection, "bank_offices", "bank_office_id", "num_atms", [row[3] for row in rows])
+
+        atms = [BankAtmModel(atm_id, *row) for atm_id, row in zip(atm_ids, values)]
+        identity = self.pool.identity_map()
+        for bank_office_id in {row[3] for row in rows}:
+            identity.expire("bank_offices", bank_office_id)  # Изменилось количество банкоматов офиса
+        return identity.add_all("atms", "atm_id", atms)
+
+    async def read(self, atm_id):
+        """
+        Возвращает банкомат по его идентификатору.
+
+        :return: Экземпляр BankAtmModel или None, если банкомат не найден
+        """
+        identity = self.pool.identity_map()
+        atm = identity.get("atms", atm_id)  # Банкомат, уже загруженный в текущей единице работы
+        if atm is not None:
+            return atm
+
+        async with self.pool.connection() as connection:
+            data = await connection.fetchrow("SELECT * FROM atms WHERE atm_id = $1", atm_id)
+        return identity.add("atms", atm_id, BankAtmModel.from_row(data)) if data else None
+
+    async def list(self):
+        """
+        Возвращает список всех банкоматов.
+
+        :return: Список экземпляров BankAtmModel
+        """
+        async with self.pool.connection() as connection:
+            atms_data = await connection.fetch("SELECT * FROM atms")
+        atms = [BankAtmModel.from_row(data) for data in atms_data]
+        return self.pool.identity_map().add_all("atms", "atm_id", atms)
+
+    async def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все банкоматы курсором, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Асинхронный генератор экземпляров BankAtmModel
+        """
+        async for data in astream_rows(self.pool, "SELECT * FROM atms", batch_size=batch_size):
+            yield BankAtmModel.from_row(data)
+
+    async def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает keyset-страницу банкоматов (см. BankAtm.page).
+
+        :return: Экземпляр PageModel с моделями BankAtmModel и токеном следующей страницы
+        """
+        return await akeyset_page(self.pool, "SELECT * FROM atms", "atm_id", BankAtmModel, self.FIELDS,
+                                  after_id, limit, filters)
+
+    async def update(self, atm_id, **kwargs):
+        """
+        Обновляет данные банкомата по его идентификатору и возвращает обновленную модель.
+        :return: Экземпляр BankAtmModel с новыми данными или None, если банкомат не найден
+        """
+        columns = update_columns("atms", self.UPDATE_FIELDS, kwargs)
+        if not columns:
+            return await self.read(atm_id)
+
+        async with self.pool.connection() as connection:
+            # Новые значения строки возвращаются тем же запросом
+            data = await connection.fetchrow(positional(update_query("atms", "atm_id", columns)),
+                                             *kwargs.values(), atm_id)
+
+        if data is None:
+            return None
+        # Уже выданный экземпляр банкомата обновляется на месте
+        return self.pool.identity_map().add("atms", atm_id, BankAtmModel.from_row(data))
+
+    async def update_many(self, updates):
+        """
+        Обновляет несколько банкоматов своими значениями для каждого (см. BankAtm.update_many).
+
+        :return: Список экземпляров BankAtmModel с новыми данными в порядке updates
+        """
+        async with self.pool.connection() as connection:
+            rows, ids = await aupdate_rows(connection, "atms", "atm_id", self.UPDATE_FIELDS, updates)
+        atms = [BankAtmModel.from_row(rows[atm_id]) for atm_id in ids if atm_id in rows]
+        return self.pool.identity_map().add_all("atms", "atm_id", atms)
+
+    async def delete(self, atm_id):
+        """
+        Удаляет банкомат по его идентификатору и уменьшает количество банкоматов в банке и офисе.
+        """
+        await self.delete_many([atm_id])
+
+        return f"ATM with ID {atm_id} deleted."
+
+    async def delete_many(self, atm_ids):
+        """
+        Удаляет несколько банкоматов одним запросом (см. BankAtm.delete_many).
+
+        :return: Количество удаленных банкоматов
+        """
+        atm_ids = list(atm_ids)
+        if not atm_ids:
+            return 0
+
+        async with self.pool.connection() as connection:
+            deleted = await connection.fetch(positional(f"""
+                WITH {BankAtm.deleted_atms("atm_id = ANY(%s)")},
+                deleted_banks AS ({self.pool.counters.add_from("num_atms", "deleted_atms", -1)})
+                SELECT atm_id, bank_office_id FROM deleted_atms
+            """), atm_ids)
+            self.pool.counters.applied()
+        identity = self.pool.identity_map()
+        for atm_id, bank_office_id in deleted:
+            identity.discard("atms", atm_id)
+            identity.expire("bank_offices", bank_office_id)  # Изменилось количество банкоматов офиса
+        return len(deleted)
@@ -0,0 +1,213 @@
+from db.batch import ainsert_returning_ids, aupdate_rows, normalize_rows
+from db.pagination import akeyset_page
+from db.sql import positional, update_columns, update_query
+from db.streaming import astream_rows
+from entity.bankOfficeModel import BankOfficeModel
+from service.BankAtm import BankAtm
+from service.BankOffice import BankOffice
+from service.impl.IBankOffice import IBankOffice
+
+
+class AsyncBankOffice(IBankOffice):
+    """
+    Асинхронный сервис офисов банков для AsyncConnectionPool (операции BankOffice в виде сопрограмм).
+    """
+
+    FIELDS = BankOffice.FIELDS
+    UPDATE_FIELDS = BankOffice.UPDATE_FIELDS
+    CREATE_FIELDS = BankOffice.CREATE_FIELDS
+
+    def __init__(self, pool):
+        """
+        Инициализация класса AsyncBankOffice. Принимает пул AsyncConnectionPool.
+        """
+        self.pool = pool
+
+    async def create_table(self):
+        """
+        Создает таблицу 'bank_offices' в базе данных.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute(BankOffice.TABLE_DDL)
+
+    async def drop_table(self):
+        """
+        Удаляет таблицу 'bank_offices' вместе с её зависимостями.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute("DROP TABLE IF EXISTS bank_offices CASCADE")
+
+    async def create(self, name, address, status, can_place_atm, can_provide_credit, dispense_money,
+                     accept_money, rent_cost, bank_id):
+        """
+        Создает новый офис банка (см. BankOffice.create).
+
+        :return: Экземпляр BankOfficeModel
+        """
+        async with self.pool.connection() as connection:
+            # Получаем количество денег в банке по идентификатору банка (из кэша метаданных банков)
+            bank = await self.pool.bank_cache.aget_by_id(connection, bank_id)
+            total_money = bank.total_money if bank else None
+
+            bank_office_id = await connection.fetchval("""
+                INSERT INTO bank_offices (name, address, status, can_place_atm, num_atms, can_provide_credit, dispense_money, accept_money, money_in_office, rent_cost, bank_id)
+                VALUES ($1, $2, $3, $4, 0, $5, $6, $7, $8, $9, $10)
+                RETURNING bank_office_id
+            """, name, address, status, can_place_atm, can_provide_credit, dispense_money, accept_money, total_money,
+                rent_cost, bank_id)
+
+            # Обновляем количество офисов в банке
+            await self.pool.counters.aadd(connection, "num_offices", [bank_id])
+
+        office = BankOfficeModel(bank_office_id, name, address, status, can_place_atm, 0, can_provide_credit,
+                                 dispense_money, accept_money, total_money, rent_cost, bank_id)
+        return self.pool.identity_map().add("bank_offices", office.bank_office_id, office)
+
+    async def create_many(self, offices):
+        """
+        Создает несколько офисов одним INSERT из массивов колонок в одной транзакции.
+
+        :param offices: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров BankOfficeModel в порядке входных данных
+        """
+        rows = normalize_rows(offices, self.CREATE_FIELDS)
+        if not rows:
+            return []
+
+        async with self.pool.connection() as connection:
+            banks = await self.pool.bank_cache.aget_many_by_id(connection, [row[-1] for row in rows])
+            total_money = {bank_id: bank.total_money for bank_id, bank in banks.items()}
+
+            values = [
+                (name, address, status, can_place_atm, 0, can_provide_credit, dispense_money, accept_money,
+                 total_money.get(bank_id), rent_cost, bank_id)
+                for (name, address, status, can_place_atm, can_provide_credit, dispense_money, accept_money,
+                     rent_cost, bank_id) in rows
+            ]
+            office_ids = await ainsert_returning_ids(connection, """
+                INSERT INTO bank_offices (name, address, status, can_place_atm, num_atms, can_provide_credit, dispense_money, accept_money, money_in_office, rent_cost, bank_id)
+                SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::bool[], $5::int[], $6::bool[], $7::bool[],
+                                     $8::bool[], $9::int[], $10::float8[], $11::int[])
+                RETURNING bank_office_id
+            """, values)
+
+            # Обновляем количество офисов в банках
+            await self.pool.counters.aadd(connection, "num_offices", [row[-1] for row in rows])
+
+        offices = [BankOfficeModel(office_id, *row) for office_id, row in zip(office_ids, values)]
+        return self.pool.identity_map().add_all("bank_offices", "bank_office_id", offices)
+
+    async def read(self, office_id):
+        """
+        Возвращает офис банка по его идентификатору.
+
+        :param office_id: Идентификатор офиса
+        :return: Экземпляр BankOfficeModel или None, если офис не найден
+        """
+        identity = self.pool.identity_map()
+        office = identity.get("bank_offices", office_id)  # Офис, уже загруженный в текущей единице работы
+        if office is not None:
+            return office
+
+        async with self.pool.connection() as connection:
+            data = await connection.fetchrow("SELECT * FROM bank_offices WHERE bank_office_id = $1", office_id)
+        return identity.add("bank_offices", office_id, BankOfficeModel.from_row(data)) if data else None
+
+    async def list(self):
+        """
+        Возвращает список всех офисов банков.
+
+        :return: Список экземпляров BankOfficeModel
+        """
+        async with self.pool.connection() as connection:
+            banks_office_data = await connection.fetch("SELECT * FROM bank_offices")
+        offices = [BankOfficeModel.from_row(data) for data in banks_office_data]
+        return self.pool.identity_map().add_all("bank_offices", "bank_office_id", offices)
+
+    async def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все офисы банков курсором, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Асинхронный генератор экземпляров BankOfficeModel
+        """
+        async for data in astream_rows(self.pool, "SELECT * FROM bank_offices", batch_size=batch_size):
+            yield BankOfficeModel.from_row(data)
+
+    async def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает keyset-страницу офисов банков (см. BankOffice.page).
+
+        :return: Экземпляр PageModel с моделями BankOfficeModel и токеном следующей страницы
+        """
+        return await akeyset_page(self.pool, "SELECT * FROM bank_offices", "bank_office_id", BankOfficeModel,
+                                  self.FIELDS, after_id, limit, filters)
+
+    async def update(self, office_id, **kwargs):
+        """
+        Обновляет данные об офисе банка по его идентификатору.
+
+        :param office_id: Идентификатор офиса
+        :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :return: Экземпляр BankOfficeModel с новыми данными или None, если офис не найден
+        """
+        columns = update_columns("bank_offices", self.UPDATE_FIELDS, kwargs)
+        if not columns:
+            return await self.read(office_id)
+
+        async with self.pool.connection() as connection:
+            # Новые значения строки возвращаются тем же запросом
+            data = await connection.fetchrow(positional(update_query("bank_offices", "bank_office_id", columns)),
+                                             *kwargs.values(), office_id)
+
+        if data is None:
+            return None
+        # Уже выданный экземпляр офиса обновляется на месте
+        return self.pool.identity_map().add("bank_offices", office_id, BankOfficeModel.from_row(data))
+
+    async def update_many(self, updates):
+        """
+        Обновляет несколько офисов своими значениями для каждого (см. BankOffice.update_many).
+
+        :return: Список экземпляров BankOfficeModel с новыми данными в порядке updates
+        """
+        async with self.pool.connection() as connection:
+            rows, ids = await aupdate_rows(connection, "bank_offices", "bank_office_id", self.UPDATE_FIELDS, updates)
+        offices = [BankOfficeModel.from_row(rows[office_id]) for office_id in ids if office_id in rows]
+        return self.pool.identity_map().add_all("bank_offices", "bank_office_id", offices)
+
+    async def delete(self, office_id):
+        """
+        Удаляет офис банка по его идентификатору и уменьшает количество офисов в банке.
+
+        :param office_id: Идентификатор офиса
+        """
+        await self.delete_many([office_id])
+
+        return f"Office with ID {office_id} deleted."
+
+    async def delete_many(self, office_ids):
+        """
+        Закрывает несколько офисов вместе с их банкоматами одним запросом (см. BankOffice.delete_many).
+
+        :return: Количество удаленных офисов
+        """
+        office_ids = list(office_ids)
+        if not office_ids:
+            return 0
+
+        update_banks = self.pool.counters.add_from_many({"num_offices": "deleted", "num_atms": "deleted_atms"}, -1)
+        async with self.pool.connection() as connection:
+            deleted = await connection.fetch(positional(f"""
+                WITH {BankAtm.deleted_atms("bank_office_id = ANY(%s)", update_offices=False)},
+                deleted AS (DELETE FROM bank_offices WHERE bank_office_id = ANY(%s) RETURNING bank_office_id, bank_id),
+                deleted_banks AS ({update_banks})
+                SELECT bank_office_id FROM deleted
+            """), office_ids, office_ids)
+            self.pool.counters.applied()
+        identity = self.pool.identity_map()
+        for (office_id,) in deleted:
+            identity.discard("bank_offices", office_id)
+        identity.clear("atms")  # Банкоматы офисов удалены
+        identity.expire_all("employees")  # У сотрудников офисов снят bank_office_id
+        return len(deleted)
@@ -0,0 +1,255 @@
+import numpy as np
+
+from db.batch import ainsert_returning_ids, aupdate_rows, normalize_rows
+from db.columnar import afetch_table_columns, group_mean, group_sum
+from db.pagination import akeyset_page
+from db.sql import as_date, positional, update_columns, update_query
+from db.streaming import astream_rows
+from entity.creditAccountModel import CreditAccountModel
+from service.CreditAccount import CreditAccount
+from service.impl.ICreditAccount import ICreditAccount
+
+
+class AsyncCreditAccount(ICreditAccount):
+    """
+    Асинхронный сервис кредитных счетов для AsyncConnectionPool (операции CreditAccount в виде сопрограмм).
+    """
+
+    FIELDS = CreditAccount.FIELDS
+    UPDATE_FIELDS = CreditAccount.UPDATE_FIELDS
+    CREATE_FIELDS = CreditAccount.CREATE_FIELDS
+    COLUMN_DTYPES = CreditAccount.COLUMN_DTYPES
+
+    # Колонки DATE: asyncpg принимает для них только datetime.date
+    DATE_FIELDS = ("start_date", "end_date")
+
+    def __init__(self, pool):
+        """
+        Инициализация класса AsyncCreditAccount. Принимает пул AsyncConnectionPool.
+        """
+        self.pool = pool
+
+    async def create_table(self):
+        """
+        Создает таблицу 'credit_accounts' в базе данных.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute(CreditAccount.TABLE_DDL)
+
+    async def drop_table(self):
+        """
+        Удаляет таблицу 'credit_accounts' вместе с зависимыми объектами.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute("DROP TABLE IF EXISTS credit_accounts CASCADE")
+
+    async def create(self, user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount,
+                     monthly_payment, employee_id, payment_account_id):
+        """
+        Создает новый кредитный счет (см. CreditAccount.create).
+
+        :return: Экземпляр CreditAccountModel
+        """
+        async with self.pool.connection() as connection:
+            # Получаем процентную ставку по названию банка (из кэша метаданных банков)
+            bank = await self.pool.bank_cache.aget_by_name(connection, bank_name)
+            interest_rate = bank.interest_rate if bank else None
+
+            credit_accounts_id = await connection.fetchval("""
+                INSERT INTO credit_accounts (user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount,
+                                             monthly_payment, interest_rate, employee_id, payment_account_id)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                RETURNING credit_account_id
+            """, user_id, bank_name, as_date(start_date), as_date(end_date), loan_duration_months, loan_amount,
+                monthly_payment, interest_rate, employee_id, payment_account_id)
+        account = CreditAccountModel(credit_accounts_id, user_id, bank_name, start_date, end_date, loan_duration_months,
+                                     loan_amount, monthly_payment, interest_rate, employee_id, payment_account_id)
+        return self.pool.identity_map().add("credit_accounts", account.credit_account_id, account)
+
+    async def create_many(self, credit_accounts):
+        """
+        Создает несколько кредитных счетов одним INSERT из массивов колонок в одной транзакции.
+
+        :param credit_accounts: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров CreditAccountModel в порядке входных данных
+        """
+        rows = normalize_rows(credit_accounts, self.CREATE_FIELDS)
+        if not rows:
+            return []
+
+        async with self.pool.connection() as connection:
+            banks = await self.pool.bank_cache.aget_many_by_name(connection, [row[1] for row in rows])
+            interest_rates = {name: bank.interest_rate for name, bank in banks.items()}
+
+            values = [
+                (user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount, monthly_payment,
+                 interest_rates.get(bank_name), employee_id, payment_account_id)
+                for (user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount, monthly_payment,
+                     employee_id, payment_account_id) in rows
+            ]
+            credit_account_ids = await ainsert_returning_ids(connection, """
+                INSERT INTO credit_accounts (user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount,
+                                             monthly_payment, interest_rate, employee_id, payment_account_id)
+                SELECT * FROM unnest($1::int[], $2::text[], $3::date[], $4::date[], $5::int[], $6::float8[],
+                                     $7::float8[], $8::float8[], $9::int[], $10::int[])
+                RETURNING credit_account_id
+            """, [row[:2] + (as_date(row[2]), as_date(row[3])) + row[4:] for row in values])
+
+        accounts = [CreditAccountModel(credit_account_id, *row)
+                    for credit_account_id, row in zip(credit_account_ids, values)]
+        return self.pool.identity_map().add_all("credit_accounts", "credit_account_id", accounts)
+
+    async def read(self, credit_account_id):
+        """
+        Возвращает кредитный счет по его идентификатору.
+
+        :return: Экземпляр CreditAccountModel или None, если счет не найден
+        """
+        identity = self.pool.identity_map()
+        account = identity.get("credit_accounts", credit_account_id)  # Счет, уже загруженный в текущей единице работы
+        if account is not None:
+            return account
+
+        async with self.pool.connection() as connection:
+            data = await connection.fetchrow("SELECT * FROM credit_accounts WHERE credit_account_id = $1",
+                                             credit_account_id)
+        return identity.add("credit_accounts", credit_account_id, CreditAccountModel.from_row(data)) if data else None
+
+    async def list(self):
+        """
+        Возвращает список всех кредитных счетов.
+
+        :return: Список экземпляров CreditAccountModel
+        """
+        async with self.pool.connection() as connection:
+            credits_account_data = await connection.fetch("SELECT * FROM credit_accounts")
+        accounts = [CreditAccountModel.from_row(data) for data in credits_account_data]
+        return self.pool.identity_map().add_all("credit_accounts", "credit_account_id", accounts)
+
+    async def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все кредитные счета курсором, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Асинхронный генератор экземпляров CreditAccountModel
+        """
+        async for data in astream_rows(self.pool, "SELECT * FROM credit_accounts", batch_size=batch_size):
+            yield CreditAccountModel.from_row(data)
+
+    async def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает keyset-страницу кредитных счетов (см. CreditAccount.page).
+
+        :return: Экземпляр PageModel с моделями CreditAccountModel и токеном следующей страницы
+        """
+        return await akeyset_page(self.pool, "SELECT * FROM credit_accounts", "credit_account_id",
+                                  CreditAccountModel, self.FIELDS, after_id, limit, filters)
+
+    async def columns(self, fields=None, filters=None, batch_size=50000):
+        """
+        Читает кредитные счета в колоночном виде (см. CreditAccount.columns).
+
+        :return: Словарь {колонка: numpy.ndarray}
+        """
+        return await afetch_table_columns(self.pool, "credit_accounts", self.COLUMN_DTYPES, fields, filters,
+                                          batch_size)
+
+    async def exposure_by_bank(self, filters=None):
+        """
+        Возвращает суммарный объем выданных кредитов по каждому банку.
+
+        :param filters: Словарь {колонка: значение} для отбора счетов
+        :return: Словарь {название банка: сумма кредитов}
+        """
+        data = await self.columns(["bank_name", "loan_amount"], filters)
+        return group_sum(data["bank_name"], data["loan_amount"])
+
+    async def average_interest_rate(self, by_bank=False, filters=None):
+        """
+        Возвращает среднюю процентную ставку по кредитам (см. CreditAccount.average_interest_rate).
+        """
+        data = await self.columns(["bank_name", "interest_rate"], filters)
+        if by_bank:
+            return group_mean(data["bank_name"], data["interest_rate"])
+        rates = data["interest_rate"][~np.isnan(data["interest_rate"])]
+        return float(rates.mean()) if len(rates) else None
+
+    async def project_portfolio(self, by_bank=True, use_stored_payment=False, horizon=None, filters=None,
+                                memory_budget=256 * 2 ** 20):
+        """
+        Прогнозирует погашение кредитного портфеля по календарным месяцам (см. CreditAccount.project_portfolio).
+        Колонки читаются асинхронно; сам расчет выполняется синхронно в NumPy.
+
+        :return: Экземпляр ProjectionModel; месяцы - datetime64[M]
+        """
+        fields = ["bank_name", "start_date", "loan_duration_months", "loan_amount", "interest_rate"]
+        if use_stored_payment:
+            fields.append("monthly_payment")
+        return CreditAccount.project_columns(await self.columns(fields, filters), by_bank, horizon, memory_budget)
+
+    async def update(self, credit_account_id, **kwargs):
+        """
+        Обновляет данные о кредитном счете по его идентификатору.
+
+        :param credit_account_id: Идентификатор кредитного счета
+        :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :return: Экземпляр CreditAccountModel с новыми данными или None, если счет не найден
+        """
+        kwargs = {key: as_date(value) if key in self.DATE_FIELDS else value for key, value in kwargs.items()}
+        columns = update_columns("credit_accounts", self.UPDATE_FIELDS, kwargs)
+        if not columns:
+            return await self.read(credit_account_id)
+
+        async with self.pool.connection() as connection:
+            # Новые значения строки возвращаются тем же запросом
+            data = await connection.fetchrow(positional(update_query("credit_accounts", "credit_account_id", columns)),
+                                             *kwargs.values(), credit_account_id)
+
+        if data is None:
+            return None
+        # Уже выданный экземпляр счета обновляется на месте
+        return self.pool.identity_map().add("credit_accounts", credit_account_id, CreditAccountModel.from_row(data))
+
+    async def update_many(self, updates):
+        """
+        Обновляет несколько кредитных счетов своими значениями для каждого (см. CreditAccount.update_many).
+
+        :return: Список экземпляров CreditAccountModel с новыми данными в порядке updates
+        """
+        updates = [(credit_account_id, {field: as_date(value) if field in self.DATE_FIELDS else value
+                                        for field, value in values.items()})
+                   for credit_account_id, values in dict(updates).items()]
+        async with self.pool.connection() as connection:
+            rows, ids = await aupdate_rows(connection, "credit_accounts", "credit_account_id", self.UPDATE_FIELDS,
+                                           updates)
+        accounts = [CreditAccountModel.from_row(rows[credit_account_id])
+                    for credit_account_id in ids if credit_account_id in rows]
+        return self.pool.identity_map().add_all("credit_accounts", "credit_account_id", accounts)
+
+    async def delete(self, credit_account_id):
+        """
+        Удаляет кредитный счет по его идентификатору.
+
+        :param credit_account_id: Идентификатор кредитного счета
+        """
+        await self.delete_many([credit_account_id])
+        return f"Credit account with ID {credit_account_id} deleted."
+
+    async def delete_many(self, credit_account_ids):
+        """
+        Удаляет несколько кредитных счетов одним запросом (= ANY).
+
+        :return: Количество удаленных счетов
+        """
+        credit_account_ids = list(credit_account_ids)
+        if not credit_account_ids:
+            return 0
+
+        async with self.pool.connection() as connection:
+            deleted = await connection.fetch(
+                "DELETE FROM credit_accounts WHERE credit_account_id = ANY($1) RETURNING credit_account_id",
+                credit_account_ids)
+        identity = self.pool.identity_map()
+        for (credit_account_id,) in deleted:
+            identity.discard("credit_accounts", credit_account_id)
+        return len(deleted)
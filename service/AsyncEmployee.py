@@ -0,0 +1,205 @@
+from db.batch import ainsert_returning_ids, aupdate_rows, normalize_rows
+from db.pagination import akeyset_page
+from db.sql import as_date, positional, update_columns, update_query
+from db.streaming import astream_rows
+from entity.employeeModel import EmployeeModel
+from service.BankAtm import BankAtm
+from service.Employee import Employee
+from service.impl.IEmployee import IEmployee
+
+
+class AsyncEmployee(IEmployee):
+    """
+    Асинхронный сервис сотрудников для AsyncConnectionPool (операции Employee в виде сопрограмм).
+    """
+
+    FIELDS = Employee.FIELDS
+    UPDATE_FIELDS = Employee.UPDATE_FIELDS
+    CREATE_FIELDS = Employee.CREATE_FIELDS
+
+    def __init__(self, pool):
+        """
+        Инициализация класса AsyncEmployee. Принимает пул AsyncConnectionPool.
+        """
+        self.pool = pool
+
+    async def create_table(self):
+        """
+        Создает таблицу 'employees' в базе данных.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute(Employee.TABLE_DDL)
+
+    async def drop_table(self):
+        """
+        Удаляет таблицу 'employees' вместе с зависимыми объектами.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute("DROP TABLE IF EXISTS employees CASCADE")
+
+    async def create(self, full_name, birth_date, position, bank_id, works_remotely, bank_office_id,
+                     can_provide_credit, salary):
+        """
+        Создает нового сотрудника (см. Employee.create).
+
+        :return: Экземпляр EmployeeModel
+        """
+        async with self.pool.connection() as connection:
+            employee_id = await connection.fetchval("""
+                INSERT INTO employees (full_name, birth_date, position, bank_id, works_remotely, bank_office_id, can_provide_credit, salary)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                RETURNING employee_id
+            """, full_name, as_date(birth_date), position, bank_id, works_remotely, bank_office_id, can_provide_credit,
+                salary)
+
+            # Обновляем количество сотрудников в таблице 'banks'
+            await self.pool.counters.aadd(connection, "num_employees", [bank_id])
+
+        employee = EmployeeModel(employee_id, full_name, birth_date, position, bank_id, works_remotely, bank_office_id,
+                                 can_provide_credit, salary)
+        return self.pool.identity_map().add("employees", employee.employee_id, employee)
+
+    async def create_many(self, employees):
+        """
+        Создает несколько сотрудников одним INSERT из массивов колонок в одной транзакции.
+
+        :param employees: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров EmployeeModel в порядке входных данных
+        """
+        rows = normalize_rows(employees, self.CREATE_FIELDS)
+        if not rows:
+            return []
+
+        async with self.pool.connection() as connection:
+            employee_ids = await ainsert_returning_ids(connection, """
+                INSERT INTO employees (full_name, birth_date, position, bank_id, works_remotely, bank_office_id, can_provide_credit, salary)
+                SELECT * FROM unnest($1::text[], $2::date[], $3::text[], $4::int[], $5::bool[], $6::int[], $7::bool[],
+                                     $8::numeric[])
+                RETURNING employee_id
+            """, [row[:1] + (as_date(row[1]),) + row[2:] for row in rows])
+
+            # Обновляем количество сотрудников в таблице 'banks'
+            await self.pool.counters.aadd(connection, "num_employees", [row[3] for row in rows])
+
+        employees = [EmployeeModel(employee_id, *row) for employee_id, row in zip(employee_ids, rows)]
+        return self.pool.identity_map().add_all("employees", "employee_id", employees)
+
+    async def read(self, employee_id):
+        """
+        Возвращает сотрудника по его идентификатору.
+
+        :return: Экземпляр EmployeeModel или None, если сотрудник не найден
+        """
+        identity = self.pool.identity_map()
+        employee = identity.get("employees", employee_id)  # Сотрудник, уже загруженный в текущей единице работы
+        if employee is not None:
+            return employee
+
+        async with self.pool.connection() as connection:
+            data = await connection.fetchrow("SELECT * FROM employees WHERE employee_id = $1", employee_id)
+        return identity.add("employees", employee_id, EmployeeModel.from_row(data)) if data else None
+
+    async def list(self):
+        """
+        Возвращает список всех сотрудников.
+
+        :return: Список экземпляров EmployeeModel
+        """
+        async with self.pool.connection() as connection:
+            employees_data = await connection.fetch("SELECT * FROM employees")
+        employees = [EmployeeModel.from_row(data) for data in employees_data]
+        return self.pool.identity_map().add_all("employees", "employee_id", employees)
+
+    async def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает всех сотрудников курсором, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Асинхронный генератор экземпляров EmployeeModel
+        """
+        async for data in astream_rows(self.pool, "SELECT * FROM employees", batch_size=batch_size):
+            yield EmployeeModel.from_row(data)
+
+    async def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает keyset-страницу сотрудников (см. Employee.page).
+
+        :return: Экземпляр PageModel с моделями EmployeeModel и токеном следующей страницы
+        """
+        return await akeyset_page(self.pool, "SELECT * FROM employees", "employee_id", EmployeeModel, self.FIELDS,
+                                  after_id, limit, filters)
+
+    async def update(self, employee_id, **kwargs):
+        """
+        Обновляет данные о сотруднике по его идентификатору.
+
+        :param employee_id: Идентификатор сотрудника
+        :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :return: Экземпляр EmployeeModel с новыми данными или None, если сотрудник не найден
+        """
+        if "birth_date" in kwargs:
+            kwargs["birth_date"] = as_date(kwargs["birth_date"])
+        columns = update_columns("employees", self.UPDATE_FIELDS, kwargs)
+        if not columns:
+            return await self.read(employee_id)
+
+        async with self.pool.connection() as connection:
+            # Новые значения строки возвращаются тем же запросом
+            data = await connection.fetchrow(positional(update_query("employees", "employee_id", columns)),
+                                             *kwargs.values(), employee_id)
+
+        if data is None:
+            return None
+        # Уже выданный экземпляр сотрудника обновляется на месте
+        return self.pool.identity_map().add("employees", employee_id, EmployeeModel.from_row(data))
+
+    async def update_many(self, updates):
+        """
+        Обновляет несколько сотрудников своими значениями для каждого (см. Employee.update_many).
+
+        :return: Список экземпляров EmployeeModel с новыми данными в порядке updates
+        """
+        updates = [(employee_id, {field: as_date(value) if field == "birth_date" else value
+                                  for field, value in values.items()})
+                   for employee_id, values in dict(updates).items()]
+        async with self.pool.connection() as connection:
+            rows, ids = await aupdate_rows(connection, "employees", "employee_id", self.UPDATE_FIELDS, updates)
+        employees = [EmployeeModel.from_row(rows[employee_id]) for employee_id in ids if employee_id in rows]
+        return self.pool.identity_map().add_all("employees", "employee_id", employees)
+
+    async def delete(self, employee_id):
+        """
+        Удаляет сотрудника по его идентификатору и уменьшает количество сотрудников в банке.
+
+        :param employee_id: Идентификатор сотрудника
+        """
+        await self.delete_many([employee_id])
+
+        return f"Employee with ID {employee_id} deleted."
+
+    async def delete_many(self, employee_ids):
+        """
+        Удаляет несколько сотрудников вместе с обслуживаемыми ими банкоматами одним запросом
+        (см. Employee.delete_many).
+
+        :return: Количество удаленных сотрудников
+        """
+        employee_ids = list(employee_ids)
+        if not employee_ids:
+            return 0
+
+        update_banks = self.pool.counters.add_from_many({"num_employees": "deleted", "num_atms": "deleted_atms"}, -1)
+        async with self.pool.connection() as connection:
+            deleted = await connection.fetch(positional(f"""
+                WITH {BankAtm.deleted_atms("employee_id = ANY(%s)")},
+                deleted AS (DELETE FROM employees WHERE employee_id = ANY(%s) RETURNING employee_id, bank_id),
+                deleted_banks AS ({update_banks})
+                SELECT employee_id FROM deleted
+            """), employee_ids, employee_ids)
+            self.pool.counters.applied()
+        identity = self.pool.identity_map()
+        for (employee_id,) in deleted:
+            identity.discard("employees", employee_id)
+        identity.clear("atms")  # Банкоматы сотрудников удалены
+        identity.expire_all("bank_offices")  # Изменилось количество банкоматов офисов
+        return len(deleted)
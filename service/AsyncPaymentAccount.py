@@ -0,0 +1,206 @@
+from db.batch import ainsert_returning_ids, aupdate_rows, normalize_rows
+from db.columnar import afetch_table_columns, group_sum
+from db.pagination import akeyset_page
+from db.sql import positional, update_columns, update_query
+from db.streaming import astream_rows
+from entity.paymentAccountModel import PaymentAccountModel
+from service.impl.IPaymentAccount import IPaymentAccount
+from service.PaymentAccount import PaymentAccount
+
+
+class AsyncPaymentAccount(IPaymentAccount):
+    """
+    Асинхронный сервис платежных счетов для AsyncConnectionPool (операции PaymentAccount в виде сопрограмм).
+    """
+
+    FIELDS = PaymentAccount.FIELDS
+    UPDATE_FIELDS = PaymentAccount.UPDATE_FIELDS
+    CREATE_FIELDS = PaymentAccount.CREATE_FIELDS
+    COLUMN_DTYPES = PaymentAccount.COLUMN_DTYPES
+
+    def __init__(self, pool):
+        """
+        Инициализация класса AsyncPaymentAccount. Принимает пул AsyncConnectionPool.
+        """
+        self.pool = pool
+
+    async def create_table(self):
+        """
+        Создает таблицу 'payment_accounts' в базе данных.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute(PaymentAccount.TABLE_DDL)
+
+    async def drop_table(self):
+        """
+        Удаляет таблицу 'payment_accounts' вместе с зависимыми объектами.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute("DROP TABLE IF EXISTS payment_accounts CASCADE")
+
+    async def create(self, user_id, bank_name, balance=0):
+        """
+        Создает новый платежный счет пользователя.
+
+        :param user_id: Идентификатор пользователя
+        :param bank_name: Название банка
+        :param balance: Начальный баланс счета, по умолчанию 0
+        """
+        async with self.pool.connection() as connection:
+            payment_account_id = await connection.fetchval("""
+                INSERT INTO payment_accounts (user_id, bank_name, balance)
+                VALUES ($1, $2, $3)
+                RETURNING payment_account_id
+            """, user_id, bank_name, balance)
+
+        account = PaymentAccountModel(payment_account_id, user_id, bank_name, balance)
+        return self.pool.identity_map().add("payment_accounts", account.payment_account_id, account)
+
+    async def create_many(self, accounts):
+        """
+        Создает несколько платежных счетов одним INSERT из массивов колонок в одной транзакции.
+
+        :param accounts: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров PaymentAccountModel в порядке входных данных
+        """
+        rows = normalize_rows(accounts, self.CREATE_FIELDS, {"balance": 0})
+        if not rows:
+            return []
+
+        async with self.pool.connection() as connection:
+            account_ids = await ainsert_returning_ids(connection, """
+                INSERT INTO payment_accounts (user_id, bank_name, balance)
+                SELECT * FROM unnest($1::int[], $2::text[], $3::numeric[])
+                RETURNING payment_account_id
+            """, rows)
+
+        accounts = [PaymentAccountModel(account_id, *row) for account_id, row in zip(account_ids, rows)]
+        return self.pool.identity_map().add_all("payment_accounts", "payment_account_id", accounts)
+
+    async def read(self, account_id):
+        """
+        Возвращает платежный счет по его идентификатору.
+
+        :return: Экземпляр PaymentAccountModel или None, если счет не найден
+        """
+        identity = self.pool.identity_map()
+        account = identity.get("payment_accounts", account_id)  # Счет, уже загруженный в текущей единице работы
+        if account is not None:
+            return account
+
+        async with self.pool.connection() as connection:
+            data = await connection.fetchrow("SELECT * FROM payment_accounts WHERE payment_account_id = $1",
+                                             account_id)
+        return identity.add("payment_accounts", account_id, PaymentAccountModel.from_row(data)) if data else None
+
+    async def list(self):
+        """
+        Возвращает список всех платежных счетов.
+
+        :return: Список экземпляров PaymentAccountModel
+        """
+        async with self.pool.connection() as connection:
+            payment_accounts_data = await connection.fetch("SELECT * FROM payment_accounts")
+        accounts = [PaymentAccountModel.from_row(data) for data in payment_accounts_data]
+        return self.pool.identity_map().add_all("payment_accounts", "payment_account_id", accounts)
+
+    async def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все платежные счета курсором, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Асинхронный генератор экземпляров PaymentAccountModel
+        """
+        async for data in astream_rows(self.pool, "SELECT * FROM payment_accounts", batch_size=batch_size):
+            yield PaymentAccountModel.from_row(data)
+
+    async def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает keyset-страницу платежных счетов (см. PaymentAccount.page).
+
+        :return: Экземпляр PageModel с моделями PaymentAccountModel и токеном следующей страницы
+        """
+        return await akeyset_page(self.pool, "SELECT * FROM payment_accounts", "payment_account_id",
+                                  PaymentAccountModel, self.FIELDS, after_id, limit, filters)
+
+    async def columns(self, fields=None, filters=None, batch_size=50000):
+        """
+        Читает платежные счета в колоночном виде (см. PaymentAccount.columns).
+
+        :return: Словарь {колонка: numpy.ndarray}
+        """
+        return await afetch_table_columns(self.pool, "payment_accounts", self.COLUMN_DTYPES, fields, filters,
+                                          batch_size)
+
+    async def balance_by_bank(self, filters=None):
+        """
+        Возвращает суммарный баланс платежных счетов по каждому банку.
+
+        :param filters: Словарь {колонка: значение} для отбора счетов
+        :return: Словарь {название банка: сумма балансов}
+        """
+        data = await self.columns(["bank_name", "balance"], filters)
+        return group_sum(data["bank_name"], data["balance"])
+
+    async def update(self, account_id, **kwargs):
+        """
+        Обновляет данные о платежном счете по его идентификатору.
+
+        :param account_id: Идентификатор платежного счета
+        :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :return: Экземпляр PaymentAccountModel с новыми данными или None, если счет не найден
+        """
+        columns = update_columns("payment_accounts", self.UPDATE_FIELDS, kwargs)
+        if not columns:
+            return await self.read(account_id)
+
+        async with self.pool.connection() as connection:
+            # Новые значения строки возвращаются тем же запросом
+            query = positional(update_query("payment_accounts", "payment_account_id", columns))
+            data = await connection.fetchrow(query, *kwargs.values(), account_id)
+
+        if data is None:
+            return None
+        # Уже выданный экземпляр счета обновляется на месте
+        return self.pool.identity_map().add("payment_accounts", account_id, PaymentAccountModel.from_row(data))
+
+    async def update_many(self, updates):
+        """
+        Обновляет несколько платежных счетов своими значениями для каждого (см. PaymentAccount.update_many).
+
+        :return: Список экземпляров PaymentAccountModel с новыми данными в порядке updates
+        """
+        async with self.pool.connection() as connection:
+            rows, ids = await aupdate_rows(connection, "payment_accounts", "payment_account_id", self.UPDATE_FIELDS,
+                                           updates)
+        accounts = [PaymentAccountModel.from_row(rows[account_id]) for account_id in ids if account_id in rows]
+        return self.pool.identity_map().add_all("payment_accounts", "payment_account_id", accounts)
+
+    async def delete(self, account_id):
+        """
+        Удаляет платежный счет по его идентификатору.
+
+        :param account_id: Идентификатор платежного счета
+        """
+        await self.delete_many([account_id])
+
+        return f"Paymeny Account with ID {account_id} deleted."
+
+    async def delete_many(self, account_ids):
+        """
+        Удаляет несколько платежных счетов одним запросом (= ANY).
+
+        :return: Количество удаленных счетов
+        """
+        account_ids = list(account_ids)
+        if not account_ids:
+            return 0
+
+        async with self.pool.connection() as connection:
+            deleted = await connection.fetch(
+                "DELETE FROM payment_accounts WHERE payment_account_id = ANY($1) RETURNING payment_account_id",
+                account_ids)
+        identity = self.pool.identity_map()
+        for (account_id,) in deleted:
+            identity.discard("payment_accounts", account_id)
+        return len(deleted)
@@ -0,0 +1,295 @@
+import math
+
+from db.batch import ainsert_returning_ids, aupdate_rows, normalize_rows
+from db.pagination import akeyset_page
+from db.sql import as_date, positional, rowcount, update_columns, update_query
+from db.streaming import astream_rows
+from entity.userModel import UserModel
+from service.impl.IUser import IUser
+from service.User import User
+
+
+class AsyncUser(IUser):
+    """
+    Асинхронный сервис пользователей для AsyncConnectionPool (операции User в виде сопрограмм).
+    """
+
+    FIELDS = User.FIELDS
+    UPDATE_FIELDS = User.UPDATE_FIELDS
+    CREATE_FIELDS = User.CREATE_FIELDS
+
+    def __init__(self, pool):
+        """
+        Инициализация класса AsyncUser. Принимает пул AsyncConnectionPool.
+        """
+        self.pool = pool
+
+    async def create_table(self):
+        """
+        Создает таблицу 'users' и таблицу связей пользователей с банками 'user_banks'.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute(User.TABLE_DDL)
+            await connection.execute(User.USER_BANKS_DDL)
+
+    async def drop_table(self):
+        """
+        Удаляет таблицу 'users' вместе с зависимыми объектами и таблицей связей 'user_banks'.
+        """
+        async with self.pool.connection() as connection:
+            await connection.execute("""
+                DROP TABLE IF EXISTS user_banks;
+                DROP TABLE IF EXISTS users CASCADE;
+            """)
+
+    async def create(self, full_name, birth_date, job, monthly_income, banks):
+        """
+        Создает нового пользователя (см. User.create).
+
+        :return: Экземпляр UserModel
+        """
+        credit_rating = math.ceil(monthly_income / 1000) * 100
+
+        async with self.pool.connection() as connection:
+            user_id = await connection.fetchval("""
+                INSERT INTO users (full_name, birth_date, job, monthly_income, credit_rating, rated_income)
+                VALUES ($1, $2, $3, $4, $5, $4)
+                RETURNING user_id
+            """, full_name, as_date(birth_date), job, monthly_income, credit_rating)
+
+            # Связываем пользователя с банками и обновляем количество их клиентов
+            linked = await self._link_banks(connection, user_id, banks)
+
+        user = UserModel(user_id, full_name, birth_date, job, monthly_income, linked, credit_rating)
+        return self.pool.identity_map().add("users", user.user_id, user)
+
+    async def create_many(self, users):
+        """
+        Создает несколько пользователей одним INSERT из массивов колонок в одной транзакции.
+        Связи с банками вставляются одним запросом, счетчики клиентов обновляются в нем же.
+
+        :param users: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров UserModel в порядке входных данных
+        """
+        rows = [
+            (full_name, birth_date, job, monthly_income, banks, math.ceil(monthly_income / 1000) * 100)
+            for full_name, birth_date, job, monthly_income, banks in normalize_rows(users, self.CREATE_FIELDS)
+        ]
+        if not rows:
+            return []
+
+        async with self.pool.connection() as connection:
+            user_ids = await ainsert_returning_ids(connection, """
+                INSERT INTO users (full_name, birth_date, job, monthly_income, credit_rating, rated_income)
+                SELECT * FROM unnest($1::text[], $2::date[], $3::text[], $4::numeric[], $5::int[], $6::numeric[])
+                RETURNING user_id
+            """, [(full_name, as_date(birth_date), job, monthly_income, credit_rating, monthly_income)
+                  for full_name, birth_date, job, monthly_income, _, credit_rating in rows])
+
+            # Связываем всех пользователей с банками одним запросом
+            linked = {user_id: [] for user_id in user_ids}
+            links = [(user_id, bank) for user_id, row in zip(user_ids, rows) for bank in row[4]]
+            if links:
+                link_user_ids, link_names = zip(*links)
+                created = await connection.fetch(f"""
+                    WITH linked AS (
+                        INSERT INTO user_banks (user_id, bank_id)
+                        SELECT v.user_id, b.bank_id FROM unnest($1::int[], $2::text[]) AS v(user_id, name)
+                        JOIN banks b ON b.name = v.name
+                        ON CONFLICT DO NOTHING
+                        RETURNING user_id, bank_id
+                    ),
+                    linked_banks AS ({self.pool.counters.add_from("num_clients", "linked")})
+                    SELECT l.user_id, b.name FROM linked l JOIN banks b ON b.bank_id = l.bank_id
+                    ORDER BY l.user_id, l.bank_id
+                """, list(link_user_ids), list(link_names))
+                self.pool.counters.applied()
+                for user_id, name in created:
+                    linked[user_id].append(name)
+
+        users = [UserModel(user_id, *row[:4], linked[user_id], row[5]) for user_id, row in zip(user_ids, rows)]
+        return self.pool.identity_map().add_all("users", "user_id", users)
+
+    async def read(self, user_id):
+        """
+        Возвращает пользователя по его идентификатору.
+
+        :return: Экземпляр UserModel или None, если пользователь не найден
+        """
+        identity = self.pool.identity_map()
+        user = identity.get("users", user_id)  # Пользователь, уже загруженный в текущей единице работы
+        if user is not None:
+            return user
+
+        async with self.pool.connection() as connection:
+            data = await connection.fetchrow(f"SELECT {User.COLUMNS} FROM users u WHERE u.user_id = $1", user_id)
+        return identity.add("users", user_id, UserModel.from_row(data)) if data else None
+
+    async def list(self):
+        """
+        Возвращает список всех пользователей.
+
+        :return: Список экземпляров UserModel
+        """
+        async with self.pool.connection() as connection:
+            user_data = await connection.fetch(f"SELECT {User.COLUMNS} FROM users u")
+        users = [UserModel.from_row(data) for data in user_data]
+        return self.pool.identity_map().add_all("users", "user_id", users)
+
+    async def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает всех пользователей курсором, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Асинхронный генератор экземпляров UserModel
+        """
+        async for data in astream_rows(self.pool, f"SELECT {User.COLUMNS} FROM users u", batch_size=batch_size):
+            yield UserModel.from_row(data)
+
+    async def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает keyset-страницу пользователей (см. User.page).
+
+        :return: Экземпляр PageModel с моделями UserModel и токеном следующей страницы
+        """
+        return await akeyset_page(self.pool, f"SELECT {User.COLUMNS} FROM users u", "user_id", UserModel,
+                                  self.FIELDS, after_id, limit, filters, prefix="u.")
+
+    async def update(self, user_id, **kwargs):
+        """
+        Обновляет данные о пользователе по его идентификатору.
+
+        :param user_id: Идентификатор пользователя
+        :param kwargs: Пары "ключ-значение" для обновляемых полей; banks заменяет список банков пользователя
+        :return: Экземпляр UserModel с новыми данными или None, если пользователь не найден
+        """
+        banks = kwargs.pop("banks", None)
+        if "birth_date" in kwargs:
+            kwargs["birth_date"] = as_date(kwargs["birth_date"])
+        columns = update_columns("users", self.UPDATE_FIELDS, kwargs)
+
+        async with self.pool.connection() as connection:
+            # Связи с банками меняются первыми, чтобы RETURNING вернул уже новый список банков
+            if banks is not None:
+                # Отвязываем банки, которых нет в новом списке, и привязываем новые
+                await connection.execute(f"""
+                    WITH unlinked AS (
+                        DELETE FROM user_banks m USING banks b
+                        WHERE m.user_id = $1 AND b.bank_id = m.bank_id AND NOT b.name = ANY($2)
+                        RETURNING m.bank_id
+                    )
+                    {self.pool.counters.add_from("num_clients", "unlinked", -1)}
+                """, user_id, list(banks))
+                self.pool.counters.applied()
+                await self._link_banks(connection, user_id, banks)
+
+            if columns:
+                # Новые значения строки возвращаются тем же запросом
+                query = positional(update_query("users", "user_id", columns, User.COLUMNS, "u"))
+                data = await connection.fetchrow(query, *kwargs.values(), user_id)
+                return self.pool.identity_map().add("users", user_id, UserModel.from_row(data)) if data else None
+
+        # Изменился только список банков: read обновит уже выданный экземпляр пользователя
+        self.pool.identity_map().expire("users", user_id)
+        return await self.read(user_id)
+
+    async def update_many(self, updates):
+        """
+        Обновляет нескольких пользователей своими значениями для каждого (см. User.update_many).
+
+        :return: Список экземпляров UserModel с новыми данными в порядке updates
+        """
+        updates = [(user_id, {field: as_date(value) if field == "birth_date" else value
+                              for field, value in values.items()})
+                   for user_id, values in dict(updates).items()]
+        async with self.pool.connection() as connection:
+            rows, user_ids = await aupdate_rows(connection, "users", "user_id", self.UPDATE_FIELDS, updates,
+                                                User.COLUMNS, "u")
+        users = [UserModel.from_row(rows[user_id]) for user_id in user_ids if user_id in rows]
+        return self.pool.identity_map().add_all("users", "user_id", users)
+
+    async def delete(self, user_id):
+        """
+        Удаляет пользователя по его идентификатору и уменьшает количество клиентов его банков.
+
+        :param user_id: Идентификатор пользователя
+        """
+        await self.delete_many([user_id])
+
+        return f"User with ID {user_id} deleted."
+
+    async def delete_many(self, user_ids):
+        """
+        Удаляет несколько пользователей вместе с их связями с банками, платежными и кредитными
+        счетами одним запросом (см. User.delete_many).
+
+        :return: Количество удаленных пользователей
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+
+        async with self.pool.connection() as connection:
+            deleted = await connection.fetch(User.delete_query(self.pool.counters, "$1"), user_ids)
+            self.pool.counters.applied()
+        return User.discard_deleted(self.pool.identity_map(), deleted)
+
+    async def _link_banks(self, connection, user_id, banks):
+        """
+        Привязывает пользователя к банкам по их названиям и увеличивает количество клиентов
+        у тех банков, с которыми связь появилась впервые.
+
+        :return: Названия банков, связь с которыми появилась, в порядке идентификаторов банков
+        """
+        linked = await connection.fetch(f"""
+            WITH linked AS (
+                INSERT INTO user_banks (user_id, bank_id)
+                SELECT u.user_id, b.bank_id FROM users u JOIN banks b ON b.name = ANY($2)
+                WHERE u.user_id = $1  -- Несуществующий пользователь не привязывается (а не нарушает FK)
+                ON CONFLICT DO NOTHING
+                RETURNING bank_id
+            ),
+            linked_banks AS ({self.pool.counters.add_from("num_clients", "linked")})
+            SELECT b.name FROM linked l JOIN banks b ON b.bank_id = l.bank_id ORDER BY b.bank_id
+        """, user_id, list(banks))
+        self.pool.counters.applied()
+        return [name for (name,) in linked]
+
+    async def recompute_credit_ratings(self, incremental=False, chunk_size=None):
+        """
+        Пересчитывает кредитный рейтинг пользователей на сервере (см. User.recompute_credit_ratings).
+
+        :return: Количество обновленных пользователей
+        """
+        stale = User.STALE_RATING_CONDITION if incremental else "TRUE"
+        self.pool.identity_map().expire_all("users")  # Рейтинги загруженных пользователей могут измениться
+        if chunk_size is None:
+            async with self.pool.connection() as connection:
+                return rowcount(await connection.execute(f"""
+                    UPDATE users u SET credit_rating = {User.RATING_EXPRESSION}, rated_income = u.monthly_income
+                    WHERE ({stale}) AND ({User.RATING_DIFFERS_CONDITION})
+                """))
+
+        # Порции идут по возрастанию user_id, каждая начинается после последнего обработанного
+        query = f"""
+            WITH chunk AS (
+                SELECT u.user_id FROM users u
+                WHERE u.user_id > $1 AND ({stale})
+                ORDER BY u.user_id
+                LIMIT $2
+            ), updated AS (
+                UPDATE users u SET credit_rating = {User.RATING_EXPRESSION}, rated_income = u.monthly_income
+                FROM chunk
+                WHERE u.user_id = chunk.user_id AND ({User.RATING_DIFFERS_CONDITION})
+                RETURNING 1
+            )
+            SELECT (SELECT max(user_id) FROM chunk), (SELECT count(*) FROM updated)
+        """
+        updated, after_id = 0, 0
+        while True:
+            async with self.pool.connection() as connection:
+                last_id, count = await connection.fetchrow(query, after_id, chunk_size)
+            if last_id is None:
+                return updated
+            updated += count
+            after_id = last_id
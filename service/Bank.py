@@ -1,20 +1,55 @@
+import json
 import random  # Импортируем модуль random для генерации случайных значений
-
+from contextlib import ExitStack
+from datetime import date
+from decimal import Decimal
+
+from db.ConnectionPool import as_pool
+from db.CounterManager import CounterManager
+from db.batch import insert_returning_ids, update_rows
+from db.pagination import keyset_page
+from db.sql import update_columns, update_query
+from db.streaming import stream_rows
 from entity.bankAtmModel import BankAtmModel
+from entity.bankInfoModel import BankInfoModel
 from entity.bankOfficeModel import BankOfficeModel
 from entity.employeeModel import EmployeeModel
 from entity.userModel import UserModel
+from service.User import User
 from service.impl.IBank import IBank
 from entity.bankModel import BankModel
 
 
 class Bank(IBank):
+    # Колонки таблицы (допустимые поля фильтров)
+    FIELDS = ("bank_id", "name", "num_offices", "num_atms", "num_employees", "num_clients", "rating",
+              "total_money", "interest_rate")
+
+    # Колонки, которые можно изменять методами update и update_many
+    UPDATE_FIELDS = FIELDS[1:]
+
+    # DDL таблицы (используется синхронным и асинхронным сервисами)
+    TABLE_DDL = """
+        CREATE TABLE banks (
+            bank_id SERIAL PRIMARY KEY,  -- Идентификатор банка (генерируется автоматически)
+            name VARCHAR(255) NOT NULL,  -- Название банка (обязательное поле)
+            num_offices INT DEFAULT 0,  -- Количество офисов (по умолчанию 0)
+            num_atms INT DEFAULT 0,  -- Количество банкоматов (по умолчанию 0)
+            num_employees INT DEFAULT 0,  -- Количество сотрудников (по умолчанию 0)
+            num_clients INT DEFAULT 0,  -- Количество клиентов (по умолчанию 0)
+            rating INT NOT NULL CHECK (rating >= 0 AND rating <= 100),  -- Рейтинг банка (0-100)
+            total_money INT NOT NULL CHECK (total_money >= 0 AND total_money <= 1000000),  -- Общая сумма денег (0-1 000 000)
+            interest_rate FLOAT NOT NULL CHECK (interest_rate >= 0 AND interest_rate <= 20)  -- Процентная ставка (0-20%)
+        );
+    """
+
     def __init__(self, connection):
         """
         Инициализация класса Bank. Принимает объект connection, который используется для
         подключения к базе данных.
+        Вместо подключения можно передать пул ConnectionPool: подключение берется на время каждой операции.
         """
-        self.connection = connection
+        self.pool = as_pool(connection)
 
     def create_table(self):
         """
@@ -22,47 +57,35 @@ class Bank(IBank):
         включая идентификатор банка, название, количество офисов, банкоматов, сотрудников,
         клиентов, рейтинг, общую сумму денег и процентную ставку.
         """
-        with self.connection.cursor() as cursor:
-            # SQL-запрос для создания таблицы
-            query = """
-                CREATE TABLE banks (
-                    bank_id SERIAL PRIMARY KEY,  -- Идентификатор банка (генерируется автоматически)
-                    name VARCHAR(255) NOT NULL,  -- Название банка (обязательное поле)
-                    num_offices INT DEFAULT 0,  -- Количество офисов (по умолчанию 0)
-                    num_atms INT DEFAULT 0,  -- Количество банкоматов (по умолчанию 0)
-                    num_employees INT DEFAULT 0,  -- Количество сотрудников (по умолчанию 0)
-                    num_clients INT DEFAULT 0,  -- Количество клиентов (по умолчанию 0)
-                    rating INT NOT NULL CHECK (rating >= 0 AND rating <= 100),  -- Рейтинг банка (0-100)
-                    total_money INT NOT NULL CHECK (total_money >= 0 AND total_money <= 1000000),  -- Общая сумма денег (0-1 000 000)
-                    interest_rate FLOAT NOT NULL CHECK (interest_rate >= 0 AND interest_rate <= 20)  -- Процентная ставка (0-20%)
-                );
-            """
-            cursor.execute(query)  # Выполнение SQL-запроса на создание таблицы
-        self.connection.commit()  # Применение изменений в базе данных
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(self.TABLE_DDL)  # Выполнение SQL-запроса на создание таблицы
+            cursor.execute(CounterManager.DDL)  # Таблица отложенных изменений счетчиков банков
 
     def drop_table(self):
         """
-        Удаляет таблицу 'banks' из базы данных, если она существует.
+        Удаляет таблицу 'banks' и таблицу изменений счетчиков из базы данных, если они существуют.
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = """
+                DROP TABLE IF EXISTS bank_counter_deltas;
                 DROP TABLE IF EXISTS banks CASCADE;
             """
             cursor.execute(query)  # Выполнение SQL-запроса на удаление таблицы
-        self.connection.commit()  # Применение изменений в базе данных
+        self.pool.bank_cache.invalidate()  # Кэшированные банки удаленной таблицы больше не существуют
 
-    def create(self, name):
+    @staticmethod
+    def random_parameters(rng=random):
         """
-        Создает новый банк с заданным именем и случайными значениями для рейтинга, общей суммы денег
-        и процентной ставки. Процентная ставка корректируется в зависимости от рейтинга.
+        Генерирует случайные значения рейтинга, общей суммы денег и процентной ставки банка.
+        Процентная ставка корректируется в зависимости от рейтинга.
 
-        :param name: Название банка.
-        :return: Возвращает экземпляр модели BankModel с данными нового банка.
+        :param rng: Источник случайных чисел (модуль random или экземпляр random.Random).
+        :return: Кортеж (rating, total_money, interest_rate).
         """
         # Генерация случайных значений для рейтинга, общей суммы денег и процентной ставки
-        rating = random.randint(0, 100)
-        total_money = random.randint(0, 1000000)
-        interest_rate = random.uniform(0, 20)
+        rating = rng.randint(0, 100)
+        total_money = rng.randint(0, 1000000)
+        interest_rate = rng.uniform(0, 20)
 
         # Корректировка процентной ставки в зависимости от рейтинга
         if rating > 80:
@@ -72,19 +95,60 @@ class Bank(IBank):
         elif rating > 40:
             interest_rate *= 0.9
 
-        with self.connection.cursor() as cursor:
+        return rating, total_money, interest_rate
+
+    def create(self, name, rng=random):
+        """
+        Создает новый банк с заданным именем и случайными значениями для рейтинга, общей суммы денег
+        и процентной ставки. Процентная ставка корректируется в зависимости от рейтинга.
+
+        :param name: Название банка.
+        :param rng: Источник случайных чисел (модуль random или экземпляр random.Random).
+        :return: Возвращает экземпляр модели BankModel с данными нового банка.
+        """
+        rating, total_money, interest_rate = self.random_parameters(rng)
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             # SQL-запрос для вставки нового банка
             query = """
                 INSERT INTO banks (name, num_offices, num_atms, num_employees, num_clients, rating, total_money, interest_rate)
                 VALUES (%s, 0, 0, 0, 0, %s, %s, %s)
                 RETURNING bank_id
             """
-            cursor.execute(query, (name, rating, total_money, round(interest_rate, 2)))  # Вставка данных в таблицу
+            # Вставка данных в таблицу
+            self.pool.statements.execute(cursor, "bank_create", query,
+                                         (name, rating, total_money, round(interest_rate, 2)))
             bank_id = cursor.fetchone()[0]  # Получение идентификатора нового банка
-        self.connection.commit()  # Применение изменений в базе данных
 
         # Возвращаем экземпляр модели BankModel с данными о новом банке
-        return BankModel(bank_id, name, 0, 0, 0, 0, rating, total_money, round(interest_rate, 2))
+        bank = BankModel(bank_id, name, 0, 0, 0, 0, rating, total_money, round(interest_rate, 2))
+        return self.pool.identity_map().add("banks", bank_id, bank)
+
+    def create_many(self, names, rng=random):
+        """
+        Создает несколько банков одним многострочным INSERT в одной транзакции.
+
+        :param names: Итерируемый объект названий банков.
+        :param rng: Источник случайных чисел (модуль random или экземпляр random.Random).
+        :return: Список экземпляров BankModel в порядке входных данных.
+        """
+        rows = []
+        for name in names:
+            rating, total_money, interest_rate = self.random_parameters(rng)
+            rows.append((name, 0, 0, 0, 0, rating, total_money, round(interest_rate, 2)))
+        if not rows:
+            return []
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = """
+                INSERT INTO banks (name, num_offices, num_atms, num_employees, num_clients, rating, total_money, interest_rate)
+                VALUES %s
+                RETURNING bank_id
+            """
+            bank_ids = insert_returning_ids(cursor, query, rows)
+
+        banks = [BankModel(bank_id, *row) for bank_id, row in zip(bank_ids, rows)]
+        return self.pool.identity_map().add_all("banks", "bank_id", banks)
 
     def read(self, bank_id):
         """
@@ -93,15 +157,21 @@ class Bank(IBank):
         :param bank_id: Идентификатор банка.
         :return: Экземпляр модели BankModel с данными банка или None, если банк не найден.
         """
-        with self.connection.cursor() as cursor:
+        self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        identity = self.pool.identity_map()
+        bank = identity.get("banks", bank_id)  # Банк, уже загруженный в текущей единице работы
+        if bank is not None:
+            return bank
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             # SQL-запрос для получения данных банка по его ID
-            query = "SELECT * FROM banks WHERE bank_id = %s"
-            cursor.execute(query, (bank_id,))
+            query = f"SELECT * FROM {self._banks} WHERE bank_id = %s"
+            self.pool.statements.execute(cursor, "bank_read", query, (bank_id,))
             data = cursor.fetchone()  # Получение первой записи
 
             # Если банк найден, возвращаем экземпляр модели BankModel
             if data:
-                return BankModel(*data)
+                return identity.add("banks", bank_id, BankModel.from_row(data))
             return None  # Если банк не найден, возвращаем None
 
     def list(self):
@@ -110,14 +180,41 @@ class Bank(IBank):
 
         :return: Список объектов BankModel для каждого банка.
         """
-        with self.connection.cursor() as cursor:
+        self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             # SQL-запрос для получения всех данных о банках
-            query = "SELECT * FROM banks"
+            query = f"SELECT * FROM {self._banks}"
             cursor.execute(query)
             banks_data = cursor.fetchall()  # Получение всех записей
 
             # Возвращаем список экземпляров моделей BankModel для каждого банка
-            return [BankModel(*data) for data in banks_data]
+            banks = [BankModel.from_row(data) for data in banks_data]
+            return self.pool.identity_map().add_all("banks", "bank_id", banks)
+
+    def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все банки через серверный курсор, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Генератор экземпляров BankModel
+        """
+        self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        for data in stream_rows(self.pool, f"SELECT * FROM {self._banks}", batch_size=batch_size):
+            yield BankModel.from_row(data)
+
+    def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает страницу банков методом keyset: следующая страница начинается после
+        идентификатора из токена продолжения, поэтому время ответа не зависит от глубины.
+
+        :param after_id: Токен продолжения предыдущей страницы (None - первая страница)
+        :param limit: Максимальное количество записей на странице
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :return: Экземпляр PageModel с моделями BankModel и токеном следующей страницы
+        """
+        self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        return keyset_page(self.pool, f"SELECT * FROM {self._banks}", "bank_id", BankModel, self.FIELDS,
+                           after_id, limit, filters)
 
     def update(self, bank_id, **kwargs):
         """
@@ -125,19 +222,44 @@ class Bank(IBank):
 
         :param bank_id: Идентификатор банка, который нужно обновить.
         :param kwargs: Поля, которые нужно обновить (в формате ключ-значение).
-        :return: Возвращает экземпляр модели BankModel с обновленными данными банка.
+        :return: Возвращает экземпляр модели BankModel с обновленными данными банка
+                 или None, если банк не найден.
         """
-        # Формирование строки для обновления полей (ключ = значение)
-        fields = ", ".join([f"{key} = %s" for key in kwargs.keys()])
-        query = f"UPDATE banks SET {fields} WHERE bank_id = %s"
-        params = list(kwargs.values()) + [bank_id]  # Параметры для обновления
-
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)  # Выполнение запроса на обновление
-        self.connection.commit()  # Применение изменений в базе данных
+        columns = update_columns("banks", self.UPDATE_FIELDS, kwargs)  # Имена колонок подставляются в SQL
+        if not columns:
+            return self.read(bank_id)
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            self._flush_before_update(cursor)
+            # Новые значения строки возвращаются тем же запросом
+            cursor.execute(update_query("banks", "bank_id", columns), [*kwargs.values(), bank_id])
+            data = cursor.fetchone()
+        self.pool.bank_cache.invalidate(bank_id)  # Метаданные банка в кэше больше не актуальны
+        if "name" in columns:
+            self.pool.identity_map().expire_all("users")  # Названия банков входят в модели клиентов
+
+        if data is None:
+            return None
+        # Уже выданный экземпляр банка обновляется на месте
+        return self.pool.identity_map().add("banks", bank_id, BankModel.from_row(data))
+
+    def update_many(self, updates):
+        """
+        Обновляет несколько банков своими значениями для каждого: одним запросом
+        UPDATE ... FROM (VALUES ...) ... RETURNING на каждый набор изменяемых колонок.
 
-        # Получаем обновленные данные после изменения и возвращаем обновленную модель
-        return self.read(bank_id)
+        :param updates: Словарь {идентификатор банка: {колонка: значение}} или пары (идентификатор, словарь).
+        :return: Список экземпляров BankModel с новыми данными в порядке updates (только найденные банки).
+        """
+        updates = dict(updates)
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            self._flush_before_update(cursor)
+            rows, bank_ids = update_rows(cursor, "banks", "bank_id", self.UPDATE_FIELDS, updates)
+        self.pool.bank_cache.invalidate()  # Метаданные измененных банков в кэше больше не актуальны
+        if any("name" in values for values in updates.values()):
+            self.pool.identity_map().expire_all("users")  # Названия банков входят в модели клиентов
+        banks = [BankModel.from_row(rows[bank_id]) for bank_id in bank_ids if bank_id in rows]
+        return self.pool.identity_map().add_all("banks", "bank_id", banks)
 
     def delete(self, bank_id):
         """
@@ -146,60 +268,193 @@ class Bank(IBank):
         :param bank_id: Идентификатор банка, который нужно удалить.
         :return: Сообщение, подтверждающее удаление банка.
         """
-        with self.connection.cursor() as cursor:
-            # SQL-запрос для удаления банка по его ID
-            query = "DELETE FROM banks WHERE bank_id = %s"
-            cursor.execute(query, (bank_id,))
-        self.connection.commit()  # Применение изменений в базе данных
+        self.delete_many([bank_id])
 
         # Возвращаем подтверждение удаления банка
         return f"Bank with ID {bank_id} deleted."
 
-    def __get_all_bankATMs_from_banks(self, bank_id):
-        with self.connection.cursor() as cursor:
-            query = "SELECT * FROM atms WHERE bank_id = %s"
-            cursor.execute(query, (bank_id,))
-            atms_data = cursor.fetchall()
-        self.connection.commit()
+    def delete_many(self, bank_ids):
+        """
+        Удаляет несколько банков одним запросом (= ANY). Офисы, банкоматы, сотрудники и связи
+        с клиентами удаляются каскадно, поэтому счетчики изменять не нужно.
 
-        return [BankAtmModel(*data) for data in atms_data]
+        :param bank_ids: Итерируемый объект идентификаторов банков
+        :return: Количество удаленных банков
+        """
+        bank_ids = list(bank_ids)
+        if not bank_ids:
+            return 0
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = "DELETE FROM banks WHERE bank_id = ANY(%s) RETURNING bank_id"
+            cursor.execute(query, (bank_ids,))
+            deleted = cursor.fetchall()
+        for (bank_id,) in deleted:
+            self.pool.bank_cache.invalidate(bank_id)  # Удаляем банк из кэша метаданных
+        self.pool.identity_map().clear()  # Вместе с банками каскадно удалены их офисы, банкоматы и сотрудники
+        return len(deleted)
+
+    # Один запрос возвращает банк и все связанные сущности, собранные в JSON-массивы
+    # ({banks} заменяется источником строк банков с псевдонимом b, см. _banks).
+    # Массивы возвращаются текстом, чтобы DECIMAL-колонки разбирались в Decimal без потери точности
+    BANK_INFO_QUERY = f"""
+        SELECT b.*,
+            (SELECT COALESCE(json_agg(a ORDER BY a.atm_id), '[]') FROM atms a
+             WHERE a.bank_id = b.bank_id)::text AS bank_atms,
+            (SELECT COALESCE(json_agg(o ORDER BY o.bank_office_id), '[]') FROM bank_offices o
+             WHERE o.bank_id = b.bank_id)::text AS bank_offices,
+            (SELECT COALESCE(json_agg(e ORDER BY e.employee_id), '[]') FROM employees e
+             WHERE e.bank_id = b.bank_id)::text AS employees,
+            (SELECT COALESCE(json_agg(c ORDER BY c.user_id), '[]') FROM (
+                SELECT {User.COLUMNS} FROM user_banks cb JOIN users u ON u.user_id = cb.user_id
+                WHERE cb.bank_id = b.bank_id
+             ) c)::text AS users
+        FROM {{banks}}
+        WHERE b.bank_id = %s
+    """
+
+    def flush_counters(self):
+        """
+        Переносит накопленные изменения счетчиков (num_offices, num_atms, num_employees, num_clients)
+        в таблицу 'banks' одним сгруппированным UPDATE.
 
-    def __get_all_bankOffices_from_banks(self, bank_id):
-        with self.connection.cursor() as cursor:
-            query = "SELECT * FROM bank_offices WHERE bank_id = %s"
-            cursor.execute(query, (bank_id,))
-            banks_office_data = cursor.fetchall()
-        self.connection.commit()
+        :return: Количество обновленных банков
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            return self.pool.counters.flush(cursor)
 
-        return [BankOfficeModel(*data) for data in banks_office_data]
+    def recompute_counters(self):
+        """
+        Пересчитывает счетчики всех банков (num_offices, num_atms, num_employees, num_clients)
+        по таблицам офисов, банкоматов, сотрудников и клиентов одним запросом
+        и отбрасывает накопленные изменения. Исправляет расхождения после сбоев или ручных правок.
 
-    def __get_all_employees_from_banks(self, bank_id):
-        with self.connection.cursor() as cursor:
-            query = "SELECT * FROM employees WHERE bank_id = %s"
-            cursor.execute(query, (bank_id,))
-            employees_data = cursor.fetchall()
-        self.connection.commit()
+        :return: Количество банков, счетчики которых были исправлены
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            return self.pool.counters.recompute(cursor)
+
+    @property
+    def _banks(self):
+        # Источник строк банков: в отложенном режиме счетчики включают еще не перенесенные изменения
+        return self.pool.counters.banks_source(self.FIELDS)
+
+    def _sync_counters(self):
+        # Чтения учитывают накопленные изменения и без переноса; перенос нужен только для того,
+        # чтобы таблица изменений не росла, поэтому занятая другим переносом блокировка не ожидается
+        if self.pool.counters.flush_due():
+            with self.pool.connection() as connection, connection.cursor() as cursor:
+                self.pool.counters.flush(cursor, wait=False)
+
+    def _flush_before_update(self, cursor):
+        # RETURNING возвращает счетчики из 'banks', поэтому накопленные изменения переносятся
+        # в той же транзакции перед изменением банков
+        if self.pool.counters.deferred:
+            self.pool.counters.flush(cursor)
+
+    @staticmethod
+    def _models_from_json(model, rows, date_fields=(), float_fields=()):
+        """
+        Строит модели из JSON-массива строк с теми же типами полей, что и при чтении колонок напрямую:
+        дробные числа разбираются в Decimal (DECIMAL), колонки FLOAT из float_fields - в float,
+        даты приходят строками и преобразуются в date.
+        """
+        models = []
+        for row in json.loads(rows, parse_float=Decimal):
+            for field in date_fields:
+                if row[field] is not None:
+                    row[field] = date.fromisoformat(row[field])
+            for field in float_fields:
+                if row[field] is not None:
+                    row[field] = float(row[field])
+            models.append(model(**row))
+        return models
 
-        return [EmployeeModel(*data) for data in employees_data]
+    def get_all_info_about_bank(self, bank_id):
+        """
+        Возвращает банк вместе с его банкоматами, офисами, сотрудниками и клиентами за один запрос.
 
-    def __get_all_users_from_banks(self, bank_id):
-        with self.connection.cursor() as cursor:
-            query = """SELECT name FROM banks WHERE bank_id = %s"""
+        :param bank_id: Идентификатор банка.
+        :return: Экземпляр BankInfoModel или None, если банк не найден.
+        """
+        self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = self.BANK_INFO_QUERY.format(banks=self.pool.counters.banks_source(self.FIELDS, "b"))
             cursor.execute(query, (bank_id,))
-            bank_name = cursor.fetchone()[0]
-
-            query = "SELECT * FROM users WHERE banks @> %s::varchar[]"
-            cursor.execute(query, (f'{{{bank_name}}}',))
-            user_data = cursor.fetchall()
-
-        self.connection.commit()
-
-        return [UserModel(*data) for data in user_data]
-
-    def get_all_info_about_bank(self, bank_id):
-        bank_atms = self.__get_all_bankATMs_from_banks(bank_id)
-        bank_offices = self.__get_all_bankOffices_from_banks(bank_id)
-        employees = self.__get_all_employees_from_banks(bank_id)
-        users = self.__get_all_users_from_banks(bank_id)
+            data = cursor.fetchone()
+
+        if not data:
+            return None
+        bank_atms, bank_offices, employees, users = data[-4:]
+        return BankInfoModel(
+            BankModel.from_row(data[:-4]),
+            self._models_from_json(BankAtmModel, bank_atms, float_fields=("maintenance_cost",)),
+            self._models_from_json(BankOfficeModel, bank_offices, float_fields=("rent_cost",)),
+            self._models_from_json(EmployeeModel, employees, ("birth_date",)),
+            self._models_from_json(UserModel, users, ("birth_date",)),
+        )
+
+    # Запросы пакетной загрузки: первая колонка - идентификатор банка, строки упорядочены по нему
+    BANKS_INFO_QUERIES = (
+        ("bank_atms", BankAtmModel,
+         "SELECT a.bank_id, a.* FROM atms a WHERE a.bank_id = ANY(%s) ORDER BY a.bank_id, a.atm_id"),
+        ("bank_offices", BankOfficeModel,
+         "SELECT o.bank_id, o.* FROM bank_offices o WHERE o.bank_id = ANY(%s) ORDER BY o.bank_id, o.bank_office_id"),
+        ("employees", EmployeeModel,
+         "SELECT e.bank_id, e.* FROM employees e WHERE e.bank_id = ANY(%s) ORDER BY e.bank_id, e.employee_id"),
+        ("users", UserModel,
+         f"""SELECT cb.bank_id, {User.COLUMNS} FROM user_banks cb JOIN users u ON u.user_id = cb.user_id
+             WHERE cb.bank_id = ANY(%s) ORDER BY cb.bank_id, u.user_id"""),
+    )
+
+    def get_all_info_about_banks(self, bank_ids, itersize=2000):
+        """
+        Потоково возвращает полную информацию о нескольких банках. Банкоматы, офисы, сотрудники
+        и клиенты всех банков читаются постоянным числом запросов (= ANY) через серверные курсоры
+        и группируются по банкам на стороне Python, поэтому в памяти находится только текущий банк.
 
-        print("bank_atms:", bank_atms, "\nbank_offices:", bank_offices, "\nemployees:", employees, "\nusers:", users)
+        :param bank_ids: Итерируемый объект идентификаторов банков.
+        :param itersize: Сколько строк серверный курсор получает за одно обращение.
+        :return: Генератор экземпляров BankInfoModel в порядке возрастания bank_id.
+        """
+        self._sync_counters()  # Переносим накопленные изменения счетчиков, если их набралось много
+        bank_ids = list(bank_ids)
+        with self.pool.connection() as connection, ExitStack() as stack:
+            banks = stack.enter_context(connection.cursor(name="bank_info_banks"))
+            banks.itersize = itersize
+            banks.execute(f"SELECT * FROM {self._banks} WHERE bank_id = ANY(%s) ORDER BY bank_id", (bank_ids,))
+
+            groups = {}
+            for name, model, query in self.BANKS_INFO_QUERIES:
+                cursor = stack.enter_context(connection.cursor(name=f"bank_info_{name}"))
+                cursor.itersize = itersize
+                cursor.execute(query, (bank_ids,))
+                groups[name] = (model, _PeekRows(cursor))
+
+            for data in banks:
+                bank = BankModel.from_row(data)
+                related = {}
+                for name, (model, rows) in groups.items():
+                    related[name] = [model.from_row(row[1:]) for row in rows.take(bank.bank_id)]
+                yield BankInfoModel(bank, **related)
+
+
+class _PeekRows:
+    """
+    Итератор курсора, упорядоченного по первой колонке, с просмотром следующей строки:
+    take возвращает подряд идущие строки с заданным ключом. Курсоры читают таблицы разными
+    запросами, поэтому в них могут оказаться строки банков, которых нет в выборке банков
+    (например, добавленных или удаленных между запросами); такие строки пропускаются.
+    """
+
+    def __init__(self, iterator):
+        self._iterator = iter(iterator)
+        self._next = next(self._iterator, None)
+
+    def take(self, key):
+        rows = []
+        while self._next is not None and self._next[0] <= key:
+            if self._next[0] == key:
+                rows.append(self._next)
+            self._next = next(self._iterator, None)
+        return rows
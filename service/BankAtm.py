@@ -1,146 +1,291 @@
+from db.ConnectionPool import as_pool
+from db.batch import add_counters, add_counters_from, insert_returning_ids, normalize_rows, update_rows
+from db.pagination import keyset_page
+from db.sql import update_columns, update_query
+from db.streaming import stream_rows
 from service.impl.IBankAtm import IBankAtm
 from entity.bankAtmModel import BankAtmModel
 
 
 class BankAtm(IBankAtm):
+    # Колонки таблицы (допустимые поля фильтров)
+    FIELDS = ("atm_id", "name", "address", "status", "bank_id", "bank_office_id", "employee_id",
+              "dispense_money", "accept_money", "money_in_atm", "maintenance_cost")
+
+    # Колонки, которые можно изменять методами update и update_many
+    UPDATE_FIELDS = FIELDS[1:]
+
+    # Параметры метода create в порядке следования (используются пакетными операциями)
+    CREATE_FIELDS = ("name", "status", "bank_id", "bank_office_id", "employee_id", "dispense_money",
+                     "accept_money", "maintenance_cost")
+
+    # DDL таблицы (используется синхронным и асинхронным сервисами)
+    TABLE_DDL = """
+        CREATE TABLE atms (
+            atm_id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            address VARCHAR(255) NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            bank_id INT NOT NULL,
+            bank_office_id INT NOT NULL,
+            employee_id INT NOT NULL,
+            dispense_money BOOLEAN NOT NULL,
+            accept_money BOOLEAN NOT NULL,
+            money_in_atm INT DEFAULT 0,
+            maintenance_cost FLOAT NOT NULL,
+            FOREIGN KEY (bank_id) REFERENCES banks(bank_id) ON DELETE CASCADE,
+            FOREIGN KEY (bank_office_id) REFERENCES bank_offices(bank_office_id) ON DELETE CASCADE,
+            FOREIGN KEY (employee_id) REFERENCES employees(employee_id) ON DELETE CASCADE
+        );
+    """
+
     def __init__(self, connection):
         """
         Инициализация класса BankAtm. Принимает объект connection для взаимодействия с базой данных.
+        Вместо подключения можно передать пул ConnectionPool: подключение берется на время каждой операции.
         """
-        self.connection = connection
+        self.pool = as_pool(connection)
 
     def create_table(self):
         """
         Создает таблицу 'atms' в базе данных для хранения информации о банкоматах.
         """
-        with self.connection.cursor() as cursor:
-            query = """
-                CREATE TABLE atms (
-                    atm_id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    address VARCHAR(255) NOT NULL,
-                    status VARCHAR(50) NOT NULL,
-                    bank_id INT NOT NULL,
-                    bank_office_id INT NOT NULL,
-                    employee_id INT NOT NULL,
-                    dispense_money BOOLEAN NOT NULL,
-                    accept_money BOOLEAN NOT NULL,
-                    money_in_atm INT DEFAULT 0,
-                    maintenance_cost FLOAT NOT NULL,
-                    FOREIGN KEY (bank_id) REFERENCES banks(bank_id) ON DELETE CASCADE,
-                    FOREIGN KEY (bank_office_id) REFERENCES bank_offices(bank_office_id) ON DELETE CASCADE,
-                    FOREIGN KEY (employee_id) REFERENCES employees(employee_id) ON DELETE CASCADE
-                );
-            """
-            cursor.execute(query)
-        self.connection.commit()
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(self.TABLE_DDL)
 
     def drop_table(self):
         """
         Удаляет таблицу 'atms' вместе с её зависимостями.
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = """
-                DROP TABLE atms CASCADE;
+                DROP TABLE IF EXISTS atms CASCADE;
             """
             cursor.execute(query)
-        self.connection.commit()
 
     def create(self, name, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money,
                maintenance_cost):
         """
         Создает новый банкомат, добавляет его в базу данных и возвращает объект модели AtmModel.
+        Адрес берется из офиса тем же запросом, который вставляет банкомат и сгруппированно
+        увеличивает счетчики банкоматов офиса и банка.
+
+        :return: Экземпляр BankAtmModel или None, если банка или офиса не существует
         """
-        with self.connection.cursor() as cursor:
-            # Получаем адрес офиса банка
-            query = "SELECT address FROM bank_offices WHERE bank_office_id = %s"
-            cursor.execute(query, (bank_office_id,))
-            address = cursor.fetchone()[0]
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Получаем количество денег в банке (из кэша метаданных банков)
+            bank = self.pool.bank_cache.get_by_id(cursor, bank_id)
+            if bank is None:
+                return None
+
+            # Вставляем банкомат с адресом офиса; для несуществующего офиса строка не вставляется
+            query = f"""
+                WITH created AS (
+                    INSERT INTO atms (name, address, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money, money_in_atm, maintenance_cost)
+                    SELECT %s, o.address, %s, %s, o.bank_office_id, %s, %s, %s, %s, %s
+                    FROM bank_offices o WHERE o.bank_office_id = %s
+                    RETURNING atm_id, address, bank_id, bank_office_id
+                ),
+                offices AS ({add_counters_from("bank_offices", "bank_office_id", "num_atms", "created")}),
+                banks AS ({self.pool.counters.add_from("num_atms", "created")})
+                SELECT atm_id, address FROM created
+            """
+            self.pool.statements.execute(cursor, "atm_create", query, (
+                name, status, bank_id, employee_id, dispense_money, accept_money, bank.total_money, maintenance_cost,
+                bank_office_id))
+            data = cursor.fetchone()
+            self.pool.counters.applied()
 
-            # Получаем количество денег в банке
-            query = "SELECT total_money FROM banks WHERE bank_id = %s"
-            cursor.execute(query, (bank_id,))
-            total_money = cursor.fetchone()[0]
+        if data is None:
+            return None
+        atm_id, address = data
 
-            # Вставляем данные банкомата
+        # Возвращаем экземпляр модели с данными нового банкомата
+        atm = BankAtmModel(atm_id, name, address, status, bank_id, bank_office_id, employee_id, dispense_money,
+                           accept_money, bank.total_money, maintenance_cost)
+        identity = self.pool.identity_map()
+        identity.expire("bank_offices", bank_office_id)  # Изменилось количество банкоматов офиса
+        return identity.add("atms", atm.atm_id, atm)
+
+    def create_many(self, atms):
+        """
+        Создает несколько банкоматов одним многострочным INSERT в одной транзакции.
+        Адреса офисов и деньги банков читаются по одному запросу на таблицу,
+        счетчики банкоматов обновляются сгруппированными UPDATE.
+
+        :param atms: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров BankAtmModel в порядке входных данных
+        """
+        rows = normalize_rows(atms, self.CREATE_FIELDS)
+        if not rows:
+            return []
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Получаем адреса офисов и количество денег в банках
+            cursor.execute("SELECT bank_office_id, address FROM bank_offices WHERE bank_office_id = ANY(%s)",
+                           (list({row[3] for row in rows}),))
+            addresses = dict(cursor.fetchall())
+            banks = self.pool.bank_cache.get_many_by_id(cursor, [row[2] for row in rows])
+            total_money = {bank_id: bank.total_money for bank_id, bank in banks.items()}
+
+            values = [
+                (name, addresses[bank_office_id], status, bank_id, bank_office_id, employee_id, dispense_money,
+                 accept_money, total_money[bank_id], maintenance_cost)
+                for (name, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money,
+                     maintenance_cost) in rows
+            ]
             query = """
                 INSERT INTO atms (name, address, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money, money_in_atm, maintenance_cost)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING atm_id
+                VALUES %s RETURNING atm_id
             """
-            cursor.execute(query, (
-                name, address, status, bank_id, bank_office_id, employee_id, dispense_money, accept_money, total_money,
-                maintenance_cost))
-            atm_id = cursor.fetchone()[0]
+            atm_ids = insert_returning_ids(cursor, query, values)
 
-            # Обновляем количество банкоматов в банке и офисе
-            cursor.execute("UPDATE banks SET num_atms = num_atms + 1 WHERE bank_id = %s", (bank_id,))
-            cursor.execute("UPDATE bank_offices SET num_atms = num_atms + 1 WHERE bank_office_id = %s",
-                           (bank_office_id,))
+            # Обновляем количество банкоматов в банках и офисах
+            self.pool.counters.add(cursor, "num_atms", [row[2] for row in rows])
+            add_counters(cursor, "bank_offices", "bank_office_id", "num_atms", [row[3] for row in rows])
 
-        self.connection.commit()
-
-        # Возвращаем экземпляр модели с данными нового банкомата
-        return BankAtmModel(atm_id, name, address, status, bank_id, bank_office_id, employee_id, dispense_money,
-                            accept_money, total_money, maintenance_cost)
+        atms = [BankAtmModel(atm_id, *row) for atm_id, row in zip(atm_ids, values)]
+        identity = self.pool.identity_map()
+        for bank_office_id in {row[3] for row in rows}:
+            identity.expire("bank_offices", bank_office_id)  # Изменилось количество банкоматов офиса
+        return identity.add_all("atms", "atm_id", atms)
 
     def read(self, atm_id):
         """
         Возвращает данные о банкомате в виде объекта модели AtmModel по его идентификатору.
         """
-        with self.connection.cursor() as cursor:
+        identity = self.pool.identity_map()
+        atm = identity.get("atms", atm_id)  # Банкомат, уже загруженный в текущей единице работы
+        if atm is not None:
+            return atm
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM atms WHERE atm_id = %s"
-            cursor.execute(query, (atm_id,))
+            self.pool.statements.execute(cursor, "atm_read", query, (atm_id,))
             data = cursor.fetchone()
 
             if data:
-                return BankAtmModel(*data)  # Возвращаем объект модели с данными банкомата
+                # Возвращаем объект модели с данными банкомата
+                return identity.add("atms", atm_id, BankAtmModel.from_row(data))
             return None
 
     def list(self):
         """
         Возвращает список всех банкоматов в виде объектов модели AtmModel.
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM atms"
             cursor.execute(query)
             atms_data = cursor.fetchall()
 
             # Возвращаем список объектов модели
-            return [BankAtmModel(*data) for data in atms_data]
+            atms = [BankAtmModel.from_row(data) for data in atms_data]
+            return self.pool.identity_map().add_all("atms", "atm_id", atms)
+
+    def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все банкоматы через серверный курсор, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Генератор экземпляров BankAtmModel
+        """
+        for data in stream_rows(self.pool, "SELECT * FROM atms", batch_size=batch_size):
+            yield BankAtmModel.from_row(data)
+
+    def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает страницу банкоматов методом keyset: следующая страница начинается после
+        идентификатора из токена продолжения, поэтому время ответа не зависит от глубины.
+
+        :param after_id: Токен продолжения предыдущей страницы (None - первая страница)
+        :param limit: Максимальное количество записей на странице
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :return: Экземпляр PageModel с моделями BankAtmModel и токеном следующей страницы
+        """
+        return keyset_page(self.pool, "SELECT * FROM atms", "atm_id", BankAtmModel, self.FIELDS,
+                           after_id, limit, filters)
 
     def update(self, atm_id, **kwargs):
         """
         Обновляет данные банкомата по его идентификатору и возвращает обновленный объект модели AtmModel.
+        :return: Экземпляр BankAtmModel с новыми данными или None, если банкомат не найден
         """
-        fields = ", ".join([f"{key} = %s" for key in kwargs.keys()])
-        query = f"UPDATE atms SET {fields} WHERE atm_id = %s"
-        params = list(kwargs.values()) + [atm_id]
+        columns = update_columns("atms", self.UPDATE_FIELDS, kwargs)  # Имена колонок подставляются в SQL
+        if not columns:
+            return self.read(atm_id)
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Новые значения строки возвращаются тем же запросом
+            cursor.execute(update_query("atms", "atm_id", columns), [*kwargs.values(), atm_id])
+            data = cursor.fetchone()
+
+        if data is None:
+            return None
+        # Уже выданный экземпляр банкомата обновляется на месте
+        return self.pool.identity_map().add("atms", atm_id, BankAtmModel.from_row(data))
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)
-        self.connection.commit()
+    def update_many(self, updates):
+        """
+        Обновляет несколько банкоматов своими значениями для каждого: одним запросом
+        UPDATE ... FROM (VALUES ...) ... RETURNING на каждый набор изменяемых колонок.
 
-        # Возвращаем обновленный объект модели после обновления
-        return self.read(atm_id)
+        :param updates: Словарь {идентификатор: {колонка: значение}} или пары (идентификатор, словарь)
+        :return: Список экземпляров BankAtmModel с новыми данными в порядке updates (только найденные)
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            rows, ids = update_rows(cursor, "atms", "atm_id", self.UPDATE_FIELDS, updates)
+        atms = [BankAtmModel.from_row(rows[atm_id]) for atm_id in ids if atm_id in rows]
+        return self.pool.identity_map().add_all("atms", "atm_id", atms)
 
     def delete(self, atm_id):
         """
         Удаляет банкомат по его идентификатору и обновляет информацию о количестве банкоматов в банке и офисе.
         """
-        with self.connection.cursor() as cursor:
-            # Получаем идентификаторы банка и офиса
-            query = "SELECT bank_id, bank_office_id FROM atms WHERE atm_id=%s"
-            cursor.execute(query, (atm_id,))
-            bank_id, bank_office_id = cursor.fetchone()
-
-            # Обновляем количество банкоматов в банке и офисе
-            cursor.execute("UPDATE banks SET num_atms = num_atms - 1 WHERE bank_id = %s", (bank_id,))
-            cursor.execute("UPDATE bank_offices SET num_atms = num_atms - 1 WHERE bank_office_id = %s",
-                           (bank_office_id,))
-
-            # Удаляем банкомат
-            cursor.execute("DELETE FROM atms WHERE atm_id = %s", (atm_id,))
-        self.connection.commit()
+        self.delete_many([atm_id])
 
         # Возвращаем подтверждение удаления
         return f"ATM with ID {atm_id} deleted."
+
+    def delete_many(self, atm_ids):
+        """
+        Удаляет несколько банкоматов одним запросом: строки удаляются по = ANY, а количество банкоматов
+        в банках и офисах уменьшается сгруппированными UPDATE в том же запросе.
+
+        :param atm_ids: Итерируемый объект идентификаторов банкоматов
+        :return: Количество удаленных банкоматов
+        """
+        atm_ids = list(atm_ids)
+        if not atm_ids:
+            return 0
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = f"""
+                WITH {self.deleted_atms("atm_id = ANY(%s)")},
+                deleted_banks AS ({self.pool.counters.add_from("num_atms", "deleted_atms", -1)})
+                SELECT atm_id, bank_office_id FROM deleted_atms
+            """
+            cursor.execute(query, (atm_ids,))
+            deleted = cursor.fetchall()
+            self.pool.counters.applied()
+
+        identity = self.pool.identity_map()
+        for atm_id, bank_office_id in deleted:
+            identity.discard("atms", atm_id)
+            identity.expire("bank_offices", bank_office_id)  # Изменилось количество банкоматов офиса
+        return len(deleted)
+
+    @staticmethod
+    def deleted_atms(condition, update_offices=True):
+        """
+        Возвращает CTE, которые удаляют банкоматы по условию и уменьшают количество банкоматов
+        их офисов сгруппированным UPDATE. Удаленные строки (atm_id, bank_id, bank_office_id)
+        доступны остальному запросу как CTE deleted_atms; счетчики банков изменяет вызывающий запрос.
+
+        :param condition: Условие WHERE для таблицы 'atms' (с параметрами %s)
+        :param update_offices: Уменьшать ли num_atms офисов (не нужно, если офисы удаляются тем же запросом)
+        """
+        ctes = [f"deleted_atms AS (DELETE FROM atms WHERE {condition} RETURNING atm_id, bank_id, bank_office_id)"]
+        if update_offices:
+            ctes.append("deleted_atms_offices AS "
+                        f"({add_counters_from('bank_offices', 'bank_office_id', 'num_atms', 'deleted_atms', -1)})")
+        return ", ".join(ctes)
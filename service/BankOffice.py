@@ -1,13 +1,51 @@
+from db.ConnectionPool import as_pool
+from db.batch import insert_returning_ids, normalize_rows, update_rows
+from db.pagination import keyset_page
+from db.sql import update_columns, update_query
+from db.streaming import stream_rows
+from service.BankAtm import BankAtm
 from service.impl.IBankOffice import IBankOffice
 from entity.bankOfficeModel import BankOfficeModel
 
 
 class BankOffice(IBankOffice):
+    # Колонки таблицы (допустимые поля фильтров)
+    FIELDS = ("bank_office_id", "name", "address", "status", "can_place_atm", "num_atms",
+              "can_provide_credit", "dispense_money", "accept_money", "money_in_office", "rent_cost",
+              "bank_id")
+
+    # Колонки, которые можно изменять методами update и update_many
+    UPDATE_FIELDS = FIELDS[1:]
+
+    # Параметры метода create в порядке следования (используются пакетными операциями)
+    CREATE_FIELDS = ("name", "address", "status", "can_place_atm", "can_provide_credit", "dispense_money",
+                     "accept_money", "rent_cost", "bank_id")
+
+    # DDL таблицы (используется синхронным и асинхронным сервисами)
+    TABLE_DDL = """
+        CREATE TABLE bank_offices (
+            bank_office_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор офиса банка (генерируется автоматически)
+            name VARCHAR(255) NOT NULL,  -- Название офиса
+            address VARCHAR(255) NOT NULL,  -- Адрес офиса
+            status VARCHAR(50) NOT NULL,  -- Текущий статус офиса (например, работает или закрыт)
+            can_place_atm BOOLEAN NOT NULL,  -- Возможность установки банкомата (True или False)
+            num_atms INT DEFAULT 0,  -- Количество банкоматов в офисе (по умолчанию 0)
+            can_provide_credit BOOLEAN NOT NULL,  -- Возможность предоставления кредита (True или False)
+            dispense_money BOOLEAN NOT NULL,  -- Возможность выдачи денег (True или False)
+            accept_money BOOLEAN NOT NULL,  -- Возможность приема денег (True или False)
+            money_in_office INT DEFAULT 0,  -- Количество денег в офисе (по умолчанию 0)
+            rent_cost FLOAT NOT NULL,  -- Затраты на аренду офиса
+            bank_id INT NOT NULL,  -- Идентификатор банка (ссылка на таблицу 'banks')
+            FOREIGN KEY (bank_id) REFERENCES banks(bank_id) ON DELETE CASCADE  -- Внешний ключ на банк
+        );
+    """
+
     def __init__(self, connection):
         """
         Инициализация класса BankOffice. Принимает объект connection для взаимодействия с базой данных.
+        Вместо подключения можно передать пул ConnectionPool: подключение берется на время каждой операции.
         """
-        self.connection = connection
+        self.pool = as_pool(connection)
 
     def create_table(self):
         """
@@ -15,38 +53,18 @@ class BankOffice(IBankOffice):
         такие как: название, адрес, статус, возможность установки банкомата, количество банкоматов,
         возможность выдачи кредита, выдачи и приема денег, аренда офиса и ссылка на таблицу банка.
         """
-        with self.connection.cursor() as cursor:
-            # SQL запрос для создания таблицы 'bank_offices'
-            query = """
-                    CREATE TABLE bank_offices (
-                        bank_office_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор офиса банка (генерируется автоматически)
-                        name VARCHAR(255) NOT NULL,  -- Название офиса
-                        address VARCHAR(255) NOT NULL,  -- Адрес офиса
-                        status VARCHAR(50) NOT NULL,  -- Текущий статус офиса (например, работает или закрыт)
-                        can_place_atm BOOLEAN NOT NULL,  -- Возможность установки банкомата (True или False)
-                        num_atms INT DEFAULT 0,  -- Количество банкоматов в офисе (по умолчанию 0)
-                        can_provide_credit BOOLEAN NOT NULL,  -- Возможность предоставления кредита (True или False)
-                        dispense_money BOOLEAN NOT NULL,  -- Возможность выдачи денег (True или False)
-                        accept_money BOOLEAN NOT NULL,  -- Возможность приема денег (True или False)
-                        money_in_office INT DEFAULT 0,  -- Количество денег в офисе (по умолчанию 0)
-                        rent_cost FLOAT NOT NULL,  -- Затраты на аренду офиса
-                        bank_id INT NOT NULL,  -- Идентификатор банка (ссылка на таблицу 'banks')
-                        FOREIGN KEY (bank_id) REFERENCES banks(bank_id) ON DELETE CASCADE  -- Внешний ключ на банк
-                    );
-                """
-            cursor.execute(query)  # Выполнение запроса на создание таблицы
-        self.connection.commit()  # Применение изменений
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(self.TABLE_DDL)  # Выполнение запроса на создание таблицы
 
     def drop_table(self):
         """
         Удаляет таблицу 'bank_offices' вместе с её зависимостями.
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = """
-                DROP TABLE bank_offices CASCADE;
+                DROP TABLE IF EXISTS bank_offices CASCADE;
             """
             cursor.execute(query)  # Выполнение запроса на удаление таблицы
-        self.connection.commit()  # Применение изменений
 
     def create(self, name, address, status, can_place_atm, can_provide_credit, dispense_money,
                accept_money, rent_cost, bank_id):
@@ -63,13 +81,10 @@ class BankOffice(IBankOffice):
         :param rent_cost: Затраты на аренду офиса
         :param bank_id: Идентификатор банка
         """
-        with self.connection.cursor() as cursor:
-            # Получаем количество денег в банке по идентификатору банка
-            query = """
-                SELECT total_money FROM banks WHERE bank_id = %s
-            """
-            cursor.execute(query, (bank_id,))
-            total_money = cursor.fetchone()  # Получаем результат запроса
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Получаем количество денег в банке по идентификатору банка (из кэша метаданных банков)
+            bank = self.pool.bank_cache.get_by_id(cursor, bank_id)
+            total_money = bank.total_money if bank else None
 
             # Вставляем новую запись об офисе в таблицу 'bank_offices'
             query = """
@@ -77,20 +92,53 @@ class BankOffice(IBankOffice):
                 VALUES (%s, %s, %s, %s, 0, %s, %s, %s, %s, %s, %s)
                 RETURNING bank_office_id
             """
-            cursor.execute(query, (
+            self.pool.statements.execute(cursor, "bank_office_create", query, (
                 name, address, status, can_place_atm, can_provide_credit, dispense_money, accept_money, total_money,
                 rent_cost, bank_id))
             bank_office_id = cursor.fetchone()[0]
 
             # Обновляем количество офисов в банке
+            self.pool.counters.add(cursor, "num_offices", [bank_id])
+
+        office = BankOfficeModel(bank_office_id, name, address, status, can_place_atm, 0, can_provide_credit,
+                                 dispense_money, accept_money, total_money, rent_cost, bank_id)
+        return self.pool.identity_map().add("bank_offices", office.bank_office_id, office)
+
+    def create_many(self, offices):
+        """
+        Создает несколько офисов одним многострочным INSERT в одной транзакции.
+        Деньги банков читаются одним запросом, счетчики офисов обновляются одним сгруппированным UPDATE.
+
+        :param offices: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров BankOfficeModel в порядке входных данных
+        """
+        rows = normalize_rows(offices, self.CREATE_FIELDS)
+        if not rows:
+            return []
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Получаем количество денег для всех затронутых банков (промахи кэша - одним запросом)
+            banks = self.pool.bank_cache.get_many_by_id(cursor, [row[-1] for row in rows])
+            total_money = {bank_id: bank.total_money for bank_id, bank in banks.items()}
+
+            values = [
+                (name, address, status, can_place_atm, 0, can_provide_credit, dispense_money, accept_money,
+                 total_money.get(bank_id), rent_cost, bank_id)
+                for (name, address, status, can_place_atm, can_provide_credit, dispense_money, accept_money,
+                     rent_cost, bank_id) in rows
+            ]
             query = """
-                UPDATE banks SET num_offices = num_offices + 1 WHERE bank_id = %s
+                INSERT INTO bank_offices (name, address, status, can_place_atm, num_atms, can_provide_credit, dispense_money, accept_money, money_in_office, rent_cost, bank_id)
+                VALUES %s
+                RETURNING bank_office_id
             """
-            cursor.execute(query, (bank_id,))
-        self.connection.commit()  # Применение изменений
+            office_ids = insert_returning_ids(cursor, query, values)
+
+            # Обновляем количество офисов в банках
+            self.pool.counters.add(cursor, "num_offices", [row[-1] for row in rows])
 
-        return BankOfficeModel(bank_office_id, name, address, status, can_place_atm, can_provide_credit,
-                               dispense_money, accept_money, total_money, rent_cost, bank_id)
+        offices = [BankOfficeModel(office_id, *row) for office_id, row in zip(office_ids, values)]
+        return self.pool.identity_map().add_all("bank_offices", "bank_office_id", offices)
 
     def read(self, office_id):
         """
@@ -99,14 +147,19 @@ class BankOffice(IBankOffice):
         :param office_id: Идентификатор офиса
         :return: Данные об офисе в виде кортежа или None, если офис не найден
         """
-        with self.connection.cursor() as cursor:
+        identity = self.pool.identity_map()
+        office = identity.get("bank_offices", office_id)  # Офис, уже загруженный в текущей единице работы
+        if office is not None:
+            return office
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM bank_offices WHERE bank_office_id = %s"
-            cursor.execute(query, (office_id,))
+            self.pool.statements.execute(cursor, "bank_office_read", query, (office_id,))
             data = cursor.fetchone()  # Получение первой записи
 
             # Если банк найден, возвращаем экземпляр модели BankModel
             if data:
-                return BankOfficeModel(*data)
+                return identity.add("bank_offices", office_id, BankOfficeModel.from_row(data))
             return None
 
     def list(self):
@@ -115,13 +168,37 @@ class BankOffice(IBankOffice):
 
         :return: Список всех офисов банка в виде кортежей
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM bank_offices"
             cursor.execute(query)  # Выполнение запроса для получения всех офисов
             banks_office_data = cursor.fetchall()  # Получение всех записей
 
             # Возвращаем список экземпляров моделей BankOfficeModel для каждого банка
-            return [BankOfficeModel(*data) for data in banks_office_data]
+            offices = [BankOfficeModel.from_row(data) for data in banks_office_data]
+            return self.pool.identity_map().add_all("bank_offices", "bank_office_id", offices)
+
+    def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все офисы банков через серверный курсор, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Генератор экземпляров BankOfficeModel
+        """
+        for data in stream_rows(self.pool, "SELECT * FROM bank_offices", batch_size=batch_size):
+            yield BankOfficeModel.from_row(data)
+
+    def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает страницу офисов банков методом keyset: следующая страница начинается после
+        идентификатора из токена продолжения, поэтому время ответа не зависит от глубины.
+
+        :param after_id: Токен продолжения предыдущей страницы (None - первая страница)
+        :param limit: Максимальное количество записей на странице
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :return: Экземпляр PageModel с моделями BankOfficeModel и токеном следующей страницы
+        """
+        return keyset_page(self.pool, "SELECT * FROM bank_offices", "bank_office_id", BankOfficeModel, self.FIELDS,
+                           after_id, limit, filters)
 
     def update(self, office_id, **kwargs):
         """
@@ -129,17 +206,34 @@ class BankOffice(IBankOffice):
 
         :param office_id: Идентификатор офиса
         :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :return: Экземпляр BankOfficeModel с новыми данными или None, если офис не найден
         """
-        # Формируем строку полей для обновления
-        fields = ", ".join([f"{key} = %s" for key in kwargs.keys()])
-        query = f"UPDATE bank_offices SET {fields} WHERE bank_office_id = %s"
-        params = list(kwargs.values()) + [office_id]  # Параметры для запроса
+        columns = update_columns("bank_offices", self.UPDATE_FIELDS, kwargs)  # Имена колонок подставляются в SQL
+        if not columns:
+            return self.read(office_id)
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)  # Выполнение запроса на обновление
-        self.connection.commit()  # Применение изменений
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Новые значения строки возвращаются тем же запросом
+            cursor.execute(update_query("bank_offices", "bank_office_id", columns), [*kwargs.values(), office_id])
+            data = cursor.fetchone()
 
-        return self.read(office_id)
+        if data is None:
+            return None
+        # Уже выданный экземпляр офиса обновляется на месте
+        return self.pool.identity_map().add("bank_offices", office_id, BankOfficeModel.from_row(data))
+
+    def update_many(self, updates):
+        """
+        Обновляет несколько офисов своими значениями для каждого: одним запросом
+        UPDATE ... FROM (VALUES ...) ... RETURNING на каждый набор изменяемых колонок.
+
+        :param updates: Словарь {идентификатор: {колонка: значение}} или пары (идентификатор, словарь)
+        :return: Список экземпляров BankOfficeModel с новыми данными в порядке updates (только найденные)
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            rows, ids = update_rows(cursor, "bank_offices", "bank_office_id", self.UPDATE_FIELDS, updates)
+        offices = [BankOfficeModel.from_row(rows[office_id]) for office_id in ids if office_id in rows]
+        return self.pool.identity_map().add_all("bank_offices", "bank_office_id", offices)
 
     def delete(self, office_id):
         """
@@ -147,21 +241,38 @@ class BankOffice(IBankOffice):
 
         :param office_id: Идентификатор офиса
         """
-        with self.connection.cursor() as cursor:
-            # Получаем идентификатор банка, к которому привязан офис
-            query = "SELECT bank_id FROM bank_offices WHERE bank_office_id = %s"
-            cursor.execute(query, (office_id,))
-            bank_id = cursor.fetchone()  # Получаем результат запроса
+        self.delete_many([office_id])
+        return f"Office with ID {office_id} deleted."
 
-            # Уменьшаем количество офисов в банке
-            query = """
-                UPDATE banks SET num_offices = num_offices - 1 WHERE bank_id = %s
-            """
-            cursor.execute(query, (bank_id,))
+    def delete_many(self, office_ids):
+        """
+        Закрывает несколько офисов одним запросом: удаляются офисы и их банкоматы (= ANY), количество
+        офисов и банкоматов в банках уменьшается сгруппированными UPDATE в том же запросе,
+        у сотрудников офисов снимается привязка к офису (ON DELETE SET NULL).
 
-            # Удаляем офис
-            query = "DELETE FROM bank_offices WHERE bank_office_id = %s"
-            cursor.execute(query, (office_id,))
-        self.connection.commit()  # Применение изменений
+        :param office_ids: Итерируемый объект идентификаторов офисов
+        :return: Количество удаленных офисов
+        """
+        office_ids = list(office_ids)
+        if not office_ids:
+            return 0
 
-        return f"Office with ID {office_id} deleted."
+        # Счетчики банков изменяются одним оператором сразу для удаленных строк и их банкоматов
+        update_banks = self.pool.counters.add_from_many({"num_offices": "deleted", "num_atms": "deleted_atms"}, -1)
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = f"""
+                WITH {BankAtm.deleted_atms("bank_office_id = ANY(%s)", update_offices=False)},
+                deleted AS (DELETE FROM bank_offices WHERE bank_office_id = ANY(%s) RETURNING bank_office_id, bank_id),
+                deleted_banks AS ({update_banks})
+                SELECT bank_office_id FROM deleted
+            """
+            cursor.execute(query, (office_ids, office_ids))
+            deleted = cursor.fetchall()
+            self.pool.counters.applied()
+
+        identity = self.pool.identity_map()
+        for (office_id,) in deleted:
+            identity.discard("bank_offices", office_id)
+        identity.clear("atms")  # Банкоматы офисов удалены
+        identity.expire_all("employees")  # У сотрудников офисов снят bank_office_id
+        return len(deleted)
@@ -1,13 +1,68 @@
+from types import MappingProxyType
+
+import numpy as np
+
+from analytics.AmortizationEngine import AmortizationEngine
+from db.ConnectionPool import as_pool
+from db.IndexManager import Lookup
+from db.batch import insert_returning_ids, normalize_rows, update_rows
+from db.columnar import fetch_table_columns, group_mean, group_sum
+from db.pagination import keyset_page
+from db.sql import update_columns, update_query
+from db.streaming import stream_rows
 from service.impl.ICreditAccount import ICreditAccount
 from entity.creditAccountModel import CreditAccountModel
 
 
 class CreditAccount(ICreditAccount):
+    # Колонки таблицы (допустимые поля фильтров)
+    FIELDS = ("credit_account_id", "user_id", "bank_name", "start_date", "end_date", "loan_duration_months",
+              "loan_amount", "monthly_payment", "interest_rate", "employee_id", "payment_account_id")
+
+    # Колонки, которые можно изменять методами update и update_many
+    UPDATE_FIELDS = FIELDS[1:]
+
+    # Параметры метода create в порядке следования (используются пакетными операциями)
+    CREATE_FIELDS = ("user_id", "bank_name", "start_date", "end_date", "loan_duration_months", "loan_amount",
+                     "monthly_payment", "employee_id", "payment_account_id")
+
+    # Типы массивов NumPy для колоночного чтения (columns)
+    COLUMN_DTYPES = MappingProxyType({
+        "credit_account_id": "int64", "user_id": "int64", "bank_name": str,
+        "start_date": "datetime64[D]", "end_date": "datetime64[D]", "loan_duration_months": "int32",
+        "loan_amount": "float64", "monthly_payment": "float64", "interest_rate": "float64",
+        "employee_id": "int64", "payment_account_id": "int64",
+    })
+
+    # Поиск этого сервиса, не следующий из внешних ключей DDL (проверяется IndexManager.missing_indexes)
+    LOOKUPS = (Lookup("CreditAccount.create", "banks", ("name",)),)
+
+    # DDL таблицы (используется синхронным и асинхронным сервисами)
+    TABLE_DDL = """
+        CREATE TABLE credit_accounts (
+            credit_account_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор кредитного счета (генерируется автоматически)
+            user_id INT NOT NULL,  -- Идентификатор пользователя (внешний ключ)
+            bank_name VARCHAR(255) NOT NULL,  -- Название банка
+            start_date DATE NOT NULL,  -- Дата начала кредита
+            end_date DATE,  -- Дата окончания кредита (может быть NULL для незакрытых счетов)
+            loan_duration_months INTEGER NOT NULL,  -- Продолжительность кредита в месяцах
+            loan_amount FLOAT NOT NULL,  -- Сумма кредита
+            monthly_payment FLOAT NOT NULL,  -- Ежемесячный платеж
+            interest_rate FLOAT NOT NULL,  -- Процентная ставка
+            employee_id INT NOT NULL,  -- Идентификатор сотрудника, который открыл кредит (внешний ключ)
+            payment_account_id INT NOT NULL,  -- Идентификатор связанного платежного счета (внешний ключ)
+            FOREIGN KEY (user_id) REFERENCES users(user_id),  -- Ссылка на пользователя
+            FOREIGN KEY (employee_id) REFERENCES employees(employee_id),  -- Ссылка на сотрудника
+            FOREIGN KEY (payment_account_id) REFERENCES payment_accounts(payment_account_id)  -- Ссылка на платежный счет
+        );
+    """
+
     def __init__(self, connection):
         """
         Инициализация класса CreditAccount. Принимает объект connection для работы с базой данных.
+        Вместо подключения можно передать пул ConnectionPool: подключение берется на время каждой операции.
         """
-        self.connection = connection
+        self.pool = as_pool(connection)
 
     def create_table(self):
         """
@@ -16,39 +71,18 @@ class CreditAccount(ICreditAccount):
         продолжительность кредита в месяцах, сумму кредита, ежемесячные платежи, процентную ставку,
         идентификаторы сотрудника и связанного платежного счета.
         """
-        with self.connection.cursor() as cursor:
-            # SQL-запрос для создания таблицы 'credit_accounts'
-            query = '''
-            CREATE TABLE credit_accounts (
-                credit_account_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор кредитного счета (генерируется автоматически)
-                user_id INT NOT NULL,  -- Идентификатор пользователя (внешний ключ)
-                bank_name VARCHAR(255) NOT NULL,  -- Название банка
-                start_date DATE NOT NULL,  -- Дата начала кредита
-                end_date DATE,  -- Дата окончания кредита (может быть NULL для незакрытых счетов)
-                loan_duration_months INTEGER NOT NULL,  -- Продолжительность кредита в месяцах
-                loan_amount FLOAT NOT NULL,  -- Сумма кредита
-                monthly_payment FLOAT NOT NULL,  -- Ежемесячный платеж
-                interest_rate FLOAT NOT NULL,  -- Процентная ставка
-                employee_id INT NOT NULL,  -- Идентификатор сотрудника, который открыл кредит (внешний ключ)
-                payment_account_id INT NOT NULL,  -- Идентификатор связанного платежного счета (внешний ключ)
-                FOREIGN KEY (user_id) REFERENCES users(user_id),  -- Ссылка на пользователя
-                FOREIGN KEY (employee_id) REFERENCES employees(employee_id),  -- Ссылка на сотрудника
-                FOREIGN KEY (payment_account_id) REFERENCES payment_accounts(payment_account_id)  -- Ссылка на платежный счет
-            );
-            '''
-            cursor.execute(query)  # Выполняем SQL-запрос для создания таблицы
-        self.connection.commit()  # Сохраняем изменения в базе данных
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(self.TABLE_DDL)  # Выполняем SQL-запрос для создания таблицы
 
     def drop_table(self):
         """
         Удаляет таблицу 'credit_accounts' вместе с зависимыми объектами.
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = """
-                DROP TABLE credit_accounts CASCADE;
+                DROP TABLE IF EXISTS credit_accounts CASCADE;
             """
             cursor.execute(query)  # Выполняем SQL-запрос для удаления таблицы
-        self.connection.commit()  # Сохраняем изменения
 
     def create(self, user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount,
                monthly_payment, employee_id, payment_account_id):
@@ -65,13 +99,10 @@ class CreditAccount(ICreditAccount):
         :param employee_id: Идентификатор сотрудника, который оформил кредит
         :param payment_account_id: Идентификатор связанного платежного счета
         """
-        with self.connection.cursor() as cursor:
-            # Получаем процентную ставку по названию банка
-            query = """
-                SELECT interest_rate FROM banks WHERE name = %s
-            """
-            cursor.execute(query, (bank_name,))
-            interest_rate = cursor.fetchone()  # Получаем процентную ставку из запроса
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Получаем процентную ставку по названию банка (из кэша метаданных банков)
+            bank = self.pool.bank_cache.get_by_name(cursor, bank_name)
+            interest_rate = bank.interest_rate if bank else None
 
             # Вставляем новую запись о кредитном счете в таблицу 'credit_accounts'
             query = """
@@ -80,13 +111,48 @@ class CreditAccount(ICreditAccount):
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 RETURNING credit_account_id
             """
-            cursor.execute(query, (
+            self.pool.statements.execute(cursor, "credit_account_create", query, (
                 user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount,
                 monthly_payment, interest_rate, employee_id, payment_account_id))
             credit_accounts_id = cursor.fetchone()[0]
-        self.connection.commit()  # Сохраняем изменения
-        return CreditAccountModel(credit_accounts_id, user_id, bank_name, start_date, end_date, loan_duration_months,
-                                  loan_amount, monthly_payment, interest_rate, employee_id, payment_account_id)
+        account = CreditAccountModel(credit_accounts_id, user_id, bank_name, start_date, end_date, loan_duration_months,
+                                     loan_amount, monthly_payment, interest_rate, employee_id, payment_account_id)
+        return self.pool.identity_map().add("credit_accounts", account.credit_account_id, account)
+
+    def create_many(self, credit_accounts):
+        """
+        Создает несколько кредитных счетов одним многострочным INSERT в одной транзакции.
+        Процентные ставки всех упомянутых банков читаются одним запросом.
+
+        :param credit_accounts: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров CreditAccountModel в порядке входных данных
+        """
+        rows = normalize_rows(credit_accounts, self.CREATE_FIELDS)
+        if not rows:
+            return []
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Получаем процентные ставки по названиям банков (промахи кэша - одним запросом)
+            banks = self.pool.bank_cache.get_many_by_name(cursor, [row[1] for row in rows])
+            interest_rates = {name: bank.interest_rate for name, bank in banks.items()}
+
+            values = [
+                (user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount, monthly_payment,
+                 interest_rates.get(bank_name), employee_id, payment_account_id)
+                for (user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount, monthly_payment,
+                     employee_id, payment_account_id) in rows
+            ]
+            query = """
+                INSERT INTO credit_accounts (user_id, bank_name, start_date, end_date, loan_duration_months, loan_amount, 
+                                             monthly_payment, interest_rate, employee_id, payment_account_id)
+                VALUES %s
+                RETURNING credit_account_id
+            """
+            credit_account_ids = insert_returning_ids(cursor, query, values)
+
+        accounts = [CreditAccountModel(credit_account_id, *row)
+                    for credit_account_id, row in zip(credit_account_ids, values)]
+        return self.pool.identity_map().add_all("credit_accounts", "credit_account_id", accounts)
 
     def read(self, credit_account_id):
         """
@@ -95,13 +161,18 @@ class CreditAccount(ICreditAccount):
         :param credit_account_id: Идентификатор кредитного счета
         :return: Данные о кредитном счете в виде кортежа или None, если счет не найден
         """
-        with self.connection.cursor() as cursor:
+        identity = self.pool.identity_map()
+        account = identity.get("credit_accounts", credit_account_id)  # Счет, уже загруженный в текущей единице работы
+        if account is not None:
+            return account
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM credit_accounts WHERE credit_account_id = %s"
-            cursor.execute(query, (credit_account_id,))
+            self.pool.statements.execute(cursor, "credit_account_read", query, (credit_account_id,))
             data = cursor.fetchone()  # Получение первой записи
 
             if data:
-                return CreditAccountModel(*data)
+                return identity.add("credit_accounts", credit_account_id, CreditAccountModel.from_row(data))
             return None
 
     def list(self):
@@ -110,13 +181,114 @@ class CreditAccount(ICreditAccount):
 
         :return: Список всех кредитных счетов в виде кортежей
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM credit_accounts"
             cursor.execute(query)  # Выполняем запрос для получения всех записей из таблицы
             credits_account_data = cursor.fetchall()  # Получение всех записей
 
             # Возвращаем список экземпляров моделей BankModel для каждого банка
-            return [CreditAccountModel(*data) for data in credits_account_data]
+            accounts = [CreditAccountModel.from_row(data) for data in credits_account_data]
+            return self.pool.identity_map().add_all("credit_accounts", "credit_account_id", accounts)
+
+    def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все кредитные счета через серверный курсор, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Генератор экземпляров CreditAccountModel
+        """
+        for data in stream_rows(self.pool, "SELECT * FROM credit_accounts", batch_size=batch_size):
+            yield CreditAccountModel.from_row(data)
+
+    def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает страницу кредитных счетов методом keyset: следующая страница начинается после
+        идентификатора из токена продолжения, поэтому время ответа не зависит от глубины.
+
+        :param after_id: Токен продолжения предыдущей страницы (None - первая страница)
+        :param limit: Максимальное количество записей на странице
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :return: Экземпляр PageModel с моделями CreditAccountModel и токеном следующей страницы
+        """
+        return keyset_page(self.pool, "SELECT * FROM credit_accounts", "credit_account_id", CreditAccountModel, self.FIELDS,
+                           after_id, limit, filters)
+
+    def columns(self, fields=None, filters=None, batch_size=50000):
+        """
+        Читает кредитные счета в колоночном виде: по одному типизированному массиву NumPy на колонку,
+        даты - datetime64[D] (NaT для незакрытых счетов). Подходит для анализа портфеля целиком.
+
+        :param fields: Список читаемых колонок (по умолчанию все колонки)
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Словарь {колонка: numpy.ndarray}
+        """
+        return fetch_table_columns(self.pool, "credit_accounts", self.COLUMN_DTYPES, fields, filters, batch_size)
+
+    def exposure_by_bank(self, filters=None):
+        """
+        Возвращает суммарный объем выданных кредитов по каждому банку.
+
+        :param filters: Словарь {колонка: значение} для отбора счетов
+        :return: Словарь {название банка: сумма кредитов}
+        """
+        data = self.columns(["bank_name", "loan_amount"], filters)
+        return group_sum(data["bank_name"], data["loan_amount"])
+
+    def average_interest_rate(self, by_bank=False, filters=None):
+        """
+        Возвращает среднюю процентную ставку по кредитам.
+
+        :param by_bank: Если True, средняя ставка считается отдельно для каждого банка
+        :param filters: Словарь {колонка: значение} для отбора счетов
+        :return: Средняя ставка (None, если кредитов нет) или словарь {название банка: средняя ставка}
+        """
+        data = self.columns(["bank_name", "interest_rate"], filters)
+        if by_bank:
+            return group_mean(data["bank_name"], data["interest_rate"])
+        rates = data["interest_rate"][~np.isnan(data["interest_rate"])]
+        return float(rates.mean()) if len(rates) else None
+
+    def project_portfolio(self, by_bank=True, use_stored_payment=False, horizon=None, filters=None,
+                          memory_budget=256 * 2 ** 20):
+        """
+        Прогнозирует погашение кредитного портфеля по календарным месяцам: платежи, процентный доход,
+        погашение основного долга и остаток долга. Графики всех кредитов считаются векторно
+        порциями, укладывающимися в memory_budget.
+
+        :param by_bank: Если True, агрегаты считаются отдельно для каждого банка
+        :param use_stored_payment: Если True, используется сохраненный monthly_payment,
+                                   иначе - аннуитетный платеж по сумме, ставке и сроку
+        :param horizon: Количество месяцев графика каждого кредита (по умолчанию максимальный срок)
+        :param filters: Словарь {колонка: значение} для отбора счетов
+        :param memory_budget: Бюджет памяти на промежуточные матрицы в байтах
+        :return: Экземпляр ProjectionModel; месяцы - datetime64[M]
+        """
+        fields = ["bank_name", "start_date", "loan_duration_months", "loan_amount", "interest_rate"]
+        if use_stored_payment:
+            fields.append("monthly_payment")
+        return self.project_columns(self.columns(fields, filters), by_bank, horizon, memory_budget)
+
+    @staticmethod
+    def project_columns(data, by_bank=True, horizon=None, memory_budget=256 * 2 ** 20):
+        """
+        Прогнозирует погашение по колонкам кредитов, прочитанным columns (см. project_portfolio).
+
+        :param data: Словарь колонок bank_name, start_date, loan_duration_months, loan_amount,
+                     interest_rate и, при необходимости, monthly_payment
+        :return: Экземпляр ProjectionModel; месяцы - datetime64[M]
+        """
+        # Номер месяца выдачи кредита относительно самого раннего кредита портфеля
+        issued = data["start_date"].astype("datetime64[M]")
+        first = issued.min() if len(issued) else np.datetime64("today", "M")
+        start_month = (issued - first).astype(np.int64)
+
+        projection = AmortizationEngine(memory_budget).project(
+            data["loan_amount"], data["interest_rate"], data["loan_duration_months"],
+            payment=data.get("monthly_payment"), groups=data["bank_name"] if by_bank else None,
+            start_month=start_month, horizon=horizon)
+        projection.months = first + projection.months
+        return projection
 
     def update(self, credit_account_id, **kwargs):
         """
@@ -124,17 +296,36 @@ class CreditAccount(ICreditAccount):
 
         :param credit_account_id: Идентификатор кредитного счета
         :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :return: Экземпляр CreditAccountModel с новыми данными или None, если счет не найден
         """
-        # Формируем строку полей для обновления
-        fields = ", ".join([f"{key} = %s" for key in kwargs.keys()])
-        query = f"UPDATE credit_accounts SET {fields} WHERE credit_account_id = %s"
-        params = list(kwargs.values()) + [credit_account_id]  # Параметры для запроса
+        columns = update_columns("credit_accounts", self.UPDATE_FIELDS, kwargs)  # Имена колонок подставляются в SQL
+        if not columns:
+            return self.read(credit_account_id)
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Новые значения строки возвращаются тем же запросом
+            query = update_query("credit_accounts", "credit_account_id", columns)
+            cursor.execute(query, [*kwargs.values(), credit_account_id])
+            data = cursor.fetchone()
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)  # Выполняем запрос на обновление записи
-        self.connection.commit()  # Сохраняем изменения
+        if data is None:
+            return None
+        # Уже выданный экземпляр счета обновляется на месте
+        return self.pool.identity_map().add("credit_accounts", credit_account_id, CreditAccountModel.from_row(data))
 
-        return self.read(credit_account_id)
+    def update_many(self, updates):
+        """
+        Обновляет несколько кредитных счетов своими значениями для каждого: одним запросом
+        UPDATE ... FROM (VALUES ...) ... RETURNING на каждый набор изменяемых колонок.
+
+        :param updates: Словарь {идентификатор: {колонка: значение}} или пары (идентификатор, словарь)
+        :return: Список экземпляров CreditAccountModel с новыми данными в порядке updates (только найденные)
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            rows, ids = update_rows(cursor, "credit_accounts", "credit_account_id", self.UPDATE_FIELDS, updates)
+        accounts = [CreditAccountModel.from_row(rows[credit_account_id])
+                    for credit_account_id in ids if credit_account_id in rows]
+        return self.pool.identity_map().add_all("credit_accounts", "credit_account_id", accounts)
 
     def delete(self, credit_account_id):
         """
@@ -142,8 +333,25 @@ class CreditAccount(ICreditAccount):
 
         :param credit_account_id: Идентификатор кредитного счета
         """
-        with self.connection.cursor() as cursor:
-            query = "DELETE FROM credit_accounts WHERE credit_account_id = %s"
-            cursor.execute(query, (credit_account_id,))  # Выполняем запрос на удаление записи
-        self.connection.commit()  # Сохраняем изменения
+        self.delete_many([credit_account_id])
         return f"Credit account with ID {credit_account_id} deleted."
+
+    def delete_many(self, credit_account_ids):
+        """
+        Удаляет несколько кредитных счетов одним запросом (= ANY).
+
+        :param credit_account_ids: Итерируемый объект идентификаторов кредитных счетов
+        :return: Количество удаленных счетов
+        """
+        credit_account_ids = list(credit_account_ids)
+        if not credit_account_ids:
+            return 0
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = "DELETE FROM credit_accounts WHERE credit_account_id = ANY(%s) RETURNING credit_account_id"
+            cursor.execute(query, (credit_account_ids,))  # Выполняем запрос на удаление записей
+            deleted = cursor.fetchall()
+        identity = self.pool.identity_map()
+        for (credit_account_id,) in deleted:
+            identity.discard("credit_accounts", credit_account_id)
+        return len(deleted)
@@ -1,13 +1,48 @@
+from db.ConnectionPool import as_pool
+from db.batch import insert_returning_ids, normalize_rows, update_rows
+from db.pagination import keyset_page
+from db.sql import update_columns, update_query
+from db.streaming import stream_rows
+from service.BankAtm import BankAtm
 from service.impl.IEmployee import IEmployee
 from entity.employeeModel import EmployeeModel
 
 
 class Employee(IEmployee):
+    # Колонки таблицы (допустимые поля фильтров)
+    FIELDS = ("employee_id", "full_name", "birth_date", "position", "bank_id", "works_remotely",
+              "bank_office_id", "can_provide_credit", "salary")
+
+    # Колонки, которые можно изменять методами update и update_many
+    UPDATE_FIELDS = FIELDS[1:]
+
+    # Параметры метода create в порядке следования (используются пакетными операциями)
+    CREATE_FIELDS = ("full_name", "birth_date", "position", "bank_id", "works_remotely", "bank_office_id",
+                     "can_provide_credit", "salary")
+
+    # DDL таблицы (используется синхронным и асинхронным сервисами)
+    TABLE_DDL = """
+        CREATE TABLE employees (
+            employee_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор сотрудника (генерируется автоматически)
+            full_name VARCHAR(255) NOT NULL,  -- Полное имя сотрудника
+            birth_date DATE NOT NULL,  -- Дата рождения сотрудника
+            position VARCHAR(255) NOT NULL,  -- Должность сотрудника
+            bank_id INT NOT NULL,  -- Идентификатор банка, где работает сотрудник (внешний ключ)
+            works_remotely BOOLEAN NOT NULL,  -- Флаг удаленной работы
+            bank_office_id INT,  -- Идентификатор банковского офиса (внешний ключ; NULL после закрытия офиса)
+            can_provide_credit BOOLEAN NOT NULL,  -- Флаг возможности выдачи кредита
+            salary DECIMAL(7, 2) NOT NULL,  -- Зарплата сотрудника
+            FOREIGN KEY (bank_id) REFERENCES banks(bank_id) ON DELETE CASCADE,  -- Ссылка на таблицу 'banks', удаление с каскадом
+            FOREIGN KEY (bank_office_id) REFERENCES bank_offices(bank_office_id) ON DELETE SET NULL  -- Ссылка на офис банка
+        );
+    """
+
     def __init__(self, connection):
         """
         Инициализация класса Employee. Принимает объект connection для работы с базой данных.
+        Вместо подключения можно передать пул ConnectionPool: подключение берется на время каждой операции.
         """
-        self.connection = connection
+        self.pool = as_pool(connection)
 
     def create_table(self):
         """
@@ -21,36 +56,27 @@ class Employee(IEmployee):
         - Возможность предоставления кредита
         - Зарплату
         """
-        with self.connection.cursor() as cursor:
-            # SQL-запрос для создания таблицы 'employees'
-            query = '''
-                CREATE TABLE employees (
-                employee_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор сотрудника (генерируется автоматически)
-                full_name VARCHAR(255) NOT NULL,  -- Полное имя сотрудника
-                birth_date DATE NOT NULL,  -- Дата рождения сотрудника
-                position VARCHAR(255) NOT NULL,  -- Должность сотрудника
-                bank_id INT NOT NULL,  -- Идентификатор банка, где работает сотрудник (внешний ключ)
-                works_remotely BOOLEAN NOT NULL,  -- Флаг удаленной работы
-                bank_office_id INT NOT NULL,  -- Идентификатор банковского офиса (внешний ключ)
-                can_provide_credit BOOLEAN NOT NULL,  -- Флаг возможности выдачи кредита
-                salary DECIMAL(7, 2) NOT NULL,  -- Зарплата сотрудника
-                FOREIGN KEY (bank_id) REFERENCES banks(bank_id) ON DELETE CASCADE,  -- Ссылка на таблицу 'banks', удаление с каскадом
-                FOREIGN KEY (bank_office_id) REFERENCES bank_offices(bank_office_id) ON DELETE SET NULL  -- Ссылка на офис банка
-            );
-            '''
-            cursor.execute(query)  # Выполняем SQL-запрос для создания таблицы
-        self.connection.commit()  # Сохраняем изменения в базе данных
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(self.TABLE_DDL)  # Выполняем SQL-запрос для создания таблицы
 
     def drop_table(self):
         """
         Удаляет таблицу 'employees' вместе с зависимыми объектами.
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = """
-                DROP TABLE employees CASCADE;
+                DROP TABLE IF EXISTS employees CASCADE;
             """
             cursor.execute(query)  # Выполняем SQL-запрос для удаления таблицы
-        self.connection.commit()  # Сохраняем изменения
+
+    def migrate(self):
+        """
+        Приводит существующую таблицу 'employees' к текущей схеме: снимает NOT NULL с bank_office_id,
+        иначе закрытие офиса со штатом нарушает ограничение (внешний ключ ставит NULL).
+        Повторный вызов ничего не меняет.
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE employees ALTER COLUMN bank_office_id DROP NOT NULL")
 
     def create(self, full_name, birth_date, position, bank_id, works_remotely, bank_office_id,
                can_provide_credit, salary):
@@ -66,27 +92,50 @@ class Employee(IEmployee):
         :param can_provide_credit: Возможность предоставления кредита (True/False)
         :param salary: Зарплата сотрудника
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             # Вставляем новую запись о сотруднике в таблицу 'employees'
             query = """
                 INSERT INTO employees (full_name, birth_date, position, bank_id, works_remotely, bank_office_id, can_provide_credit, salary)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 RETURNING employee_id
             """
-            cursor.execute(query, (
+            self.pool.statements.execute(cursor, "employee_create", query, (
                 full_name, birth_date, position, bank_id, works_remotely, bank_office_id, can_provide_credit,
                 salary))
             employee_id = cursor.fetchone()[0]
 
             # Обновляем количество сотрудников в таблице 'banks'
+            self.pool.counters.add(cursor, "num_employees", [bank_id])
+
+        employee = EmployeeModel(employee_id, full_name, birth_date, position, bank_id, works_remotely, bank_office_id,
+                                 can_provide_credit, salary)
+        return self.pool.identity_map().add("employees", employee.employee_id, employee)
+
+    def create_many(self, employees):
+        """
+        Создает несколько сотрудников одним многострочным INSERT в одной транзакции.
+        Счетчики сотрудников в банках обновляются одним сгруппированным UPDATE.
+
+        :param employees: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров EmployeeModel в порядке входных данных
+        """
+        rows = normalize_rows(employees, self.CREATE_FIELDS)
+        if not rows:
+            return []
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = """
-                UPDATE banks SET num_employees = num_employees + 1 WHERE bank_id = %s
+                INSERT INTO employees (full_name, birth_date, position, bank_id, works_remotely, bank_office_id, can_provide_credit, salary)
+                VALUES %s
+                RETURNING employee_id
             """
-            cursor.execute(query, (bank_id,))
-        self.connection.commit()  # Сохраняем изменения
+            employee_ids = insert_returning_ids(cursor, query, rows)
 
-        return EmployeeModel(employee_id, full_name, birth_date, position, bank_id, works_remotely, bank_office_id,
-                             can_provide_credit, salary)
+            # Обновляем количество сотрудников в таблице 'banks'
+            self.pool.counters.add(cursor, "num_employees", [row[3] for row in rows])
+
+        employees = [EmployeeModel(employee_id, *row) for employee_id, row in zip(employee_ids, rows)]
+        return self.pool.identity_map().add_all("employees", "employee_id", employees)
 
     def read(self, employee_id):
         """
@@ -95,14 +144,19 @@ class Employee(IEmployee):
         :param employee_id: Идентификатор сотрудника
         :return: Данные о сотруднике в виде кортежа или None, если сотрудник не найден
         """
-        with self.connection.cursor() as cursor:
+        identity = self.pool.identity_map()
+        employee = identity.get("employees", employee_id)  # Сотрудник, уже загруженный в текущей единице работы
+        if employee is not None:
+            return employee
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM employees WHERE employee_id = %s"
-            cursor.execute(query, (employee_id,))
+            self.pool.statements.execute(cursor, "employee_read", query, (employee_id,))
             data = cursor.fetchone()  # Получение первой записи
 
             # Если банк найден, возвращаем экземпляр модели BankModel
             if data:
-                return EmployeeModel(*data)
+                return identity.add("employees", employee_id, EmployeeModel.from_row(data))
             return None
 
     def list(self):
@@ -111,13 +165,37 @@ class Employee(IEmployee):
 
         :return: Список всех сотрудников в виде кортежей
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM employees"
             cursor.execute(query)  # Выполняем запрос для получения всех записей из таблицы 'employees'
             employees_data = cursor.fetchall()  # Получение всех записей
 
             # Возвращаем список экземпляров моделей BankModel для каждого банка
-            return [EmployeeModel(*data) for data in employees_data]
+            employees = [EmployeeModel.from_row(data) for data in employees_data]
+            return self.pool.identity_map().add_all("employees", "employee_id", employees)
+
+    def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает всех сотрудников через серверный курсор, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Генератор экземпляров EmployeeModel
+        """
+        for data in stream_rows(self.pool, "SELECT * FROM employees", batch_size=batch_size):
+            yield EmployeeModel.from_row(data)
+
+    def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает страницу сотрудников методом keyset: следующая страница начинается после
+        идентификатора из токена продолжения, поэтому время ответа не зависит от глубины.
+
+        :param after_id: Токен продолжения предыдущей страницы (None - первая страница)
+        :param limit: Максимальное количество записей на странице
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :return: Экземпляр PageModel с моделями EmployeeModel и токеном следующей страницы
+        """
+        return keyset_page(self.pool, "SELECT * FROM employees", "employee_id", EmployeeModel, self.FIELDS,
+                           after_id, limit, filters)
 
     def update(self, employee_id, **kwargs):
         """
@@ -125,39 +203,73 @@ class Employee(IEmployee):
 
         :param employee_id: Идентификатор сотрудника
         :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :return: Экземпляр EmployeeModel с новыми данными или None, если сотрудник не найден
         """
-        # Формируем строку полей для обновления
-        fields = ", ".join([f"{key} = %s" for key in kwargs.keys()])
-        query = f"UPDATE employees SET {fields} WHERE employee_id = %s"
-        params = list(kwargs.values()) + [employee_id]  # Параметры для запроса
+        columns = update_columns("employees", self.UPDATE_FIELDS, kwargs)  # Имена колонок подставляются в SQL
+        if not columns:
+            return self.read(employee_id)
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)  # Выполняем запрос на обновление записи
-        self.connection.commit()  # Сохраняем изменения
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Новые значения строки возвращаются тем же запросом
+            cursor.execute(update_query("employees", "employee_id", columns), [*kwargs.values(), employee_id])
+            data = cursor.fetchone()
 
-        return self.read(employee_id)
+        if data is None:
+            return None
+        # Уже выданный экземпляр сотрудника обновляется на месте
+        return self.pool.identity_map().add("employees", employee_id, EmployeeModel.from_row(data))
+
+    def update_many(self, updates):
+        """
+        Обновляет несколько сотрудников своими значениями для каждого: одним запросом
+        UPDATE ... FROM (VALUES ...) ... RETURNING на каждый набор изменяемых колонок.
+
+        :param updates: Словарь {идентификатор: {колонка: значение}} или пары (идентификатор, словарь)
+        :return: Список экземпляров EmployeeModel с новыми данными в порядке updates (только найденные)
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            rows, ids = update_rows(cursor, "employees", "employee_id", self.UPDATE_FIELDS, updates)
+        employees = [EmployeeModel.from_row(rows[employee_id]) for employee_id in ids if employee_id in rows]
+        return self.pool.identity_map().add_all("employees", "employee_id", employees)
 
     def delete(self, employee_id):
         """
-        Удаляет сотрудника по его идентификатору.
+        Удаляет сотрудника по его идентификатору. Также уменьшает количество сотрудников в банке.
 
         :param employee_id: Идентификатор сотрудника
         """
-        with self.connection.cursor() as cursor:
-            # Получаем идентификатор банка, к которому относится сотрудник
-            query = "SELECT bank_id FROM employees WHERE employee_id = %s"
-            cursor.execute(query, (employee_id,))
-            bank_id = cursor.fetchone()
+        self.delete_many([employee_id])
+        return f"Employee with ID {employee_id} deleted."
 
-            # Обновляем количество сотрудников в банке, уменьшая на 1
-            query = """
-                UPDATE banks SET num_employees = num_employees - 1 WHERE bank_id = %s
-            """
-            cursor.execute(query, (bank_id,))
+    def delete_many(self, employee_ids):
+        """
+        Удаляет несколько сотрудников одним запросом: удаляются сотрудники и обслуживаемые ими банкоматы
+        (= ANY), количество сотрудников и банкоматов в банках и офисах уменьшается сгруппированными
+        UPDATE в том же запросе.
 
-            # Удаляем запись о сотруднике из таблицы 'employees'
-            query = "DELETE FROM employees WHERE employee_id = %s"
-            cursor.execute(query, (employee_id,))
-        self.connection.commit()  # Сохраняем изменения
+        :param employee_ids: Итерируемый объект идентификаторов сотрудников
+        :return: Количество удаленных сотрудников
+        """
+        employee_ids = list(employee_ids)
+        if not employee_ids:
+            return 0
 
-        return f"Employee with ID {employee_id} deleted."
+        # Счетчики банков изменяются одним оператором сразу для удаленных строк и их банкоматов
+        update_banks = self.pool.counters.add_from_many({"num_employees": "deleted", "num_atms": "deleted_atms"}, -1)
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = f"""
+                WITH {BankAtm.deleted_atms("employee_id = ANY(%s)")},
+                deleted AS (DELETE FROM employees WHERE employee_id = ANY(%s) RETURNING employee_id, bank_id),
+                deleted_banks AS ({update_banks})
+                SELECT employee_id FROM deleted
+            """
+            cursor.execute(query, (employee_ids, employee_ids))
+            deleted = cursor.fetchall()
+            self.pool.counters.applied()
+
+        identity = self.pool.identity_map()
+        for (employee_id,) in deleted:
+            identity.discard("employees", employee_id)
+        identity.clear("atms")  # Банкоматы сотрудников удалены
+        identity.expire_all("bank_offices")  # Изменилось количество банкоматов офисов
+        return len(deleted)
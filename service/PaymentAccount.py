@@ -1,13 +1,47 @@
+from types import MappingProxyType
+
+from db.ConnectionPool import as_pool
+from db.batch import insert_returning_ids, normalize_rows, update_rows
+from db.columnar import fetch_table_columns, group_sum
+from db.pagination import keyset_page
+from db.sql import update_columns, update_query
+from db.streaming import stream_rows
 from service.impl.IPaymentAccount import IPaymentAccount
 from entity.paymentAccountModel import PaymentAccountModel
 
 
 class PaymentAccount(IPaymentAccount):
+    # Колонки таблицы (допустимые поля фильтров)
+    FIELDS = ("payment_account_id", "user_id", "bank_name", "balance")
+
+    # Колонки, которые можно изменять методами update и update_many
+    UPDATE_FIELDS = FIELDS[1:]
+
+    # Параметры метода create в порядке следования (используются пакетными операциями)
+    CREATE_FIELDS = ("user_id", "bank_name", "balance")
+
+    # Типы массивов NumPy для колоночного чтения (columns)
+    COLUMN_DTYPES = MappingProxyType({
+        "payment_account_id": "int64", "user_id": "int64", "bank_name": str, "balance": "float64",
+    })
+
+    # DDL таблицы (используется синхронным и асинхронным сервисами)
+    TABLE_DDL = """
+        CREATE TABLE payment_accounts (
+            payment_account_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор платежного счета (генерируется автоматически)
+            user_id INT NOT NULL,  -- Идентификатор пользователя (внешний ключ)
+            bank_name VARCHAR(255) NOT NULL,  -- Название банка
+            balance DECIMAL(10, 2) DEFAULT 0.00,  -- Баланс счета, по умолчанию 0.00
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE  -- Ссылка на таблицу 'users', удаление с каскадом
+        );
+    """
+
     def __init__(self, connection):
         """
         Инициализация класса PaymentAccount. Принимает объект connection для работы с базой данных.
+        Вместо подключения можно передать пул ConnectionPool: подключение берется на время каждой операции.
         """
-        self.connection = connection
+        self.pool = as_pool(connection)
 
     def create_table(self):
         """
@@ -16,30 +50,18 @@ class PaymentAccount(IPaymentAccount):
         - Название банка (bank_name)
         - Баланс счета
         """
-        with self.connection.cursor() as cursor:
-            # SQL-запрос для создания таблицы 'payment_accounts'
-            query = '''
-                CREATE TABLE payment_accounts (
-                payment_account_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор платежного счета (генерируется автоматически)
-                user_id INT NOT NULL,  -- Идентификатор пользователя (внешний ключ)
-                bank_name VARCHAR(255) NOT NULL,  -- Название банка
-                balance DECIMAL(10, 2) DEFAULT 0.00,  -- Баланс счета, по умолчанию 0.00
-                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE  -- Ссылка на таблицу 'users', удаление с каскадом
-            );
-            '''
-            cursor.execute(query)  # Выполняем SQL-запрос для создания таблицы
-        self.connection.commit()  # Сохраняем изменения в базе данных
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(self.TABLE_DDL)  # Выполняем SQL-запрос для создания таблицы
 
     def drop_table(self):
         """
         Удаляет таблицу 'payment_accounts' вместе с зависимыми объектами.
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = """
-                DROP TABLE payment_accounts CASCADE;
+                DROP TABLE IF EXISTS payment_accounts CASCADE;
             """
             cursor.execute(query)  # Выполняем SQL-запрос для удаления таблицы
-        self.connection.commit()  # Сохраняем изменения
 
     def create(self, user_id, bank_name, balance=0):
         """
@@ -49,18 +71,40 @@ class PaymentAccount(IPaymentAccount):
         :param bank_name: Название банка
         :param balance: Начальный баланс счета, по умолчанию 0
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             # Вставляем новую запись о платёжном счете в таблицу 'payment_accounts'
             query = """
                 INSERT INTO payment_accounts (user_id, bank_name, balance)
                 VALUES (%s, %s, %s)
                 RETURNING payment_account_id
             """
-            cursor.execute(query, (user_id, bank_name, balance))
+            self.pool.statements.execute(cursor, "payment_account_create", query, (user_id, bank_name, balance))
             payment_account_id = cursor.fetchone()[0]
-        self.connection.commit()  # Сохраняем изменения
 
-        return PaymentAccountModel(payment_account_id, user_id, bank_name, balance)
+        account = PaymentAccountModel(payment_account_id, user_id, bank_name, balance)
+        return self.pool.identity_map().add("payment_accounts", account.payment_account_id, account)
+
+    def create_many(self, accounts):
+        """
+        Создает несколько платежных счетов одним многострочным INSERT в одной транзакции.
+
+        :param accounts: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров PaymentAccountModel в порядке входных данных
+        """
+        rows = normalize_rows(accounts, self.CREATE_FIELDS, {"balance": 0})
+        if not rows:
+            return []
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = """
+                INSERT INTO payment_accounts (user_id, bank_name, balance)
+                VALUES %s
+                RETURNING payment_account_id
+            """
+            account_ids = insert_returning_ids(cursor, query, rows)
+
+        accounts = [PaymentAccountModel(account_id, *row) for account_id, row in zip(account_ids, rows)]
+        return self.pool.identity_map().add_all("payment_accounts", "payment_account_id", accounts)
 
     def read(self, account_id):
         """
@@ -69,13 +113,18 @@ class PaymentAccount(IPaymentAccount):
         :param account_id: Идентификатор платежного счета
         :return: Данные о счете в виде кортежа или None, если счет не найден
         """
-        with self.connection.cursor() as cursor:
+        identity = self.pool.identity_map()
+        account = identity.get("payment_accounts", account_id)  # Счет, уже загруженный в текущей единице работы
+        if account is not None:
+            return account
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM payment_accounts WHERE payment_account_id = %s"
-            cursor.execute(query, (account_id,))
+            self.pool.statements.execute(cursor, "payment_account_read", query, (account_id,))
             data = cursor.fetchone()  # Получение первой записи
 
             if data:
-                return PaymentAccountModel(*data)
+                return identity.add("payment_accounts", account_id, PaymentAccountModel.from_row(data))
             return None
 
     def list(self):
@@ -84,12 +133,58 @@ class PaymentAccount(IPaymentAccount):
 
         :return: Список всех платежных счетов в виде кортежей
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM payment_accounts"
             cursor.execute(query)
             payment_accounts_data = cursor.fetchall()
 
-            return [PaymentAccountModel(*data) for data in payment_accounts_data]
+            accounts = [PaymentAccountModel.from_row(data) for data in payment_accounts_data]
+            return self.pool.identity_map().add_all("payment_accounts", "payment_account_id", accounts)
+
+    def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает все платежные счета через серверный курсор, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Генератор экземпляров PaymentAccountModel
+        """
+        for data in stream_rows(self.pool, "SELECT * FROM payment_accounts", batch_size=batch_size):
+            yield PaymentAccountModel.from_row(data)
+
+    def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает страницу платежных счетов методом keyset: следующая страница начинается после
+        идентификатора из токена продолжения, поэтому время ответа не зависит от глубины.
+
+        :param after_id: Токен продолжения предыдущей страницы (None - первая страница)
+        :param limit: Максимальное количество записей на странице
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :return: Экземпляр PageModel с моделями PaymentAccountModel и токеном следующей страницы
+        """
+        return keyset_page(self.pool, "SELECT * FROM payment_accounts", "payment_account_id", PaymentAccountModel, self.FIELDS,
+                           after_id, limit, filters)
+
+    def columns(self, fields=None, filters=None, batch_size=50000):
+        """
+        Читает платежные счета в колоночном виде: по одному типизированному массиву NumPy на колонку
+        (баланс - float64).
+
+        :param fields: Список читаемых колонок (по умолчанию все колонки)
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Словарь {колонка: numpy.ndarray}
+        """
+        return fetch_table_columns(self.pool, "payment_accounts", self.COLUMN_DTYPES, fields, filters, batch_size)
+
+    def balance_by_bank(self, filters=None):
+        """
+        Возвращает суммарный баланс платежных счетов по каждому банку.
+
+        :param filters: Словарь {колонка: значение} для отбора счетов
+        :return: Словарь {название банка: сумма балансов}
+        """
+        data = self.columns(["bank_name", "balance"], filters)
+        return group_sum(data["bank_name"], data["balance"])
 
     def update(self, account_id, **kwargs):
         """
@@ -97,17 +192,35 @@ class PaymentAccount(IPaymentAccount):
 
         :param account_id: Идентификатор платежного счета
         :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :return: Экземпляр PaymentAccountModel с новыми данными или None, если счет не найден
         """
-        # Формируем строку полей для обновления
-        fields = ", ".join([f"{key} = %s" for key in kwargs.keys()])
-        query = f"UPDATE payment_accounts SET {fields} WHERE payment_account_id = %s"
-        params = list(kwargs.values()) + [account_id]  # Параметры для запроса
+        columns = update_columns("payment_accounts", self.UPDATE_FIELDS, kwargs)  # Имена колонок подставляются в SQL
+        if not columns:
+            return self.read(account_id)
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)  # Выполняем запрос на обновление записи
-        self.connection.commit()  # Сохраняем изменения
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Новые значения строки возвращаются тем же запросом
+            query = update_query("payment_accounts", "payment_account_id", columns)
+            cursor.execute(query, [*kwargs.values(), account_id])
+            data = cursor.fetchone()
 
-        return self.read(account_id)
+        if data is None:
+            return None
+        # Уже выданный экземпляр счета обновляется на месте
+        return self.pool.identity_map().add("payment_accounts", account_id, PaymentAccountModel.from_row(data))
+
+    def update_many(self, updates):
+        """
+        Обновляет несколько платежных счетов своими значениями для каждого: одним запросом
+        UPDATE ... FROM (VALUES ...) ... RETURNING на каждый набор изменяемых колонок.
+
+        :param updates: Словарь {идентификатор: {колонка: значение}} или пары (идентификатор, словарь)
+        :return: Список экземпляров PaymentAccountModel с новыми данными в порядке updates (только найденные)
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            rows, ids = update_rows(cursor, "payment_accounts", "payment_account_id", self.UPDATE_FIELDS, updates)
+        accounts = [PaymentAccountModel.from_row(rows[account_id]) for account_id in ids if account_id in rows]
+        return self.pool.identity_map().add_all("payment_accounts", "payment_account_id", accounts)
 
     def delete(self, account_id):
         """
@@ -115,10 +228,27 @@ class PaymentAccount(IPaymentAccount):
 
         :param account_id: Идентификатор платежного счета
         """
-        with self.connection.cursor() as cursor:
-            # Удаляем запись о платежном счете из таблицы 'payment_accounts'
-            query = "DELETE FROM payment_accounts WHERE payment_account_id = %s"
-            cursor.execute(query, (account_id,))
-        self.connection.commit()  # Сохраняем изменения
+        self.delete_many([account_id])
 
         return f"Paymeny Account with ID {account_id} deleted."
+
+    def delete_many(self, account_ids):
+        """
+        Удаляет несколько платежных счетов одним запросом (= ANY).
+
+        :param account_ids: Итерируемый объект идентификаторов платежных счетов
+        :return: Количество удаленных счетов
+        """
+        account_ids = list(account_ids)
+        if not account_ids:
+            return 0
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Удаляем записи о платежных счетах из таблицы 'payment_accounts'
+            query = "DELETE FROM payment_accounts WHERE payment_account_id = ANY(%s) RETURNING payment_account_id"
+            cursor.execute(query, (account_ids,))
+            deleted = cursor.fetchall()
+        identity = self.pool.identity_map()
+        for (account_id,) in deleted:
+            identity.discard("payment_accounts", account_id)
+        return len(deleted)
@@ -1,5 +1,13 @@
 import math
 
+from psycopg2.extras import execute_values
+
+from db.ConnectionPool import as_pool
+from db.IndexManager import IndexManager, Lookup
+from db.batch import insert_returning_ids, normalize_rows, update_rows
+from db.pagination import keyset_page
+from db.sql import update_columns, update_query
+from db.streaming import stream_rows
 from entity.creditAccountModel import CreditAccountModel
 from entity.paymentAccountModel import PaymentAccountModel
 from service.impl.IUser import IUser
@@ -7,11 +15,64 @@ from entity.userModel import UserModel
 
 
 class User(IUser):
+    # Колонки таблицы (допустимые поля фильтров)
+    FIELDS = ("user_id", "full_name", "birth_date", "job", "monthly_income", "credit_rating")
+
+    # Колонки, которые можно изменять методами update и update_many (список банков - только через update)
+    UPDATE_FIELDS = FIELDS[1:]
+
+    # Параметры метода create в порядке следования (используются пакетными операциями)
+    CREATE_FIELDS = ("full_name", "birth_date", "job", "monthly_income", "banks")
+
+    # Колонки пользователя в порядке UserModel; список банков собирается из таблицы user_banks
+    COLUMNS = """
+        u.user_id, u.full_name, u.birth_date, u.job, u.monthly_income,
+        ARRAY(SELECT mb.name FROM user_banks m JOIN banks mb ON mb.bank_id = m.bank_id
+              WHERE m.user_id = u.user_id ORDER BY mb.bank_id) AS banks,
+        u.credit_rating
+    """
+
+    # Связь клиентов с банками; индекс (bank_id, user_id) позволяет искать клиентов банка по индексу
+    USER_BANKS_DDL = """
+        CREATE TABLE IF NOT EXISTS user_banks (
+            user_id INT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,  -- Идентификатор пользователя
+            bank_id INT NOT NULL REFERENCES banks(bank_id) ON DELETE CASCADE,  -- Идентификатор банка
+            PRIMARY KEY (user_id, bank_id)
+        );
+        CREATE INDEX IF NOT EXISTS user_banks_bank_id_user_id_idx ON user_banks (bank_id, user_id);
+    """
+
+    # Формула кредитного рейтинга метода create в SQL и условия для его пересчета
+    RATING_EXPRESSION = "CEIL(u.monthly_income / 1000) * 100"
+    RATING_DIFFERS_CONDITION = (f"u.credit_rating IS DISTINCT FROM {RATING_EXPRESSION} "
+                                f"OR u.rated_income IS DISTINCT FROM u.monthly_income")
+    STALE_RATING_CONDITION = "u.monthly_income IS DISTINCT FROM u.rated_income"  # Поддержано индексом users_rating_stale_idx
+
+    # Поиск этого сервиса, не следующий из внешних ключей DDL (проверяется IndexManager.missing_indexes)
+    LOOKUPS = (
+        Lookup("User.create", "banks", ("name",)),
+        Lookup("User.recompute_credit_ratings", "users", ("user_id",), STALE_RATING_CONDITION),
+    )
+
+    # DDL таблицы (используется синхронным и асинхронным сервисами)
+    TABLE_DDL = """
+        CREATE TABLE users (
+            user_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор пользователя
+            full_name VARCHAR(255) NOT NULL,  -- Полное имя пользователя
+            birth_date DATE NOT NULL,  -- Дата рождения
+            job VARCHAR(255),  -- Работа
+            monthly_income DECIMAL(10, 2) CHECK (monthly_income <= 10000),  -- Ежемесячный доход (макс. 10,000)
+            credit_rating INT CHECK (credit_rating BETWEEN 100 AND 1000),  -- Кредитный рейтинг (от 100 до 1000)
+            rated_income DECIMAL(10, 2)  -- Доход, по которому рассчитан рейтинг (для пересчета рейтингов)
+        );
+    """
+
     def __init__(self, connection):
         """
         Инициализация класса User. Принимает объект connection для работы с базой данных.
+        Вместо подключения можно передать пул ConnectionPool: подключение берется на время каждой операции.
         """
-        self.connection = connection
+        self.pool = as_pool(connection)
 
     def create_table(self):
         """
@@ -21,36 +82,25 @@ class User(IUser):
         - Дата рождения (birth_date)
         - Работа (job)
         - Ежемесячный доход (monthly_income), с ограничением не более 10,000
-        - Список банков, с которыми связан пользователь (banks)
         - Кредитный рейтинг (credit_rating), который должен быть в пределах от 100 до 1000
+        - Доход, по которому рассчитан кредитный рейтинг (rated_income)
         - Уникальное ограничение на сочетание полного имени и даты рождения
+        Банки пользователя хранятся в отдельной таблице 'user_banks' (user_id, bank_id).
         """
-        with self.connection.cursor() as cursor:
-            # SQL-запрос для создания таблицы 'users'
-            query = '''
-                CREATE TABLE users (
-                    user_id SERIAL PRIMARY KEY,  -- Уникальный идентификатор пользователя
-                    full_name VARCHAR(255) NOT NULL,  -- Полное имя пользователя
-                    birth_date DATE NOT NULL,  -- Дата рождения
-                    job VARCHAR(255),  -- Работа
-                    monthly_income DECIMAL(10, 2) CHECK (monthly_income <= 10000),  -- Ежемесячный доход (макс. 10,000)
-                    banks VARCHAR(255)[],  -- Список банков, связанных с пользователем
-                    credit_rating INT CHECK (credit_rating BETWEEN 100 AND 1000)  -- Кредитный рейтинг (от 100 до 1000)
-                );
-                '''
-            cursor.execute(query)  # Выполняем запрос для создания таблицы
-        self.connection.commit()  # Сохраняем изменения в базе данных
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(self.TABLE_DDL)  # Выполняем запрос для создания таблицы
+            cursor.execute(self.USER_BANKS_DDL)  # Таблица связей пользователей с банками
 
     def drop_table(self):
         """
-        Удаляет таблицу 'users' вместе с зависимыми объектами.
+        Удаляет таблицу 'users' вместе с зависимыми объектами и таблицей связей 'user_banks'.
         """
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = """
-                    DROP TABLE users CASCADE;
+                    DROP TABLE IF EXISTS user_banks;
+                    DROP TABLE IF EXISTS users CASCADE;
                 """
             cursor.execute(query)  # Выполняем запрос для удаления таблицы
-        self.connection.commit()  # Сохраняем изменения
 
     def create(self, full_name, birth_date, job, monthly_income, banks):
         """
@@ -62,37 +112,75 @@ class User(IUser):
         :param job: Работа пользователя
         :param monthly_income: Ежемесячный доход пользователя
         :param banks: Список банков, с которыми связан пользователь
+        :return: Экземпляр UserModel; banks - банки, с которыми пользователь действительно связан
+                 (несуществующие названия пропускаются, порядок - как у read)
         """
         # Рассчитываем кредитный рейтинг на основе дохода пользователя (округляем до сотен)
         credit_rating = math.ceil(monthly_income / 1000) * 100
 
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             # Вставляем новую запись в таблицу 'users'
             query = """
-                INSERT INTO users (full_name, birth_date, job, monthly_income, banks, credit_rating)
+                INSERT INTO users (full_name, birth_date, job, monthly_income, credit_rating, rated_income)
                 VALUES (%s, %s, %s, %s, %s, %s)
                 RETURNING user_id
             """
-            cursor.execute(query, (full_name, birth_date, job, monthly_income, banks, credit_rating))
+            self.pool.statements.execute(cursor, "user_create", query,
+                                         (full_name, birth_date, job, monthly_income, credit_rating, monthly_income))
             user_id = cursor.fetchone()[0]
 
-            # Обновляем информацию о количестве клиентов в каждом банке из списка пользователя
-            for bank in banks:
-                # Получаем идентификатор банка по его названию
-                query = """
-                    SELECT bank_id FROM banks WHERE name = %s
-                """
-                cursor.execute(query, (bank,))
-                bank_id = cursor.fetchone()
+            # Связываем пользователя с банками и обновляем количество их клиентов
+            linked = self._link_banks(cursor, user_id, banks)
+
+        user = UserModel(user_id, full_name, birth_date, job, monthly_income, linked, credit_rating)
+        return self.pool.identity_map().add("users", user.user_id, user)
+
+    def create_many(self, users):
+        """
+        Создает несколько пользователей одним многострочным INSERT в одной транзакции.
+        Идентификаторы банков находятся одним запросом, счетчики клиентов обновляются одним UPDATE.
+
+        :param users: Итерируемый объект кортежей или словарей с параметрами метода create
+        :return: Список экземпляров UserModel в порядке входных данных (banks - как у create)
+        """
+        rows = [
+            (full_name, birth_date, job, monthly_income, banks, math.ceil(monthly_income / 1000) * 100)
+            for full_name, birth_date, job, monthly_income, banks in normalize_rows(users, self.CREATE_FIELDS)
+        ]
+        if not rows:
+            return []
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = """
+                INSERT INTO users (full_name, birth_date, job, monthly_income, credit_rating, rated_income)
+                VALUES %s
+                RETURNING user_id
+            """
+            user_ids = insert_returning_ids(cursor, query, [row[:4] + row[5:] + row[3:4] for row in rows])
 
-                # Обновляем количество клиентов банка
+            # Связываем всех пользователей с банками одним запросом
+            linked = {user_id: [] for user_id in user_ids}
+            links = [(user_id, bank) for user_id, row in zip(user_ids, rows) for bank in row[4]]
+            if links:
                 query = """
-                    UPDATE banks SET num_clients = num_clients + 1 WHERE bank_id = %s
+                    WITH linked AS (
+                        INSERT INTO user_banks (user_id, bank_id)
+                        SELECT v.user_id, b.bank_id FROM (VALUES %s) AS v(user_id, name) JOIN banks b ON b.name = v.name
+                        ON CONFLICT DO NOTHING
+                        RETURNING user_id, bank_id
+                    )
+                    SELECT l.user_id, l.bank_id, b.name FROM linked l JOIN banks b ON b.bank_id = l.bank_id
+                    ORDER BY l.user_id, l.bank_id
                 """
-                cursor.execute(query, (bank_id,))
-        self.connection.commit()  # Сохраняем изменения
+                created = execute_values(cursor, query, links, page_size=len(links), fetch=True)
+                for user_id, _, name in created:
+                    linked[user_id].append(name)
+
+                # Обновляем количество клиентов банков
+                self.pool.counters.add(cursor, "num_clients", [row[1] for row in created])
 
-        return UserModel(user_id, full_name, birth_date, job, monthly_income, banks, credit_rating)
+        users = [UserModel(user_id, *row[:4], linked[user_id], row[5]) for user_id, row in zip(user_ids, rows)]
+        return self.pool.identity_map().add_all("users", "user_id", users)
 
     def read(self, user_id):
         """
@@ -101,13 +189,18 @@ class User(IUser):
         :param user_id: Идентификатор пользователя
         :return: Данные о пользователе в виде кортежа или None, если пользователь не найден
         """
-        with self.connection.cursor() as cursor:
-            query = "SELECT * FROM users WHERE user_id = %s"
-            cursor.execute(query, (user_id,))
+        identity = self.pool.identity_map()
+        user = identity.get("users", user_id)  # Пользователь, уже загруженный в текущей единице работы
+        if user is not None:
+            return user
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = f"SELECT {self.COLUMNS} FROM users u WHERE u.user_id = %s"
+            self.pool.statements.execute(cursor, "user_read", query, (user_id,))
             data = cursor.fetchone()  # Получение первой записи
 
             if data:
-                return UserModel(*data)
+                return identity.add("users", user_id, UserModel.from_row(data))
             return None
 
     def list(self):
@@ -116,31 +209,89 @@ class User(IUser):
 
         :return: Список всех пользователей в виде кортежей
         """
-        with self.connection.cursor() as cursor:
-            query = "SELECT * FROM users"
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            query = f"SELECT {self.COLUMNS} FROM users u"
             cursor.execute(query)  # Выполняем запрос для получения всех записей из таблицы 'users'
             user_data = cursor.fetchall()  # Получение всех записей
 
             # Возвращаем список экземпляров моделей BankModel для каждого банка
-            return [UserModel(*data) for data in user_data]
+            users = [UserModel.from_row(data) for data in user_data]
+            return self.pool.identity_map().add_all("users", "user_id", users)
+
+    def iter_all(self, batch_size=2000):
+        """
+        Потоково перебирает всех пользователей через серверный курсор, не загружая таблицу в память целиком.
+
+        :param batch_size: Количество строк, получаемых с сервера за одно обращение
+        :return: Генератор экземпляров UserModel
+        """
+        for data in stream_rows(self.pool, f"SELECT {self.COLUMNS} FROM users u", batch_size=batch_size):
+            yield UserModel.from_row(data)
+
+    def page(self, after_id=None, limit=100, filters=None):
+        """
+        Возвращает страницу пользователей методом keyset: следующая страница начинается после
+        идентификатора из токена продолжения, поэтому время ответа не зависит от глубины.
+
+        :param after_id: Токен продолжения предыдущей страницы (None - первая страница)
+        :param limit: Максимальное количество записей на странице
+        :param filters: Словарь {колонка: значение} для отбора (колонки из FIELDS)
+        :return: Экземпляр PageModel с моделями UserModel и токеном следующей страницы
+        """
+        return keyset_page(self.pool, f"SELECT {self.COLUMNS} FROM users u", "user_id", UserModel, self.FIELDS,
+                           after_id, limit, filters, prefix="u.")
 
     def update(self, user_id, **kwargs):
         """
         Обновляет данные о пользователе по его идентификатору. Поля для обновления передаются через kwargs.
 
         :param user_id: Идентификатор пользователя
-        :param kwargs: Пары "ключ-значение" для обновляемых полей
+        :param kwargs: Пары "ключ-значение" для обновляемых полей; banks заменяет список банков пользователя
+        :return: Экземпляр UserModel с новыми данными или None, если пользователь не найден
         """
-        # Формируем строку полей для обновления
-        fields = ", ".join([f"{key} = %s" for key in kwargs.keys()])
-        query = f"UPDATE users SET {fields} WHERE user_id = %s"
-        params = list(kwargs.values()) + [user_id]  # Параметры для запроса
+        banks = kwargs.pop("banks", None)
+        columns = update_columns("users", self.UPDATE_FIELDS, kwargs)  # Имена колонок подставляются в SQL
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            # Связи с банками меняются первыми, чтобы RETURNING вернул уже новый список банков
+            if banks is not None:
+                # Отвязываем банки, которых нет в новом списке, и привязываем новые
+                query = f"""
+                    WITH unlinked AS (
+                        DELETE FROM user_banks m USING banks b
+                        WHERE m.user_id = %s AND b.bank_id = m.bank_id AND NOT b.name = ANY(%s)
+                        RETURNING m.bank_id
+                    )
+                    {self.pool.counters.add_from("num_clients", "unlinked", -1)}
+                """
+                cursor.execute(query, (user_id, list(banks)))
+                self.pool.counters.applied()
+                self._link_banks(cursor, user_id, banks)
+
+            if columns:
+                # Новые значения строки возвращаются тем же запросом
+                cursor.execute(update_query("users", "user_id", columns, self.COLUMNS, "u"),
+                               [*kwargs.values(), user_id])
+                data = cursor.fetchone()
+                return self.pool.identity_map().add("users", user_id, UserModel.from_row(data)) if data else None
+
+        # Изменился только список банков: read обновит уже выданный экземпляр пользователя
+        self.pool.identity_map().expire("users", user_id)
+        return self.read(user_id)
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)  # Выполняем запрос на обновление записи
-        self.connection.commit()  # Сохраняем изменения
+    def update_many(self, updates):
+        """
+        Обновляет нескольких пользователей своими значениями для каждого: одним запросом
+        UPDATE ... FROM (VALUES ...) ... RETURNING на каждый набор изменяемых колонок.
+        Список банков пакетно не меняется (см. update).
 
-        return self.read(user_id)
+        :param updates: Словарь {идентификатор: {колонка: значение}} или пары (идентификатор, словарь)
+        :return: Список экземпляров UserModel с новыми данными в порядке updates (только найденные)
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            rows, user_ids = update_rows(cursor, "users", "user_id", self.UPDATE_FIELDS, updates, self.COLUMNS, "u")
+        users = [UserModel.from_row(rows[user_id]) for user_id in user_ids if user_id in rows]
+        return self.pool.identity_map().add_all("users", "user_id", users)
 
     def delete(self, user_id):
         """
@@ -149,52 +300,208 @@ class User(IUser):
 
         :param user_id: Идентификатор пользователя
         """
-        with self.connection.cursor() as cursor:
-            # Получаем список банков, связанных с пользователем
-            query = """
-                    SELECT banks FROM users WHERE user_id = %s        
-            """
-            cursor.execute(query, (user_id,))
-            banks = cursor.fetchall()  # Получаем список банков
+        self.delete_many([user_id])
+        return f"User with ID {user_id} deleted."
 
-            # Обновляем количество клиентов в каждом банке
-            for bank in banks:
-                # Получаем идентификатор банка
-                query = """
-                    SELECT bank_id FROM banks WHERE name = %s
-                """
-                bank_id = cursor.execute(query, (bank,))
+    def delete_many(self, user_ids):
+        """
+        Удаляет несколько пользователей одним запросом: удаляются их связи с банками, платежные
+        и кредитные счета и сами пользователи (= ANY), а количество клиентов банков уменьшается
+        сгруппированным UPDATE в том же запросе. Кредитные счета ссылаются на пользователей
+        и платежные счета без каскада, поэтому удаляются явно: иначе один пользователь с кредитом
+        отменял бы удаление всего набора.
+
+        :param user_ids: Итерируемый объект идентификаторов пользователей
+        :return: Количество удаленных пользователей
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(self.delete_query(self.pool.counters), (user_ids,) * 4)
+            deleted = cursor.fetchall()
+            self.pool.counters.applied()
+        return self.discard_deleted(self.pool.identity_map(), deleted)
+
+    @staticmethod
+    def delete_query(counters, ids="%s"):
+        """
+        Возвращает запрос delete_many. Результат - пары (таблица, идентификатор) удаленных
+        пользователей, платежных и кредитных счетов.
 
-                # Уменьшаем количество клиентов банка
-                query = """
-                    UPDATE banks SET num_clients = num_clients - 1 WHERE bank_id = %s
+        :param counters: CounterManager пула
+        :param ids: Параметр с массивом идентификаторов пользователей (%s или $1)
+        """
+        return f"""
+            WITH unlinked AS (DELETE FROM user_banks WHERE user_id = ANY({ids}) RETURNING bank_id),
+            unlinked_banks AS ({counters.add_from("num_clients", "unlinked", -1)}),
+            payments AS (DELETE FROM payment_accounts WHERE user_id = ANY({ids}) RETURNING payment_account_id),
+            credits AS (
+                DELETE FROM credit_accounts
+                WHERE user_id = ANY({ids}) OR payment_account_id IN (SELECT payment_account_id FROM payments)
+                RETURNING credit_account_id
+            ),
+            deleted AS (DELETE FROM users WHERE user_id = ANY({ids}) RETURNING user_id)
+            SELECT 'users', user_id FROM deleted
+            UNION ALL SELECT 'payment_accounts', payment_account_id FROM payments
+            UNION ALL SELECT 'credit_accounts', credit_account_id FROM credits
+        """
+
+    @staticmethod
+    def discard_deleted(identity, deleted):
+        """
+        Удаляет из карты идентичности строки, удаленные запросом delete_query.
+
+        :return: Количество удаленных пользователей
+        """
+        for table, key in deleted:
+            identity.discard(table, key)
+        return sum(table == "users" for table, _ in deleted)
+
+    def _link_banks(self, cursor, user_id, banks):
+        """
+        Привязывает пользователя к банкам по их названиям и увеличивает количество клиентов
+        у тех банков, с которыми связь появилась впервые.
+
+        :return: Названия банков, связь с которыми появилась, в порядке идентификаторов банков
+        """
+        query = f"""
+            WITH linked AS (
+                INSERT INTO user_banks (user_id, bank_id)
+                SELECT u.user_id, b.bank_id FROM users u JOIN banks b ON b.name = ANY(%s)
+                WHERE u.user_id = %s  -- Несуществующий пользователь не привязывается (а не нарушает FK)
+                ON CONFLICT DO NOTHING
+                RETURNING bank_id
+            ),
+            linked_banks AS ({self.pool.counters.add_from("num_clients", "linked")})
+            SELECT b.name FROM linked l JOIN banks b ON b.bank_id = l.bank_id ORDER BY b.bank_id
+        """
+        cursor.execute(query, (list(banks), user_id))
+        self.pool.counters.applied()
+        return [name for (name,) in cursor.fetchall()]
+
+    def recompute_credit_ratings(self, incremental=False, chunk_size=None):
+        """
+        Пересчитывает кредитный рейтинг пользователей на сервере по формуле метода create:
+        ceil(monthly_income / 1000) * 100 (вычисляется в NUMERIC, поэтому совпадает с Python точно).
+        Перезаписываются только строки, рейтинг которых отличается от рассчитанного.
+
+        :param incremental: Если True, обрабатываются только пользователи, доход которых изменился
+                            после последнего расчета рейтинга (rated_income отличается от monthly_income)
+        :param chunk_size: Если задан, таблица обрабатывается порциями по chunk_size пользователей,
+                           каждая порция - в своей транзакции; иначе - одним UPDATE
+        :return: Количество обновленных пользователей
+        """
+        stale = self.STALE_RATING_CONDITION if incremental else "TRUE"
+        self.pool.identity_map().expire_all("users")  # Рейтинги загруженных пользователей могут измениться
+        if chunk_size is None:
+            with self.pool.connection() as connection, connection.cursor() as cursor:
+                query = f"""
+                    UPDATE users u SET credit_rating = {self.RATING_EXPRESSION}, rated_income = u.monthly_income
+                    WHERE ({stale}) AND ({self.RATING_DIFFERS_CONDITION})
                 """
-                cursor.execute(query, (bank_id,))
+                cursor.execute(query)
+                return cursor.rowcount
+
+        # Порции идут по возрастанию user_id, каждая начинается после последнего обработанного
+        query = f"""
+            WITH chunk AS (
+                SELECT u.user_id FROM users u
+                WHERE u.user_id > %s AND ({stale})
+                ORDER BY u.user_id
+                LIMIT %s
+            ), updated AS (
+                UPDATE users u SET credit_rating = {self.RATING_EXPRESSION}, rated_income = u.monthly_income
+                FROM chunk
+                WHERE u.user_id = chunk.user_id AND ({self.RATING_DIFFERS_CONDITION})
+                RETURNING 1
+            )
+            SELECT (SELECT max(user_id) FROM chunk), (SELECT count(*) FROM updated)
+        """
+        updated, after_id = 0, 0
+        while True:
+            with self.pool.connection() as connection, connection.cursor() as cursor:
+                cursor.execute(query, (after_id, chunk_size))
+                last_id, count = cursor.fetchone()
+            if last_id is None:
+                return updated
+            updated += count
+            after_id = last_id
+
+    def migrate(self):
+        """
+        Приводит существующую таблицу 'users' к текущей схеме: переносит банки пользователей
+        в таблицу 'user_banks' (migrate_banks_array) и добавляет колонку rated_income с индексом
+        пользователей с устаревшим рейтингом (migrate_rated_income). Повторный вызов ничего не меняет.
+        """
+        self.migrate_banks_array()
+        self.migrate_rated_income()
 
-            # Удаляем запись о пользователе
-            query = "DELETE FROM users WHERE user_id = %s"
-            cursor.execute(query, (user_id,))
-        self.connection.commit()  # Сохраняем изменения
+    def migrate_rated_income(self):
+        """
+        Добавляет колонку users.rated_income, если ее нет, и заполняет ее текущим доходом:
+        рейтинги существующих пользователей рассчитаны методом create по этому доходу.
+        Создает частичный индекс users_rating_stale_idx для инкрементального пересчета рейтингов.
 
-        return f"User with ID {user_id} deleted."
+        :return: Количество заполненных строк (0, если колонка уже была)
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'rated_income'
+            """)
+            filled = 0
+            if cursor.fetchone() is None:
+                cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS rated_income DECIMAL(10, 2)")
+                cursor.execute("UPDATE users SET rated_income = monthly_income")
+                filled = cursor.rowcount
+        IndexManager(self.pool).create_indexes(["users_rating_stale_idx"])
+        return filled
+
+    def migrate_banks_array(self):
+        """
+        Переносит членство пользователей в банках из старой колонки users.banks (VARCHAR[])
+        в таблицу 'user_banks' и удаляет колонку. Повторный вызов ничего не делает.
+
+        :return: Количество перенесенных связей
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'banks'
+            """)
+            if cursor.fetchone() is None:
+                return 0
+
+            cursor.execute(self.USER_BANKS_DDL)
+            query = """
+                INSERT INTO user_banks (user_id, bank_id)
+                SELECT u.user_id, b.bank_id
+                FROM users u CROSS JOIN LATERAL unnest(u.banks) AS n(name)
+                JOIN banks b ON b.name = n.name
+                ON CONFLICT DO NOTHING
+            """
+            cursor.execute(query)
+            migrated = cursor.rowcount
+            cursor.execute("ALTER TABLE users DROP COLUMN banks")
+        return migrated
 
     def __get_all_credit_accounts(self, user_id):
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM credit_accounts WHERE user_id = %s"
             cursor.execute(query, (user_id,))
             credit_account_data = cursor.fetchall()
-        self.connection.commit()
 
-        return [CreditAccountModel(*data) for data in credit_account_data]
+        return [CreditAccountModel.from_row(data) for data in credit_account_data]
 
     def __get_all_payment_accounts(self, user_id):
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             query = "SELECT * FROM payment_accounts WHERE user_id = %s"
             cursor.execute(query, (user_id,))
             payment_accounts_data = cursor.fetchall()
-            self.connection.commit()
 
-        return [PaymentAccountModel(*data) for data in payment_accounts_data]
+        return [PaymentAccountModel.from_row(data) for data in payment_accounts_data]
 
     def get_all_info_about_user(self, user_id):
         credit_accounts = self.__get_all_credit_accounts(user_id)
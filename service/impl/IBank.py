@@ -18,7 +18,11 @@ class IBank(ABC):
         pass
 
     @abstractmethod
-    def create(self, name):
+    def create(self, name, rng=random):
+        pass
+
+    @abstractmethod
+    def create_many(self, names, rng=random):
         pass
 
     @abstractmethod
@@ -29,10 +33,34 @@ class IBank(ABC):
     def list(self):
         pass
 
+    @abstractmethod
+    def iter_all(self, batch_size=2000):
+        pass
+
+    @abstractmethod
+    def page(self, after_id=None, limit=100, filters=None):
+        pass
+
     @abstractmethod
     def update(self, bank_id, **kwargs):
         pass
 
+    @abstractmethod
+    def update_many(self, updates):
+        pass
+
     @abstractmethod
     def delete(self, bank_id):
         pass
+
+    @abstractmethod
+    def delete_many(self, bank_ids):
+        pass
+
+    @abstractmethod
+    def flush_counters(self):
+        pass
+
+    @abstractmethod
+    def recompute_counters(self):
+        pass
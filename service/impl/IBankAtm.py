@@ -19,6 +19,10 @@ class IBankAtm(ABC):
                maintenance_cost):
         pass
 
+    @abstractmethod
+    def create_many(self, atms):
+        pass
+
     @abstractmethod
     def read(self, atm_id):
         pass
@@ -27,10 +31,26 @@ class IBankAtm(ABC):
     def list(self):
         pass
 
+    @abstractmethod
+    def iter_all(self, batch_size=2000):
+        pass
+
+    @abstractmethod
+    def page(self, after_id=None, limit=100, filters=None):
+        pass
+
     @abstractmethod
     def update(self, atm_id, **kwargs):
         pass
 
+    @abstractmethod
+    def update_many(self, updates):
+        pass
+
     @abstractmethod
     def delete(self, atm_id):
         pass
+
+    @abstractmethod
+    def delete_many(self, atm_ids):
+        pass
@@ -21,6 +21,10 @@ class IBankOffice(ABC):
                accept_money, rent_cost, bank_id):
         pass
 
+    @abstractmethod
+    def create_many(self, offices):
+        pass
+
     @abstractmethod
     def read(self, office_id):
         pass
@@ -29,10 +33,26 @@ class IBankOffice(ABC):
     def list(self):
         pass
 
+    @abstractmethod
+    def iter_all(self, batch_size=2000):
+        pass
+
+    @abstractmethod
+    def page(self, after_id=None, limit=100, filters=None):
+        pass
+
     @abstractmethod
     def update(self, office_id, **kwargs):
         pass
 
+    @abstractmethod
+    def update_many(self, updates):
+        pass
+
     @abstractmethod
     def delete(self, office_id):
         pass
+
+    @abstractmethod
+    def delete_many(self, office_ids):
+        pass
@@ -20,6 +20,10 @@ class ICreditAccount(ABC):
                monthly_payment, employee_id, payment_account_id):
         pass
 
+    @abstractmethod
+    def create_many(self, credit_accounts):
+        pass
+
     @abstractmethod
     def read(self, credit_account_id):
         pass
@@ -28,10 +32,43 @@ class ICreditAccount(ABC):
     def list(self):
         pass
 
+    @abstractmethod
+    def iter_all(self, batch_size=2000):
+        pass
+
+    @abstractmethod
+    def page(self, after_id=None, limit=100, filters=None):
+        pass
+
+    @abstractmethod
+    def columns(self, fields=None, filters=None, batch_size=50000):
+        pass
+
+    @abstractmethod
+    def exposure_by_bank(self, filters=None):
+        pass
+
+    @abstractmethod
+    def average_interest_rate(self, by_bank=False, filters=None):
+        pass
+
+    @abstractmethod
+    def project_portfolio(self, by_bank=True, use_stored_payment=False, horizon=None, filters=None,
+                          memory_budget=256 * 2 ** 20):
+        pass
+
     @abstractmethod
     def update(self, credit_account_id, **kwargs):
         pass
 
+    @abstractmethod
+    def update_many(self, updates):
+        pass
+
     @abstractmethod
     def delete(self, credit_account_id):
         pass
+
+    @abstractmethod
+    def delete_many(self, credit_account_ids):
+        pass
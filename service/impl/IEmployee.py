@@ -21,6 +21,10 @@ class IEmployee(ABC):
                can_provide_credit, salary):
         pass
 
+    @abstractmethod
+    def create_many(self, employees):
+        pass
+
     @abstractmethod
     def read(self, employee_id):
         pass
@@ -29,10 +33,26 @@ class IEmployee(ABC):
     def list(self):
         pass
 
+    @abstractmethod
+    def iter_all(self, batch_size=2000):
+        pass
+
+    @abstractmethod
+    def page(self, after_id=None, limit=100, filters=None):
+        pass
+
     @abstractmethod
     def update(self, employee_id, **kwargs):
         pass
 
+    @abstractmethod
+    def update_many(self, updates):
+        pass
+
     @abstractmethod
     def delete(self, employee_id):
         pass
+
+    @abstractmethod
+    def delete_many(self, employee_ids):
+        pass
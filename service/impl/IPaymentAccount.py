@@ -20,6 +20,10 @@ class IPaymentAccount(ABC):
     def create(self, user_id, bank_name, balance=0):
         pass
 
+    @abstractmethod
+    def create_many(self, accounts):
+        pass
+
     @abstractmethod
     def read(self, account_id):
         pass
@@ -28,10 +32,34 @@ class IPaymentAccount(ABC):
     def list(self):
         pass
 
+    @abstractmethod
+    def iter_all(self, batch_size=2000):
+        pass
+
+    @abstractmethod
+    def page(self, after_id=None, limit=100, filters=None):
+        pass
+
+    @abstractmethod
+    def columns(self, fields=None, filters=None, batch_size=50000):
+        pass
+
+    @abstractmethod
+    def balance_by_bank(self, filters=None):
+        pass
+
     @abstractmethod
     def update(self, account_id, **kwargs):
         pass
 
+    @abstractmethod
+    def update_many(self, updates):
+        pass
+
     @abstractmethod
     def delete(self, account_id):
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def delete_many(self, account_ids):
+        pass
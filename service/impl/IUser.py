@@ -21,6 +21,10 @@ class IUser(ABC):
     def create(self, full_name, birth_date, job, monthly_income, banks):
         pass
 
+    @abstractmethod
+    def create_many(self, users):
+        pass
+
     @abstractmethod
     def read(self, user_id):
         pass
@@ -29,10 +33,30 @@ class IUser(ABC):
     def list(self):
         pass
 
+    @abstractmethod
+    def iter_all(self, batch_size=2000):
+        pass
+
+    @abstractmethod
+    def page(self, after_id=None, limit=100, filters=None):
+        pass
+
     @abstractmethod
     def update(self, user_id, **kwargs):
         pass
 
+    @abstractmethod
+    def update_many(self, updates):
+        pass
+
     @abstractmethod
     def delete(self, user_id):
         pass
+
+    @abstractmethod
+    def delete_many(self, user_ids):
+        pass
+
+    @abstractmethod
+    def recompute_credit_ratings(self, incremental=False, chunk_size=None):
+        pass
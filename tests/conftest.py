@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+psycopg2 = pytest.importorskip("psycopg2")
+from psycopg2.extensions import parse_dsn
+
+import main
+
+# Тесты с базой пересоздают все таблицы, поэтому выполняются только на отдельной базе,
+# заданной строкой подключения libpq, например: BANK_TEST_DSN="dbname=bank_test user=postgres"
+TEST_DSN = os.environ.get("BANK_TEST_DSN")
+
+
+@pytest.fixture
+def params():
+    """
+    Параметры подключения к тестовой базе; без BANK_TEST_DSN или недоступной базы тест пропускается.
+    """
+    if not TEST_DSN:
+        pytest.skip("BANK_TEST_DSN is not set")
+    params = parse_dsn(TEST_DSN)
+    try:
+        psycopg2.connect(**params).close()
+    except psycopg2.OperationalError as error:
+        pytest.skip(f"Test database is unavailable: {error}")
+    return params
+
+
+@pytest.fixture(params=[False, True], ids=["immediate", "deferred"])
+def filler(request, params):
+    """
+    Заполненная база (5 банков со связанными сущностями) в режиме немедленных и отложенных счетчиков.
+    """
+    filler = main.BankDataFiller(params, seed=7, deferred_counters=request.param)
+    filler.fill_models()
+    yield filler
+    filler.close_connection()
+
+
+@pytest.fixture
+def mismatches_of():
+    """
+    Функция, которая переносит накопленные изменения счетчиков заполнителя и возвращает банки и офисы,
+    счетчики которых расходятся с фактическими строками (пустой список - счетчики сходятся).
+    """
+    def check(filler):
+        filler.bank.flush_counters()
+        with filler.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(COUNTER_MISMATCHES_QUERY)
+            return cursor.fetchall()
+    return check
+
+
+@pytest.fixture
+def mismatches(filler, mismatches_of):
+    """
+    Проверка счетчиков (см. mismatches_of) для заполненной базы фикстуры filler.
+    """
+    return lambda: mismatches_of(filler)
+
+
+COUNTER_MISMATCHES_QUERY = """
+    SELECT 'banks', b.bank_id FROM banks b
+    WHERE (b.num_offices, b.num_atms, b.num_employees, b.num_clients) IS DISTINCT FROM (
+        (SELECT count(*) FROM bank_offices o WHERE o.bank_id = b.bank_id),
+        (SELECT count(*) FROM atms a WHERE a.bank_id = b.bank_id),
+        (SELECT count(*) FROM employees e WHERE e.bank_id = b.bank_id),
+        (SELECT count(*) FROM user_banks m WHERE m.bank_id = b.bank_id))
+    UNION ALL
+    SELECT 'bank_offices', o.bank_office_id FROM bank_offices o
+    WHERE o.num_atms IS DISTINCT FROM (SELECT count(*) FROM atms a WHERE a.bank_office_id = o.bank_office_id)
+"""
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from analytics.AmortizationEngine import AmortizationEngine
+
+
+def scalar_schedule(principal, annual_rate, months, payment, horizon):
+    """
+    Эталонный помесячный расчет одного кредита циклом Python.
+    """
+    rate = annual_rate / 1200
+    rows = {field: [0.0] * horizon for field in ("payment", "interest", "principal", "balance")}
+    balance = principal
+    for month in range(min(months, horizon)):
+        interest = balance * rate
+        due = balance + interest
+        paid = due if month == months - 1 else min(payment, due)
+        balance = due - paid
+        rows["payment"][month] = paid
+        rows["interest"][month] = interest
+        rows["principal"][month] = paid - interest
+        rows["balance"][month] = balance
+    return rows
+
+
+@pytest.fixture
+def portfolio():
+    rng = np.random.default_rng(13)
+    count = 40
+    principal = rng.integers(10_000, 1_000_000, count).astype(float)
+    rate = rng.uniform(0, 20, count).round(2)
+    rate[:3] = 0  # Беспроцентные кредиты считаются отдельной веткой
+    months = rng.integers(1, 36, count)
+    return principal, rate, months
+
+
+def test_annuity_payment_repays_loan():
+    payment = AmortizationEngine.annuity_payment([120_000, 120_000], [12, 0], [12, 12])
+    assert payment[1] == pytest.approx(10_000)
+    assert payment[0] == pytest.approx(10_661.85, abs=0.01)
+
+
+@pytest.mark.parametrize("memory_budget", [256 * 2 ** 20, 2_000])
+def test_schedule_matches_scalar_loop(portfolio, memory_budget):
+    principal, rate, months = portfolio
+    engine = AmortizationEngine(memory_budget)
+    horizon = int(months.max())
+    schedule = engine.schedule(principal, rate, months)
+    payments = engine.annuity_payment(principal, rate, months)
+
+    for i in range(len(principal)):
+        expected = scalar_schedule(principal[i], rate[i], int(months[i]), payments[i], horizon)
+        for field, values in expected.items():
+            np.testing.assert_allclose(schedule[field][i], values, rtol=1e-9, atol=1e-6)
+
+
+def test_underpayment_is_settled_by_last_payment(portfolio):
+    principal, rate, months = portfolio
+    payments = AmortizationEngine.annuity_payment(principal, rate, months) * 0.5
+    schedule = AmortizationEngine().schedule(principal, rate, months, payments)
+
+    for i in range(len(principal)):
+        expected = scalar_schedule(principal[i], rate[i], int(months[i]), payments[i], int(months.max()))
+        np.testing.assert_allclose(schedule["payment"][i], expected["payment"], rtol=1e-9, atol=1e-6)
+        assert schedule["balance"][i][months[i] - 1] == pytest.approx(0, abs=1e-6)
+
+
+def test_project_sums_scalar_schedules_by_group_and_month(portfolio):
+    principal, rate, months = portfolio
+    groups = np.array(["A", "B"])[np.arange(len(principal)) % 2]
+    start = np.arange(len(principal)) % 3
+    projection = AmortizationEngine(2_000).project(principal, rate, months, groups=groups, start_month=start)
+    payments = AmortizationEngine.annuity_payment(principal, rate, months)
+
+    horizon = int(months.max())
+    expected = np.zeros((2, horizon + int(start.max())))
+    for i in range(len(principal)):
+        rows = scalar_schedule(principal[i], rate[i], int(months[i]), payments[i], horizon)
+        expected[int(groups[i] == "B"), start[i]:start[i] + horizon] += rows["interest"]
+
+    assert list(projection.groups) == ["A", "B"]
+    np.testing.assert_allclose(projection.interest, expected, rtol=1e-9, atol=1e-6)
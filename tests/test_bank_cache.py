@@ -0,0 +1,69 @@
+import pytest
+
+from db.BankCache import BankCache
+
+
+@pytest.fixture
+def cursor(filler):
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        yield cursor
+
+
+def bank_office_money(filler, bank_id):
+    office = filler.bank_office.create("cached", "address", "open", True, True, True, True, 10.0, bank_id)
+    return filler.bank_office.read(office.bank_office_id).money_in_office
+
+
+def test_lookups_count_hits_and_misses(filler, cursor):
+    cache = BankCache()
+    bank = filler.bank.list()[0]
+
+    assert cache.get_by_id(cursor, bank.bank_id).name == bank.name
+    # Банк, прочитанный по идентификатору, находится и по названию
+    assert cache.get_by_name(cursor, bank.name).bank_id == bank.bank_id
+    assert cache.get_by_id(cursor, 10 ** 6) is None
+    assert list(cache.get_many_by_id(cursor, [bank.bank_id, 10 ** 6])) == [bank.bank_id]
+    assert cache.stats() == {"hits": 2, "misses": 3, "evictions": 0, "size": 2}
+
+
+def test_expired_and_evicted_entries_are_read_again(filler, cursor):
+    first, second = filler.bank.list()[:2]
+
+    expired = BankCache(ttl=0.0)
+    expired.get_by_id(cursor, first.bank_id)
+    expired.get_by_id(cursor, first.bank_id)
+    assert (expired.hits, expired.misses) == (0, 2)
+
+    # Каждый банк занимает два ключа: второй банк вытесняет давно не использованный первый
+    small = BankCache(maxsize=2)
+    small.get_by_id(cursor, first.bank_id)
+    small.get_by_id(cursor, second.bank_id)
+    assert small.evictions == 2
+    small.get_by_name(cursor, first.name)
+    assert (small.hits, small.misses) == (0, 3)
+
+
+def test_bank_writes_invalidate_cached_metadata(filler):
+    bank = filler.bank.create("Cached bank")
+    assert bank_office_money(filler, bank.bank_id) == bank.total_money
+    hits = filler.pool.bank_cache.hits
+    assert bank_office_money(filler, bank.bank_id) == bank.total_money
+    assert filler.pool.bank_cache.hits == hits + 1
+
+    filler.bank.update(bank.bank_id, total_money=bank.total_money + 1)
+    assert bank_office_money(filler, bank.bank_id) == bank.total_money + 1
+
+    filler.bank.update_many({bank.bank_id: {"total_money": bank.total_money + 2}})
+    assert bank_office_money(filler, bank.bank_id) == bank.total_money + 2
+
+    # Откаченная единица работы не оставляет в кэше банк, которого нет в базе
+    with pytest.raises(RuntimeError):
+        with filler.pool.transaction():
+            filler.bank.update(bank.bank_id, total_money=0)
+            assert bank_office_money(filler, bank.bank_id) == 0
+            raise RuntimeError("rollback")
+    assert bank_office_money(filler, bank.bank_id) == bank.total_money + 2
+
+    filler.bank.delete(bank.bank_id)
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        assert filler.pool.bank_cache.get_by_name(cursor, bank.name) is None
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from service.Bank import _PeekRows
+
+
+def fields(model):
+    return {name: getattr(model, name) for name in type(model).__slots__}
+
+
+def assert_same_models(actual, expected):
+    assert len(actual) == len(expected)
+    for first, second in zip(actual, expected):
+        assert fields(first) == fields(second)
+        assert {name: type(value) for name, value in fields(first).items()} == \
+               {name: type(value) for name, value in fields(second).items()}
+
+
+def test_peek_rows_skips_keys_missing_from_bank_cursor():
+    rows = _PeekRows([(1, "a"), (2, "b"), (2, "c"), (4, "d"), (5, "e")])
+    assert rows.take(2) == [(2, "b"), (2, "c")]
+    assert rows.take(3) == []
+    assert rows.take(5) == [(5, "e")]
+    assert rows.take(6) == []
+
+
+def test_bank_info_has_same_types_as_direct_reads(filler):
+    for bank in filler.bank.list():
+        info = filler.bank.get_all_info_about_bank(bank.bank_id)
+        assert_same_models(info.bank_offices, [filler.bank_office.read(o.bank_office_id) for o in info.bank_offices])
+        assert_same_models(info.bank_atms, [filler.bank_atm.read(a.atm_id) for a in info.bank_atms])
+        assert_same_models(info.employees, [filler.employee.read(e.employee_id) for e in info.employees])
+        assert_same_models(info.users, [filler.user.read(u.user_id) for u in info.users])
+
+
+def test_batched_bank_info_matches_single_reads(filler):
+    bank_ids = [bank.bank_id for bank in filler.bank.list()]
+    # Банки, которых нет в базе, пропускаются
+    infos = list(filler.bank.get_all_info_about_banks(bank_ids[1:] + [10 ** 6], itersize=3))
+    assert [info.bank.bank_id for info in infos] == sorted(bank_ids[1:])
+    for info in infos:
+        single = filler.bank.get_all_info_about_bank(info.bank.bank_id)
+        for name in ("bank_offices", "bank_atms", "employees", "users"):
+            assert_same_models(getattr(info, name), getattr(single, name))
+
+
+def test_async_bank_info_matches_sync(filler, params):
+    pytest.importorskip("asyncpg")
+    from db.AsyncConnectionPool import AsyncConnectionPool
+    from service.AsyncBank import AsyncBank
+
+    bank_id = filler.bank.list()[0].bank_id
+    expected = filler.bank.get_all_info_about_bank(bank_id)
+
+    async def read():
+        pool = await AsyncConnectionPool(params, deferred_counters=filler.pool.counters.deferred).open()
+        try:
+            return await AsyncBank(pool).get_all_info_about_bank(bank_id)
+        finally:
+            await pool.close()
+
+    info = asyncio.run(read())
+    assert fields(info.bank) == fields(expected.bank)
+    for name in ("bank_offices", "bank_atms", "employees", "users"):
+        assert_same_models(getattr(info, name), getattr(expected, name))
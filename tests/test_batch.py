@@ -0,0 +1,156 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+
+def test_create_many_matches_rows_and_counters(filler, mismatches):
+    bank = filler.bank.list()[0]
+    offices = filler.bank_office.create_many([
+        {"name": f"batch{i}", "address": f"address{i}", "status": "open", "can_place_atm": True,
+         "can_provide_credit": True, "dispense_money": True, "accept_money": True, "rent_cost": 100.0 + i,
+         "bank_id": bank.bank_id}
+        for i in range(3)
+    ])
+    assert [office.name for office in offices] == ["batch0", "batch1", "batch2"]
+    assert all(filler.bank_office.read(office.bank_office_id).name == office.name for office in offices)
+
+    employees = filler.employee.create_many([
+        (f"employee{i}", "1990-01-01", "manager", bank.bank_id, False, offices[i].bank_office_id, True, 1000)
+        for i in range(3)
+    ])
+    atms = filler.bank_atm.create_many([
+        (f"atm{i}", "working", bank.bank_id, offices[0].bank_office_id, employees[i].employee_id, True, True, 10.0)
+        for i in range(3)
+    ])
+    assert all(atm.address == "address0" for atm in atms)
+    users = filler.user.create_many([
+        (f"user{i}", "1980-05-05", "job", 2500, [bank.name]) for i in range(4)
+    ])
+    assert all(user.banks == [bank.name] for user in users)
+
+    refreshed = filler.bank.read(bank.bank_id)
+    assert refreshed.num_offices == bank.num_offices + 3
+    assert refreshed.num_employees == bank.num_employees + 3
+    assert refreshed.num_atms == bank.num_atms + 3
+    assert refreshed.num_clients == bank.num_clients + 4
+    assert filler.bank_office.read(offices[0].bank_office_id).num_atms == 3
+    assert mismatches() == []
+
+
+def test_created_users_report_linked_banks(filler, params, mismatches):
+    first, second = sorted(filler.bank.list(), key=lambda bank: bank.bank_id)[:2]
+    # Повторы и несуществующие банки не создают связей; порядок - по идентификаторам банков, как у read
+    banks = [second.name, "Unknown", first.name, second.name]
+    expected = [first.name, second.name]
+
+    user = filler.user.create("linked", "1980-05-05", "job", 2500, banks)
+    many = filler.user.create_many([("many", "1980-05-05", "job", 2500, banks), ("none", "1980-05-05", "job", 10, [])])
+    assert user.banks == expected
+    assert [user.banks for user in many] == [expected, []]
+
+    pytest.importorskip("asyncpg")
+    from db.AsyncConnectionPool import AsyncConnectionPool
+    from service.AsyncUser import AsyncUser
+
+    async def create():
+        pool = await AsyncConnectionPool(params, deferred_counters=filler.pool.counters.deferred).open()
+        try:
+            users = AsyncUser(pool)
+            return [await users.create("async", "1980-05-05", "job", 2500, banks),
+                    *await users.create_many([("async many", "1980-05-05", "job", 2500, banks)])]
+        finally:
+            await pool.close()
+
+    created = asyncio.run(create())
+    assert [user.banks for user in created] == [expected, expected]
+    for model in [user, *many, *created]:
+        assert filler.user.read(model.user_id).banks == model.banks
+    assert mismatches() == []
+
+
+def test_create_many_empty(filler):
+    assert filler.bank.create_many([]) == []
+    assert filler.user.create_many([]) == []
+    assert filler.bank_atm.create_many([]) == []
+
+
+def test_update_many_returns_updated_rows(filler):
+    offices = filler.bank_office.list()[:3]
+    updated = filler.bank_office.update_many({
+        office.bank_office_id: {"status": f"status{i}", "rent_cost": 50.0 * i} for i, office in enumerate(offices)
+    })
+    assert [(office.status, office.rent_cost) for office in updated] == [(f"status{i}", 50.0 * i) for i in range(3)]
+    assert filler.bank_office.read(offices[1].bank_office_id).status == "status1"
+
+    # Идентификаторы, которых нет в базе, пропускаются
+    assert filler.bank_office.update_many({10 ** 6: {"status": "x"}}) == []
+
+
+def test_update_many_users(filler, mismatches):
+    banks = filler.bank.list()
+    users = filler.user.list()[:2]
+    updated = filler.user.update_many({
+        users[0].user_id: {"job": "tester", "monthly_income": Decimal("1234.50")},
+        users[1].user_id: {"job": "analyst"},
+    })
+    assert [(user.user_id, user.job) for user in updated] == [(users[0].user_id, "tester"),
+                                                               (users[1].user_id, "analyst")]
+    assert updated[0].monthly_income == Decimal("1234.50")
+
+    # Список банков меняется через update; количество клиентов банков меняется вместе с ним
+    user = filler.user.update(users[1].user_id, banks=[banks[0].name, banks[1].name])
+    assert sorted(user.banks) == sorted([banks[0].name, banks[1].name])
+    assert mismatches() == []
+
+
+def test_update_banks_of_missing_user_returns_none(filler):
+    name = filler.bank.list()[0].name
+    assert filler.user.update(10 ** 6, banks=[name]) is None
+    assert filler.user.update(10 ** 6, banks=[name], job="x") is None
+
+
+def test_delete_many_reconciles_counters(filler, mismatches):
+    atms = [atm.atm_id for atm in filler.bank_atm.list()[:3]]
+    assert filler.bank_atm.delete_many(atms + [10 ** 6]) == 3
+    assert mismatches() == []
+
+    offices = [office.bank_office_id for office in filler.bank_office.list()[:2]]
+    assert filler.bank_office.delete_many(offices) == 2
+    # Сотрудники закрытых офисов остаются в банке без офиса, банкоматы офисов удаляются
+    assert all(employee.bank_office_id not in offices for employee in filler.employee.list())
+    assert not [atm for atm in filler.bank_atm.list() if atm.bank_office_id in offices]
+    assert mismatches() == []
+
+
+def test_delete_many_users_with_accounts(filler, mismatches):
+    credit = filler.credit_account.list()[0]
+    owner = credit.user_id
+    assert filler.user.delete_many([owner]) == 1
+    assert filler.user.read(owner) is None
+    assert not [account for account in filler.payment_account.list() if account.user_id == owner]
+    assert filler.credit_account.read(credit.credit_account_id) is None
+    assert mismatches() == []
+
+
+def test_delete_many_keeps_other_cached_accounts(filler):
+    accounts = filler.payment_account.list()
+    owner = accounts[0].user_id
+    other = next(account for account in accounts if account.user_id != owner)
+    with filler.pool.transaction():
+        cached = filler.payment_account.read(other.payment_account_id)
+        filler.user.delete_many([owner])
+        assert filler.payment_account.read(other.payment_account_id) is cached
+
+
+def test_create_atm_for_missing_parent_returns_none(filler, mismatches):
+    office = filler.bank_office.list()[0]
+    employee = filler.employee.list()[0]
+    assert filler.bank_atm.create("atm", "working", 10 ** 6, office.bank_office_id, employee.employee_id,
+                                  True, True, 1.0) is None
+    assert filler.bank_atm.create("atm", "working", office.bank_id, 10 ** 6, employee.employee_id,
+                                  True, True, 1.0) is None
+    atm = filler.bank_atm.create("atm", "working", office.bank_id, office.bank_office_id, employee.employee_id,
+                                 True, True, 1.0)
+    assert atm.address == office.address
+    assert mismatches() == []
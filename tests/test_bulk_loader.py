@@ -0,0 +1,53 @@
+import psycopg2
+import pytest
+
+from db.BulkLoader import BulkLoader
+
+ROWS = [
+    (1, "plain", None, True, ["a", "b"]),
+    (2, "tab\there", "line\nbreak", False, ['quote"d', None]),
+    (3, "back\\slash", "carriage\rreturn", None, []),
+    (4, "\\N", "", True, ["tab\tin\narray", "back\\slash"]),
+    (5, "кириллица", None, False, None),
+]
+
+
+@pytest.fixture
+def cursor(params):
+    connection = psycopg2.connect(**params)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE loaded (
+                    id SERIAL PRIMARY KEY, name TEXT NOT NULL, note TEXT, flag BOOLEAN, tags TEXT[]
+                )
+            """)
+            yield cursor
+    finally:
+        connection.close()
+
+
+def test_copy_escapes_nulls_tabs_and_newlines(cursor):
+    # Пачки по две строки: последняя пачка неполная
+    assert BulkLoader(batch_size=2).copy(cursor, "loaded", ["id", "name", "note", "flag", "tags"], iter(ROWS)) == 5
+
+    cursor.execute("SELECT id, name, note, flag, tags FROM loaded ORDER BY id")
+    assert cursor.fetchall() == [tuple(row) for row in ROWS]
+
+
+def test_next_id_continues_after_loaded_ids(cursor):
+    loader = BulkLoader()
+    assert loader.next_id(cursor, "loaded", "id") == 1
+
+    first = loader.next_id(cursor, "loaded", "id")
+    loader.copy(cursor, "loaded", ["id", "name"], [(first + i, f"row{i}") for i in range(3)])
+    second = loader.next_id(cursor, "loaded", "id")
+    assert second == first + 3
+    loader.copy(cursor, "loaded", ["id", "name"], [(second + i, f"more{i}") for i in range(2)])
+
+    # После сдвига последовательности обычная вставка продолжает идентификаторы без пропусков
+    loader.reset_sequence(cursor, "loaded", "id")
+    cursor.execute("INSERT INTO loaded (name) VALUES ('serial') RETURNING id")
+    assert cursor.fetchone()[0] == second + 2
+    cursor.execute("SELECT array_agg(id ORDER BY id) FROM loaded")
+    assert cursor.fetchone()[0] == list(range(1, second + 3))
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+
+def row_columns(models, dtypes):
+    # Те же колонки, собранные из моделей построчного чтения
+    return {name: np.array([getattr(model, name) for model in models], dtype=dtype) for name, dtype in dtypes.items()}
+
+
+@pytest.mark.parametrize("service, key", [("credit_account", "credit_account_id"),
+                                          ("payment_account", "payment_account_id")])
+def test_columns_match_row_fetch(filler, service, key):
+    service = getattr(filler, service)
+    models = sorted(service.list(), key=lambda model: getattr(model, key))
+    assert models
+
+    # Маленькие пачки проверяют склейку массивов из нескольких обращений к серверу
+    columns = service.columns(batch_size=3)
+    order = np.argsort(columns[key])
+    expected = row_columns(models, service.COLUMN_DTYPES)
+    assert list(columns) == list(service.COLUMN_DTYPES)
+    for name, values in expected.items():
+        assert columns[name].dtype == values.dtype
+        np.testing.assert_array_equal(columns[name][order], values)
+
+
+def test_columns_with_fields_and_filters(filler):
+    accounts = filler.payment_account.list()
+    user_id = accounts[0].user_id
+    balances = sorted(float(account.balance) for account in accounts if account.user_id == user_id)
+
+    columns = filler.payment_account.columns(fields=["balance"], filters={"user_id": user_id})
+    assert list(columns) == ["balance"]
+    assert sorted(columns["balance"].tolist()) == balances
+    with pytest.raises(ValueError):
+        filler.payment_account.columns(fields=["missing"])
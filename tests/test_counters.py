@@ -0,0 +1,124 @@
+import psycopg2
+import pytest
+
+import main
+from db.ConnectionPool import ConnectionPool, as_pool
+from service.Bank import Bank
+
+
+@pytest.fixture
+def deferred(params):
+    filler = main.BankDataFiller(params, seed=7, deferred_counters=True)
+    filler.fill_models()
+    filler.bank.flush_counters()
+    yield filler
+    filler.close_connection()
+
+
+def stored_offices(filler, bank_id):
+    # Значение счетчика в самой таблице 'banks', без накопленных изменений
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT num_offices FROM banks WHERE bank_id = %s", (bank_id,))
+        return cursor.fetchone()[0]
+
+
+def pending_rows(filler):
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM bank_counter_deltas")
+        return cursor.fetchone()[0]
+
+
+def create_office(filler, bank_id):
+    return filler.bank_office.create("office", "address", "open", True, True, True, True, 10.0, bank_id)
+
+
+def test_immediate_counters_by_default(params):
+    pool = ConnectionPool(params)
+    try:
+        assert not pool.counters.deferred
+        with pool.connection() as connection:
+            assert not as_pool(connection).counters.deferred
+    finally:
+        pool.closeall()
+
+
+def test_reads_include_pending_deltas_and_flush_drains_them(deferred):
+    bank = deferred.bank.list()[0]
+    create_office(deferred, bank.bank_id)
+    create_office(deferred, bank.bank_id)
+
+    assert stored_offices(deferred, bank.bank_id) == bank.num_offices
+    assert deferred.bank.read(bank.bank_id).num_offices == bank.num_offices + 2
+    assert deferred.pool.counters.pending == 2
+
+    assert deferred.bank.flush_counters() == 1
+    assert stored_offices(deferred, bank.bank_id) == bank.num_offices + 2
+    assert deferred.bank.read(bank.bank_id).num_offices == bank.num_offices + 2
+    assert pending_rows(deferred) == 0 and deferred.pool.counters.pending == 0
+
+
+def test_other_pool_sees_deltas_without_flush(deferred, params):
+    bank = deferred.bank.list()[0]
+    create_office(deferred, bank.bank_id)
+
+    pool = ConnectionPool(params, deferred_counters=True)
+    try:
+        # Другой процесс не знает о накопленных изменениях этого пула, но читает их из таблицы изменений
+        assert pool.counters.pending == 0
+        assert Bank(pool).read(bank.bank_id).num_offices == bank.num_offices + 1
+    finally:
+        pool.closeall()
+
+
+def test_flush_keeps_uncommitted_deltas(deferred, params):
+    bank = deferred.bank.list()[0]
+    other = psycopg2.connect(**params)
+    try:
+        with other.cursor() as cursor:
+            cursor.execute("INSERT INTO bank_counter_deltas (bank_id, num_offices) VALUES (%s, 1)", (bank.bank_id,))
+        deferred.bank.flush_counters()  # Строка еще не зафиксирована и не видна переносу
+        other.commit()
+    finally:
+        other.close()
+
+    assert deferred.bank.read(bank.bank_id).num_offices == bank.num_offices + 1
+    deferred.bank.flush_counters()
+    assert stored_offices(deferred, bank.bank_id) == bank.num_offices + 1
+
+
+def test_rolled_back_flush_loses_nothing(deferred):
+    bank = deferred.bank.list()[0]
+    create_office(deferred, bank.bank_id)
+
+    with pytest.raises(RuntimeError):
+        with deferred.pool.transaction():
+            deferred.bank.flush_counters()
+            raise RuntimeError("rollback")
+
+    assert pending_rows(deferred) == 1
+    assert deferred.bank.read(bank.bank_id).num_offices == bank.num_offices + 1
+    deferred.bank.flush_counters()
+    assert stored_offices(deferred, bank.bank_id) == bank.num_offices + 1
+
+
+def test_recompute_discards_deltas(deferred):
+    bank = deferred.bank.list()[0]
+    create_office(deferred, bank.bank_id)
+    assert deferred.bank.recompute_counters() == 1
+    assert pending_rows(deferred) == 0
+    assert stored_offices(deferred, bank.bank_id) == bank.num_offices + 1
+
+
+def test_statement_counters_are_reported_only_after_success(deferred):
+    counters = deferred.pool.counters
+    counters.add_from("num_atms", "created")
+    counters.add_from_many({"num_offices": "deleted", "num_atms": "deleted_atms"}, -1)
+    assert counters.pending == 0
+
+    with pytest.raises(psycopg2.ProgrammingError):
+        deferred.bank_atm.delete_many(["not an id"])
+    assert counters.pending == 0
+
+    atm = deferred.bank_atm.list()[0]
+    assert deferred.bank_atm.delete_many([atm.atm_id]) == 1
+    assert counters.pending == 1
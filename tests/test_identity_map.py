@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from db.ConnectionPool import ConnectionPool
+from db.IdentityMap import NO_IDENTITY_MAP
+from db.QueryStats import QueryStats
+from service.Bank import Bank
+from service.BankOffice import BankOffice
+from service.User import User
+
+
+@pytest.fixture
+def stats():
+    return QueryStats()
+
+
+@pytest.fixture
+def pool(filler, params, stats):
+    pool = ConnectionPool(params, deferred_counters=filler.pool.counters.deferred, stats=stats)
+    yield pool
+    pool.closeall()
+
+
+def queries(stats, method):
+    return stats.snapshot().get(method, {}).get("count", 0)
+
+
+def test_read_returns_the_same_instance_without_select(pool, stats):
+    users = User(pool)
+    user_id = users.list()[0].user_id
+    with pool.transaction() as unit:
+        first = users.read(user_id)
+        selects = queries(stats, "User.read")
+        assert users.read(user_id) is first
+        assert queries(stats, "User.read") == selects
+        assert (unit.identity_map.hits, unit.identity_map.misses) == (1, 1)
+
+    item = stats.snapshot()["User.read"]
+    assert (item["identity_hits"], item["identity_misses"]) == (1, 1)
+    # Вне единицы работы карты нет: каждый read читает базу и создает новый экземпляр
+    assert pool.identity_map() is NO_IDENTITY_MAP
+    assert users.read(user_id) is not users.read(user_id)
+
+
+def test_list_create_and_update_populate_the_map(pool, stats):
+    users = User(pool)
+    bank = Bank(pool).list()[0]
+    with pool.transaction():
+        listed = users.list()
+        created = users.create("mapped", "1990-01-01", "job", 2500, [bank.name])
+        selects = queries(stats, "User.read")
+        assert users.read(listed[0].user_id) is listed[0]
+        assert users.read(created.user_id) is created
+
+        # Обновление меняет уже выданный экземпляр на месте
+        assert users.update(created.user_id, job="updated") is created
+        assert created.job == "updated"
+        users.update_many({listed[0].user_id: {"monthly_income": 4321}})
+        assert listed[0].monthly_income == 4321
+        assert queries(stats, "User.read") == selects
+
+        # После смены банков read выполняет SELECT и обновляет тот же экземпляр
+        # (запрос учитывается за внешним методом сервиса - User.update)
+        assert users.update(created.user_id, banks=[]) is created
+        assert created.banks == []
+        assert stats.snapshot()["User.update"]["identity_misses"] == 1
+
+
+def test_delete_invalidates_the_entry(pool):
+    users = User(pool)
+    bank = Bank(pool).list()[0]
+    with pool.transaction() as unit:
+        user = users.create("deleted", "1990-01-01", "job", 2500, [bank.name])
+        size = len(unit.identity_map)
+        users.delete(user.user_id)
+        assert len(unit.identity_map) == size - 1
+        assert users.read(user.user_id) is None
+
+
+def test_counter_changes_and_rolled_back_savepoints_expire_models(pool):
+    banks, offices = Bank(pool), BankOffice(pool)
+    bank_id = banks.list()[0].bank_id
+    with pool.transaction() as unit:
+        bank = banks.read(bank_id)
+        offices_before = bank.num_offices
+        offices.create("mapped", "address", "open", True, True, True, True, 10.0, bank_id)
+        assert banks.read(bank_id) is bank
+        assert bank.num_offices == offices_before + 1
+
+        office = offices.list()[0]
+        with pytest.raises(RuntimeError):
+            with unit.savepoint():
+                offices.update(office.bank_office_id, name="rolled back")
+                assert office.name == "rolled back"
+                raise RuntimeError("rollback")
+        assert offices.read(office.bank_office_id) is office
+        assert office.name != "rolled back"
+
+
+def test_async_unit_shares_instances(filler, params):
+    pytest.importorskip("asyncpg")
+    from db.AsyncConnectionPool import AsyncConnectionPool
+    from service.AsyncUser import AsyncUser
+
+    user_id = filler.user.list()[0].user_id
+
+    async def read():
+        pool = await AsyncConnectionPool(params).open()
+        try:
+            users = AsyncUser(pool)
+            async with pool.transaction():
+                first = await users.read(user_id)
+                assert await users.read(user_id) is first
+            assert await users.read(user_id) is not first
+        finally:
+            await pool.close()
+
+    asyncio.run(read())
@@ -0,0 +1,52 @@
+import pytest
+
+import main
+from db.IndexManager import (
+    IndexManager,
+    Lookup,
+    default_services,
+    same_condition,
+    service_lookups,
+)
+from service.User import User
+
+
+def test_lookups_follow_service_definitions():
+    lookups = service_lookups(default_services())
+    keys = {(lookup.table, lookup.columns) for lookup in lookups}
+
+    # Внешние ключи из DDL, включая ссылки в описании колонок (user_banks)
+    assert ("atms", ("bank_office_id",)) in keys
+    assert ("employees", ("bank_office_id",)) in keys
+    assert ("user_banks", ("bank_id",)) in keys
+    assert ("credit_accounts", ("payment_account_id",)) in keys
+    assert Lookup("User.recompute_credit_ratings", "users", ("user_id",), User.STALE_RATING_CONDITION) in lookups
+
+
+def test_same_condition_ignores_aliases_and_parentheses():
+    assert same_condition("(monthly_income IS DISTINCT FROM rated_income)", User.STALE_RATING_CONDITION)
+    assert not same_condition("(monthly_income > 0)", User.STALE_RATING_CONDITION)
+    assert same_condition(None, None)
+    assert not same_condition(None, User.STALE_RATING_CONDITION)
+
+
+@pytest.fixture
+def indexes(params):
+    filler = main.BankDataFiller(params, seed=7)
+    yield IndexManager(filler.pool)
+    filler.close_connection()
+
+
+def test_declared_indexes_cover_all_lookups(indexes):
+    assert indexes.missing_indexes() == []
+
+
+def test_partial_index_with_other_predicate_does_not_cover_lookup(indexes):
+    with indexes.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute("DROP INDEX users_rating_stale_idx")
+        cursor.execute("CREATE INDEX users_rating_stale_idx ON users (user_id) WHERE monthly_income > 0")
+        cursor.execute("DROP INDEX atms_bank_office_id_idx")
+        cursor.execute("CREATE INDEX atms_bank_office_id_idx ON atms (bank_office_id) WHERE status = 'working'")
+
+    missing = {(lookup.table, lookup.columns) for lookup in indexes.missing_indexes()}
+    assert missing == {("users", ("user_id",)), ("atms", ("bank_office_id",))}
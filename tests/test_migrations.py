@@ -0,0 +1,81 @@
+import pytest
+
+import main
+
+# Таблица пользователей в исходной схеме: банки хранятся массивом, колонки rated_income нет
+BASELINE_USERS_DDL = """
+    DROP TABLE IF EXISTS user_banks;
+    DROP TABLE IF EXISTS users CASCADE;
+    CREATE TABLE users (
+        user_id SERIAL PRIMARY KEY,
+        full_name VARCHAR(255) NOT NULL,
+        birth_date DATE NOT NULL,
+        job VARCHAR(255),
+        monthly_income DECIMAL(10, 2) CHECK (monthly_income <= 10000),
+        banks VARCHAR(255)[],
+        credit_rating INT CHECK (credit_rating BETWEEN 100 AND 1000)
+    );
+"""
+
+
+@pytest.fixture
+def baseline(params):
+    filler = main.BankDataFiller(params, seed=7)
+    filler.bank.create_many(["Sberbank", "VTB"])
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(BASELINE_USERS_DDL)
+        cursor.execute("""
+            INSERT INTO users (full_name, birth_date, job, monthly_income, banks, credit_rating) VALUES
+                ('first', '1990-01-01', 'job', 2500, ARRAY['Sberbank', 'VTB'], 300),
+                ('second', '1991-01-01', 'job', 4100, ARRAY['VTB', 'Unknown'], 500)
+        """)
+    yield filler
+    filler.close_connection()
+
+
+def columns(filler, table):
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT column_name FROM information_schema.columns "
+                       "WHERE table_schema = current_schema() AND table_name = %s", (table,))
+        return {row[0] for row in cursor.fetchall()}
+
+
+def test_migrate_moves_banks_array_into_user_banks(baseline):
+    baseline.user.migrate()
+
+    assert "banks" not in columns(baseline, "users")
+    users = {user.full_name: user for user in baseline.user.list()}
+    assert sorted(users["first"].banks) == ["Sberbank", "VTB"]
+    assert users["second"].banks == ["VTB"]  # Неизвестные банки не переносятся
+
+
+def test_migrate_adds_rated_income_and_keeps_service_writes_working(baseline):
+    baseline.user.migrate()
+    baseline.user.migrate()  # Повторный вызов ничего не меняет
+
+    assert "rated_income" in columns(baseline, "users")
+    assert baseline.user.recompute_credit_ratings(incremental=True) == 0
+
+    created = baseline.user.create("third", "1992-01-01", "job", 7300, ["VTB"])
+    assert created.credit_rating == 800
+    assert len(baseline.user.create_many([("fourth", "1993-01-01", "job", 100, ["Sberbank"])])) == 1
+
+    baseline.user.update(created.user_id, monthly_income=9100)
+    assert baseline.user.recompute_credit_ratings(incremental=True) == 1
+    assert baseline.user.read(created.user_id).credit_rating == 1000
+
+
+def test_migrate_allows_closing_staffed_offices(baseline):
+    bank_id = baseline.bank.list()[0].bank_id
+    office = baseline.bank_office.create("office", "address", "open", True, True, True, True, 10.0, bank_id)
+    employee = baseline.employee.create("staff", "1990-01-01", "clerk", bank_id, False, office.bank_office_id,
+                                        True, 1000)
+    with baseline.pool.connection() as connection, connection.cursor() as cursor:
+        # Ограничение исходной схемы
+        cursor.execute("ALTER TABLE employees ALTER COLUMN bank_office_id SET NOT NULL")
+
+    baseline.employee.migrate()
+    baseline.employee.migrate()  # Повторный вызов ничего не меняет
+
+    assert baseline.bank_office.delete_many([office.bank_office_id]) == 1
+    assert baseline.employee.read(employee.employee_id).bank_office_id is None
@@ -0,0 +1,36 @@
+import pytest
+
+from entity.bankAtmModel import BankAtmModel
+from entity.bankModel import BankModel
+from entity.bankOfficeModel import BankOfficeModel
+from entity.creditAccountModel import CreditAccountModel
+from entity.employeeModel import EmployeeModel
+from entity.paymentAccountModel import PaymentAccountModel
+from entity.userModel import UserModel
+from service.User import User
+
+# Запрос чтения каждой модели в том виде, в каком его выполняют сервисы
+QUERIES = [
+    (BankModel, "SELECT * FROM banks"),
+    (BankOfficeModel, "SELECT * FROM bank_offices"),
+    (BankAtmModel, "SELECT * FROM atms"),
+    (EmployeeModel, "SELECT * FROM employees"),
+    (PaymentAccountModel, "SELECT * FROM payment_accounts"),
+    (CreditAccountModel, "SELECT * FROM credit_accounts"),
+    (UserModel, f"SELECT {User.COLUMNS} FROM users u"),
+]
+
+
+@pytest.mark.parametrize("model, query", QUERIES, ids=[model.__name__ for model, _ in QUERIES])
+def test_from_row_matches_selected_columns(filler, model, query):
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(query)
+        columns = tuple(column.name for column in cursor.description)
+        rows = cursor.fetchall()
+
+    # Атрибуты модели перечислены в порядке колонок, и from_row раскладывает строку по ним
+    assert columns == model.__slots__
+    assert rows
+    for row in rows:
+        instance = model.from_row(row)
+        assert tuple(getattr(instance, name) for name in model.__slots__) == row
@@ -0,0 +1,54 @@
+import pytest
+
+from db.pagination import keyset_query
+
+
+def walk(service, limit, filters=None):
+    pages, after_id = [], None
+    while True:
+        page = service.page(after_id, limit, filters)
+        pages.append(page.items)
+        if page.next_token is None:
+            return pages
+        after_id = page.next_token
+
+
+def test_keyset_query_appends_seek_condition():
+    query, params = keyset_query("SELECT * FROM atms", "atm_id", ("atm_id", "bank_id"), after_id=10, limit=5,
+                                 filters={"bank_id": [1, 2]})
+    assert query == "SELECT * FROM atms WHERE bank_id = ANY(%s) AND atm_id > %s ORDER BY atm_id LIMIT %s"
+    assert params == [[1, 2], 10, 6]
+
+
+def test_keyset_query_rejects_unknown_filter_and_bad_limit():
+    with pytest.raises(ValueError):
+        keyset_query("SELECT * FROM atms", "atm_id", ("atm_id",), filters={"name; DROP": 1})
+    with pytest.raises(ValueError):
+        keyset_query("SELECT * FROM atms", "atm_id", ("atm_id",), limit=0)
+
+
+@pytest.mark.parametrize("service, key", [
+    ("bank", "bank_id"), ("bank_office", "bank_office_id"), ("employee", "employee_id"), ("user", "user_id"),
+    ("bank_atm", "atm_id"), ("payment_account", "payment_account_id"), ("credit_account", "credit_account_id"),
+])
+def test_page_walk_returns_every_row_once_in_key_order(filler, service, key):
+    service = getattr(filler, service)
+    pages = walk(service, 7)
+    ids = [getattr(item, key) for items in pages for item in items]
+
+    assert ids == sorted(getattr(item, key) for item in service.list())
+    assert all(0 < len(items) <= 7 for items in pages)
+
+
+def test_page_filters(filler):
+    bank_id = filler.bank.list()[1].bank_id
+    items = [atm for page in walk(filler.bank_atm, 2, {"bank_id": bank_id}) for atm in page]
+    assert items and all(atm.bank_id == bank_id for atm in items)
+    assert len(items) == len([atm for atm in filler.bank_atm.list() if atm.bank_id == bank_id])
+
+
+def test_last_page_has_no_token(filler):
+    count = len(filler.bank.list())
+    page = filler.bank.page(limit=count)
+    assert len(page.items) == count and page.next_token is None
+    assert filler.bank.page(after_id=page.items[-1].bank_id).items == []
@@ -0,0 +1,83 @@
+import pytest
+
+import main
+from data import banks_str
+from seed.DataGenerator import DataGenerator
+from seed.ParallelDataFiller import ParallelDataFiller
+
+# Таблицы с идентификатором и банком строки
+BANK_TABLES = {"bank_offices": "bank_office_id", "employees": "employee_id", "atms": "atm_id"}
+
+
+def seeded_dump(params, fill):
+    filler = main.BankDataFiller(params)
+    try:
+        counts = fill(filler)
+        with filler.pool.connection() as connection, connection.cursor() as cursor:
+            tables = {}
+            for table in ("banks", *BANK_TABLES, "users", "user_banks", "payment_accounts", "credit_accounts"):
+                cursor.execute(f"SELECT * FROM {table} ORDER BY 1, 2")
+                tables[table] = cursor.fetchall()
+        return counts, tables
+    finally:
+        filler.close_connection()
+
+
+def test_parallel_seeding_matches_bulk_for_a_seed(params):
+    bulk = seeded_dump(params, lambda filler: filler.fill_models_bulk(seed=5))
+    # Результат не зависит от количества процессов и порядка завершения частей
+    for workers in (1, 3):
+        assert seeded_dump(params, lambda filler, workers=workers: filler.fill_models_parallel(workers, seed=5)) == bulk
+
+    other = seeded_dump(params, lambda filler: filler.fill_models_parallel(2, seed=6))
+    assert other[0] == bulk[0] and other[1]["banks"] != bulk[1]["banks"]
+
+
+def test_each_bank_gets_its_own_id_block(params, mismatches_of):
+    filler = main.BankDataFiller(params)
+    try:
+        counts = filler.fill_models_parallel(workers=2, seed=5, bank_count=len(banks_str) + 2)
+        assert counts["banks"] == len(banks_str) + 2
+        with filler.pool.connection() as connection, connection.cursor() as cursor:
+            for table, column in BANK_TABLES.items():
+                per_bank = counts[table] // counts["banks"]
+                cursor.execute(f"SELECT bank_id, min({column}), max({column}), count(*) FROM {table} "
+                               f"GROUP BY bank_id ORDER BY bank_id")
+                assert cursor.fetchall() == [(bank_id, (bank_id - 1) * per_bank + 1, bank_id * per_bank, per_bank)
+                                             for bank_id in range(1, counts["banks"] + 1)]
+        assert mismatches_of(filler) == []
+    finally:
+        filler.close_connection()
+
+
+def test_bank_names_repeat_with_numbers():
+    assert ParallelDataFiller.bank_names() == list(banks_str)
+    names = ParallelDataFiller.bank_names(2 * len(banks_str) + 1)
+    assert len(set(names)) == len(names)
+    assert names[len(banks_str):] == [f"{name}-1" for name in banks_str] + [f"{banks_str[0]}-2"]
+
+
+def test_seed_is_chosen_once_and_shared_by_workers(params):
+    filler = ParallelDataFiller(params)
+    assert isinstance(filler.seed, int) and filler.options["seed"] == filler.seed
+    assert ParallelDataFiller(params, seed=5).options["seed"] == 5
+
+
+def test_generator_positions_are_unique_and_independent():
+    data = DataGenerator(seed=3)
+    # Имен больше, чем комбинаций словарей: значения следующих кругов получают номер
+    capacity = 2 * len(data.MALE_FIRST_NAMES) * len(data.PATRONYMICS) * len(data.SURNAMES)
+    names = data.full_names(capacity + 10)
+    assert len(set(names.tolist())) == len(names)
+
+    # Любой диапазон позиций совпадает с тем же срезом полной выборки, в том числе у нового генератора
+    assert DataGenerator(seed=3).full_names(10, 500).tolist() == names[500:510].tolist()
+    assert list(data.stream("addresses", 25, chunk_size=7)) == data.addresses(25).tolist()
+    assert DataGenerator(seed=4).full_names(10).tolist() != names[:10].tolist()
+
+
+@pytest.mark.parametrize("count", [1, 365])
+def test_birth_dates_of_a_round_are_distinct(count):
+    dates = DataGenerator(seed=3).birth_dates(count, first="2000-01-01", last="2000-12-30")
+    assert len(set(dates.tolist())) == count
+    assert str(dates.min()) >= "2000-01-01" and str(dates.max()) <= "2000-12-30"
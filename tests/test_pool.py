@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import pytest
+from psycopg2 import pool as pg_pool
+
+from db.ConnectionPool import ConnectionPool
+from service.Bank import Bank
+from service.BankOffice import BankOffice
+from service.User import User
+
+
+@pytest.fixture
+def pool(filler, params):
+    pool = ConnectionPool(params, maxconn=4, timeout=5.0)
+    yield pool
+    pool.closeall()
+
+
+def backend_pid(pool):
+    with pool.connection() as connection:
+        return connection.info.backend_pid
+
+
+def test_parallel_writers_share_the_pool(pool, mismatches):
+    bank = Bank(pool).list()[0]
+    offices, users = BankOffice(pool), User(pool)
+
+    def write(i):
+        office = offices.create(f"parallel{i}", f"address{i}", "open", True, True, True, True, 10.0 + i, bank.bank_id)
+        user = users.create(f"user{i}", "1990-01-01", "job", 1000 + i, [bank.name])
+        users.update(user.user_id, job=f"job{i}", monthly_income=100 + i)
+        return office, user
+
+    with ThreadPoolExecutor(8) as executor:
+        created = list(executor.map(write, range(24)))
+
+    assert {offices.read(office.bank_office_id).name for office, _ in created} == {f"parallel{i}" for i in range(24)}
+    for i, (_, user) in enumerate(created):
+        stored = users.read(user.user_id)
+        assert (stored.job, stored.monthly_income, stored.banks) == (f"job{i}", 100 + i, [bank.name])
+    refreshed = Bank(pool).read(bank.bank_id)
+    assert (refreshed.num_offices, refreshed.num_clients) == (bank.num_offices + 24, bank.num_clients + 24)
+    assert mismatches() == []
+
+
+def test_failed_write_rolls_back_and_frees_its_connection(pool):
+    offices = BankOffice(pool)
+    office = offices.list()[0]
+    for _ in range(pool.maxconn + 1):
+        with pytest.raises(psycopg2.DataError):
+            offices.update(office.bank_office_id, name="renamed", rent_cost="not a number")
+
+    assert offices.read(office.bank_office_id).name == office.name
+    assert offices.update(office.bank_office_id, name="renamed").name == "renamed"
+
+
+def test_checkout_waits_for_a_free_connection(params, filler):
+    pool = ConnectionPool(params, maxconn=1, timeout=0.3)
+    try:
+        with pool.connection():
+            with pytest.raises(pg_pool.PoolError):
+                pool.getconn()
+
+        # Подключение, которое другой поток возвращает за время ожидания, выдается ожидающему
+        held = pool.getconn()
+        threading.Timer(0.05, pool.putconn, (held,)).start()
+        with pool.connection() as connection:
+            assert connection is held
+    finally:
+        pool.closeall()
+
+
+def test_dead_connection_is_replaced_after_health_check(params, filler):
+    pool = ConnectionPool(params, health_check_after=0.0)
+    try:
+        pid = backend_pid(pool)
+        with filler.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", (pid,))
+
+        assert backend_pid(pool) != pid
+        assert Bank(pool).list()
+    finally:
+        pool.closeall()
+
+
+def test_idle_connection_is_recycled(params, filler):
+    pool = ConnectionPool(params, max_idle=0.0)
+    try:
+        assert backend_pid(pool) != backend_pid(pool)
+    finally:
+        pool.closeall()
@@ -0,0 +1,46 @@
+import psycopg2
+import pytest
+
+import main
+from db.ConnectionPool import as_pool
+from service.User import User
+
+
+@pytest.fixture
+def users(params):
+    filler = main.BankDataFiller(params, seed=7)
+    filler.bank.create_many(["Sberbank"])
+    connection = psycopg2.connect(**params)
+    yield User(as_pool(connection))
+    connection.close()
+    filler.close_connection()
+
+
+def deallocate_all(users):
+    with users.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute("DEALLOCATE ALL")
+
+
+def test_execute_prepares_again_after_deallocate(users):
+    user_id = users.create("first", "1990-01-01", "job", 2500, ["Sberbank"]).user_id
+    assert users.read(user_id).full_name == "first"
+    prepares = users.pool.statements.prepares
+
+    deallocate_all(users)
+    assert users.read(user_id).full_name == "first"
+    assert users.pool.statements.prepares == prepares + 1
+    assert users.read(user_id).full_name == "first"
+    assert users.pool.statements.prepares == prepares + 1
+
+
+def test_retry_inside_transaction_keeps_earlier_work(users):
+    user_id = users.create("first", "1990-01-01", "job", 2500, ["Sberbank"]).user_id
+    users.read(user_id)
+
+    with users.pool.transaction():
+        created = users.create("second", "1991-01-01", "job", 4100, ["Sberbank"])
+        deallocate_all(users)
+        assert users.read(user_id).full_name == "first"
+        assert users.create("third", "1992-01-01", "job", 100, []).user_id == created.user_id + 1
+
+    assert sorted(user.full_name for user in users.list()) == ["first", "second", "third"]
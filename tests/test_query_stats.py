@@ -0,0 +1,115 @@
+import asyncio
+import logging
+
+import psycopg2
+import pytest
+
+from db.ConnectionPool import ConnectionPool
+from db.QueryStats import OTHER_STATEMENTS, QueryStats
+from service.Bank import Bank
+from service.BankOffice import BankOffice
+
+
+@pytest.fixture
+def stats():
+    return QueryStats(slow_threshold=10.0)
+
+
+@pytest.fixture
+def pool(filler, params, stats):
+    pool = ConnectionPool(params, stats=stats)
+    yield pool
+    pool.closeall()
+
+
+def test_queries_are_grouped_by_service_method(pool, stats):
+    banks, offices = Bank(pool), BankOffice(pool)
+    listed = banks.list()
+    banks.read(listed[0].bank_id)
+    banks.read(listed[1].bank_id)
+    office = offices.list()[0]
+    with pytest.raises(psycopg2.DataError):
+        offices.update(office.bank_office_id, rent_cost="not a number")
+
+    snapshot = stats.snapshot()
+    assert {"Bank.list", "Bank.read", "BankOffice.list", "BankOffice.update"} <= set(snapshot)
+    assert snapshot["Bank.read"]["count"] >= 2 and snapshot["Bank.read"]["rows"] >= 2
+    assert snapshot["Bank.list"]["rows"] >= len(listed)
+    assert snapshot["BankOffice.update"]["errors"] == 1
+    assert all(item["errors"] == 0 for method, item in snapshot.items() if method != "BankOffice.update")
+
+    # Гистограмма нарастающим итогом: последняя корзина содержит все запросы метода
+    for item in snapshot.values():
+        counts = list(item["buckets"].values())
+        assert counts == sorted(counts) and counts[-1] == item["count"]
+        assert sum(statement["count"] for statement in item["statements"].values()) == item["count"]
+        assert 0 < item["max_seconds"] <= item["seconds"]
+
+
+def test_slow_queries_are_logged(pool, stats, caplog):
+    stats.slow_threshold = 0.0
+    with caplog.at_level(logging.WARNING, logger="db.queries"):
+        Bank(pool).list()
+    assert stats.snapshot()["Bank.list"]["slow"] >= 1
+    assert any("Slow query" in record.getMessage() and "Bank.list" in record.getMessage()
+               for record in caplog.records)
+
+
+def test_disabled_stats_record_nothing(pool, stats):
+    stats.enabled = False
+    Bank(pool).list()
+    assert stats.snapshot() == {}
+
+    stats.enabled = True
+    Bank(pool).list()
+    stats.reset()
+    assert stats.snapshot() == {}
+
+
+def test_histogram_buckets_and_statement_limit():
+    stats = QueryStats(buckets=(0.1, 1.0), max_statements=2)
+    stats.record("Bank.read", "SELECT  1", 0.1, rows=1)
+    stats.record("Bank.read", "SELECT 2", 0.5, rows=1)
+    stats.record("Bank.read", b"SELECT 3", 5.0, rows=-1, error=True)
+
+    item = stats.snapshot()["Bank.read"]
+    assert item["buckets"] == {"0.1": 1, "1.0": 2, "+Inf": 3}
+    assert (item["count"], item["rows"], item["errors"], item["max_seconds"]) == (3, 2, 1, 5.0)
+    # Тексты сверх max_statements считаются вместе, пробелы в тексте схлопываются
+    assert set(item["statements"]) == {"SELECT 1", "SELECT 2", OTHER_STATEMENTS}
+
+
+def test_prometheus_dump():
+    stats = QueryStats(buckets=(0.1,))
+    stats.record('Bank."read"', "SELECT 1", 0.05, rows=1)
+    stats.record_identity('Bank."read"', True)
+    stats.record_identity('Bank."read"', False)
+
+    lines = stats.prometheus().splitlines()
+    assert "# TYPE bank_db_query_duration_seconds histogram" in lines
+    assert 'bank_db_query_duration_seconds_bucket{method="Bank.\\"read\\"",le="0.1"} 1' in lines
+    assert 'bank_db_query_duration_seconds_bucket{method="Bank.\\"read\\"",le="+Inf"} 1' in lines
+    assert 'bank_db_query_duration_seconds_count{method="Bank.\\"read\\""} 1' in lines
+    assert 'bank_db_identity_map_hits_total{method="Bank.\\"read\\""} 1' in lines
+    assert 'bank_db_identity_map_misses_total{method="Bank.\\"read\\""} 1' in lines
+
+
+def test_async_queries_are_grouped_by_service_method(filler, params, stats):
+    pytest.importorskip("asyncpg")
+    from db.AsyncConnectionPool import AsyncConnectionPool
+    from service.AsyncBank import AsyncBank
+
+    async def read():
+        pool = await AsyncConnectionPool(params, stats=stats).open()
+        try:
+            banks = AsyncBank(pool)
+            listed = await banks.list()
+            await asyncio.gather(*(banks.read(bank.bank_id) for bank in listed))
+            return listed
+        finally:
+            await pool.close()
+
+    listed = asyncio.run(read())
+    snapshot = stats.snapshot()
+    assert snapshot["AsyncBank.list"]["rows"] >= len(listed)
+    assert snapshot["AsyncBank.read"]["count"] >= len(listed)
@@ -0,0 +1,81 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def empty(params):
+    filler = main.BankDataFiller(params, seed=7)
+    yield filler
+    filler.close_connection()
+
+
+def bank_names(filler):
+    return sorted(bank.name for bank in filler.bank.list())
+
+
+def test_bulk_seeding_twice_appends_unique_banks(empty, mismatches_of):
+    first = empty.fill_models_bulk(seed=1)
+    second = empty.fill_models_bulk(seed=1)
+    assert first == second
+
+    names = bank_names(empty)
+    assert len(names) == len(set(names)) == 2 * first["banks"]
+    assert "Sberbank" in names and any(name.startswith("Sberbank-") for name in names)
+    assert len(empty.user.list()) == 2 * first["users"]
+    assert mismatches_of(empty) == []
+
+
+def test_bulk_seeding_after_fill_models(empty, mismatches_of):
+    empty.fill_models()
+    banks = len(empty.bank.list())
+    counts = empty.fill_models_bulk(seed=1)
+    assert len(bank_names(empty)) == banks + counts["banks"]
+    # Созданные сервисами строки продолжают последовательности после загрузки
+    assert empty.bank.create_many(["New bank"])[0].bank_id == banks + counts["banks"] + 1
+    assert mismatches_of(empty) == []
+
+
+def test_parallel_seeding_after_bulk(empty, mismatches_of):
+    empty.fill_models_bulk(seed=1)
+    counts = empty.fill_models_parallel(workers=2, seed=1)
+    names = bank_names(empty)
+    assert len(names) == len(set(names)) == 2 * counts["banks"]
+    assert mismatches_of(empty) == []
+
+
+TABLES = ("banks", "bank_offices", "atms", "employees", "users", "user_banks", "payment_accounts", "credit_accounts")
+
+
+def dump(filler):
+    with filler.pool.connection() as connection, connection.cursor() as cursor:
+        tables = {}
+        for table in TABLES:
+            cursor.execute(f"SELECT * FROM {table} ORDER BY 1, 2")
+            tables[table] = cursor.fetchall()
+        return tables
+
+
+def test_fill_models_is_deterministic_for_a_seed(params):
+    dumps = []
+    for seed in (11, 11, 12):
+        filler = main.BankDataFiller(params, seed=seed)
+        try:
+            filler.fill_models()
+            dumps.append(dump(filler))
+        finally:
+            filler.close_connection()
+
+    assert all(dumps[0][table] for table in TABLES)
+    assert dumps[0] == dumps[1]
+    assert dumps[0]["banks"] != dumps[2]["banks"]
+
+
+def test_bulk_scale_multiplies_rows_of_every_bank(empty):
+    single = empty.fill_models_bulk(scale=1, seed=1)
+    double = empty.fill_models_bulk(scale=2, seed=1)
+
+    assert double["banks"] == single["banks"]
+    assert all(double[table] == 2 * count for table, count in single.items() if table != "banks")
+    bank = max(empty.bank.list(), key=lambda bank: bank.bank_id)
+    assert (bank.num_offices, bank.num_atms, bank.num_employees, bank.num_clients) == (6, 6, 30, 30)
@@ -0,0 +1,73 @@
+import asyncio
+
+import psycopg2
+import pytest
+
+from db.ConnectionPool import ConnectionPool, as_pool
+from service.User import User
+
+SERVICES = ["bank", "bank_office", "bank_atm", "employee", "user", "payment_account", "credit_account"]
+
+
+def fields(model):
+    return tuple(getattr(model, name) for name in type(model).__slots__)
+
+
+def open_cursors(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_cursors")
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.parametrize("service", SERVICES)
+def test_iter_all_streams_the_same_rows_as_list(filler, service):
+    service = getattr(filler, service)
+    expected = sorted(map(fields, service.list()))
+    assert expected
+    # Маленькие пачки: перебор идет через несколько обращений к серверному курсору
+    assert sorted(map(fields, service.iter_all(batch_size=3))) == expected
+
+
+def test_iter_all_is_lazy_and_releases_cursor_when_closed(filler, params):
+    connection = psycopg2.connect(**params)
+    try:
+        users = User(as_pool(connection))
+        stream = users.iter_all(batch_size=2)
+        assert open_cursors(connection) == 0  # Генератор ничего не выполняет до первого next
+
+        first = next(stream)
+        assert open_cursors(connection) == 1
+        assert first.user_id in {user.user_id for user in filler.user.list()}
+
+        stream.close()  # Досрочное прекращение перебора фиксирует транзакцию и закрывает курсор
+        assert open_cursors(connection) == 0
+    finally:
+        connection.close()
+
+
+def test_abandoned_stream_returns_its_connection(filler, params):
+    pool = ConnectionPool(params, maxconn=1, timeout=0.5)
+    try:
+        users = User(pool)
+        for _ in range(3):
+            stream = users.iter_all(batch_size=2)
+            next(stream)
+            stream.close()
+        assert users.read(filler.user.list()[0].user_id) is not None
+    finally:
+        pool.closeall()
+
+
+def test_async_iter_all_matches_sync(filler, params):
+    pytest.importorskip("asyncpg")
+    from db.AsyncConnectionPool import AsyncConnectionPool
+    from service.AsyncUser import AsyncUser
+
+    async def read():
+        pool = await AsyncConnectionPool(params).open()
+        try:
+            return [user async for user in AsyncUser(pool).iter_all(batch_size=3)]
+        finally:
+            await pool.close()
+
+    assert sorted(map(fields, asyncio.run(read()))) == sorted(map(fields, filler.user.list()))
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+import psycopg2
+import pytest
+
+
+@pytest.fixture
+def observer(params):
+    # Отдельное подключение видит только зафиксированные строки
+    connection = psycopg2.connect(**params)
+    connection.autocommit = True
+    yield connection
+    connection.close()
+
+
+def users_named(connection, *names):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT full_name FROM users WHERE full_name = ANY(%s) ORDER BY full_name", (list(names),))
+        return [name for (name,) in cursor.fetchall()]
+
+
+def onboard(filler, name, bank):
+    user = filler.user.create(name, "1990-01-01", "job", 2500, [bank.name])
+    account = filler.payment_account.create(user.user_id, bank.name, 100)
+    employee = filler.employee.list()[0]
+    filler.credit_account.create(user.user_id, bank.name, "2023-03-22", "2024-03-24", 12, 10000, 1000,
+                                 employee.employee_id, account.payment_account_id)
+    return user
+
+
+def test_unit_of_work_commits_once_on_exit(filler, observer, mismatches):
+    bank = filler.bank.list()[0]
+    with filler.pool.transaction() as unit:
+        user = onboard(filler, "onboarded", bank)
+        # Все операции идут через подключение единицы работы и не видны до выхода из блока
+        with filler.pool.connection() as connection:
+            assert connection is unit.connection
+        assert users_named(observer, "onboarded") == []
+
+    assert users_named(observer, "onboarded") == ["onboarded"]
+    assert len(filler.credit_account.page(filters={"user_id": user.user_id}).items) == 1
+    assert mismatches() == []
+
+
+def test_error_rolls_back_the_whole_unit(filler, observer, mismatches):
+    bank = filler.bank.list()[0]
+    clients = bank.num_clients
+    with pytest.raises(RuntimeError):
+        with filler.pool.transaction():
+            onboard(filler, "rolled back", bank)
+            raise RuntimeError("rollback")
+
+    assert users_named(observer, "rolled back") == []
+    assert filler.bank.read(bank.bank_id).num_clients == clients
+    assert mismatches() == []
+
+
+def test_nested_transaction_rolls_back_only_its_part(filler, observer, mismatches):
+    bank = filler.bank.list()[0]
+    with filler.pool.transaction() as unit:
+        onboard(filler, "outer", bank)
+        with pytest.raises(psycopg2.IntegrityError):
+            with filler.pool.transaction():
+                onboard(filler, "inner", bank)
+                assert unit.depth == 1
+                filler.payment_account.create(10 ** 6, bank.name, 100)  # Нет такого пользователя
+        with unit.savepoint():
+            onboard(filler, "savepoint", bank)
+        assert unit.depth == 0
+
+    assert users_named(observer, "outer", "inner", "savepoint") == ["outer", "savepoint"]
+    assert mismatches() == []
+
+
+def test_other_threads_do_not_join_the_unit(filler, observer):
+    # Разные банки: поток не ждет блокировку строки банка, которую держит единица работы
+    first, second = filler.bank.list()[:2]
+    with filler.pool.transaction():
+        onboard(filler, "waiting", first)
+        worker = threading.Thread(target=onboard, args=(filler, "independent", second))
+        worker.start()
+        worker.join()
+        assert users_named(observer, "waiting", "independent") == ["independent"]
+
+    assert users_named(observer, "waiting", "independent") == ["independent", "waiting"]
+
+
+def test_async_nested_transaction_rolls_back_only_its_part(filler, params, observer):
+    pytest.importorskip("asyncpg")
+    from db.AsyncConnectionPool import AsyncConnectionPool
+    from service.AsyncUser import AsyncUser
+
+    bank = filler.bank.list()[0]
+
+    async def write():
+        pool = await AsyncConnectionPool(params, deferred_counters=filler.pool.counters.deferred).open()
+        try:
+            users = AsyncUser(pool)
+            async with pool.transaction():
+                await users.create("async outer", "1990-01-01", "job", 2500, [bank.name])
+                with pytest.raises(RuntimeError):
+                    async with pool.transaction():
+                        await users.create("async inner", "1990-01-01", "job", 2500, [bank.name])
+                        raise RuntimeError("rollback")
+                assert users_named(observer, "async outer") == []
+        finally:
+            await pool.close()
+
+    asyncio.run(write())
+    assert users_named(observer, "async outer", "async inner") == ["async outer"]